@@ -112,6 +112,10 @@ def create_app(config_name=None):
     # 注册蓝图
     register_blueprints(app)
     
+    # AI接口准入控制（限速、并发上限与排队）
+    from app.utils.admission_control import init_admission_control
+    init_admission_control(app)
+    
     # 注册错误处理
     register_error_handlers(app)
     
@@ -0,0 +1,21 @@
+"""
+性能基准测试包
+每个模块可通过 python -m app.benchmarks.<模块名> 单独运行
+需要大规模数据集时，使用 app.utils.scale_data_generator.build_scale_database
+按固定种子生成可复现的数据库（命令行: python -m app.utils.scale_data_generator --database 测试库路径 --rows N）
+
+模块说明：
+- medical_extraction.py: 医疗实体抽取吞吐量（条/秒）
+- db_writer.py: 32个并发写线程下的持续插入吞吐量（行/秒）
+- his_import.py: HIS批量导入吞吐量（行/分钟）
+- compact_rows.py: 100万条 MedicalRecord 以完整模型/紧凑行加载的耗时与内存
+- model_persistence.py: Patient/MedicalRecord/WorkloadRecord 逐条保存与批量保存吞吐量（行/秒）
+- relation_loading.py: 病历关联患者/医生的逐条查询与批量预加载（含查询次数校验）
+- workload_summary.py: 500万条工作量记录的汇总查询耗时（原实现/SQL聚合/日汇总表）
+- partitioned_storage.py: 多年业务数据按年归档前后的仪表盘查询耗时、主库大小与VACUUM耗时
+- result_summary.py: 不同行数查询结果发送给大模型前后的token数、摘要耗时与回答耗时
+- agent_loop.py: 固定问题集上ReAct Agent与工具调用Agent每个回答的大模型调用次数与端到端耗时（本地桩模型）
+- multi_query.py: 按科室对比多项指标时逐条执行SQL与多查询工具并发执行的模型调用次数、查询耗时与端到端耗时
+- chat_pipeline.py: 固定问题集驱动完整Agent流程的 p50/p95 耗时、每问模型调用次数与数据库耗时占比
+  （本地桩服务、录制回放或真实API，见 app.utils.llm_recorder 与 app.utils.llm_stub_server）
+"""
@@ -0,0 +1,175 @@
+"""
+Agent执行循环基准测试
+
+在固定问题集上对比两种执行方式每个回答的大模型调用次数与端到端耗时：
+- react: LangChain ZERO_SHOT_REACT_DESCRIPTION Agent（原实现，每轮只能发出一个工具调用）
+- tool_calling: ToolCallingAgent（同一轮的多个工具调用并行执行）
+两者使用相同的本地桩模型（固定延迟、按问题预设的工具计划）和桩工具（固定延迟），
+不访问真实API，结果只反映执行循环本身的差异
+
+用法:
+    python -m app.benchmarks.agent_loop --llm-latency 0.5 --tool-latency 0.2
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.tool_agent import AgentTool, ToolCallingAgent
+
+# 固定问题集：问题 -> 需要调用的工具及参数
+QUESTIONS = [
+    ('今年门诊量是多少', [('medical_database_query', '今年门诊量')]),
+    ('什么是高血压', [('medical_knowledge_search', '高血压')]),
+    ('各科室收入情况如何，给出财务分析建议',
+     [('medical_database_query', '各科室收入'), ('data_analysis', '科室收入财务分析')]),
+    ('对比门诊量和住院量的趋势并给出建议',
+     [('medical_database_query', '门诊量趋势'), ('medical_database_query', '住院量趋势'),
+      ('data_analysis', '门诊住院趋势')]),
+    ('糖尿病患者的门诊量和科室绩效如何',
+     [('medical_knowledge_search', '糖尿病'), ('medical_database_query', '糖尿病门诊量'),
+      ('data_analysis', '科室绩效')]),
+    ('门诊管理有哪些要点', [('medical_knowledge_search', '门诊管理')])
+]
+TOOL_DESCRIPTIONS = {
+    'medical_database_query': '查询医疗数据库，获取门诊、住院、手术、收入等数据。',
+    'medical_knowledge_search': '搜索医疗专业知识，包括疾病信息、治疗方案、医学概念等。',
+    'data_analysis': '对医疗数据进行分析，提供专业建议和见解。'
+}
+
+
+def _plan(question: str) -> List[tuple]:
+    for text, plan in QUESTIONS:
+        if text in question:
+            return plan
+    return []
+
+
+def _make_tool(name: str, latency: float):
+    def run(query: str) -> Dict[str, Any]:
+        time.sleep(latency)
+        return {'ok': True, 'tool': name, 'query': query, 'value': len(query)}
+    return run
+
+
+class StubToolCallingLLM:
+    """按问题计划返回工具调用的桩模型：第一轮发出全部工具调用，拿到结果后给出回答"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def call_with_tools(self, messages, tools=None, tool_choice=None, **kwargs) -> Optional[Dict[str, Any]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        plan = _plan(messages[1]['content'])
+        if messages[-1]['role'] == 'user' and plan and tool_choice != 'none':
+            return {'role': 'assistant', 'content': '', 'tool_calls': [
+                {'id': f'call_{index}', 'type': 'function',
+                 'function': {'name': name, 'arguments': json.dumps({'query': argument}, ensure_ascii=False)}}
+                for index, (name, argument) in enumerate(plan)
+            ]}
+        return {'role': 'assistant', 'content': f"根据{len(plan)}项工具结果的回答"}
+
+
+def _build_react_agent(llm_latency: float, tool_latency: float, max_iterations: int):
+    """创建使用桩模型的ReAct Agent（仅基准测试需要LangChain）"""
+    from langchain.agents import initialize_agent, AgentType
+    from langchain.llms.base import LLM
+    from langchain.tools import Tool
+
+    class StubReActLLM(LLM):
+        """按问题计划逐轮输出 Action 的桩模型"""
+
+        latency: float = 0.0
+        calls: int = 0
+
+        def _call(self, prompt: str, stop=None, run_manager=None, **kwargs: Any) -> str:
+            self.calls += 1
+            time.sleep(self.latency)
+            scratchpad = prompt[prompt.rfind('Question:'):]
+            plan = _plan(scratchpad)
+            step = scratchpad.count('Observation:')
+            if step < len(plan):
+                name, argument = plan[step]
+                return f"Thought: 需要调用{name}\nAction: {name}\nAction Input: {argument}"
+            return f"Thought: I now know the final answer\nFinal Answer: 根据{len(plan)}项工具结果的回答"
+
+        @property
+        def _llm_type(self) -> str:
+            return 'stub_react'
+
+    llm = StubReActLLM(latency=llm_latency)
+    tools = [
+        Tool(name=name, description=description,
+             func=lambda query, run=_make_tool(name, tool_latency): json.dumps(run(query), ensure_ascii=False))
+        for name, description in TOOL_DESCRIPTIONS.items()
+    ]
+    return initialize_agent(tools=tools, llm=llm, agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+                            verbose=False, max_iterations=max_iterations, handle_parsing_errors=True)
+
+
+def run_benchmark(llm_latency: float = 0.5, tool_latency: float = 0.2, max_steps: int = 4) -> List[Dict[str, Any]]:
+    """
+    运行Agent执行循环基准测试
+
+    参数:
+        llm_latency: 桩模型每次调用的延迟（秒）
+        tool_latency: 桩工具每次调用的延迟（秒）
+        max_steps: 两种Agent的最大轮数
+
+    返回:
+        每个问题的 {'question', 'tools', 'react_calls', 'react_seconds', 'tool_calling_calls', 'tool_calling_seconds'}
+    """
+    tools = [AgentTool(name=name, description=description, func=_make_tool(name, tool_latency))
+             for name, description in TOOL_DESCRIPTIONS.items()]
+    stub_llm = StubToolCallingLLM(llm_latency)
+    tool_agent = ToolCallingAgent(stub_llm, tools, '你是医疗数据分析助手',
+                                  {'max_steps': max_steps, 'tool_timeout': tool_latency * 10 + 5})
+    react_agent = _build_react_agent(llm_latency, tool_latency, max_steps)
+    react_llm = react_agent.agent.llm_chain.llm
+
+    measured = []
+    for question, plan in QUESTIONS:
+        react_llm.calls = 0
+        start = time.perf_counter()
+        react_agent.run(question)
+        react_seconds = time.perf_counter() - start
+
+        stub_llm.calls = 0
+        start = time.perf_counter()
+        tool_agent.run(question)
+        tool_seconds = time.perf_counter() - start
+
+        measured.append({
+            'question': question,
+            'tools': len(plan),
+            'react_calls': react_llm.calls,
+            'react_seconds': react_seconds,
+            'tool_calling_calls': stub_llm.calls,
+            'tool_calling_seconds': tool_seconds
+        })
+    return measured
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Agent执行循环基准测试')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='桩模型每次调用的延迟（秒）')
+    parser.add_argument('--tool-latency', type=float, default=0.2, help='桩工具每次调用的延迟（秒）')
+    parser.add_argument('--max-steps', type=int, default=4, help='最大轮数')
+    args = parser.parse_args()
+
+    measured = run_benchmark(args.llm_latency, args.tool_latency, args.max_steps)
+    for item in measured:
+        print(f"{item['question']}（{item['tools']}个工具）: "
+              f"ReAct {item['react_calls']} 次调用 / {item['react_seconds']:.2f} 秒, "
+              f"工具调用 {item['tool_calling_calls']} 次调用 / {item['tool_calling_seconds']:.2f} 秒")
+    count = len(measured)
+    print(f"平均每个回答: ReAct {sum(item['react_calls'] for item in measured) / count:.2f} 次调用 / "
+          f"{sum(item['react_seconds'] for item in measured) / count:.2f} 秒, "
+          f"工具调用 {sum(item['tool_calling_calls'] for item in measured) / count:.2f} 次调用 / "
+          f"{sum(item['tool_calling_seconds'] for item in measured) / count:.2f} 秒")
+
+
+if __name__ == '__main__':
+    main()
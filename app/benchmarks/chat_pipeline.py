@@ -0,0 +1,184 @@
+"""
+对话流程离线基准测试
+
+用规模数据生成器生成门诊/住院/手术/收入数据，以固定问题集驱动完整的Agent流程
+（StandardLangChainAgent -> 工具调用 -> SQL沙箱 -> 回答），统计：
+- 每个问题端到端耗时的 p50/p95
+- 每个问题的大模型调用次数与工具调用次数
+- 数据库查询耗时、大模型调用耗时占端到端耗时的比例
+
+大模型后端：
+- stub: 启动本地OpenAI兼容桩服务（固定延迟），不访问网络（默认）
+- replay: 只从录制文件回放，延迟按录制耗时或 --llm-latency 指定
+- live: 调用真实API（需要网络与API密钥）
+stub/live 模式下提供 --recordings 时同时录制，之后可用 replay 模式复现同一轮测试
+
+用法:
+    python -m app.benchmarks.chat_pipeline --rows 200000 --llm-latency 0.5
+    python -m app.benchmarks.chat_pipeline --backend live --recordings instance/chat_pipeline.jsonl
+    python -m app.benchmarks.chat_pipeline --backend replay --recordings instance/chat_pipeline.jsonl
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from app.config import config
+from app.config.base import LLM_COALESCING_CONFIG
+from app.utils.llm_recorder import configure_llm_recorder, OFF, RECORD, REPLAY
+from app.utils.llm_stub_server import start_stub_server
+from app.utils.scale_data_generator import ScaleDataGenerator
+from app.utils.sql_sandbox import get_sql_sandbox
+
+START_DATE = date(2022, 1, 1)
+
+# 固定问题集
+QUESTIONS = [
+    '今年门诊量是多少',
+    '各科室的门诊量排名',
+    '住院患者的平均住院天数',
+    '各科室手术量和平均手术时长',
+    '各科室收入情况如何，给出财务分析建议',
+    '对比门诊量和住院量的趋势并给出建议',
+    '什么是高血压',
+    '门诊管理有哪些要点'
+]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(q / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _run_question(agent, question: str) -> Dict[str, Any]:
+    sandbox = get_sql_sandbox()
+    db_before = sandbox.get_query_stats()['seconds']
+    start = time.perf_counter()
+    result = agent.process_query(question)
+    seconds = time.perf_counter() - start
+    return {
+        'question': question,
+        'success': bool(result.get('success')),
+        'seconds': seconds,
+        'llm_calls': result.get('llm_calls') or 0,
+        'tool_calls': result.get('tool_calls') or 0,
+        'llm_seconds': sum(step.get('llm_seconds', 0) for step in result.get('steps') or []),
+        'db_seconds': sandbox.get_query_stats()['seconds'] - db_before
+    }
+
+
+def _summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = [run['seconds'] for run in runs]
+    total = sum(latencies) or 1.0
+    return {
+        'runs': len(runs),
+        'success_rate': sum(run['success'] for run in runs) / len(runs) if runs else 0,
+        'p50': _percentile(latencies, 50),
+        'p95': _percentile(latencies, 95),
+        'mean': total / len(runs) if runs else 0,
+        'llm_calls_per_question': sum(run['llm_calls'] for run in runs) / len(runs) if runs else 0,
+        'tool_calls_per_question': sum(run['tool_calls'] for run in runs) / len(runs) if runs else 0,
+        'db_time_share': sum(run['db_seconds'] for run in runs) / total,
+        'llm_time_share': sum(run['llm_seconds'] for run in runs) / total
+    }
+
+
+def run_benchmark(rows: int = 200000, backend: str = 'stub', llm_latency: Optional[float] = 0.5,
+                  repeat: int = 3, recordings: Optional[str] = None,
+                  questions: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    运行对话流程基准测试
+
+    参数:
+        rows: 门诊记录行数（其余业务表按比例生成）
+        backend: 大模型后端 stub、replay 或 live
+        llm_latency: stub 的每次调用延迟；replay 时为固定回放延迟，None 表示按录制耗时
+        repeat: 问题集重复次数（另有一轮预热不计入统计）
+        recordings: 录制文件路径（replay 模式必需，stub/live 模式提供时同时录制）
+        questions: 问题集，默认使用 QUESTIONS
+
+    返回:
+        {'backend', 'summary': 汇总统计, 'per_question': {问题: 汇总统计}, 'recorder': 录制/回放统计}
+    """
+    if backend == REPLAY and not recordings:
+        raise ValueError('replay 模式需要提供录制文件')
+    questions = questions or QUESTIONS
+    original_path = config.DATABASE_PATH
+    original_coalescing = LLM_COALESCING_CONFIG['enabled']
+    server = None
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config.DATABASE_PATH = os.path.join(tmp, 'chat_pipeline.db')
+            ScaleDataGenerator(start_date=START_DATE, years=2).populate(
+                rows, feeds=['visits', 'admissions', 'surgeries', 'revenue'], mode='replace',
+                database_path=config.DATABASE_PATH)
+
+            # 关闭请求合并与回答缓存，每次提问都完整经过Agent流程
+            LLM_COALESCING_CONFIG['enabled'] = False
+            if backend == REPLAY:
+                recorder = configure_llm_recorder(REPLAY, recordings, latency=llm_latency)
+            else:
+                recorder = configure_llm_recorder(RECORD if recordings else OFF, recordings)
+
+            from app.services.standard_langchain_agent import StandardLangChainAgent
+            agent = StandardLangChainAgent()
+            if backend == 'stub':
+                server = start_stub_server(latency=llm_latency or 0.0)
+                agent.llm.api_url = server.url
+
+            for question in questions:
+                _run_question(agent, question)
+            runs = [_run_question(agent, question) for _ in range(repeat) for question in questions]
+            get_sql_sandbox().close()
+
+            return {
+                'backend': backend,
+                'summary': _summarize(runs),
+                'per_question': {question: _summarize([run for run in runs if run['question'] == question])
+                                 for question in questions},
+                'recorder': recorder.get_stats()
+            }
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        configure_llm_recorder(OFF)
+        LLM_COALESCING_CONFIG['enabled'] = original_coalescing
+        config.DATABASE_PATH = original_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对话流程离线基准测试')
+    parser.add_argument('--rows', type=int, default=200000, help='门诊记录行数')
+    parser.add_argument('--backend', choices=['stub', 'replay', 'live'], default='stub', help='大模型后端')
+    parser.add_argument('--llm-latency', type=float, default=None,
+                        help='stub 的调用延迟（默认0.5秒）；replay 的固定回放延迟（默认按录制耗时）')
+    parser.add_argument('--repeat', type=int, default=3, help='问题集重复次数')
+    parser.add_argument('--recordings', help='录制文件路径（replay 时读取，stub/live 时写入）')
+    args = parser.parse_args()
+
+    llm_latency = args.llm_latency
+    if llm_latency is None and args.backend == 'stub':
+        llm_latency = 0.5
+    result = run_benchmark(args.rows, args.backend, llm_latency, args.repeat, args.recordings)
+
+    def line(name: str, item: Dict[str, Any]) -> str:
+        return (f"[{name}] p50 {item['p50']:.2f} 秒, p95 {item['p95']:.2f} 秒, "
+                f"模型调用 {item['llm_calls_per_question']:.2f} 次/问, 工具调用 {item['tool_calls_per_question']:.2f} 次/问, "
+                f"数据库耗时占比 {item['db_time_share']:.1%}, 模型耗时占比 {item['llm_time_share']:.1%}, "
+                f"成功率 {item['success_rate']:.0%}")
+
+    print(line(f"{result['backend']} 全部问题", result['summary']))
+    for question, item in result['per_question'].items():
+        print(line(question, item))
+    print(f"录制/回放: {result['recorder']}")
+
+
+if __name__ == '__main__':
+    main()
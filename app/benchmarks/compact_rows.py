@@ -0,0 +1,153 @@
+"""
+紧凑行加载基准测试：加载100万条 MedicalRecord 的耗时与内存
+
+对比两种方式：
+- model: get_all 构造完整模型实例（逐行转字典、立即解析全部JSON与日期字段，在样本上测量后按行数折算）
+- compact: get_rows 构造紧凑只读行（元组存储，JSON与日期字段首次访问时解析）
+另测一次只读取列表展示字段（患者、科室、就诊日期）的耗时
+
+用法:
+    python -m app.benchmarks.compact_rows --rows 1000000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from app.config import config
+from app.models.medical_record import MedicalRecord
+
+DEPARTMENTS = ['内科', '外科', '妇产科', '儿科', '骨科', '眼科', '耳鼻喉科', '神经科', '皮肤科', '急诊科']
+DIAGNOSES = [('J06.9', '上呼吸道感染'), ('I10', '原发性高血压'), ('E11.9', '2型糖尿病'), ('K29.7', '胃炎')]
+DRUGS = ['阿莫西林', '布洛芬', '二甲双胍', '氨氯地平', '奥美拉唑']
+
+
+def build_database(path: str, rows: int, seed: int = 42, chunk_size: int = 100000) -> None:
+    """
+    生成 medical_records 表（列与模型字段一致，JSON字段按保存格式存为字符串）
+
+    参数:
+        path: 数据库路径
+        rows: 记录数
+        seed: 随机种子
+        chunk_size: 每批插入行数
+    """
+    rng = random.Random(seed)
+    columns = MedicalRecord.row_class()._columns
+    start = datetime(2023, 1, 1)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute(f"CREATE TABLE medical_records (id TEXT PRIMARY KEY, {', '.join(columns[1:])})")
+    insert = f"INSERT INTO medical_records ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+    for offset in range(0, rows, chunk_size):
+        batch = []
+        for i in range(offset, min(offset + chunk_size, rows)):
+            when = (start + timedelta(minutes=rng.randrange(1051200))).isoformat()
+            code, name = DIAGNOSES[rng.randrange(len(DIAGNOSES))]
+            values = {
+                'id': f"{i:032x}",
+                'patient_id': f"P{rng.randrange(200000):07d}",
+                'doctor_id': f"D{rng.randrange(300):04d}",
+                'record_date': when,
+                'visit_type': '门诊',
+                'chief_complaint': '咳嗽、咽痛三天',
+                'diagnosis': json.dumps([{'code': code, 'name': name}], ensure_ascii=False),
+                'treatment_plan': json.dumps({'plan': '对症治疗', 'rest_days': rng.randrange(1, 7)}, ensure_ascii=False),
+                'prescriptions': json.dumps([{'drug': DRUGS[rng.randrange(len(DRUGS))], 'dose': '0.5g', 'days': 5}],
+                                            ensure_ascii=False),
+                'lab_results': json.dumps([{'item': 'WBC', 'value': round(rng.uniform(4, 12), 1)}]),
+                'imaging_results': '[]',
+                'follow_up': '{}',
+                'department': DEPARTMENTS[rng.randrange(len(DEPARTMENTS))],
+                'is_completed': 1,
+                'created_at': when,
+                'updated_at': when,
+                'workload_points': round(rng.uniform(0.5, 5), 1)
+            }
+            batch.append(tuple(values.get(column) for column in columns))
+        conn.executemany(insert, batch)
+    conn.commit()
+    conn.close()
+
+
+def _measure(load, rows: int) -> dict:
+    """测量加载耗时（不跟踪内存）与加载结果占用的内存（tracemalloc）"""
+    gc.collect()
+    start = time.perf_counter()
+    items = load()
+    seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for item in items:
+        (item.patient_id, item.department, item.record_date)
+    listing_seconds = time.perf_counter() - start
+    loaded = len(items)
+    del items
+    gc.collect()
+
+    tracemalloc.start()
+    items = load()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del items
+    gc.collect()
+
+    scale = rows / loaded if loaded else 0
+    return {
+        'rows_per_second': loaded / seconds if seconds else 0,
+        'seconds': seconds * scale,
+        'listing_seconds': listing_seconds * scale,
+        'bytes_per_row': memory / loaded if loaded else 0,
+        'memory_mb': memory * scale / 1024 / 1024
+    }
+
+
+def run_benchmark(rows: int = 1000000, model_rows: int = 200000) -> dict:
+    """
+    运行加载基准测试
+
+    参数:
+        rows: 记录数
+        model_rows: 完整模型方式的样本行数（结果按 rows 折算）
+
+    返回:
+        {方式: {'rows_per_second', 'seconds', 'listing_seconds', 'bytes_per_row', 'memory_mb'}}
+    """
+    original_path = config.DATABASE_PATH
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config.DATABASE_PATH = os.path.join(tmp, 'records.db')
+            build_database(config.DATABASE_PATH, rows)
+            order_by = 'id'
+            return {
+                'model': _measure(lambda: MedicalRecord.get_all(order_by=order_by, limit=min(model_rows, rows)), rows),
+                'compact': _measure(lambda: MedicalRecord.get_rows(order_by=order_by), rows)
+            }
+    finally:
+        config.DATABASE_PATH = original_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='紧凑行加载基准测试')
+    parser.add_argument('--rows', type=int, default=1000000, help='MedicalRecord 记录数')
+    parser.add_argument('--model-rows', type=int, default=200000, help='完整模型方式的样本行数')
+    args = parser.parse_args()
+
+    for mode, result in run_benchmark(args.rows, args.model_rows).items():
+        print(f"[{mode}] 加载 {result['rows_per_second']:,.0f} 行/秒 "
+              f"({args.rows} 行约 {result['seconds']:.1f} 秒), "
+              f"列表字段读取 {result['listing_seconds']:.2f} 秒, "
+              f"内存 {result['bytes_per_row']:.0f} 字节/行 (约 {result['memory_mb']:,.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
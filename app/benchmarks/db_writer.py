@@ -0,0 +1,127 @@
+"""
+数据库写入吞吐量基准测试：32个并发写线程持续插入
+
+对比两种方式：
+- direct: 每次写入打开连接并单独提交（原 insert_record 行为）
+- queue: 经由单写线程分组提交（DatabaseWriter）
+
+用法:
+    python -m app.benchmarks.db_writer --writers 32 --rows 500
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app.utils.db_writer import DatabaseWriter
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS bench_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    writer INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    message TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+INSERT_SQL = "INSERT INTO bench_logs (writer, seq, message) VALUES (?, ?, ?)"
+
+
+def _prepare_database(path: str) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(CREATE_TABLE_SQL)
+    conn.commit()
+    conn.close()
+
+
+def _direct_insert(path: str, params, timeout: float) -> None:
+    conn = sqlite3.connect(path, timeout=timeout)
+    try:
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(INSERT_SQL, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _run_writers(writers: int, rows: int, insert) -> dict:
+    errors = []
+    error_lock = threading.Lock()
+
+    def worker(writer_id):
+        for seq in range(rows):
+            try:
+                insert((writer_id, seq, f"writer {writer_id} row {seq}"))
+            except Exception as e:
+                with error_lock:
+                    errors.append(str(e))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    total = writers * rows
+    return {
+        'rows': total,
+        'seconds': elapsed,
+        'inserts_per_second': (total - len(errors)) / elapsed if elapsed else 0,
+        'errors': len(errors),
+        'locked_errors': sum(1 for e in errors if 'locked' in e)
+    }
+
+
+def run_benchmark(writers: int = 32, rows: int = 500, lock_timeout: float = 5.0) -> dict:
+    """
+    运行写入吞吐量测试
+
+    参数:
+        writers: 并发写线程数
+        rows: 每个线程插入的行数
+        lock_timeout: direct模式下连接的锁等待秒数
+
+    返回:
+        {'direct': {...}, 'queue': {...}}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        direct_path = os.path.join(tmp, 'direct.db')
+        _prepare_database(direct_path)
+        results['direct'] = _run_writers(
+            writers, rows, lambda params: _direct_insert(direct_path, params, lock_timeout)
+        )
+
+        queue_path = os.path.join(tmp, 'queue.db')
+        _prepare_database(queue_path)
+        writer = DatabaseWriter(queue_path)
+        results['queue'] = _run_writers(writers, rows, lambda params: writer.execute(INSERT_SQL, params))
+        results['queue'].update(writer.get_stats())
+        writer.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并发写入吞吐量基准测试')
+    parser.add_argument('--writers', type=int, default=32, help='并发写线程数')
+    parser.add_argument('--rows', type=int, default=500, help='每个线程插入的行数')
+    parser.add_argument('--lock-timeout', type=float, default=5.0, help='direct模式的锁等待秒数')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.writers, args.rows, args.lock_timeout)
+    for mode, result in results.items():
+        line = (f"[{mode}] {result['rows']} 行, 耗时 {result['seconds']:.2f} 秒, "
+                f"{result['inserts_per_second']:.0f} 行/秒, 失败 {result['errors']} "
+                f"(database is locked: {result['locked_errors']})")
+        if 'avg_batch_size' in result:
+            line += f", 平均批大小 {result['avg_batch_size']:.1f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+医疗实体抽取吞吐量基准测试
+
+用法:
+    python -m app.benchmarks.medical_extraction --notes 20000
+"""
+import argparse
+import random
+
+from app.utils.medical_extractor import get_extraction_engine
+
+# 病历片段模板
+NOTE_TEMPLATES = [
+    "患者{age}岁，主诉{symptom}{days}天，伴{symptom2}。初步诊断为{disease}，给予{drug}{dose}mg每日{times}次。",
+    "入院查血常规，白细胞：{wbc}x10^9/L，血糖：{glu}mmol/L。既往患有{disease}，长期服用{drug}。",
+    "复诊，{symptom}较前好转，心电图未见明显异常。明确诊断：{disease}，继续使用{drug}{dose}片每日{times}次。",
+]
+
+
+def generate_notes(count: int, seed: int = 42):
+    """
+    生成合成病历文本
+
+    参数:
+        count: 病历数量
+        seed: 随机种子
+
+    返回:
+        病历文本列表
+    """
+    rng = random.Random(seed)
+    diseases = ["糖尿病", "高血压", "肺炎", "冠心病", "肝炎", "脑梗"]
+    symptoms = ["头痛", "发热", "咳嗽", "乏力", "胸闷", "腹痛"]
+    drugs = ["阿司匹林", "二甲双胍", "胰岛素", "头孢", "布洛芬"]
+
+    notes = []
+    for _ in range(count):
+        template = rng.choice(NOTE_TEMPLATES)
+        notes.append(template.format(
+            age=rng.randint(18, 90),
+            symptom=rng.choice(symptoms),
+            symptom2=rng.choice(symptoms),
+            days=rng.randint(1, 14),
+            disease=rng.choice(diseases),
+            drug=rng.choice(drugs),
+            dose=rng.choice([5, 10, 25, 50, 100]),
+            times=rng.randint(1, 3),
+            wbc=round(rng.uniform(3.5, 15.0), 1),
+            glu=round(rng.uniform(4.0, 15.0), 1),
+        ))
+    return notes
+
+
+def run_benchmark(notes: int = 20000, repeat: int = 3):
+    """
+    运行抽取吞吐量测试
+
+    参数:
+        notes: 病历数量
+        repeat: 重复次数
+
+    返回:
+        基准测试结果字典
+    """
+    corpus = generate_notes(notes)
+    engine = get_extraction_engine()
+    result = engine.benchmark(corpus, repeat=repeat)
+    result['entities_per_note'] = sum(len(e) for e in engine.extract_batch(corpus[:1000])) / min(len(corpus), 1000)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='医疗实体抽取吞吐量基准测试')
+    parser.add_argument('--notes', type=int, default=20000, help='病历数量')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数')
+    args = parser.parse_args()
+
+    result = run_benchmark(args.notes, args.repeat)
+    print(f"病历数: {result['notes']}")
+    print(f"耗时: {result['seconds']:.3f} 秒")
+    print(f"吞吐量: {result['notes_per_second']:.0f} 条/秒")
+    print(f"平均实体数: {result['entities_per_note']:.1f} 个/条")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+模型持久化吞吐量基准测试（Patient / MedicalRecord / WorkloadRecord）
+
+对每个模型依次测试：
+- legacy_save: 逐条 get_by_id 后再插入（原 save 行为，在样本上测量）
+- save: 逐条单语句 upsert（在样本上测量）
+- bulk_create: 批量插入全部新记录
+- bulk_save: 批量 upsert（全部记录已存在，走更新分支）
+- bulk_update: 按主键批量更新
+
+用法:
+    python -m app.benchmarks.model_persistence --rows 100000
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from app.config import config
+from app.models.patient import Patient
+from app.models.medical_record import MedicalRecord
+from app.models.workload import WorkloadRecord
+from app.utils.database import get_db_connection, insert_record
+
+
+def _create_table(model) -> None:
+    """按模型字段建表（主键为TEXT）"""
+    columns = ', '.join(f for f in model.__fields__ if f != model.__primary_key__)
+    with get_db_connection() as conn:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {model.__tablename__} "
+                     f"({model.__primary_key__} TEXT PRIMARY KEY, {columns})")
+
+
+def _make_instances(model, rows: int, rng: random.Random) -> list:
+    """生成模型实例（JSON字段与日期字段使用模型默认值或随机值）"""
+    base = datetime.datetime(2024, 1, 1)
+    instances = []
+    for i in range(rows):
+        when = base + datetime.timedelta(minutes=rng.randrange(525600))
+        if model is Patient:
+            instance = Patient(name=f"患者{i}", age=rng.randrange(1, 95), phone=f"138{i:08d}",
+                               allergies=["青霉素"] if i % 10 == 0 else [],
+                               medical_history=[{"date": when.date().isoformat(), "diagnosis": "高血压"}])
+        elif model is MedicalRecord:
+            instance = MedicalRecord(patient_id=f"P{i}", doctor_id=f"D{rng.randrange(300)}",
+                                     record_date=when, chief_complaint="咳嗽三天",
+                                     diagnosis=[{"code": "J06.9", "name": "上呼吸道感染"}],
+                                     prescriptions=[{"drug": "阿莫西林", "dose": "0.5g", "days": 5}])
+        else:
+            instance = WorkloadRecord(doctor_id=f"D{rng.randrange(300)}", category_id=f"C{rng.randrange(15)}",
+                                      record_date=when, points=round(rng.uniform(0.5, 8), 1),
+                                      metadata={"source": "benchmark"})
+        instances.append(instance)
+    return instances
+
+
+def _legacy_save(instance) -> bool:
+    """原 save 行为：先按主键查询，不存在时插入"""
+    columns, to_row = instance._row_serializer()
+    data = dict(zip(columns, to_row(instance)))
+    if instance.get_by_id(data[instance.__primary_key__]):
+        return False
+    return insert_record(instance.__tablename__, data) is not None
+
+
+def _rate(func, items) -> float:
+    start = time.perf_counter()
+    func(items)
+    return len(items) / (time.perf_counter() - start)
+
+
+def run_benchmark(rows: int = 100000, sample: int = 2000, seed: int = 42) -> dict:
+    """
+    运行持久化基准测试
+
+    参数:
+        rows: 每个模型的记录数
+        sample: 逐条保存方式的样本数
+        seed: 随机种子
+
+    返回:
+        {模型名: {方式: 行/秒}}
+    """
+    rng = random.Random(seed)
+    original_path = config.DATABASE_PATH
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # 写入队列的写线程绑定首次使用时的数据库路径，三个模型共用同一个库
+            config.DATABASE_PATH = os.path.join(tmp, 'persistence.db')
+            for model in (Patient, MedicalRecord, WorkloadRecord):
+                _create_table(model)
+                instances = _make_instances(model, rows, rng)
+                sample_size = min(sample, rows)
+                timings = {
+                    'legacy_save': _rate(lambda items: [_legacy_save(obj) for obj in items],
+                                         _make_instances(model, sample_size, rng)),
+                    'save': _rate(lambda items: [obj.save() for obj in items],
+                                  _make_instances(model, sample_size, rng)),
+                    'bulk_create': _rate(model.bulk_create, instances)
+                }
+                for instance in instances:
+                    instance.updated_at = datetime.datetime.now()
+                timings['bulk_save'] = _rate(model.bulk_save, instances)
+                timings['bulk_update'] = _rate(model.bulk_update, instances)
+                results[model.__name__] = timings
+    finally:
+        config.DATABASE_PATH = original_path
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模型持久化吞吐量基准测试')
+    parser.add_argument('--rows', type=int, default=100000, help='每个模型的记录数')
+    parser.add_argument('--sample', type=int, default=2000, help='逐条保存方式的样本数')
+    args = parser.parse_args()
+
+    for name, timings in run_benchmark(args.rows, args.sample).items():
+        print(f"[{name}] " + ", ".join(f"{mode} {rate:,.0f} 行/秒" for mode, rate in timings.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+多查询工具基准测试
+
+用规模数据生成器生成门诊/住院/手术数据，对"按科室对比门诊、住院和手术量"这类问题比较：
+- sequential: 原先每个Agent轮次只能执行一条SQL（每条SQL前一次模型调用，最后一次模型调用作答）
+- multi_query: 一次模型调用发出 multi_query，子查询在只读连接池上并发执行，再一次模型调用作答
+模型调用以固定延迟模拟，分别给出纯查询耗时与含模型调用的端到端耗时
+
+用法:
+    python -m app.benchmarks.multi_query --rows 1000000 --llm-latency 1.0
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+
+from app.config import config
+from app.services.multi_query import run_multi_query
+from app.services.result_summarizer import summarize_results
+from app.utils.scale_data_generator import ScaleDataGenerator
+from app.utils.sql_sandbox import get_sql_sandbox
+
+START_DATE = date(2022, 1, 1)
+
+# 按科室对比门诊、住院、手术量与收入
+QUERIES = [
+    "SELECT department, COUNT(*) AS visits FROM visits GROUP BY department ORDER BY visits DESC",
+    "SELECT department, COUNT(*) AS admissions, AVG(length_of_stay) AS avg_los FROM admissions "
+    "GROUP BY department ORDER BY admissions DESC",
+    "SELECT department, COUNT(*) AS surgeries, AVG(duration) AS avg_duration FROM surgeries "
+    "GROUP BY department ORDER BY surgeries DESC",
+    "SELECT department, SUM(amount) AS revenue FROM revenue GROUP BY department ORDER BY revenue DESC"
+]
+
+
+def _sequential(queries: list, llm_latency: float) -> dict:
+    sandbox = get_sql_sandbox()
+    query_seconds = 0.0
+    start = time.perf_counter()
+    for sql in queries:
+        time.sleep(llm_latency)
+        query_start = time.perf_counter()
+        summarize_results(sandbox.execute(sql, user='benchmark')['rows'])
+        query_seconds += time.perf_counter() - query_start
+    time.sleep(llm_latency)
+    return {'llm_calls': len(queries) + 1, 'query_seconds': query_seconds,
+            'seconds': time.perf_counter() - start}
+
+
+def _concurrent(queries: list, llm_latency: float) -> dict:
+    start = time.perf_counter()
+    time.sleep(llm_latency)
+    query_start = time.perf_counter()
+    result = run_multi_query(queries)
+    query_seconds = time.perf_counter() - query_start
+    assert all(item['ok'] for item in result['results']), result
+    time.sleep(llm_latency)
+    return {'llm_calls': 2, 'query_seconds': query_seconds, 'seconds': time.perf_counter() - start}
+
+
+def run_benchmark(rows: int = 1000000, llm_latency: float = 1.0, repeat: int = 3) -> dict:
+    """
+    运行多查询工具基准测试
+
+    参数:
+        rows: 门诊记录行数（其余业务表按比例生成）
+        llm_latency: 模拟的每次模型调用延迟（秒）
+        repeat: 重复次数（取平均）
+
+    返回:
+        {'sequential'/'multi_query': {'llm_calls', 'query_seconds', 'seconds'}}
+    """
+    original_path = config.DATABASE_PATH
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config.DATABASE_PATH = os.path.join(tmp, 'multi_query.db')
+            ScaleDataGenerator(start_date=START_DATE, years=2).populate(
+                rows, feeds=['visits', 'admissions', 'surgeries', 'revenue'], mode='replace',
+                database_path=config.DATABASE_PATH)
+
+            measured = {}
+            for name, func in (('sequential', _sequential), ('multi_query', _concurrent)):
+                runs = [func(QUERIES, llm_latency) for _ in range(repeat)]
+                measured[name] = {key: sum(run[key] for run in runs) / repeat for key in runs[0]}
+            get_sql_sandbox().close()
+            return measured
+    finally:
+        config.DATABASE_PATH = original_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多查询工具基准测试')
+    parser.add_argument('--rows', type=int, default=1000000, help='门诊记录行数')
+    parser.add_argument('--llm-latency', type=float, default=1.0, help='模拟的每次模型调用延迟（秒）')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数')
+    args = parser.parse_args()
+
+    for name, item in run_benchmark(args.rows, args.llm_latency, args.repeat).items():
+        print(f"[{name}] 模型调用 {item['llm_calls']:.0f} 次, 查询耗时 {item['query_seconds'] * 1000:.1f} 毫秒, "
+              f"端到端 {item['seconds']:.2f} 秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+按年分区存储基准测试
+
+用规模数据生成器生成多年的门诊/住院/手术/收入数据，分别在归档前（全部数据在主库）
+与归档后（只保留最近一年在主库，更早年份ATTACH分区）测试：
+- hot: 最近90天的仪表盘查询（核心指标 + 门诊趋势 + 科室工作量）
+- history: 跨全部年份的同一组查询
+- vacuum: 主库VACUUM耗时与主库文件大小
+并校验归档前后两组查询的结果一致
+
+用法:
+    python -m app.benchmarks.partitioned_storage --rows 2000000 --years 5
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app.config import config
+from app.utils.database import get_db_connection
+from app.utils.partitioning import archive_partitions, route_query
+from app.utils.scale_data_generator import ScaleDataGenerator
+
+START_DATE = date(2020, 1, 1)
+
+# 与 dashboard_routes 中日期范围查询结构相同的查询
+DASHBOARD_QUERIES = [
+    "SELECT COUNT(*) AS total FROM visits WHERE visit_date BETWEEN ? AND ?",
+    "SELECT SUM(amount) AS total FROM revenue WHERE date BETWEEN ? AND ?",
+    "SELECT AVG(length_of_stay) AS avg_los FROM admissions WHERE admission_date BETWEEN ? AND ?",
+    "SELECT COUNT(*) AS total FROM surgeries WHERE surgery_date BETWEEN ? AND ?",
+    "SELECT visit_date AS date, COUNT(*) AS count FROM visits WHERE visit_date BETWEEN ? AND ? "
+    "GROUP BY visit_date ORDER BY date",
+    "SELECT revenue_type, SUM(amount) AS total_amount FROM revenue WHERE date BETWEEN ? AND ? "
+    "GROUP BY revenue_type ORDER BY revenue_type",
+    "SELECT v.department, COUNT(*) AS count FROM visits v WHERE v.visit_date BETWEEN ? AND ? "
+    "GROUP BY v.department ORDER BY v.department",
+    "SELECT diagnosis_group, COUNT(*) AS count FROM admissions WHERE admission_date BETWEEN ? AND ? "
+    "GROUP BY diagnosis_group ORDER BY count DESC, diagnosis_group LIMIT 5"
+]
+
+
+def _run_queries(start_date: str, end_date: str, repeat: int) -> dict:
+    """执行一组仪表盘查询，返回平均耗时与结果"""
+    results = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        with get_db_connection() as conn:
+            results = [
+                [tuple(row) for row in conn.execute(route_query(conn, query, start_date, end_date),
+                                                     (start_date, end_date)).fetchall()]
+                for query in DASHBOARD_QUERIES
+            ]
+    return {'seconds': (time.perf_counter() - start) / repeat, 'results': results}
+
+
+def _vacuum(path: str) -> dict:
+    start = time.perf_counter()
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    conn.close()
+    return {'seconds': time.perf_counter() - start, 'size_mb': os.path.getsize(path) / 1024 / 1024}
+
+
+def _measure(ranges: dict, repeat: int) -> dict:
+    measured = {name: _run_queries(start_date, end_date, repeat) for name, (start_date, end_date) in ranges.items()}
+    measured['vacuum'] = _vacuum(config.DATABASE_PATH)
+    return measured
+
+
+def run_benchmark(rows: int = 2000000, years: int = 5, repeat: int = 5) -> dict:
+    """
+    运行分区存储基准测试（归档前后结果不一致时抛出 AssertionError）
+
+    参数:
+        rows: 门诊记录行数（其余业务表按比例生成）
+        years: 数据覆盖年数
+        repeat: 每组查询的重复次数
+
+    返回:
+        {'before'/'after': {'hot'/'history': {'seconds'}, 'vacuum': {'seconds', 'size_mb'}}, 'archived': 归档统计}
+    """
+    last_year = START_DATE.year + years - 1
+    end = date(last_year, 12, 31)
+    ranges = {
+        'hot': ((end - timedelta(days=89)).isoformat(), end.isoformat()),
+        'history': (START_DATE.isoformat(), end.isoformat())
+    }
+
+    original_path = config.DATABASE_PATH
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config.DATABASE_PATH = os.path.join(tmp, 'partitioned.db')
+            ScaleDataGenerator(start_date=START_DATE, years=years).populate(rows, mode='replace',
+                                                                        database_path=config.DATABASE_PATH)
+
+            before = _measure(ranges, repeat)
+            archived = archive_partitions(before_year=last_year, vacuum=False)
+            after = _measure(ranges, repeat)
+
+            for name in ranges:
+                assert before[name].pop('results') == after[name].pop('results'), name
+            return {'before': before, 'after': after, 'archived': archived}
+    finally:
+        config.DATABASE_PATH = original_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按年分区存储基准测试')
+    parser.add_argument('--rows', type=int, default=2000000, help='门诊记录行数')
+    parser.add_argument('--years', type=int, default=5, help='数据覆盖年数')
+    parser.add_argument('--repeat', type=int, default=5, help='每组查询的重复次数')
+    args = parser.parse_args()
+
+    result = run_benchmark(args.rows, args.years, args.repeat)
+    print(f"归档年份: {sorted(result['archived'])}")
+    for stage in ('before', 'after'):
+        measured = result[stage]
+        print(f"[{stage}] 近90天查询 {measured['hot']['seconds'] * 1000:.1f} 毫秒, "
+              f"全部年份查询 {measured['history']['seconds'] * 1000:.1f} 毫秒, "
+              f"主库VACUUM {measured['vacuum']['seconds']:.2f} 秒 ({measured['vacuum']['size_mb']:.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+关联加载基准测试：MedicalRecord → Patient / Doctor 的 N+1 查询与批量预加载
+
+对比三种方式，并校验各方式发出的查询次数：
+- naive: 逐条 get_by_id 加载患者与医生（1 + 2N 次查询）
+- include: QueryBuilder.include('patient', 'doctor')（1 + 每个关联按900个键一批的 IN 查询）
+- identity_map: 同一请求内再次预加载，已加载的患者与医生直接取自身份映射（只有主查询）
+
+用法:
+    python -m app.benchmarks.relation_loading --records 10000
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+
+from flask import Flask
+
+from app.config import config
+from app.models.doctor import Doctor
+from app.models.medical_record import MedicalRecord
+from app.models.patient import Patient
+from app.models.relations import IN_BATCH_SIZE
+from app.utils.database import count_queries, get_db_connection, quote_identifier
+
+
+def _create_table(model) -> None:
+    """按模型字段建表（主键为TEXT）"""
+    columns = ', '.join(quote_identifier(f) for f in model.__fields__ if f != model.__primary_key__)
+    with get_db_connection() as conn:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {model.__tablename__} "
+                     f"({model.__primary_key__} TEXT PRIMARY KEY, {columns})")
+
+
+def build_database(records: int, patients: int, doctors: int, seed: int = 42) -> None:
+    """
+    在当前 DATABASE_PATH 中生成患者、医生与病历
+
+    参数:
+        records: 病历数
+        patients: 患者数
+        doctors: 医生数
+        seed: 随机种子
+    """
+    rng = random.Random(seed)
+    for model in (Patient, Doctor, MedicalRecord):
+        _create_table(model)
+    Patient.bulk_create([Patient(id=f"P{i:06d}", name=f"患者{i}") for i in range(patients)])
+    Doctor.bulk_create([Doctor(id=f"D{i:04d}", name=f"医生{i}") for i in range(doctors)])
+    MedicalRecord.bulk_create([
+        MedicalRecord(patient_id=f"P{rng.randrange(patients):06d}", doctor_id=f"D{rng.randrange(doctors):04d}",
+                      department='内科', chief_complaint='头痛')
+        for _ in range(records)
+    ])
+
+
+def _selects(statements) -> int:
+    return sum(1 for statement in statements if statement.lstrip().upper().startswith('SELECT'))
+
+
+def _naive():
+    rows = []
+    for record in MedicalRecord.get_all():
+        patient = Patient.get_by_id(record.patient_id)
+        doctor = Doctor.get_by_id(record.doctor_id)
+        rows.append((record.id, patient.name if patient else None, doctor.name if doctor else None))
+    return rows
+
+
+def _include():
+    return [(record.id, record.patient.name if record.patient else None, record.doctor.name if record.doctor else None)
+            for record in MedicalRecord.query().include('patient', 'doctor').get_models()]
+
+
+def _check(condition: bool, detail) -> None:
+    """校验失败时抛出 AssertionError（不使用 assert，python -O 下同样生效）"""
+    if not condition:
+        raise AssertionError(detail)
+
+
+def _run(func):
+    with count_queries() as statements:
+        start = time.perf_counter()
+        rows = func()
+        seconds = time.perf_counter() - start
+    return rows, {'seconds': seconds, 'queries': _selects(statements)}
+
+
+def run_benchmark(records: int = 10000, patients: int = 2000, doctors: int = 200) -> dict:
+    """
+    运行关联加载基准测试（查询次数与预期不符时抛出 AssertionError）
+
+    参数:
+        records: 病历数
+        patients: 患者数
+        doctors: 医生数
+
+    返回:
+        {方式: {'seconds': 耗时, 'queries': SELECT次数}}
+    """
+    original_path = config.DATABASE_PATH
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            config.DATABASE_PATH = os.path.join(tmp, 'relations.db')
+            build_database(records, patients, doctors)
+            referenced = {
+                column: MedicalRecord.query().select(f"COUNT(DISTINCT {column}) AS count").get_one()['count']
+                for column in ('patient_id', 'doctor_id')
+            }
+
+            results = {}
+            naive_rows, results['naive'] = _run(_naive)
+            _check(results['naive']['queries'] == 1 + 2 * records, results['naive'])
+
+            # 身份映射保存在 flask.g 上，按一次请求的应用上下文运行
+            with Flask(__name__).app_context():
+                include_rows, results['include'] = _run(_include)
+                expected = 1 + sum(math.ceil(count / IN_BATCH_SIZE) for count in referenced.values())
+                _check(results['include']['queries'] == expected, (results['include'], expected))
+
+                cached_rows, results['identity_map'] = _run(_include)
+                _check(results['identity_map']['queries'] == 1, results['identity_map'])
+
+            _check(sorted(naive_rows) == sorted(include_rows) == sorted(cached_rows), '三种方式的结果不一致')
+            return results
+    finally:
+        config.DATABASE_PATH = original_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='关联加载基准测试')
+    parser.add_argument('--records', type=int, default=10000, help='病历数')
+    parser.add_argument('--patients', type=int, default=2000, help='患者数')
+    parser.add_argument('--doctors', type=int, default=200, help='医生数')
+    args = parser.parse_args()
+
+    for mode, result in run_benchmark(args.records, args.patients, args.doctors).items():
+        print(f"[{mode}] 查询 {result['queries']} 次, 耗时 {result['seconds']:.3f} 秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+查询结果摘要基准测试
+
+按固定种子生成不同行数的门诊明细结果集（日期、科室、门诊类型、就诊人次、费用），对比：
+- raw: 原先发送给大模型的完整JSON结果
+- summary: 统计摘要与分层样本
+的token数与摘要耗时。指定 --live 时分别以两种提示词调用大模型，记录回答耗时
+（需要可用的API配置，相同提示词的结果会命中请求合并缓存，因此每种提示词只调用一次）
+
+用法:
+    python -m app.benchmarks.result_summary --rows 100 1000 10000 100000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.result_summarizer import summarize_results
+from app.utils.token_counter import measure_tokens
+
+DEPARTMENTS = ['内科', '外科', '儿科', '妇产科', '眼科', '口腔科', '皮肤科', '急诊科']
+QUESTION = '分析今年各科室门诊量和费用的变化趋势'
+
+
+def build_results(rows: int, seed: int = 42) -> list:
+    """生成门诊明细结果集（字典列表，与查询结果格式相同）"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-01-01', periods=365).strftime('%Y-%m-%d')
+    frame = pd.DataFrame({
+        'visit_date': dates[rng.integers(0, len(dates), rows)],
+        'department': np.array(DEPARTMENTS)[rng.integers(0, len(DEPARTMENTS), rows)],
+        'visit_type': np.where(rng.random(rows) < 0.3, '复诊', '初诊'),
+        'visits': rng.poisson(30, rows),
+        'amount': rng.normal(1000, 150, rows).round(2)
+    }).sort_values('visit_date')
+    return frame.to_dict(orient='records')
+
+
+def _ask(prompt_results: str) -> float:
+    from app.services.base_llm_service import BaseLLMService
+
+    start = time.perf_counter()
+    BaseLLMService().call_api(
+        system_prompt='你是一位医疗数据分析专家，擅长解读SQL查询结果并提供医学见解。',
+        user_message=f"用户问题：{QUESTION}\n\n查询结果：\n{prompt_results}",
+        temperature=0.4,
+        top_p=0.9
+    )
+    return time.perf_counter() - start
+
+
+def run_benchmark(row_counts=(100, 1000, 10000, 100000), token_budget: int = None, live: bool = False) -> list:
+    """
+    运行查询结果摘要基准测试
+
+    参数:
+        row_counts: 结果集行数列表
+        token_budget: 结果部分的token上限，默认使用配置
+        live: 是否实际调用大模型测量回答耗时
+
+    返回:
+        每个行数的 {'rows', 'raw_tokens', 'summary_tokens', 'summary_seconds', 'raw_answer_seconds', 'summary_answer_seconds'}
+    """
+    measured = []
+    for rows in row_counts:
+        results = build_results(rows)
+        raw = json.dumps(results, ensure_ascii=False)
+
+        start = time.perf_counter()
+        summary = summarize_results(results, token_budget)
+        item = {
+            'rows': rows,
+            'raw_tokens': measure_tokens(raw),
+            'summary_tokens': summary['tokens'],
+            'summary_seconds': time.perf_counter() - start
+        }
+        if live:
+            item['raw_answer_seconds'] = _ask(raw)
+            item['summary_answer_seconds'] = _ask(summary['text'])
+        measured.append(item)
+    return measured
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查询结果摘要基准测试')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 10000, 100000], help='结果集行数')
+    parser.add_argument('--budget', type=int, default=None, help='结果部分的token上限')
+    parser.add_argument('--live', action='store_true', help='实际调用大模型测量回答耗时')
+    args = parser.parse_args()
+
+    for item in run_benchmark(args.rows, args.budget, args.live):
+        line = (f"{item['rows']:>7} 行: 原始 {item['raw_tokens']} tokens -> 摘要 {item['summary_tokens']} tokens, "
+                f"摘要耗时 {item['summary_seconds'] * 1000:.1f} 毫秒")
+        if 'raw_answer_seconds' in item:
+            line += (f", 回答耗时 {item['raw_answer_seconds']:.1f} 秒 -> "
+                     f"{item['summary_answer_seconds']:.1f} 秒")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
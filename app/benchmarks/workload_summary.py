@@ -0,0 +1,208 @@
+"""
+工作量汇总查询基准测试
+
+生成指定行数的工作量记录（约80%已审核，少量无效日期），依次测试：
+- legacy: 读取全部记录为模型实例后在Python中分组（原实现，仅在样本库上运行）
+- sql: 在SQL中分组聚合
+- rollup: 启用日汇总表后的聚合
+- doctor: 单个医生按类别汇总
+并校验前三种方式的结果一致
+
+用法:
+    python -m app.benchmarks.workload_summary --rows 5000000
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from app.config import config
+from app.models.workload import WorkloadRecord
+
+STATUSES = ['已审核', '待审核', '已拒绝']
+STATUS_WEIGHTS = [0.8, 0.15, 0.05]
+
+# 医生数与工作量类别数
+DOCTORS = 300
+CATEGORIES = 15
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workload_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doctor_id TEXT,
+    category_id TEXT,
+    record_date TEXT,
+    points REAL,
+    quantity INTEGER,
+    description TEXT,
+    reference_id TEXT,
+    reference_type TEXT,
+    status TEXT,
+    approved_by TEXT,
+    approved_at TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    metadata TEXT
+)
+"""
+
+
+def build_database(path: str, rows: int, seed: int = 42, chunk_size: int = 500000) -> None:
+    """
+    生成工作量记录库（record_date 按模型保存格式存为ISO日期时间）
+
+    参数:
+        path: 数据库路径
+        rows: 记录数
+        seed: 随机种子
+        chunk_size: 每批插入行数
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2022-01-01T00:00:00')
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute(SCHEMA)
+
+    for offset in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - offset)
+        seconds = rng.integers(0, 3 * 365 * 86400, n)
+        dates = np.datetime_as_string(start + seconds.astype('timedelta64[s]'), unit='s').astype(object)
+        dates[rng.random(n) < 0.001] = '无效日期'
+        doctors = np.char.add('D', np.char.zfill(rng.integers(0, DOCTORS, n).astype(str), 4)).astype(object)
+        categories = np.char.add('C', rng.integers(1, CATEGORIES + 1, n).astype(str)).astype(object)
+        categories[rng.random(n) < 0.01] = None
+        points = np.round(rng.gamma(2.0, 1.5, n), 1)
+        statuses = np.asarray(STATUSES, dtype=object)[rng.choice(len(STATUSES), n, p=STATUS_WEIGHTS)]
+        conn.executemany(
+            "INSERT INTO workload_records (doctor_id, category_id, record_date, points, quantity, status) "
+            "VALUES (?, ?, ?, ?, 1, ?)",
+            zip(doctors.tolist(), categories.tolist(), dates.tolist(), points.tolist(), statuses.tolist())
+        )
+    conn.commit()
+    conn.close()
+    WorkloadRecord.ensure_summary_indexes()
+
+
+def legacy_summary_by_period(period_type: str, start_date=None, end_date=None) -> dict:
+    """原实现：读取全部已审核记录后在Python中分组"""
+    conditions = ["status = '已审核'"]
+    params = []
+    if start_date:
+        conditions.append("record_date >= ?")
+        params.append(start_date.isoformat())
+    if end_date:
+        conditions.append("record_date <= ?")
+        params.append(end_date.isoformat())
+    records = WorkloadRecord.get_all(" AND ".join(conditions), tuple(params))
+
+    period_summary = {}
+    doctor_summary = {}
+    for record in records:
+        if not isinstance(record.record_date, datetime.datetime):
+            continue
+        if period_type == "week":
+            key = f"{record.record_date.year}-W{record.record_date.isocalendar()[1]:02d}"
+        else:
+            key = record.record_date.strftime({"day": "%Y-%m-%d", "year": "%Y"}.get(period_type, "%Y-%m"))
+        period = period_summary.setdefault(key, {"count": 0, "points": 0})
+        period["count"] += 1
+        period["points"] += record.points or 0
+        if record.doctor_id:
+            doctor = doctor_summary.setdefault(record.doctor_id, {"count": 0, "points": 0})
+            doctor["count"] += 1
+            doctor["points"] += record.points or 0
+    return {
+        "total_records": len(records),
+        "total_points": sum(record.points for record in records if record.points),
+        "by_period": period_summary,
+        "by_doctor": doctor_summary
+    }
+
+
+def _same_summary(a: dict, b: dict) -> bool:
+    """比较两个汇总结果（分值按浮点误差容忍比较）"""
+    def close(x, y):
+        return abs(x - y) <= 1e-6 * max(1.0, abs(x), abs(y))
+
+    if a["total_records"] != b["total_records"] or not close(a["total_points"], b["total_points"]):
+        return False
+    for key in ("by_period", "by_doctor"):
+        if a[key].keys() != b[key].keys():
+            return False
+        for group, value in a[key].items():
+            other = b[key][group]
+            if value["count"] != other["count"] or not close(value["points"], other["points"]):
+                return False
+    return True
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(rows: int = 5000000, legacy_rows: int = 200000, period_type: str = "month") -> dict:
+    """
+    运行汇总查询基准测试
+
+    参数:
+        rows: 记录数
+        legacy_rows: 运行原实现的样本库记录数（0表示不运行）
+        period_type: 汇总的时间段类型
+
+    返回:
+        {库规模: {方式: 耗时秒数, 'consistent': 结果是否一致}}
+    """
+    start_date = datetime.datetime(2022, 3, 15, 12, 0)
+    end_date = datetime.datetime(2024, 10, 20, 8, 30)
+    original_path = config.DATABASE_PATH
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for size in sorted({size for size in (legacy_rows, rows) if size}):
+                config.DATABASE_PATH = os.path.join(tmp, f'workload_{size}.db')
+                build_database(config.DATABASE_PATH, size)
+                timings = {}
+                summaries = []
+
+                if size <= legacy_rows:
+                    summary, timings['legacy'] = _timed(legacy_summary_by_period, period_type, start_date, end_date)
+                    summaries.append(summary)
+
+                summary, timings['sql'] = _timed(WorkloadRecord.get_summary_by_period, period_type,
+                                                 start_date, end_date, use_rollup=False)
+                summaries.append(summary)
+
+                _, timings['rollup_build'] = _timed(WorkloadRecord.enable_summary_rollup)
+                summary, timings['rollup'] = _timed(WorkloadRecord.get_summary_by_period, period_type,
+                                                    start_date, end_date, use_rollup=True)
+                summaries.append(summary)
+
+                _, timings['doctor'] = _timed(WorkloadRecord.get_summary_by_doctor, 'D0001', start_date, end_date)
+                timings['consistent'] = all(_same_summary(summaries[0], other) for other in summaries[1:])
+                results[size] = timings
+    finally:
+        config.DATABASE_PATH = original_path
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='工作量汇总查询基准测试')
+    parser.add_argument('--rows', type=int, default=5000000, help='工作量记录数')
+    parser.add_argument('--legacy-rows', type=int, default=200000, help='运行原实现的样本库记录数，0表示不运行')
+    parser.add_argument('--period', default='month', choices=['day', 'week', 'month', 'year'], help='时间段类型')
+    args = parser.parse_args()
+
+    for size, timings in run_benchmark(args.rows, args.legacy_rows, args.period).items():
+        parts = [f"{name} {seconds:.3f} 秒" for name, seconds in timings.items() if name != 'consistent']
+        print(f"[{size} 行] " + ", ".join(parts) + f", 结果一致: {timings['consistent']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -13,7 +13,9 @@ from .base import (
     ERROR_CODES,
     ERROR_TYPES,
     ERROR_MESSAGES,
-    ERROR_STATUS_CODES
+    ERROR_STATUS_CODES,
+    SERIALIZATION_CONFIG,
+    NLP_CONFIG
 )
 
 # 获取当前文件所在目录的绝对路径
@@ -187,6 +189,10 @@ class Config:
     LLM_PAYLOAD_TEMPLATE = LLM_PAYLOAD_TEMPLATE
     LLM_ERROR_MESSAGES = LLM_ERROR_MESSAGES
     
+    # 响应序列化配置
+    SERIALIZATION_CONFIG = SERIALIZATION_CONFIG
+    NLP_CONFIG = NLP_CONFIG
+    
     @staticmethod
     def init_app(app):
         """初始化应用"""
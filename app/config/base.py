@@ -342,6 +342,248 @@ SQL_ERROR_MESSAGES = {
     'analysis_failed': '分析SQL查询结果失败: {}'
 }
 
+# 响应序列化配置
+SERIALIZATION_CONFIG = {
+    'compress_min_size': 4096,       # 超过该字节数的响应才压缩
+    'gzip_level': 5,
+    'brotli_quality': 4,
+    'default_table_format': 'records'  # records 或 columnar
+}
+
+# NLP引擎配置
+NLP_CONFIG = {
+    'dict_paths': [
+        'data/dict/medical_dict.txt',
+        'app/data/medical_dict.txt'
+    ],
+    'spacy_model': 'zh_core_web_sm',
+    'spacy_batch_size': 64,
+    'spacy_n_process': 1,
+    'parallel_workers': None,         # None表示使用CPU核数
+    'parallel_min_chars': 200000,     # 语料超过该字符数时自动启用并行分词
+    'max_batch_size': 1000,           # 批量接口单次最多处理的文本数
+    'similarity_top_k': 10,           # 批量相似度检索默认返回条数
+    'dedup_threshold': 0.8,           # 近重复检测的Jaccard阈值
+    'dedup_num_perm': 128,            # MinHash签名长度
+    'dedup_shingle_size': 3           # 字符shingle长度
+}
+
+# 文件解析流水线配置
+INGESTION_CONFIG = {
+    'max_workers': MAX_WORKERS,               # 页/工作表并行处理的进程数，<=1表示串行
+    'cache_size': 64,                         # 内存中缓存的解析结果数量（按内容哈希）
+    'cache_ttl': 1800,                        # 解析结果在内存中保留的秒数（含上传的患者数据，不落盘）
+    'parallel_min_pages': 32,                 # PDF页数达到该值时分块并行解析
+    'page_chunk_size': 16,                    # 每个并行任务处理的页数
+    'parallel_min_sheets': 2,                 # 工作表数达到该值且文件足够大时并行解析
+    'parallel_min_bytes': 2 * 1024 * 1024     # 启用工作表并行解析的最小文件大小
+}
+
+# 数据库写入队列配置（单写线程 + 分组提交）
+WRITE_QUEUE_CONFIG = {
+    'enabled': True,          # insert_record/update_record/delete_record 是否经由写入队列
+    'max_batch_size': 256,    # 单个事务最多合并的写入意图数
+    'max_latency_ms': 0,      # 收集一批写入意图的最长等待毫秒数，0表示只合并已在队列中的意图
+                              # （写线程提交期间到达的写入会自然组成下一批）
+    'queue_maxsize': 10000,   # 队列上限，满时提交方阻塞（背压）
+    'busy_timeout': 30,       # 写连接的锁等待秒数（多进程部署时仍可能与其他进程竞争）
+    'submit_timeout': 60      # 同步包装函数等待提交结果的秒数
+}
+
+# HIS批量导入配置
+HIS_IMPORT_CONFIG = {
+    'chunk_size': 50000,          # 流式解析时每次写入暂存表的行数
+    'default_mode': 'append',     # append: 去重后追加；replace: 用导入数据整体替换目标表
+    'drop_index_ratio': 0.2,      # 追加行数超过现有行数的该比例时，先删除二级索引、导入后统一重建
+    'csv_encodings': ['utf-8-sig', 'gb18030'],  # CSV编码探测顺序（HIS导出文件常为GBK）
+    # 导入连接的PRAGMA。journal_mode 记录在数据库文件中、对所有连接生效（须与 DB_PRAGMA_SETTINGS 一致）；
+    # 其余只作用于导入连接。synchronous=OFF 只用于写暂存表，写入正式表前恢复为 DB_PRAGMA_SETTINGS 的设置
+    'load_pragmas': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -262144,    # 负数表示KB，即256MB
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'OFF'
+    },
+    'busy_timeout': 60            # 等待其他连接释放写锁的秒数
+}
+
+# 分页配置
+PAGINATION_CONFIG = {
+    'default_page_size': 20,
+    'max_page_size': 200,
+    'approx_count_cap': 10000     # 带条件的近似计数最多扫描的行数，超过时返回下限
+}
+
+# 按年分区存储配置（冷数据年份归档到独立的SQLite文件，查询时按日期范围ATTACH）
+PARTITION_CONFIG = {
+    'enabled': True,
+    'directory': None,        # 分区文件目录，None表示主数据库所在目录下的 partitions/
+    'hot_years': 2,           # 主库保留的年份数（含当年），更早的年份可归档
+    # 参与分区的事实表及其日期列（日期以 'YYYY-MM-DD' 开头的文本保存）
+    'tables': {
+        'visits': 'visit_date',
+        'admissions': 'admission_date',
+        'surgeries': 'surgery_date',
+        'revenue': 'date',
+        'department_workload': 'date',
+        'department_revenue': 'date'
+    },
+    'vacuum_after_archive': False  # 归档后是否对主库执行VACUUM以回收空间
+}
+
+# 即席SQL执行沙箱配置（LLM生成或用户提交的只读查询）
+SQL_SANDBOX_CONFIG = {
+    'pool_size': 4,               # 只读连接池大小，同时也是全局并发上限
+    'acquire_timeout': 5,         # 等待空闲连接的秒数
+    'timeout_seconds': 10,        # 单条查询的执行时间上限
+    'progress_interval': 10000,   # 每执行多少条虚拟机指令检查一次超时
+    'max_rows': 5000,             # 返回的最大行数，超出部分截断
+    'max_scan_rows': 5000000,     # 全表扫描的表超过该行数且需要排序/聚合/连接时拒绝执行
+    'per_user_concurrency': 2,    # 每个用户同时执行的查询数
+    'user_slot_wait': 5,          # 用户并发已满时等待空闲名额的秒数（Agent同一轮的并行工具调用会排队而不是直接失败）
+    'denied_tables': ['users'],   # 禁止读取的表
+    'table_stats_ttl': 300        # 表行数估算的缓存秒数
+}
+
+# 自然语言转SQL的表结构提示词配置（按相关性裁剪表和字段，按token预算拼装）
+SCHEMA_PROMPT_CONFIG = {
+    'encoding': 'cl100k_base',    # tiktoken编码名，不可用时按字符数估算
+    'token_budget': 800,          # 每次调用表结构部分的token上限
+    'top_k_tables': 4,            # 最多包含的相关表数
+    'max_columns_per_table': 12,  # 每个表最多包含的字段数
+    'sample_values': 2,           # 相关字段附带的样例值个数，0表示不附带
+    'fragment_cache_size': 4096,  # token计数缓存的片段数
+    # 不向模型暴露的表（账户、会话与内部维护表）
+    'exclude_tables': ['users', 'chats', 'chat_messages', 'partition_catalog', 'workload_daily_rollup']
+}
+
+# 相同LLM请求合并配置（并发的相同请求共用一次调用，结果短期缓存）
+LLM_COALESCING_CONFIG = {
+    'enabled': True,
+    'cache_ttl': 120,             # call_api 结果缓存秒数，0表示只合并进行中的请求不缓存
+    'agent_cache_ttl': 60,        # Agent 查询结果缓存秒数
+    'max_entries': 512,           # 每类请求最多缓存的结果数
+    'wait_timeout': 300           # 等待进行中请求的最长秒数，超时后自行调用
+}
+
+# 查询结果摘要配置（结果集发送给LLM前压缩为统计摘要与分层样本）
+RESULT_SUMMARY_CONFIG = {
+    'token_budget': 1500,         # 结果部分的token上限，原始结果不超过时原样发送
+    'top_k': 5,                   # 类别字段列出的高频值个数
+    'sample_rows': 20,            # 分层样本的最大行数
+    'trend_points': 12,           # 趋势序列的最多分段数
+    'outlier_iqr': 1.5,           # 异常值判定的四分位距倍数
+    'max_columns': 20,            # 最多统计的字段数
+    'seed': 42                    # 抽样随机种子，保证相同结果得到相同摘要
+}
+
+# 对话记忆配置（分页读取历史、滚动摘要与最近若干轮窗口）
+CHAT_MEMORY_CONFIG = {
+    'page_size': 50,              # 历史消息每页条数
+    'window_turns': 6,            # 提示词中保留的最近对话轮数（每轮一问一答）
+    'window_token_budget': 1500,  # 最近对话窗口的token上限
+    'message_max_chars': 800,     # 窗口与摘要输入中单条消息的最大字符数
+    'summary_batch': 6,           # 窗口之外未摘要的消息达到该条数时更新摘要
+    'summary_max_chars': 400,     # 摘要的最大字数
+    'zstd_level': 6               # 结构化数据（图表、表格）的zstd压缩级别
+}
+
+# 工具调用Agent配置
+AGENT_CONFIG = {
+    'max_steps': 4,               # 最多的模型调用轮数（每轮可并行调用多个工具）
+    'max_parallel_tools': 4,      # 同一轮中并行执行的工具数（每个请求的每一轮使用独立线程池）
+    'tool_timeout': 30,           # 一轮全部工具调用的总超时秒数
+    'tool_output_max_chars': 4000,  # 回传给模型的单个工具结果的最大字符数
+    'temperature': 0.3
+}
+
+# 多查询工具配置（一次工具调用并发执行多个子问题/SQL，合并为一条观察结果）
+MULTI_QUERY_CONFIG = {
+    'max_queries': 6,             # 单次调用最多的子查询数
+    'max_workers': 4,             # 并发执行的子查询数（不超过只读连接池大小）
+    'token_budget': 1600,         # 合并结果的token上限，按子查询平均分配
+    'min_item_budget': 150        # 每个子查询结果的最少token数
+}
+
+# 大模型服务熔断配置（上游持续失败或变慢时快速失败并返回降级回答）
+LLM_CIRCUIT_BREAKER_CONFIG = {
+    'enabled': True,
+    'window_size': 20,            # 统计失败率的最近调用数
+    'min_calls': 5,               # 窗口内至少多少次调用才判断是否熔断
+    'failure_rate_threshold': 0.5,  # 失败率达到该值时打开
+    'slow_call_seconds': 30,      # 单次HTTP请求超过该秒数视为慢调用
+    'slow_rate_threshold': 0.8,   # 慢调用率达到该值时打开
+    'open_seconds': 30,           # 打开后快速失败的秒数，期满进入半开
+    'half_open_probes': 1,        # 半开状态放行的探测调用数
+    'max_timeout': 90,            # 超时重试时逐次延长的请求超时上限（秒）
+    'answer_cache_size': 512,     # 降级时可复用的历史回答数
+    'open_message': '大模型服务暂时不可用，已切换为简化模式，请稍后重试。'
+}
+
+# 大模型调用录制/回放配置（离线基准测试与可复现调试）
+LLM_REPLAY_CONFIG = {
+    'mode': os.environ.get('LLM_REPLAY_MODE', 'off'),  # off、record（调用真实API并录制）或 replay（只从录制回放）
+    'store_path': os.environ.get('LLM_REPLAY_STORE', os.path.join('instance', 'llm_recordings.jsonl')),
+    'latency': None,        # 回放延迟（秒），None 表示按录制时的耗时
+    'latency_scale': 1.0,   # 按录制耗时回放时的缩放系数
+    'jitter': 0.0,          # 在延迟上叠加的随机抖动（±秒）
+    'seed': 42,             # 抖动的随机种子
+    'on_miss': 'error'      # 回放未命中时：error（返回404）或 passthrough（调用真实API并录制）
+}
+
+# AI接口准入控制配置（令牌桶限速、并发上限与优先级等待队列）
+ADMISSION_CONTROL_CONFIG = {
+    'enabled': True,
+    'backend': os.environ.get('ADMISSION_BACKEND', 'memory'),  # memory（进程内）或 sqlite（多个工作进程共享）
+    'sqlite_path': os.path.join('instance', 'admission_control.db'),
+    # 受控的接口路径
+    'paths': ['/chat/query', '/chat/api/chat', '/api/analyze', '/analytics/api/test-langchain'],
+    # 令牌桶: rate 为每秒补充的令牌数，capacity 为桶容量（允许的突发量）
+    'user_requests': {'rate': 0.5, 'capacity': 10},
+    'global_requests': {'rate': 5, 'capacity': 50},
+    'user_llm_tokens': {'rate': 200, 'capacity': 30000},
+    'global_llm_tokens': {'rate': 2000, 'capacity': 300000},
+    'request_token_overhead': 2000,  # 每个请求估算的提示词与回答token数（另加请求体本身）
+    'max_concurrent': 8,          # 每个进程同时处理的AI请求数
+    'per_user_concurrent': 2,     # 每个用户同时处理的AI请求数
+    'max_queue': 16,              # 等待队列长度上限
+    'max_wait': {'interactive': 15, 'batch': 3},  # 各优先级的最长排队秒数
+    'priority_header': 'X-Request-Priority',  # 值为 batch 时按批量请求处理
+    # 按批量请求处理的客户端（脚本调用）
+    'batch_user_agents': ['python-requests', 'curl', 'httpx', 'aiohttp', 'go-http-client', 'wget']
+}
+
+# 按任务选择模型档位（分类、抽取等用小模型，综合回答用大模型），校验失败时逐级升级
+MODEL_ROUTING_CONFIG = {
+    'enabled': True,
+    # 各档位使用的模型，留空时使用 VOLCENGINE_MODEL
+    'tiers': {
+        'fast': os.environ.get('LLM_FAST_MODEL', ''),
+        'large': os.environ.get('LLM_LARGE_MODEL', '')
+    },
+    'default_tier': 'large',
+    # 任务 -> 档位
+    'tasks': {
+        'intent': 'fast',             # 查询意图分类
+        'keywords': 'fast',           # 知识库检索关键词抽取
+        'sql_generation': 'fast',     # 自然语言转SQL
+        'sql_explanation': 'fast',    # SQL含义解释
+        'chat_summary': 'fast',       # 对话滚动摘要
+        'answer': 'large'             # 最终回答撰写
+    },
+    # 提供校验函数时，校验失败依次升级的档位
+    'cascade': {
+        'intent': ['fast', 'large'],
+        'keywords': ['fast', 'large'],
+        'sql_generation': ['fast', 'large']
+    },
+    # 每千token价格（元）: 模型 -> (输入, 输出)，用于估算成本，以服务商当前报价为准，未列出的模型按0计
+    'pricing': {
+        'deepseek-v3-241226': (0.002, 0.008)
+    }
+}
+
 class BaseConfig:
     """基础配置类"""
     # 应用配置
@@ -475,5 +717,59 @@ class BaseConfig:
     LLM_HEADERS = LLM_HEADERS
     LLM_PAYLOAD_TEMPLATE = LLM_PAYLOAD_TEMPLATE
     
+    # 响应序列化配置
+    SERIALIZATION_CONFIG = SERIALIZATION_CONFIG
+    
+    # NLP引擎配置
+    NLP_CONFIG = NLP_CONFIG
+    
+    # 文件解析流水线配置
+    INGESTION_CONFIG = INGESTION_CONFIG
+    
+    # 数据库写入队列配置
+    WRITE_QUEUE_CONFIG = WRITE_QUEUE_CONFIG
+    
+    # HIS批量导入配置
+    HIS_IMPORT_CONFIG = HIS_IMPORT_CONFIG
+    
+    # 分页配置
+    PAGINATION_CONFIG = PAGINATION_CONFIG
+    
+    # 按年分区存储配置
+    PARTITION_CONFIG = PARTITION_CONFIG
+    
+    # 即席SQL执行沙箱配置
+    SQL_SANDBOX_CONFIG = SQL_SANDBOX_CONFIG
+    
+    # 自然语言转SQL的表结构提示词配置
+    SCHEMA_PROMPT_CONFIG = SCHEMA_PROMPT_CONFIG
+    
+    # 相同LLM请求合并配置
+    LLM_COALESCING_CONFIG = LLM_COALESCING_CONFIG
+    
+    # 查询结果摘要配置
+    RESULT_SUMMARY_CONFIG = RESULT_SUMMARY_CONFIG
+    
+    # 对话记忆配置
+    CHAT_MEMORY_CONFIG = CHAT_MEMORY_CONFIG
+    
+    # 工具调用Agent配置
+    AGENT_CONFIG = AGENT_CONFIG
+    
+    # 多查询工具配置
+    MULTI_QUERY_CONFIG = MULTI_QUERY_CONFIG
+    
+    # 大模型服务熔断配置
+    LLM_CIRCUIT_BREAKER_CONFIG = LLM_CIRCUIT_BREAKER_CONFIG
+    
+    # 大模型调用录制/回放配置
+    LLM_REPLAY_CONFIG = LLM_REPLAY_CONFIG
+    
+    # AI接口准入控制配置
+    ADMISSION_CONTROL_CONFIG = ADMISSION_CONTROL_CONFIG
+    
+    # 按任务选择模型档位配置
+    MODEL_ROUTING_CONFIG = MODEL_ROUTING_CONFIG
+    
     # 通用工具配置
     UTILS = UTILS 
\ No newline at end of file
@@ -2,20 +2,26 @@
 模型基类模块 - 提供所有模型的基础功能
 """
 import json
-from typing import Dict, List, Any, Optional, Type, ClassVar, TypeVar, Generic, Tuple
+from typing import Dict, List, Any, Optional, Sequence, Type, ClassVar, TypeVar, Generic, Tuple, Callable
 import time
 import datetime
 from dataclasses import dataclass, field, asdict, is_dataclass
 
+from app.models.compact_row import CompactRow, make_row_class, decode_json, decode_datetime
+from app.models.relations import load_relations
 from app.utils.database import (
-    insert_record, update_record, delete_record,
-    get_record, get_records, count_records,
+    insert_record, delete_record,
+    get_record, get_records, get_record_tuples, count_records,
+    upsert_record, bulk_write_records, quote_identifier,
     QueryBuilder
 )
 from app.utils.utils import to_json, generate_uuid
 
 T = TypeVar('T', bound='BaseModel')
 
+# 各模型生成的紧凑行类
+_row_classes: Dict[Type, Type[CompactRow]] = {}
+
 class ModelMeta(type):
     """模型元类，用于注册模型类"""
     
@@ -69,19 +75,16 @@ class BaseModel(metaclass=ModelMeta):
         参数:
             **kwargs: 属性值
         """
-        # 设置属性
-        for key, value in kwargs.items():
-            if key in self.__fields__ or key == self.__primary_key__:
-                setattr(self, key, value)
-                
-        # 为未设置的字段设置默认值
-        for field_name in self.__fields__:
-            if not hasattr(self, field_name):
-                setattr(self, field_name, None)
+        # 一次性写入实例字典：未传入的字段为None，其他无关参数被忽略
+        values = dict.fromkeys(self.__fields__)
+        primary_key = self.__primary_key__
+        values.update((key, value) for key, value in kwargs.items()
+                      if key in self.__fields__ or key == primary_key)
                 
         # 如果主键未设置，则生成一个
-        if not hasattr(self, self.__primary_key__) or getattr(self, self.__primary_key__) is None:
-            setattr(self, self.__primary_key__, generate_uuid())
+        if values.get(primary_key) is None:
+            values[primary_key] = generate_uuid()
+        self.__dict__.update(values)
     
     @classmethod
     def from_dict(cls: Type[T], data: Dict[str, Any]) -> T:
@@ -96,19 +99,13 @@ class BaseModel(metaclass=ModelMeta):
         """
         # 解析JSON字段
         for field in cls.__json_fields__:
-            if field in data and isinstance(data[field], str):
-                try:
-                    data[field] = json.loads(data[field])
-                except (json.JSONDecodeError, TypeError):
-                    pass
+            if field in data:
+                data[field] = decode_json(data[field])
                     
         # 解析日期时间字段
         for field in cls.__datetime_fields__:
-            if field in data and isinstance(data[field], str):
-                try:
-                    data[field] = datetime.datetime.fromisoformat(data[field].replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
-                    pass
+            if field in data:
+                data[field] = decode_datetime(data[field])
                     
         return cls(**data)
     
@@ -142,48 +139,102 @@ class BaseModel(metaclass=ModelMeta):
         """表示形式"""
         return self.__str__()
     
+    @classmethod
+    def _row_serializer(cls) -> Tuple[List[str], Callable[['BaseModel'], Tuple]]:
+        """
+        生成行序列化函数：列顺序与各列的转换（JSON、日期时间）只在每批确定一次
+        
+        返回:
+            (列名列表, 将实例转换为行元组的函数)
+        """
+        columns = [cls.__primary_key__] + [f for f in cls.__fields__ if f != cls.__primary_key__]
+        json_fields = set(cls.__json_fields__)
+        datetime_fields = set(cls.__datetime_fields__)
+        
+        def convert(column: str) -> Callable[[Any], Any]:
+            if column in json_fields:
+                return lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v
+            if column in datetime_fields:
+                return lambda v: v.isoformat() if isinstance(v, datetime.datetime) else v
+            return None
+        
+        converters = [(column, convert(column)) for column in columns]
+        
+        def to_row(instance: 'BaseModel') -> Tuple:
+            return tuple(
+                conv(getattr(instance, column, None)) if conv else getattr(instance, column, None)
+                for column, conv in converters
+            )
+        
+        return columns, to_row
+    
     # 保存方法
     def save(self) -> bool:
         """
-        保存模型，如果主键存在则更新，否则插入
+        保存模型：主键存在时以一条 INSERT ... ON CONFLICT DO UPDATE 完成插入或更新
         
         返回:
             是否成功
         """
-        data = self.to_dict()
-        pk_value = data.pop(self.__primary_key__, None)
+        columns, to_row = self._row_serializer()
+        data = dict(zip(columns, to_row(self)))
         
-        # 处理JSON字段
-        for field in self.__json_fields__:
-            if field in data and (isinstance(data[field], dict) or isinstance(data[field], list)):
-                data[field] = json.dumps(data[field], ensure_ascii=False)
+        if data[self.__primary_key__] is not None:
+            return upsert_record(self.__tablename__, data, self.__primary_key__)
         
-        # 如果主键存在且不为None，则更新
-        if pk_value is not None:
-            # 获取现有记录
-            existing = self.get_by_id(pk_value)
-            
-            if existing:
-                success = update_record(
-                    self.__tablename__,
-                    data,
-                    f"{self.__primary_key__} = ?",
-                    (pk_value,)
-                )
-                return success
-        
-        # 插入记录
-        if pk_value:
-            data[self.__primary_key__] = pk_value
-            
+        # 主键为空时插入并回填自增主键
+        data.pop(self.__primary_key__)
         record_id = insert_record(self.__tablename__, data)
-        
-        # 更新主键
-        if record_id and not pk_value:
+        if record_id:
             setattr(self, self.__primary_key__, record_id)
             
         return record_id is not None
     
+    @classmethod
+    def _bulk_write(cls, instances: Sequence['BaseModel'], mode: str) -> Optional[int]:
+        columns, to_row = cls._row_serializer()
+        return bulk_write_records(cls.__tablename__, columns, [to_row(instance) for instance in instances],
+                                  key=cls.__primary_key__, mode=mode)
+    
+    @classmethod
+    def bulk_save(cls, instances: Sequence[T]) -> Optional[int]:
+        """
+        批量保存（存在则更新，否则插入），在一个事务内执行
+        
+        参数:
+            instances: 模型实例列表
+            
+        返回:
+            写入的行数，失败返回None
+        """
+        return cls._bulk_write(instances, 'upsert')
+    
+    @classmethod
+    def bulk_create(cls, instances: Sequence[T]) -> Optional[int]:
+        """
+        批量插入新记录，主键冲突时整批失败并回滚
+        
+        参数:
+            instances: 模型实例列表
+            
+        返回:
+            插入的行数，失败返回None
+        """
+        return cls._bulk_write(instances, 'insert')
+    
+    @classmethod
+    def bulk_update(cls, instances: Sequence[T]) -> Optional[int]:
+        """
+        按主键批量更新已存在的记录，不存在的记录被忽略
+        
+        参数:
+            instances: 模型实例列表
+            
+        返回:
+            更新的行数，失败返回None
+        """
+        return cls._bulk_write(instances, 'update')
+    
     def delete(self) -> bool:
         """
         删除模型
@@ -240,7 +291,8 @@ class BaseModel(metaclass=ModelMeta):
     
     @classmethod
     def get_all(cls: Type[T], condition: str = '', params: Tuple = (), 
-               order_by: str = '', limit: int = 0, offset: int = 0) -> List[T]:
+               order_by: str = '', limit: int = 0, offset: int = 0,
+               after: Optional[Sequence] = None) -> List[T]:
         """
         获取多个模型
         
@@ -250,6 +302,7 @@ class BaseModel(metaclass=ModelMeta):
             order_by: 排序
             limit: 限制
             offset: 偏移
+            after: 键集分页起点（上一页最后一行的排序键值）
             
         返回:
             模型实例列表
@@ -264,11 +317,54 @@ class BaseModel(metaclass=ModelMeta):
             params,
             order_by,
             limit,
-            offset
+            offset,
+            after=after
         )
         
         return [cls.from_dict(record) for record in records]
     
+    @classmethod
+    def row_class(cls) -> Type[CompactRow]:
+        """
+        获取模型的紧凑行类（首次调用时生成）
+        
+        返回:
+            基于 __slots__ 的只读行类
+        """
+        row_cls = _row_classes.get(cls)
+        if row_cls is None:
+            row_cls = _row_classes[cls] = make_row_class(cls)
+        return row_cls
+    
+    @classmethod
+    def get_rows(cls, condition: str = '', params: Tuple = (),
+                 order_by: str = '', limit: int = 0, offset: int = 0,
+                 after: Optional[Sequence] = None) -> List[CompactRow]:
+        """
+        获取多条记录的紧凑只读行（参数同 get_all）
+        
+        行对象直接保存查询返回的元组，JSON与日期时间字段在首次访问时才解析，
+        适合列表、导出等只读取部分字段的场景；需要修改时调用 row.to_model()
+        
+        返回:
+            紧凑行列表
+        """
+        if not order_by and cls.__order_by__:
+            order_by = cls.__order_by__
+        
+        row_cls = cls.row_class()
+        records = get_record_tuples(
+            cls.__tablename__,
+            ', '.join(map(quote_identifier, row_cls._columns)),
+            condition,
+            params,
+            order_by,
+            limit,
+            offset,
+            after=after
+        )
+        return list(map(row_cls, records))
+    
     @classmethod
     def count(cls, condition: str = '', params: Tuple = ()) -> int:
         """
@@ -305,7 +401,21 @@ class BaseModel(metaclass=ModelMeta):
         返回:
             查询构建器
         """
-        return QueryBuilder(cls.__tablename__)
+        return QueryBuilder(cls.__tablename__, model=cls)
+    
+    @classmethod
+    def load_relations(cls: Type[T], instances: Sequence[T], *names: str) -> Sequence[T]:
+        """
+        为已加载的一批实例批量加载关联（每个关联一条 IN 查询）
+        
+        参数:
+            instances: 模型实例列表
+            names: 关联名，支持点号路径
+            
+        返回:
+            instances（关联作为同名属性写入）
+        """
+        return load_relations(cls, instances, names)
     
     @classmethod
     def find(cls: Type[T], **kwargs) -> List[T]:
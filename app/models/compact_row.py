@@ -0,0 +1,154 @@
+"""
+紧凑行模块 - 为模型生成基于 __slots__ 的只读行类
+
+列表、导出等只读场景不需要完整的模型实例：行对象以查询返回的元组保存一行的原始列值，
+JSON与日期时间字段在首次访问时才解析并缓存，未访问的字段不产生解析开销。
+"""
+import json
+import datetime
+from typing import Any, Callable, ClassVar, Dict, Optional, Tuple, Type
+
+# 延迟字段尚未解析的标记
+_UNSET = object()
+
+
+def decode_json(value: Any) -> Any:
+    """解析JSON字段（与 BaseModel.from_dict 一致，解析失败时保留原值）"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return value
+    return value
+
+
+def decode_datetime(value: Any) -> Any:
+    """解析日期时间字段（与 BaseModel.from_dict 一致，解析失败时保留原值）"""
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return value
+    return value
+
+
+class _Column:
+    """原始列描述符：直接返回元组中的列值"""
+    __slots__ = ('name', 'index')
+
+    def __init__(self, name: str, index: int):
+        self.name = name
+        self.index = index
+
+    def __get__(self, row, owner=None):
+        if row is None:
+            return self
+        return row._values[self.index]
+
+    def __set__(self, row, value):
+        raise AttributeError(f"{self.name} 为只读字段，修改请先调用 to_model() 获取模型实例")
+
+
+class _LazyColumn(_Column):
+    """延迟解析列描述符：首次访问时解码并缓存到行对象上"""
+    __slots__ = ('slot', 'decoder')
+
+    def __init__(self, name: str, index: int, slot: int, decoder: Callable[[Any], Any]):
+        super().__init__(name, index)
+        self.slot = slot
+        self.decoder = decoder
+
+    def __get__(self, row, owner=None):
+        if row is None:
+            return self
+        cache = row._decoded
+        if cache is None:
+            cache = row._decoded = [_UNSET] * row._lazy_count
+        value = cache[self.slot]
+        if value is _UNSET:
+            value = cache[self.slot] = self.decoder(row._values[self.index])
+        return value
+
+
+class CompactRow:
+    """紧凑行基类，具体行类由 make_row_class 按模型生成"""
+    __slots__ = ('_values', '_decoded')
+
+    _model: ClassVar[Optional[type]] = None
+    _columns: ClassVar[Tuple[str, ...]] = ()
+    _lazy_count: ClassVar[int] = 0
+
+    def __init__(self, values: Tuple):
+        """
+        参数:
+            values: 按 _columns 顺序排列的原始列值
+        """
+        self._values = values
+        self._decoded = None
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._columns:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """按列名取值，列不存在时返回默认值"""
+        return getattr(self, name) if name in self._columns else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为字典（与模型 to_dict 的输出一致）
+
+        返回:
+            数据字典
+        """
+        data = {}
+        for name in self._columns:
+            value = getattr(self, name)
+            if isinstance(value, datetime.datetime):
+                value = value.isoformat()
+            data[name] = value
+        return data
+
+    def to_model(self):
+        """
+        转换为完整的模型实例（可修改、保存）
+
+        返回:
+            模型实例
+        """
+        return self._model.from_dict(dict(zip(self._columns, self._values)))
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._values!r})"
+
+
+def make_row_class(model) -> Type[CompactRow]:
+    """
+    为模型生成紧凑行类：主键与 __fields__ 中的字段各对应一个描述符，
+    JSON与日期时间字段使用延迟解析描述符
+
+    参数:
+        model: BaseModel子类
+
+    返回:
+        行类（类名为 <模型名>Row）
+    """
+    columns = (model.__primary_key__,) + tuple(f for f in model.__fields__ if f != model.__primary_key__)
+    json_fields = set(model.__json_fields__)
+    datetime_fields = set(model.__datetime_fields__)
+
+    attrs = {'__slots__': (), '_model': model, '_columns': columns}
+    lazy_count = 0
+    for index, name in enumerate(columns):
+        if name in json_fields:
+            attrs[name] = _LazyColumn(name, index, lazy_count, decode_json)
+            lazy_count += 1
+        elif name in datetime_fields:
+            attrs[name] = _LazyColumn(name, index, lazy_count, decode_datetime)
+            lazy_count += 1
+        else:
+            attrs[name] = _Column(name, index)
+    attrs['_lazy_count'] = lazy_count
+
+    return type(f"{model.__name__}Row", (CompactRow,), attrs)
@@ -53,6 +53,12 @@ class Doctor(BaseModel):
         "specializations", "education", "certifications", "schedule"
     ]
     
+    # 关联
+    __relations__: ClassVar[Dict[str, Dict[str, Any]]] = {
+        "medical_records": {"model": "app.models.medical_record.MedicalRecord", "foreign_key": "doctor_id", "many": True},
+        "workload_records": {"model": "app.models.workload.WorkloadRecord", "foreign_key": "doctor_id", "many": True}
+    }
+    
     def __init__(self, **kwargs):
         """
         初始化医生实例
@@ -50,6 +50,12 @@ class MedicalRecord(BaseModel):
         "lab_results", "imaging_results", "follow_up"
     ]
     
+    # 关联
+    __relations__: ClassVar[Dict[str, Dict[str, Any]]] = {
+        "patient": {"model": "app.models.patient.Patient", "foreign_key": "patient_id"},
+        "doctor": {"model": "app.models.doctor.Doctor", "foreign_key": "doctor_id"}
+    }
+    
     def __init__(self, **kwargs):
         """
         初始化医疗记录实例
@@ -42,6 +42,11 @@ class Patient(BaseModel):
     # JSON字段
     __json_fields__: ClassVar[List[str]] = ["medical_history", "allergies"]
     
+    # 关联
+    __relations__: ClassVar[Dict[str, Dict[str, Any]]] = {
+        "medical_records": {"model": "app.models.medical_record.MedicalRecord", "foreign_key": "patient_id", "many": True}
+    }
+    
     def __init__(self, **kwargs):
         """
         初始化患者实例
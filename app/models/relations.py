@@ -0,0 +1,215 @@
+"""
+模型关联加载模块 - 解析 __relations__ 声明并批量加载关联记录
+
+关联声明（模型类属性 __relations__）:
+    多对一: 'patient': {'model': 'app.models.patient.Patient', 'foreign_key': 'patient_id'}
+    一对多: 'medical_records': {'model': 'app.models.medical_record.MedicalRecord',
+                                'foreign_key': 'patient_id', 'many': True}
+多对一的 foreign_key 是本模型的列，一对多的 foreign_key 是关联模型的列；
+可选 'key' 指定被引用的列（默认为主键）。
+
+一批记录的每个关联只发出一条 WHERE key IN (...) 查询（超出参数上限时分批），
+加载结果经由请求级身份映射去重：同一请求内已加载的记录不会重复查询，同一主键只对应一个实例。
+"""
+import importlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from flask import g, has_app_context
+
+from app.utils.database import quote_identifier
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 单条 IN 查询的最大参数数（低版本SQLite的变量上限为999）
+IN_BATCH_SIZE = 900
+
+
+class IdentityMap:
+    """身份映射：一次请求内同一模型同一主键只对应一个实例"""
+
+    def __init__(self):
+        self._instances: Dict[Tuple[type, Any], Any] = {}
+
+    def get(self, model, pk: Any) -> Optional[Any]:
+        """按模型和主键取已加载的实例"""
+        return self._instances.get((model, pk))
+
+    def add(self, instance: Any) -> Any:
+        """
+        登记实例
+
+        返回:
+            映射中该主键对应的实例（已存在时返回已有实例）
+        """
+        key = (type(instance), getattr(instance, instance.__primary_key__))
+        return self._instances.setdefault(key, instance)
+
+    def discard(self, model, pk: Any) -> None:
+        """移除实例（记录被删除或需要重新加载时调用）"""
+        self._instances.pop((model, pk), None)
+
+    def clear(self) -> None:
+        """清空映射"""
+        self._instances.clear()
+
+    def __len__(self) -> int:
+        return len(self._instances)
+
+
+def get_identity_map() -> IdentityMap:
+    """
+    获取当前请求的身份映射（保存在 flask.g 上，请求结束即失效）
+
+    返回:
+        身份映射；没有应用上下文时返回新的映射，只在单次加载内去重
+    """
+    if not has_app_context():
+        return IdentityMap()
+    identity_map = g.get('_identity_map')
+    if identity_map is None:
+        identity_map = g._identity_map = IdentityMap()
+    return identity_map
+
+
+def _resolve_model(target: Any):
+    """解析关联目标模型（类或 '模块路径.类名' 字符串）"""
+    if not isinstance(target, str):
+        return target
+    module_name, _, class_name = target.rpartition('.')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def get_relation(model, name: str) -> Dict[str, Any]:
+    """
+    获取关联定义（补全默认值）
+
+    参数:
+        model: 模型类
+        name: 关联名
+
+    返回:
+        {'model': 关联模型类, 'foreign_key': 外键列, 'key': 被引用列, 'many': 是否一对多}
+    """
+    spec = model.__relations__.get(name)
+    if spec is None:
+        raise ValueError(f"{model.__name__} 未声明关联: {name}")
+
+    target = _resolve_model(spec['model'])
+    many = bool(spec.get('many', False))
+    default_key = model.__primary_key__ if many else target.__primary_key__
+    return {
+        'model': target,
+        'foreign_key': spec['foreign_key'],
+        'key': spec.get('key', default_key),
+        'many': many
+    }
+
+
+def _fetch(target, column: str, values: Sequence[Any], identity_map: IdentityMap) -> List[Any]:
+    """按列值批量查询关联模型，结果登记到身份映射"""
+    logger.debug(f"批量加载关联 {target.__name__}.{column}: {len(values)} 个键")
+    instances = []
+    for start in range(0, len(values), IN_BATCH_SIZE):
+        batch = values[start:start + IN_BATCH_SIZE]
+        condition = f"{quote_identifier(column)} IN ({', '.join('?' * len(batch))})"
+        instances.extend(identity_map.add(instance) for instance in target.get_all(condition, tuple(batch)))
+    return instances
+
+
+def _unique_values(records: Sequence[Any], column: str) -> List[Any]:
+    return list(dict.fromkeys(value for value in (getattr(record, column, None) for record in records)
+                              if value is not None))
+
+
+def _group_paths(names: Sequence[str]) -> Dict[str, List[str]]:
+    """将 ['a', 'a.b', 'c'] 分组为 {'a': ['b'], 'c': []}"""
+    paths: Dict[str, List[str]] = {}
+    for path in names:
+        head, _, rest = path.partition('.')
+        paths.setdefault(head, [])
+        if rest:
+            paths[head].append(rest)
+    return paths
+
+
+def _load_relation(records: Sequence[Any], name: str, relation: Dict[str, Any],
+                   identity_map: IdentityMap) -> List[Any]:
+    """加载一个关联并写回每条记录，返回加载到的关联实例"""
+    target = relation['model']
+
+    if relation['many']:
+        parent_keys = _unique_values(records, relation['key'])
+        children = _fetch(target, relation['foreign_key'], parent_keys, identity_map) if parent_keys else []
+        groups: Dict[Any, List[Any]] = {}
+        for child in children:
+            groups.setdefault(getattr(child, relation['foreign_key']), []).append(child)
+        for record in records:
+            setattr(record, name, list(groups.get(getattr(record, relation['key'], None), [])))
+        return children
+
+    key = relation['key']
+    found: Dict[Any, Any] = {}
+    missing = []
+    for value in _unique_values(records, relation['foreign_key']):
+        instance = identity_map.get(target, value) if key == target.__primary_key__ else None
+        if instance is not None:
+            found[value] = instance
+        else:
+            missing.append(value)
+    for instance in _fetch(target, key, missing, identity_map) if missing else []:
+        found[getattr(instance, key)] = instance
+
+    for record in records:
+        setattr(record, name, found.get(getattr(record, relation['foreign_key'], None)))
+    return list({id(instance): instance for instance in found.values()}.values())
+
+
+def load_relations(model, records: Sequence[Any], names: Sequence[str],
+                   identity_map: Optional[IdentityMap] = None) -> Sequence[Any]:
+    """
+    为一批模型实例加载关联，结果作为同名属性写回（多对一为实例或None，一对多为列表）
+
+    参数:
+        model: 记录所属的模型类
+        records: 模型实例列表
+        names: 关联名，支持点号路径加载下一级关联（如 'category.parent'）
+        identity_map: 身份映射，默认使用当前请求的映射
+
+    返回:
+        records
+    """
+    if not records or not names:
+        return records
+    if identity_map is None:
+        identity_map = get_identity_map()
+
+    # 按第一级关联分组，下一级路径在关联实例上递归加载
+    for name, sub_paths in _group_paths(names).items():
+        relation = get_relation(model, name)
+        related = _load_relation(records, name, relation, identity_map)
+        if sub_paths and related:
+            load_relations(relation['model'], related, sub_paths, identity_map)
+    return records
+
+
+def relation_dict(instance: Any, names: Sequence[str]) -> Dict[str, Any]:
+    """
+    将实例及已加载的关联转换为嵌套字典
+
+    参数:
+        instance: 模型实例
+        names: 已加载的关联名（支持点号路径）
+
+    返回:
+        instance.to_dict()，并以关联名为键附加关联记录的字典
+    """
+    data = instance.to_dict()
+    for name, sub_paths in _group_paths(names).items():
+        related = getattr(instance, name, None)
+        if isinstance(related, list):
+            data[name] = [relation_dict(item, sub_paths) for item in related]
+        else:
+            data[name] = relation_dict(related, sub_paths) if related is not None else None
+    return data
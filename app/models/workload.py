@@ -1,12 +1,30 @@
 """
 工作量模型模块 - 定义工作量相关数据模型
 """
-from typing import Dict, List, Any, Optional, ClassVar
+from typing import Dict, List, Any, Optional, ClassVar, Tuple
 import datetime
 
 from app.models.base_model import BaseModel
+from app.utils.database import execute_query, transaction
 from app.utils.utils import format_datetime
 
+# 参与汇总统计的记录状态
+APPROVED_STATUS = "已审核"
+
+# 工作量日汇总表
+WORKLOAD_ROLLUP_TABLE = "workload_daily_rollup"
+
+# 从记录日期中取出日期部分（YYYY-MM-DD），无法解析时为NULL
+WORKLOAD_DAY_EXPR = "date(substr(record_date, 1, 10))"
+
+# 各时间段类型的分组键（基于 day 列），周使用ISO周数
+PERIOD_EXPRESSIONS = {
+    "day": "day",
+    "week": "strftime('%Y', day) || '-W' || printf('%02d', (strftime('%j', date(day, '-3 days', 'weekday 4')) - 1) / 7 + 1)",
+    "month": "substr(day, 1, 7)",
+    "year": "substr(day, 1, 4)"
+}
+
 class WorkloadCategory(BaseModel):
     """工作量类别模型类"""
     
@@ -36,6 +54,12 @@ class WorkloadCategory(BaseModel):
     # JSON字段
     __json_fields__: ClassVar[List[str]] = ["points_rule"]
     
+    # 关联
+    __relations__: ClassVar[Dict[str, Dict[str, Any]]] = {
+        "parent": {"model": "app.models.workload.WorkloadCategory", "foreign_key": "parent_id"},
+        "children": {"model": "app.models.workload.WorkloadCategory", "foreign_key": "parent_id", "many": True}
+    }
+    
     def __init__(self, **kwargs):
         """
         初始化工作量类别实例
@@ -140,6 +164,12 @@ class WorkloadRecord(BaseModel):
     # JSON字段
     __json_fields__: ClassVar[List[str]] = ["metadata"]
     
+    # 关联
+    __relations__: ClassVar[Dict[str, Dict[str, Any]]] = {
+        "doctor": {"model": "app.models.doctor.Doctor", "foreign_key": "doctor_id"},
+        "category": {"model": "app.models.workload.WorkloadCategory", "foreign_key": "category_id"}
+    }
+    
     def __init__(self, **kwargs):
         """
         初始化工作量记录实例
@@ -271,6 +301,102 @@ class WorkloadRecord(BaseModel):
         """
         return cls.find(status="待审核")
     
+    # ------------------------------------------------------------------
+    # 汇总统计（在SQL中完成分组聚合）
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _bound_param(value: Any) -> Any:
+        """将日期边界转换为与存储格式一致的查询参数"""
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        return value
+    
+    @staticmethod
+    def _bound_day(value: Any) -> Optional[str]:
+        """取日期边界所在的日期（YYYY-MM-DD），无法解析时返回None"""
+        try:
+            return datetime.date.fromisoformat(str(value)[:10]).isoformat()
+        except ValueError:
+            return None
+    
+    @classmethod
+    def _summary_conditions(cls, start_date: Any = None, end_date: Any = None,
+                            doctor_id: Optional[str] = None) -> Tuple[List[str], List[Any]]:
+        """构建汇总查询的明细过滤条件（与原先逐条读取时的条件一致）"""
+        conditions = ["status = ?"]
+        params: List[Any] = [APPROVED_STATUS]
+        if doctor_id is not None:
+            conditions.append("doctor_id = ?")
+            params.append(doctor_id)
+        if start_date:
+            conditions.append("record_date >= ?")
+            params.append(cls._bound_param(start_date))
+        if end_date:
+            conditions.append("record_date <= ?")
+            params.append(cls._bound_param(end_date))
+        return conditions, params
+    
+    @classmethod
+    def has_summary_rollup(cls) -> bool:
+        """日汇总表是否已启用"""
+        result = execute_query(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?",
+            (WORKLOAD_ROLLUP_TABLE,), fetch_one=True
+        )
+        return result is not None
+    
+    @classmethod
+    def _daily_source(cls, start_date: Any = None, end_date: Any = None,
+                      use_rollup: Optional[bool] = None) -> Tuple[str, List[Any]]:
+        """
+        构建按日期、医生分组的数据源子查询，输出列: day, doctor_id, record_count, points
+        
+        启用日汇总表时，起止日期之间的完整日期直接读汇总表，
+        起止边界所在的两天仍从明细表按原始条件读取，保证结果与明细查询一致
+        """
+        conditions, params = cls._summary_conditions(start_date, end_date)
+        detail_select = (f"SELECT {WORKLOAD_DAY_EXPR} AS day, doctor_id, COUNT(*) AS record_count, "
+                         f"SUM(points) AS points FROM {cls.__tablename__}")
+        
+        start_day = cls._bound_day(start_date) if start_date else None
+        end_day = cls._bound_day(end_date) if end_date else None
+        rollup_usable = (start_day or not start_date) and (end_day or not end_date)
+        if use_rollup is False or not rollup_usable or not cls.has_summary_rollup():
+            return f"{detail_select} WHERE {' AND '.join(conditions)} GROUP BY day, doctor_id", params
+        
+        rollup_conditions = []
+        rollup_params: List[Any] = []
+        if start_day:
+            rollup_conditions.append("day > ?")
+            rollup_params.append(start_day)
+        if end_day:
+            rollup_conditions.append("day < ?")
+            rollup_params.append(end_day)
+        if not rollup_conditions:
+            return (f"SELECT NULLIF(day, '') AS day, NULLIF(doctor_id, '') AS doctor_id, record_count, points "
+                    f"FROM {WORKLOAD_ROLLUP_TABLE}", [])
+        
+        # 有日期边界时汇总表中的无效日期（day为空串）不参与，由下方明细查询按原始条件处理
+        rollup_select = (f"SELECT day, NULLIF(doctor_id, '') AS doctor_id, record_count, points "
+                         f"FROM {WORKLOAD_ROLLUP_TABLE} WHERE day != '' AND {' AND '.join(rollup_conditions)}")
+        
+        ranges = []
+        range_params = []
+        for day in sorted({day for day in (start_day, end_day) if day}):
+            next_day = (datetime.date.fromisoformat(day) + datetime.timedelta(days=1)).isoformat()
+            ranges.append("(record_date >= ? AND record_date < ?)")
+            range_params.extend([day, next_day])
+        source = (f"{rollup_select} UNION ALL {detail_select} WHERE {' AND '.join(conditions)} "
+                  f"AND ({' OR '.join(ranges)}) GROUP BY day, doctor_id")
+        source_params = rollup_params + params + range_params
+        
+        # 日期无法解析的记录按字符串比较可能落在查询区间内，汇总表中存在此类记录时回明细表读取
+        if execute_query(f"SELECT 1 FROM {WORKLOAD_ROLLUP_TABLE} WHERE day = '' LIMIT 1", fetch_one=True):
+            source += (f" UNION ALL {detail_select} WHERE {' AND '.join(conditions)} "
+                       f"AND {WORKLOAD_DAY_EXPR} IS NULL GROUP BY day, doctor_id")
+            source_params += params
+        return source, source_params
+    
     @classmethod
     def get_summary_by_doctor(cls, doctor_id: str, 
                            start_date: Optional[datetime.datetime] = None,
@@ -286,44 +412,23 @@ class WorkloadRecord(BaseModel):
         返回:
             工作量汇总数据
         """
-        conditions = ["doctor_id = ? AND status = '已审核'"]
-        params = [doctor_id]
-        
-        if start_date:
-            conditions.append("record_date >= ?")
-            params.append(start_date.isoformat() if isinstance(start_date, datetime.datetime) else start_date)
-            
-        if end_date:
-            conditions.append("record_date <= ?")
-            params.append(end_date.isoformat() if isinstance(end_date, datetime.datetime) else end_date)
-            
-        condition = " AND ".join(conditions)
-        
-        # 获取记录
-        records = cls.get_all(condition, tuple(params))
-        
-        # 计算总分值
-        total_points = sum(record.points for record in records if hasattr(record, "points") and record.points)
+        conditions, params = cls._summary_conditions(start_date, end_date, doctor_id=doctor_id)
+        rows = execute_query(
+            f"SELECT category_id, COUNT(*) AS count, COALESCE(SUM(points), 0) AS points "
+            f"FROM {cls.__tablename__} WHERE {' AND '.join(conditions)} GROUP BY category_id",
+            tuple(params)
+        ) or []
         
-        # 按类别分组
-        category_summary = {}
-        for record in records:
-            if not hasattr(record, "category_id") or not record.category_id:
-                continue
-                
-            if record.category_id not in category_summary:
-                category_summary[record.category_id] = {
-                    "count": 0,
-                    "points": 0
-                }
-                
-            category_summary[record.category_id]["count"] += 1
-            category_summary[record.category_id]["points"] += record.points if hasattr(record, "points") and record.points else 0
+        # 按类别分组（未设置类别的记录只计入总数）
+        category_summary = {
+            row["category_id"]: {"count": row["count"], "points": row["points"]}
+            for row in rows if row["category_id"]
+        }
             
         return {
             "doctor_id": doctor_id,
-            "total_records": len(records),
-            "total_points": total_points,
+            "total_records": sum(row["count"] for row in rows),
+            "total_points": sum(row["points"] for row in rows),
             "by_category": category_summary,
             "start_date": start_date.isoformat() if isinstance(start_date, datetime.datetime) else start_date,
             "end_date": end_date.isoformat() if isinstance(end_date, datetime.datetime) else end_date
@@ -332,7 +437,8 @@ class WorkloadRecord(BaseModel):
     @classmethod
     def get_summary_by_period(cls, period_type: str = "month",
                             start_date: Optional[datetime.datetime] = None,
-                            end_date: Optional[datetime.datetime] = None) -> Dict[str, Any]:
+                            end_date: Optional[datetime.datetime] = None,
+                            use_rollup: Optional[bool] = None) -> Dict[str, Any]:
         """
         获取指定时间段的工作量汇总
         
@@ -340,85 +446,144 @@ class WorkloadRecord(BaseModel):
             period_type: 时间段类型 (day, week, month, year)
             start_date: 开始日期
             end_date: 结束日期
+            use_rollup: 是否使用日汇总表，None表示已启用时自动使用
             
         返回:
             工作量汇总数据
         """
-        conditions = ["status = '已审核'"]
-        params = []
-        
-        if start_date:
-            conditions.append("record_date >= ?")
-            params.append(start_date.isoformat() if isinstance(start_date, datetime.datetime) else start_date)
-            
-        if end_date:
-            conditions.append("record_date <= ?")
-            params.append(end_date.isoformat() if isinstance(end_date, datetime.datetime) else end_date)
-            
-        condition = " AND ".join(conditions)
-        
-        # 获取记录
-        records = cls.get_all(condition, tuple(params))
+        period_expr = PERIOD_EXPRESSIONS.get(period_type, PERIOD_EXPRESSIONS["month"])
+        source, params = cls._daily_source(start_date, end_date, use_rollup=use_rollup)
+        rows = execute_query(
+            f"SELECT {period_expr} AS period, doctor_id, SUM(record_count) AS count, "
+            f"COALESCE(SUM(points), 0) AS points FROM ({source}) "
+            f"GROUP BY period, doctor_id ORDER BY period DESC",
+            tuple(params)
+        ) or []
         
-        # 按时间段和医生ID分组
+        # 按时间段和医生ID汇总（日期无法解析的记录只计入总数）
         period_summary = {}
         doctor_summary = {}
-        
-        for record in records:
-            if not hasattr(record, "record_date") or not record.record_date:
+        for row in rows:
+            if row["period"] is None:
                 continue
-                
-            # 处理日期
-            if isinstance(record.record_date, str):
-                try:
-                    record_date = datetime.datetime.fromisoformat(record.record_date.replace('Z', '+00:00'))
-                except ValueError:
-                    continue
-            else:
-                record_date = record.record_date
-                
-            # 获取时间段键
-            if period_type == "day":
-                period_key = record_date.strftime("%Y-%m-%d")
-            elif period_type == "week":
-                # 使用ISO周数
-                period_key = f"{record_date.year}-W{record_date.isocalendar()[1]:02d}"
-            elif period_type == "month":
-                period_key = record_date.strftime("%Y-%m")
-            elif period_type == "year":
-                period_key = str(record_date.year)
-            else:
-                period_key = record_date.strftime("%Y-%m")  # 默认按月
-                
-            # 按时间段汇总
-            if period_key not in period_summary:
-                period_summary[period_key] = {
-                    "count": 0,
-                    "points": 0
-                }
-                
-            period_summary[period_key]["count"] += 1
-            period_summary[period_key]["points"] += record.points if hasattr(record, "points") and record.points else 0
+            period = period_summary.setdefault(row["period"], {"count": 0, "points": 0})
+            period["count"] += row["count"]
+            period["points"] += row["points"]
             
-            # 按医生汇总
-            if not hasattr(record, "doctor_id") or not record.doctor_id:
+            if not row["doctor_id"]:
                 continue
-                
-            if record.doctor_id not in doctor_summary:
-                doctor_summary[record.doctor_id] = {
-                    "count": 0,
-                    "points": 0
-                }
-                
-            doctor_summary[record.doctor_id]["count"] += 1
-            doctor_summary[record.doctor_id]["points"] += record.points if hasattr(record, "points") and record.points else 0
+            doctor = doctor_summary.setdefault(row["doctor_id"], {"count": 0, "points": 0})
+            doctor["count"] += row["count"]
+            doctor["points"] += row["points"]
             
         return {
-            "total_records": len(records),
-            "total_points": sum(record.points for record in records if hasattr(record, "points") and record.points),
+            "total_records": sum(row["count"] for row in rows),
+            "total_points": sum(row["points"] for row in rows),
             "by_period": period_summary,
             "by_doctor": doctor_summary,
             "period_type": period_type,
             "start_date": start_date.isoformat() if isinstance(start_date, datetime.datetime) else start_date,
             "end_date": end_date.isoformat() if isinstance(end_date, datetime.datetime) else end_date
-        } 
\ No newline at end of file
+        }
+    
+    @classmethod
+    def ensure_summary_indexes(cls) -> None:
+        """
+        创建汇总查询使用的覆盖索引
+        
+        索引包含汇总所需的全部列，按状态与日期范围（或按医生）扫描时无需回表；
+        日期无法解析的记录单独建部分索引，使用日汇总表时可直接定位
+        """
+        table = cls.__tablename__
+        with transaction() as conn:
+            conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_summary
+            ON {table} (status, record_date, doctor_id, points)
+            """)
+            conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_doctor_summary
+            ON {table} (doctor_id, status, record_date, category_id, points)
+            """)
+            conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_invalid_date
+            ON {table} (status, record_date, doctor_id, points)
+            WHERE {WORKLOAD_DAY_EXPR} IS NULL
+            """)
+    
+    @classmethod
+    def enable_summary_rollup(cls) -> None:
+        """
+        启用日汇总表（按日期、医生汇总已审核记录）
+        
+        创建汇总表与维护触发器并回填现有数据；之后按时间段汇总时自动走汇总表。
+        触发器会给每次写入增加一次汇总表更新，适合读多写少的场景
+        """
+        table = cls.__tablename__
+        day_of = "COALESCE(date(substr({0}.record_date, 1, 10)), '')"
+        
+        def upsert(prefix: str, sign: str) -> str:
+            # INSERT ... SELECT 形式的UPSERT需要WHERE子句消除语法歧义
+            return (
+                f"INSERT INTO {WORKLOAD_ROLLUP_TABLE} (day, doctor_id, record_count, points) "
+                f"SELECT {day_of.format(prefix)}, COALESCE({prefix}.doctor_id, ''), "
+                f"{sign}1, {sign}COALESCE({prefix}.points, 0) "
+                f"WHERE {prefix}.status = '{APPROVED_STATUS}' "
+                f"ON CONFLICT (day, doctor_id) DO UPDATE SET "
+                f"record_count = record_count + excluded.record_count, "
+                f"points = points + excluded.points;"
+            )
+        
+        def prune(prefix: str) -> str:
+            # 分组记录数减为0时删除该行，避免汇总结果中出现空分组
+            return (
+                f"DELETE FROM {WORKLOAD_ROLLUP_TABLE} "
+                f"WHERE day = {day_of.format(prefix)} AND doctor_id = COALESCE({prefix}.doctor_id, '') "
+                f"AND record_count = 0;"
+            )
+        
+        with transaction() as conn:
+            conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {WORKLOAD_ROLLUP_TABLE} (
+                day TEXT NOT NULL,
+                doctor_id TEXT NOT NULL,
+                record_count INTEGER NOT NULL,
+                points REAL NOT NULL,
+                PRIMARY KEY (day, doctor_id)
+            ) WITHOUT ROWID
+            """)
+            conn.execute(f"DELETE FROM {WORKLOAD_ROLLUP_TABLE}")
+            conn.execute(f"""
+            INSERT INTO {WORKLOAD_ROLLUP_TABLE} (day, doctor_id, record_count, points)
+            SELECT COALESCE({WORKLOAD_DAY_EXPR}, '') AS day, COALESCE(doctor_id, '') AS doctor,
+                   COUNT(*), COALESCE(SUM(points), 0)
+            FROM {table} WHERE status = ?
+            GROUP BY day, doctor
+            """, (APPROVED_STATUS,))
+            
+            for suffix in ('insert', 'delete', 'update'):
+                conn.execute(f"DROP TRIGGER IF EXISTS {table}_rollup_{suffix}")
+            conn.execute(f"""
+            CREATE TRIGGER {table}_rollup_insert AFTER INSERT ON {table}
+            WHEN NEW.status = '{APPROVED_STATUS}'
+            BEGIN {upsert('NEW', '')} END
+            """)
+            conn.execute(f"""
+            CREATE TRIGGER {table}_rollup_delete AFTER DELETE ON {table}
+            WHEN OLD.status = '{APPROVED_STATUS}'
+            BEGIN {upsert('OLD', '-')} {prune('OLD')} END
+            """)
+            conn.execute(f"""
+            CREATE TRIGGER {table}_rollup_update
+            AFTER UPDATE OF status, record_date, doctor_id, points ON {table}
+            WHEN OLD.status = '{APPROVED_STATUS}' OR NEW.status = '{APPROVED_STATUS}'
+            BEGIN {upsert('OLD', '-')} {upsert('NEW', '')} {prune('OLD')} END
+            """)
+    
+    @classmethod
+    def disable_summary_rollup(cls) -> None:
+        """停用日汇总表并删除维护触发器"""
+        table = cls.__tablename__
+        with transaction() as conn:
+            for suffix in ('insert', 'delete', 'update'):
+                conn.execute(f"DROP TRIGGER IF EXISTS {table}_rollup_{suffix}")
+            conn.execute(f"DROP TABLE IF EXISTS {WORKLOAD_ROLLUP_TABLE}")
@@ -36,7 +36,8 @@ from app.prompts.responding import (
     DATA_RESPONSE_SYSTEM_PROMPT, DATA_RESPONSE_USER_PROMPT,
     TEXT_RESPONSE_SYSTEM_PROMPT, TEXT_RESPONSE_USER_PROMPT,
     KB_RESPONSE_SYSTEM_PROMPT, KB_RESPONSE_USER_PROMPT,
-    COMPREHENSIVE_RESPONSE_SYSTEM_PROMPT, COMPREHENSIVE_RESPONSE_USER_PROMPT
+    COMPREHENSIVE_RESPONSE_SYSTEM_PROMPT, COMPREHENSIVE_RESPONSE_USER_PROMPT,
+    CHAT_SUMMARY_SYSTEM_PROMPT, CHAT_SUMMARY_USER_PROMPT
 )
 
 from app.prompts.visualization import (
@@ -101,6 +102,7 @@ __all__ = [
     'TEXT_RESPONSE_SYSTEM_PROMPT', 'TEXT_RESPONSE_USER_PROMPT',
     'KB_RESPONSE_SYSTEM_PROMPT', 'KB_RESPONSE_USER_PROMPT',
     'COMPREHENSIVE_RESPONSE_SYSTEM_PROMPT', 'COMPREHENSIVE_RESPONSE_USER_PROMPT',
+    'CHAT_SUMMARY_SYSTEM_PROMPT', 'CHAT_SUMMARY_USER_PROMPT',
     
     # 可视化模块提示词
     'CHART_GENERATION_SYSTEM_PROMPT', 'CHART_GENERATION_USER_PROMPT',
@@ -274,6 +274,26 @@ RESPONSE_USER_PROMPT = """
 5. 使用适当的医学术语并提供必要解释
 """
 
+# ===================== 对话摘要提示词 ===================== #
+
+CHAT_SUMMARY_SYSTEM_PROMPT = r"""你是一位医疗数据分析助手，负责维护与用户对话的滚动摘要。
+摘要用于在后续对话中代替较早的聊天记录，需要保留：
+1. 用户关心的科室、指标、时间范围等查询条件
+2. 已得出的关键数字与结论
+3. 用户的偏好与尚未解决的问题
+不要复述寒暄内容，不要编造对话中没有出现的数据。
+"""
+
+CHAT_SUMMARY_USER_PROMPT = """
+已有摘要：
+{previous_summary}
+
+新增的较早对话：
+{messages}
+
+请将新增对话合并进已有摘要，输出更新后的完整摘要（不超过{max_chars}字，直接输出摘要正文）。
+"""
+
 # 导出所有回复模块提示词
 __all__ = [
     # 通用回复提示词
@@ -294,5 +314,9 @@ __all__ = [
     
     # 综合回复提示词
     'COMPREHENSIVE_RESPONSE_SYSTEM_PROMPT',
-    'COMPREHENSIVE_RESPONSE_USER_PROMPT'
+    'COMPREHENSIVE_RESPONSE_USER_PROMPT',
+    
+    # 对话摘要提示词
+    'CHAT_SUMMARY_SYSTEM_PROMPT',
+    'CHAT_SUMMARY_USER_PROMPT'
 ] 
\ No newline at end of file
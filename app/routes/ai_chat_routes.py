@@ -11,9 +11,13 @@ from app.services.query_service import create_response
 from app.services.standard_langchain_agent import standard_agent
 from app.services.chart_service import ChartService
 from app.services.ai_chat_service import AIChatService
+from app.services.chat_memory import get_chat_memory
 from app.utils.report_generator import ReportGenerator
 from app.utils.logger import log_user_query
-from app.utils.utils import safe_json_dumps
+from app.utils.serialization import json_response
+from app.utils.single_flight import get_single_flight_stats
+from app.utils.circuit_breaker import get_circuit_breaker_stats
+from app.utils.admission_control import get_admission_controller
 from app.utils.nlp_utils import TextProcessor
 from app.routes.auth_routes import login_required, api_login_required
 from app.services.llm_service import LLMServiceFactory
@@ -45,6 +49,14 @@ ai_chat_bp = Blueprint('ai_chat', __name__, url_prefix='/chat')
 
 # 创建AI聊天服务实例
 ai_chat_service = AIChatService()
+chat_memory = get_chat_memory()
+
+def _chat_owner_ids():
+    """当前用户可访问的聊天所属标识（用户ID；兼容按用户名创建的历史会话）"""
+    owner_ids = {str(session['user_id'])}
+    if session.get('username'):
+        owner_ids.add(session['username'])
+    return owner_ids
 
 @ai_chat_bp.route('/')
 @login_required
@@ -83,7 +95,22 @@ def process_query():
         
         current_app.logger.info("使用标准LangChain Agent架构处理查询")
         
-        agent_result = standard_agent.process_query(query)
+        # 带chat_id的多轮对话：提示词中附带滚动摘要与最近若干轮对话
+        chat_id = data.get('chat_id')
+        agent_input = query
+        if chat_id:
+            # 只能在自己的会话中继续对话，不能读取或写入其他用户的会话
+            if chat_memory.ensure_chat(chat_id, session['user_id'], title=query[:50]) not in _chat_owner_ids():
+                return jsonify({'error': '聊天不存在'}), 404
+            agent_input = chat_memory.format_prompt(chat_memory.build_context(chat_id), query)
+        
+        agent_result = standard_agent.process_query(agent_input, question=query)
+        
+        if chat_id:
+            chat_memory.append_message(chat_id, 'user', query)
+            if agent_result.get('success'):
+                chat_memory.append_message(chat_id, 'ai', agent_result.get('answer', ''), content_type='markdown')
+            chat_memory.maybe_refresh_summary(chat_id)
         
         # 转换为标准格式
         if agent_result.get('success'):
@@ -92,8 +119,12 @@ def process_query():
                 message=agent_result.get('answer', ''),
                 data={
                     'process_time': agent_result.get('process_time', ''),
-                    'architecture': 'StandardLangChain Agent ✅',
-                    'agent_type': agent_result.get('agent_type', 'StandardLangChain'),
+                    'architecture': 'ToolCalling Agent ✅',
+                    'agent_type': agent_result.get('agent_type', 'ToolCalling'),
+                    'llm_calls': agent_result.get('llm_calls'),
+                    'tool_calls': agent_result.get('tool_calls'),
+                    'steps': agent_result.get('steps', []),
+                    'degraded': agent_result.get('degraded', False),
                     'performance': 'Fast & Reliable'
                 }
             )
@@ -105,18 +136,18 @@ def process_query():
                 message=f"处理查询失败: {agent_result.get('error', '未知错误')}",
                 error=agent_result.get('error', ''),
                 data={
-                    'architecture': 'StandardLangChain Agent',
-                    'agent_type': 'StandardLangChain'
+                    'architecture': 'ToolCalling Agent',
+                    'agent_type': agent_result.get('agent_type', 'ToolCalling')
                 }
             )
         
         process_time = time.time() - start_time
         
         # 记录处理时间
-        current_app.logger.info(f"标准LangChain Agent处理完成，耗时: {process_time:.2f}秒")
+        current_app.logger.info(f"标准Agent处理完成，耗时: {process_time:.2f}秒")
         
-        # 使用安全的JSON序列化，直接返回标准格式响应
-        return safe_json_dumps(result), 200, {'Content-Type': 'application/json'}
+        # 使用orjson序列化并按需压缩，直接返回标准格式响应
+        return json_response(result)
         
     except Exception as e:
         traceback.print_exc()
@@ -126,7 +157,7 @@ def process_query():
             message=f'处理查询失败: {str(e)}',
             error=str(e)
         )
-        return safe_json_dumps(error_response), 200, {'Content-Type': 'application/json'}
+        return json_response(error_response)
 
 @ai_chat_bp.route('/render-chart', methods=['POST'])
 @api_login_required
@@ -401,4 +432,58 @@ def test_chat():
         return jsonify({
             'success': False,
             'message': f'获取测试数据时出错: {str(e)}'
-        }), 500 
\ No newline at end of file
+        }), 500 
+
+@ai_chat_bp.route('/api/chat/<chat_id>/messages', methods=['GET'])
+@api_login_required
+def chat_messages(chat_id):
+    """分页获取聊天历史（cursor为上一页返回的next_cursor，structured=1时附带图表与表格）"""
+    if chat_memory.get_owner(chat_id) not in _chat_owner_ids():
+        return jsonify({'success': False, 'message': '聊天不存在'}), 404
+    try:
+        page = ai_chat_service.get_chat_history_page(
+            chat_id,
+            cursor=request.args.get('cursor') or None,
+            limit=request.args.get('limit', 0, type=int),
+            include_structured=request.args.get('structured') == '1'
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    page['summary'] = chat_memory.get_summary(chat_id)
+    return json_response({'success': True, 'data': page})
+
+@ai_chat_bp.route('/api/llm/dedupe-stats', methods=['GET'])
+@api_login_required
+def llm_dedupe_stats():
+    """获取相同LLM请求合并与缓存的统计"""
+    return jsonify({
+        'success': True,
+        'data': get_single_flight_stats()
+    })
+
+@ai_chat_bp.route('/api/llm/task-stats', methods=['GET'])
+@api_login_required
+def llm_task_stats():
+    """获取按任务的模型调用统计（档位、耗时、估算token与成本、升级次数）"""
+    return jsonify({
+        'success': True,
+        'data': LLMServiceFactory.get_task_stats()
+    })
+
+@ai_chat_bp.route('/api/llm/breaker-stats', methods=['GET'])
+@api_login_required
+def llm_breaker_stats():
+    """获取大模型服务熔断器的状态与统计（状态、失败率、慢调用率、打开次数、拒绝数）"""
+    return jsonify({
+        'success': True,
+        'data': get_circuit_breaker_stats()
+    })
+
+@ai_chat_bp.route('/api/llm/admission-stats', methods=['GET'])
+@api_login_required
+def admission_stats():
+    """获取AI接口准入控制统计（准入、排队、各原因拒绝数、当前并发与队列长度）"""
+    return jsonify({
+        'success': True,
+        'data': get_admission_controller().get_stats()
+    })
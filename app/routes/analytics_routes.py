@@ -3,7 +3,6 @@
 提供数据分析和可视化API
 """
 from flask import Blueprint, request, jsonify, render_template, current_app, Response, make_response
-import json
 import pandas as pd
 import traceback
 import random
@@ -28,9 +27,12 @@ from functools import wraps
 from app.utils.data_analysis import DataAnalyzer, DataVisualizer, generate_plotly_chart_for_sql
 from app.routes.auth_routes import login_required, api_login_required
 from app.utils.database import get_outpatient_data, get_completion_rate, get_db_connection, execute_query, execute_query_to_dataframe
+from app.utils.partitioning import route_query
+from app.utils.sql_sandbox import get_sql_sandbox, SQLSandboxError
 # 导入API错误处理装饰器
 from app.utils.error_handler import api_error_handler, ApiError, ErrorCode
 from app.utils.utils import date_range_to_dates
+from app.utils.serialization import json_response, plotly_json, raw_json, table_payload
 
 # 创建CSRF保护
 csrf = CSRFProtect()
@@ -140,9 +142,11 @@ def generate_chart():
         if not query:
             return jsonify({'error': '查询语句为空'}), 400
             
-        # 生成图表
+        # 在只读沙箱中执行查询后生成图表
+        df = get_sql_sandbox().query_dataframe(query)
         chart_json = generate_plotly_chart_for_sql(
             query=query,
+            df=df,
             chart_type=chart_type,
             x=x,
             y=y,
@@ -154,10 +158,12 @@ def generate_chart():
         if not chart_json:
             return jsonify({'error': '生成图表失败'}), 500
             
-        return jsonify({
+        return json_response({
             'success': True,
-            'chart_data': json.loads(chart_json)
+            'chart_data': raw_json(chart_json)
         })
+    except SQLSandboxError as e:
+        return jsonify({'error': e.message, 'reason': e.reason}), e.http_status
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': f'生成图表出错: {str(e)}'}), 500
@@ -182,7 +188,7 @@ def create_pivot_table():
             return jsonify({'error': '参数不完整'}), 400
             
         # 执行查询
-        df = Database.query_to_dataframe(query)
+        df = get_sql_sandbox().query_dataframe(query)
         
         if df.empty:
             return jsonify({'error': '查询结果为空'}), 400
@@ -196,15 +202,17 @@ def create_pivot_table():
             aggfunc=aggfunc
         )
         
-        # 转换为JSON
-        pivot_data = pivot_df.reset_index().to_dict(orient='records')
-        columns = pivot_df.reset_index().columns.tolist()
+        # 转换为JSON（按客户端协商输出行字典或列式表格）
+        pivot_df = pivot_df.reset_index()
+        columns = [str(c) for c in pivot_df.columns]
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'pivot_data': pivot_data,
+            'pivot_data': table_payload(pivot_df),
             'columns': columns
         })
+    except SQLSandboxError as e:
+        return jsonify({'error': e.message, 'reason': e.reason}), e.http_status
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': f'创建数据透视表出错: {str(e)}'}), 500
@@ -226,7 +234,7 @@ def generate_correlation():
             return jsonify({'error': '查询语句为空'}), 400
             
         # 执行查询
-        df = Database.query_to_dataframe(query)
+        df = get_sql_sandbox().query_dataframe(query)
         
         if df.empty:
             return jsonify({'error': '查询结果为空'}), 400
@@ -237,10 +245,12 @@ def generate_correlation():
         if fig is None:
             return jsonify({'error': '生成相关性热图失败'}), 500
             
-        return jsonify({
+        return json_response({
             'success': True,
-            'correlation_data': json.loads(fig.to_json())
+            'correlation_data': plotly_json(fig)
         })
+    except SQLSandboxError as e:
+        return jsonify({'error': e.message, 'reason': e.reason}), e.http_status
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': f'生成相关性矩阵出错: {str(e)}'}), 500
@@ -262,7 +272,7 @@ def generate_dashboard():
             return jsonify({'error': '查询语句为空'}), 400
             
         # 执行查询
-        df = Database.query_to_dataframe(query)
+        df = get_sql_sandbox().query_dataframe(query)
         
         if df.empty:
             return jsonify({'error': '查询结果为空'}), 400
@@ -273,10 +283,12 @@ def generate_dashboard():
         if fig is None:
             return jsonify({'error': '生成仪表板失败'}), 500
             
-        return jsonify({
+        return json_response({
             'success': True,
-            'dashboard_data': json.loads(fig.to_json())
+            'dashboard_data': plotly_json(fig)
         })
+    except SQLSandboxError as e:
+        return jsonify({'error': e.message, 'reason': e.reason}), e.http_status
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': f'生成仪表板出错: {str(e)}'}), 500
@@ -338,10 +350,10 @@ def get_outpatient_trends():
             title="门诊量趋势分析"
         )
         
-        return jsonify({
+        return json_response({
             'success': True,
             'analysis': analysis_result,
-            'chart_data': json.loads(fig.to_json()) if fig else None
+            'chart_data': plotly_json(fig)
         })
     except Exception as e:
         traceback.print_exc()
@@ -389,10 +401,10 @@ def get_completion_rate():
             title="目标完成率分析"
         )
         
-        return jsonify({
+        return json_response({
             'success': True,
             'analysis': analysis_result,
-            'chart_data': json.loads(fig.to_json()) if fig else None
+            'chart_data': plotly_json(fig)
         })
     except Exception as e:
         traceback.print_exc()
@@ -432,10 +444,10 @@ def get_department_comparison():
         dept_summary = df.groupby('科室')['数量'].sum().reset_index()
         dept_summary = dept_summary.sort_values(by='数量', ascending=False)
         
-        return jsonify({
+        return json_response({
             'success': True,
-            'summary_data': dept_summary.to_dict('records'),
-            'chart_data': json.loads(fig.to_json()) if fig else None
+            'summary_data': table_payload(dept_summary),
+            'chart_data': plotly_json(fig)
         })
     except Exception as e:
         traceback.print_exc()
@@ -556,7 +568,7 @@ def get_department_workload():
         # 执行查询
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(query, params)
+            cursor.execute(route_query(conn, query, start_date, end_date), params)
             rows = cursor.fetchall()
             
         # 格式化数据
@@ -734,7 +746,7 @@ def get_department_revenue():
         # 执行查询
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(query, params)
+            cursor.execute(route_query(conn, query, start_date, end_date), params)
             rows = cursor.fetchall()
             
         # 格式化数据
@@ -772,10 +784,10 @@ def get_department_list():
         ORDER BY department
         """
         
-        # 执行查询
+        # 执行查询（包括已归档年份分区中的科室）
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(query)
+            cursor.execute(route_query(conn, query))
             rows = cursor.fetchall()
             
         # 格式化数据
@@ -917,7 +929,7 @@ def get_finance_composition():
     # 执行查询
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(query, params)
+        cursor.execute(route_query(conn, query, start_date, end_date), params)
         row = cursor.fetchone()
         
     # 检查是否有数据返回
@@ -1142,7 +1154,7 @@ def get_financial_composition_data(start_date, end_date):
     # 执行查询
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(query, params)
+        cursor.execute(route_query(conn, query, start_date, end_date), params)
         row = cursor.fetchone()
     
     # 检查是否有数据
@@ -1202,7 +1214,7 @@ def get_department_finance_data(start_date, end_date):
             create_sample_department_data(cursor, conn, start_date, end_date)
         
         # 查询数据
-        cursor.execute(query, params)
+        cursor.execute(route_query(conn, query, start_date, end_date), params)
         rows = cursor.fetchall()
     
     # 格式化数据
@@ -2,10 +2,16 @@
 API路由模块 - 处理API请求
 """
 from flask import Blueprint, request, jsonify
+from flask_login import current_user
 import json
+import os
+import tempfile
 from app.services.llm_service import LLMServiceFactory
 from app.routes.auth_routes import api_login_required
-from app.utils.database import connect_db, execute_query
+from app.utils.database import connect_db, get_records_page
+from app.services.his_import_service import HIS_FEEDS, get_his_import_service
+from app.config.base import UPLOAD_FOLDER, HIS_IMPORT_CONFIG
+from app.utils.sql_sandbox import get_sql_sandbox, SQLSandboxError
 
 # 创建蓝图
 api_bp = Blueprint('api', __name__, url_prefix='/api')
@@ -176,14 +182,101 @@ def execute_sql():
         return jsonify({'error': 'SQL查询不能为空', 'code': 400}), 400
     
     try:
-        # 执行SQL查询
-        # from app.models.database import Database
-        results = execute_query(sql_query)
+        # 在只读沙箱中执行SQL查询（时间预算、行数上限、执行计划检查与按用户并发限制）
+        result = get_sql_sandbox().execute(sql_query)
         
         # 返回结果
         return jsonify({
             'success': True,
-            'data': results
+            'data': result['rows'],
+            'truncated': result['truncated']
         })
+    except SQLSandboxError as e:
+        return jsonify({'error': e.message, 'reason': e.reason, 'code': e.http_status}), e.http_status
+    except Exception as e:
+        return jsonify({'error': str(e), 'code': 500}), 500 
+
+@api_bp.route('/import/his', methods=['POST'])
+@api_login_required
+def import_his_data():
+    """HIS数据批量导入接口（multipart: file, feed, mode；replace 模式会整表替换，仅限管理员）"""
+    upload = request.files.get('file')
+    feed = request.form.get('feed', '')
+    mode = request.form.get('mode') or HIS_IMPORT_CONFIG.get('default_mode', 'append')
+    if mode == 'replace' and not getattr(current_user, 'is_admin', False):
+        return jsonify({'error': 'replace 模式会替换整张业务表，仅管理员可用', 'code': 403}), 403
+
+    if upload is None or not upload.filename:
+        return jsonify({'error': '请上传导入文件', 'code': 400}), 400
+    if feed not in HIS_FEEDS:
+        return jsonify({'error': f'不支持的导入类型: {feed}', 'code': 400}), 400
+
+    ext = os.path.splitext(upload.filename)[1].lower()
+    if ext not in ('.csv', '.txt', '.tsv', '.xlsx', '.xlsm', '.xls'):
+        return jsonify({'error': f'不支持的导入文件格式: {ext}', 'code': 400}), 400
+
+    fd, file_path = tempfile.mkstemp(suffix=ext, dir=UPLOAD_FOLDER)
+    os.close(fd)
+    try:
+        upload.save(file_path)
+        result = get_his_import_service().import_file(file_path, feed, mode=mode)
+        return jsonify({'success': True, 'data': result})
+    except ValueError as e:
+        return jsonify({'error': str(e), 'code': 400}), 400
+    except Exception as e:
+        return jsonify({'error': f'导入HIS数据失败: {str(e)}', 'code': 500}), 500
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def _pagination_args():
+    """读取通用分页参数: cursor, limit, count(approx/exact)"""
+    cursor = request.args.get('cursor') or None
+    limit = request.args.get('limit', type=int) or request.args.get('per_page', type=int) or 0
+    count = request.args.get('count')
+    if count not in (None, 'approx', 'exact'):
+        raise ValueError(f'count参数只支持 approx 或 exact: {count}')
+    return cursor, limit, count
+
+@api_bp.route('/records/<feed>', methods=['GET'])
+@api_login_required
+def list_records(feed):
+    """
+    键集分页浏览HIS业务数据（visits/admissions/surgeries/revenue）
+    
+    查询参数: cursor, limit, count=approx|exact, department, start_date, end_date
+    """
+    if feed not in HIS_FEEDS:
+        return jsonify({'error': f'不支持的数据类型: {feed}', 'code': 400}), 400
+    
+    spec = HIS_FEEDS[feed]
+    date_column = spec['rollup']['date']
+    conditions, params = [], []
+    if request.args.get('department'):
+        conditions.append('department = ?')
+        params.append(request.args['department'])
+    if request.args.get('start_date'):
+        conditions.append(f'{date_column} >= ?')
+        params.append(request.args['start_date'])
+    if request.args.get('end_date'):
+        conditions.append(f'{date_column} <= ?')
+        params.append(request.args['end_date'])
+    
+    try:
+        cursor, limit, count = _pagination_args()
+        page = get_records_page(
+            spec['table'],
+            condition=' AND '.join(conditions),
+            params=tuple(params),
+            order_by=f'{date_column} DESC, id DESC',
+            limit=limit,
+            cursor=cursor,
+            count=count,
+            # 日期范围内已归档到分区文件的年份一并读取
+            date_range=(request.args.get('start_date'), request.args.get('end_date'))
+        )
+        return jsonify({'success': True, **page})
+    except ValueError as e:
+        return jsonify({'error': str(e), 'code': 400}), 400
     except Exception as e:
-        return jsonify({'error': str(e), 'code': 500}), 500 
\ No newline at end of file
+        return jsonify({'error': f'获取数据列表失败: {str(e)}', 'code': 500}), 500
@@ -10,7 +10,8 @@ import random
 from flask_wtf import CSRFProtect
 from app import csrf  # 导入app/__init__.py中定义的csrf实例
 
-from app.utils.database import execute_query, get_db_connection
+from app.utils.database import get_db_connection
+from app.utils.partitioning import execute_partitioned_query, route_query
 from app.utils.utils import date_range_to_dates
 from app.routes.auth_routes import api_login_required
 from app.utils.report_generator import ReportGenerator
@@ -91,39 +92,39 @@ def get_core_metrics(start_date, end_date):
     """获取核心指标数据"""
     try:
         # 获取就诊患者总数
-        patient_query = f"""
+        patient_query = """
         SELECT COUNT(*) as total 
         FROM visits 
-        WHERE visit_date BETWEEN '{start_date}' AND '{end_date}'
+        WHERE visit_date BETWEEN ? AND ?
         """
-        patient_result = execute_query(patient_query)
+        patient_result = execute_partitioned_query(patient_query, (start_date, end_date), start_date, end_date)
         patient_count = patient_result[0]['total'] if patient_result else 0
         
         # 获取收入总额
-        revenue_query = f"""
+        revenue_query = """
         SELECT SUM(amount) as total 
         FROM revenue 
-        WHERE date BETWEEN '{start_date}' AND '{end_date}'
+        WHERE date BETWEEN ? AND ?
         """
-        revenue_result = execute_query(revenue_query)
+        revenue_result = execute_partitioned_query(revenue_query, (start_date, end_date), start_date, end_date)
         revenue_total = revenue_result[0]['total'] if revenue_result and revenue_result[0]['total'] is not None else 0
         
         # 获取平均住院日
-        los_query = f"""
+        los_query = """
         SELECT AVG(length_of_stay) as avg_los 
         FROM admissions 
-        WHERE admission_date BETWEEN '{start_date}' AND '{end_date}'
+        WHERE admission_date BETWEEN ? AND ?
         """
-        los_result = execute_query(los_query)
+        los_result = execute_partitioned_query(los_query, (start_date, end_date), start_date, end_date)
         avg_los = round(los_result[0]['avg_los'], 1) if los_result and los_result[0]['avg_los'] is not None else 0
         
         # 获取手术台次
-        surgery_query = f"""
+        surgery_query = """
         SELECT COUNT(*) as total 
         FROM surgeries 
-        WHERE surgery_date BETWEEN '{start_date}' AND '{end_date}'
+        WHERE surgery_date BETWEEN ? AND ?
         """
-        surgery_result = execute_query(surgery_query)
+        surgery_result = execute_partitioned_query(surgery_query, (start_date, end_date), start_date, end_date)
         surgery_count = surgery_result[0]['total'] if surgery_result else 0
         
         return {
@@ -150,7 +151,7 @@ def get_outpatient_trend(cursor, start_date, end_date):
     GROUP BY visit_date 
     ORDER BY date
     """
-    cursor.execute(query, (start_date, end_date))
+    cursor.execute(route_query(cursor.connection, query, start_date, end_date), (start_date, end_date))
     rows = cursor.fetchall()
     
     # 确保每一天都有数据
@@ -181,7 +182,7 @@ def get_revenue_distribution(cursor, start_date, end_date):
     WHERE date BETWEEN ? AND ? 
     GROUP BY revenue_type
     """
-    cursor.execute(query, (start_date, end_date))
+    cursor.execute(route_query(cursor.connection, query, start_date, end_date), (start_date, end_date))
     rows = cursor.fetchall()
     
     result = [{'revenue_type': row[0], 'amount': row[1]} for row in rows]
@@ -196,7 +197,7 @@ def get_department_workload(cursor, start_date, end_date):
     WHERE visit_date BETWEEN ? AND ? 
     ORDER BY department
     """
-    cursor.execute(dept_query, (start_date, end_date))
+    cursor.execute(route_query(cursor.connection, dept_query, start_date, end_date), (start_date, end_date))
     departments = [row[0] for row in cursor.fetchall()]
     
     # 如果没有科室数据，返回空结果
@@ -210,7 +211,7 @@ def get_department_workload(cursor, start_date, end_date):
     WHERE visit_date BETWEEN ? AND ? 
     GROUP BY department
     """
-    cursor.execute(outpatient_query, (start_date, end_date))
+    cursor.execute(route_query(cursor.connection, outpatient_query, start_date, end_date), (start_date, end_date))
     outpatient_data = {row[0]: row[1] for row in cursor.fetchall()}
     
     # 获取各科室住院量
@@ -220,7 +221,7 @@ def get_department_workload(cursor, start_date, end_date):
     WHERE admission_date BETWEEN ? AND ? 
     GROUP BY department
     """
-    cursor.execute(inpatient_query, (start_date, end_date))
+    cursor.execute(route_query(cursor.connection, inpatient_query, start_date, end_date), (start_date, end_date))
     inpatient_data = {row[0]: row[1] for row in cursor.fetchall()}
     
     # 获取各科室手术量
@@ -230,7 +231,7 @@ def get_department_workload(cursor, start_date, end_date):
     WHERE surgery_date BETWEEN ? AND ? 
     GROUP BY department
     """
-    cursor.execute(surgery_query, (start_date, end_date))
+    cursor.execute(route_query(cursor.connection, surgery_query, start_date, end_date), (start_date, end_date))
     surgery_data = {row[0]: row[1] for row in cursor.fetchall()}
     
     # 构建结果
@@ -257,7 +258,7 @@ def get_top_admission_diagnosis(cursor, start_date, end_date, limit=5):
     ORDER BY count DESC 
     LIMIT ?
     """
-    cursor.execute(query, (start_date, end_date, limit))
+    cursor.execute(route_query(cursor.connection, query, start_date, end_date), (start_date, end_date, limit))
     rows = cursor.fetchall()
     
     result = [{'diagnosis_group': row[0], 'count': row[1]} for row in rows]
@@ -7,11 +7,71 @@ import json
 import traceback
 
 from app.utils.nlp_utils import TextProcessor, MedicalTermExtractor
+from app.utils.similarity_index import SimilarityIndex, MinHashLSH
 from app.routes.auth_routes import login_required, api_login_required
+from app.config.base import NLP_CONFIG
 
 # 创建蓝图
 nlp_bp = Blueprint('nlp', __name__, url_prefix='/nlp')
 
+def _get_batch_texts(data):
+    """
+    从请求数据中获取批量文本
+    
+    返回:
+        (文本列表, 错误响应)，校验通过时错误响应为None
+    """
+    if not data:
+        return None, (jsonify({'error': '请求数据为空'}), 400)
+    
+    texts = data.get('texts')
+    if not isinstance(texts, list) or not texts:
+        return None, (jsonify({'error': 'texts必须为非空数组'}), 400)
+    
+    if not all(isinstance(text, str) for text in texts):
+        return None, (jsonify({'error': 'texts中的元素必须为字符串'}), 400)
+    
+    max_batch_size = NLP_CONFIG.get('max_batch_size', 1000)
+    if len(texts) > max_batch_size:
+        return None, (jsonify({'error': f'单次最多处理{max_batch_size}条文本'}), 400)
+    
+    return texts, None
+
+def _get_batch_ids(data, texts):
+    """
+    从请求数据中获取与texts对应的标识
+    
+    返回:
+        (标识列表或None, 错误响应)，标识须为互不重复的字符串或整数
+    """
+    ids = data.get('ids')
+    if ids is None:
+        return None, None
+    
+    if not isinstance(ids, list) or len(ids) != len(texts):
+        return None, (jsonify({'error': 'ids必须为数组且数量与texts一致'}), 400)
+    
+    # 标识用作结果字典的键，须可哈希且不重复
+    if not all(isinstance(doc_id, (str, int)) and not isinstance(doc_id, bool) for doc_id in ids):
+        return None, (jsonify({'error': 'ids中的元素必须为字符串或整数'}), 400)
+    
+    if len(set(ids)) != len(ids):
+        return None, (jsonify({'error': 'ids不能重复'}), 400)
+    
+    return ids, None
+
+def _get_number(data, name, default, cast):
+    """
+    从请求数据中获取数值参数
+    
+    返回:
+        (数值, 错误响应)，无法转换时返回400错误响应
+    """
+    try:
+        return cast(data.get(name, default)), None
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': f'{name}必须为数值'}), 400)
+
 @nlp_bp.route('/')
 @login_required
 def nlp_home():
@@ -46,6 +106,30 @@ def segment_text():
         traceback.print_exc()
         return jsonify({'error': f'分词出错: {str(e)}'}), 500
 
+@nlp_bp.route('/segment/batch', methods=['POST'])
+@api_login_required
+def segment_text_batch():
+    """批量中文分词"""
+    try:
+        data = request.get_json()
+        texts, error = _get_batch_texts(data)
+        if error:
+            return error
+            
+        cut_all = data.get('cut_all', False)
+        
+        # 批量分词（请求线程中不启用jieba多进程模式：进程池按CPU核数启动，只用于离线批处理）
+        results = TextProcessor.segment_texts(texts, cut_all=cut_all, parallel=False)
+        
+        return jsonify({
+            'success': True,
+            'results': [{'words': words, 'word_count': len(words)} for words in results],
+            'count': len(results)
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'批量分词出错: {str(e)}'}), 500
+
 @nlp_bp.route('/keywords', methods=['POST'])
 @api_login_required
 def extract_keywords():
@@ -76,6 +160,30 @@ def extract_keywords():
         traceback.print_exc()
         return jsonify({'error': f'提取关键词出错: {str(e)}'}), 500
 
+@nlp_bp.route('/keywords/batch', methods=['POST'])
+@api_login_required
+def extract_keywords_batch():
+    """批量提取关键词"""
+    try:
+        data = request.get_json()
+        texts, error = _get_batch_texts(data)
+        if error:
+            return error
+            
+        topk = data.get('topk', 10)
+        
+        # 批量提取关键词
+        results = TextProcessor.extract_keywords_batch(texts, topk=topk)
+        
+        return jsonify({
+            'success': True,
+            'results': [{word: weight for word, weight in keywords} for keywords in results],
+            'count': len(results)
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'批量提取关键词出错: {str(e)}'}), 500
+
 @nlp_bp.route('/entities', methods=['POST'])
 @api_login_required
 def extract_entities():
@@ -102,6 +210,28 @@ def extract_entities():
         traceback.print_exc()
         return jsonify({'error': f'提取医疗实体出错: {str(e)}'}), 500
 
+@nlp_bp.route('/entities/batch', methods=['POST'])
+@api_login_required
+def extract_entities_batch():
+    """批量提取医疗实体"""
+    try:
+        data = request.get_json()
+        texts, error = _get_batch_texts(data)
+        if error:
+            return error
+            
+        # 批量提取医疗实体
+        results = TextProcessor.extract_medical_entities_batch(texts)
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'count': len(results)
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'批量提取医疗实体出错: {str(e)}'}), 500
+
 @nlp_bp.route('/word-freq', methods=['POST'])
 @api_login_required
 def get_word_frequency():
@@ -159,6 +289,92 @@ def calculate_similarity():
         traceback.print_exc()
         return jsonify({'error': f'计算相似度出错: {str(e)}'}), 500
 
+@nlp_bp.route('/similarity/batch', methods=['POST'])
+@api_login_required
+def calculate_similarity_batch():
+    """
+    批量计算文本相似度
+    
+    请求中提供query时返回query与texts中各文本的Top-K相似结果，
+    否则返回texts内部每个文本的Top-K相似文本
+    """
+    try:
+        data = request.get_json()
+        texts, error = _get_batch_texts(data)
+        if error:
+            return error
+            
+        query = data.get('query')
+        ids, error = _get_batch_ids(data, texts)
+        if error:
+            return error
+        top_k, error = _get_number(data, 'top_k', NLP_CONFIG.get('similarity_top_k', 10), int)
+        if error:
+            return error
+        threshold, error = _get_number(data, 'threshold', 0.0, float)
+        if error:
+            return error
+        
+        if top_k <= 0:
+            return jsonify({'error': 'top_k必须为正整数'}), 400
+        
+        # 语料只分词一次，构建稀疏TF-IDF索引
+        index = SimilarityIndex(texts, ids=ids)
+        
+        if query:
+            results = index.query(query, top_k=top_k, threshold=threshold)
+        else:
+            results = [
+                {'id': doc_id, 'similar': similar}
+                for doc_id, similar in index.all_pairs_top_k(top_k=top_k, threshold=threshold).items()
+            ]
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'count': len(results)
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'批量计算相似度出错: {str(e)}'}), 500
+
+@nlp_bp.route('/dedup', methods=['POST'])
+@api_login_required
+def deduplicate_texts():
+    """基于MinHash/LSH检测近重复文本（如重复病历）"""
+    try:
+        data = request.get_json()
+        texts, error = _get_batch_texts(data)
+        if error:
+            return error
+            
+        ids, error = _get_batch_ids(data, texts)
+        if error:
+            return error
+        threshold, error = _get_number(data, 'threshold', NLP_CONFIG.get('dedup_threshold', 0.8), float)
+        if error:
+            return error
+        
+        if not 0 < threshold <= 1:
+            return jsonify({'error': 'threshold必须在(0, 1]范围内'}), 400
+        
+        lsh = MinHashLSH(
+            num_perm=NLP_CONFIG.get('dedup_num_perm', 128),
+            threshold=threshold,
+            shingle_size=NLP_CONFIG.get('dedup_shingle_size', 3)
+        )
+        result = lsh.find_duplicates(texts, ids=ids)
+        
+        return jsonify({
+            'success': True,
+            'pairs': result['pairs'],
+            'groups': result['groups'],
+            'duplicate_count': sum(len(group) - 1 for group in result['groups'])
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'文本去重出错: {str(e)}'}), 500
+
 @nlp_bp.route('/classify', methods=['POST'])
 @api_login_required
 def classify_text():
@@ -185,6 +401,52 @@ def classify_text():
         traceback.print_exc()
         return jsonify({'error': f'文本分类出错: {str(e)}'}), 500
 
+@nlp_bp.route('/extract', methods=['POST'])
+@api_login_required
+def extract_all():
+    """单次扫描提取实体、诊断、用药和化验值"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': '请求数据为空'}), 400
+            
+        text = data.get('text')
+        
+        if not text:
+            return jsonify({'error': '文本为空'}), 400
+            
+        result = MedicalTermExtractor.extract_all(text)
+        
+        return jsonify({
+            'success': True,
+            **result
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'提取医学信息出错: {str(e)}'}), 500
+
+@nlp_bp.route('/extract/batch', methods=['POST'])
+@api_login_required
+def extract_all_batch():
+    """批量提取实体、诊断、用药和化验值"""
+    try:
+        data = request.get_json()
+        texts, error = _get_batch_texts(data)
+        if error:
+            return error
+            
+        results = MedicalTermExtractor.extract_all_batch(texts)
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'count': len(results)
+        })
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'error': f'批量提取医学信息出错: {str(e)}'}), 500
+
 @nlp_bp.route('/diagnoses', methods=['POST'])
 @api_login_required
 def extract_diagnoses():
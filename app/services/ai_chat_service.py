@@ -1,57 +1,44 @@
 """
 AI聊天服务 - 处理AI聊天相关的业务逻辑
 """
-import json
-from datetime import datetime
 from app.utils.database import execute_query
-from app.utils.utils import safe_json_loads
-from app.config import config
+from app.services.chat_memory import get_chat_memory
+from app.config.base import CHAT_QUERIES, CHAT_ERROR_MESSAGES
 
 class AIChatService:
     """AI聊天服务类"""
     
-    def get_chat_history(self, chat_id):
+    def get_chat_history(self, chat_id, include_structured=True):
         """
-        获取指定聊天ID的聊天历史记录
+        获取指定聊天ID的全部聊天历史记录（按页读取，用于渲染与导出）
         
         参数:
             chat_id: 聊天ID
+            include_structured: 是否解码图表、表格等结构化数据
             
         返回:
             聊天历史记录列表
         """
         try:
-            # 从数据库中获取聊天历史
-            results = execute_query(config.CHAT_QUERIES['get_history'], (chat_id,))
-            
-            if not results:
-                return []
-                
-            # 处理聊天记录
-            chat_history = []
-            for message in results:
-                message_data = {
-                    'role': message['role'],
-                    'content': message['content'],
-                    'content_type': message['content_type'],
-                    'time': message['time']
-                }
-                
-                # 处理结构化数据（如果有）
-                if message.get('structured_data'):
-                    structured_data = safe_json_loads(message['structured_data'])
-                    
-                    # 添加结构化数据字段
-                    for field in config.CHAT_STRUCTURED_DATA_FIELDS:
-                        if field in structured_data:
-                            message_data[field] = structured_data[field]
-                
-                chat_history.append(message_data)
-                
-            return chat_history
+            return list(get_chat_memory().iter_messages(chat_id, include_structured))
         except Exception as e:
-            print(config.CHAT_ERROR_MESSAGES['history_error'].format(str(e)))
+            print(CHAT_ERROR_MESSAGES['history_error'].format(str(e)))
             return []
+    
+    def get_chat_history_page(self, chat_id, cursor=None, limit=0, include_structured=False):
+        """
+        分页获取聊天历史（从最新一页往前翻）
+        
+        参数:
+            chat_id: 聊天ID
+            cursor: 上一页返回的 next_cursor
+            limit: 每页条数，默认使用配置
+            include_structured: 是否解码图表、表格等结构化数据
+            
+        返回:
+            {'items': 消息列表, 'next_cursor': 游标或None, 'has_more': bool}
+        """
+        return get_chat_memory().get_page(chat_id, cursor, limit, include_structured)
             
     def get_chat_title(self, chat_id):
         """
@@ -64,12 +51,12 @@ class AIChatService:
             聊天标题
         """
         try:
-            result = execute_query(config.CHAT_QUERIES['get_title'], (chat_id,))
+            result = execute_query(CHAT_QUERIES['get_title'], (chat_id,))
             
             if result and len(result) > 0:
                 return result[0]['title']
                 
             return None
         except Exception as e:
-            print(config.CHAT_ERROR_MESSAGES['title_error'].format(str(e)))
-            return None 
\ No newline at end of file
+            print(CHAT_ERROR_MESSAGES['title_error'].format(str(e)))
+            return None
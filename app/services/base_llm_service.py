@@ -10,6 +10,9 @@ from typing import Dict, Any, Optional, List
 from pathlib import Path
 from dotenv import load_dotenv
 from app.config import config
+from app.utils.single_flight import get_single_flight, make_key
+from app.utils.circuit_breaker import CircuitBreaker, get_circuit_breaker
+from app.utils.llm_recorder import get_llm_recorder
 
 # 获取项目根目录的绝对路径
 ROOT_DIR = Path(__file__).resolve().parent.parent.parent
@@ -23,6 +26,7 @@ load_dotenv(dotenv_path=ENV_FILE)
 from app.config.base import VOLCENGINE_API_KEY as DEFAULT_API_KEY
 from app.config.base import VOLCENGINE_API_URL as DEFAULT_API_URL
 from app.config.base import VOLCENGINE_MODEL as DEFAULT_MODEL
+from app.config.base import LLM_COALESCING_CONFIG, LLM_CIRCUIT_BREAKER_CONFIG
 
 VOLCENGINE_API_KEY = os.getenv(config.LLM_ENV_VARS['api_key']) or DEFAULT_API_KEY
 VOLCENGINE_API_URL = os.getenv(config.LLM_ENV_VARS['api_url']) or DEFAULT_API_URL
@@ -31,6 +35,24 @@ REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", str(config.LLM_DEFAULTS['time
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", str(config.LLM_DEFAULTS['max_retries'])))
 RETRY_DELAY = int(os.getenv("RETRY_DELAY", str(config.LLM_DEFAULTS['retry_delay'])))
 
+def is_valid_response(response: Optional[str]) -> bool:
+    """
+    判断是否为正常回复（call_api 失败时返回的是错误提示文本）
+    
+    参数:
+        response: call_api 的返回值
+        
+    返回:
+        是否为正常回复
+    """
+    if not response:
+        return False
+    messages = config.LLM_ERROR_MESSAGES
+    if response in (messages['api_timeout'], messages['api_connection'], messages['no_response'],
+                    LLM_CIRCUIT_BREAKER_CONFIG['open_message']):
+        return False
+    return not response.startswith(messages['api_error'].split('{}')[0])
+
 class BaseLLMService:
     """
     基础大模型服务类
@@ -57,10 +79,59 @@ class BaseLLMService:
         print(f"API密钥: {self.api_key[:5]}...{self.api_key[-5:]}")
         print(f"API端点: {self.api_url}")
     
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        """当前API端点共用的熔断器"""
+        return get_circuit_breaker(f"llm:{self.api_url}")
+    
+    def llm_available(self) -> bool:
+        """
+        大模型服务当前是否可用（熔断器未打开）
+        
+        返回:
+            熔断器打开时返回False，调用方应直接使用降级回答
+        """
+        return not self.circuit_breaker.is_open()
+    
+    def _post(self, headers: Dict[str, str], payload: Dict[str, Any], timeout: float):
+        """发送 chat/completions 请求（启用录制/回放时经由 LLMRecorder）"""
+        recorder = get_llm_recorder()
+        if recorder.enabled:
+            return recorder.post(self.api_url, headers, payload, timeout)
+        return requests.post(self.api_url, headers=headers, json=payload, timeout=timeout)
+    
     def call_api(self, system_prompt: str, user_message: str, 
                 temperature=0.7, top_p=0.8, top_k=50, 
                 max_tokens=None, retry_count=None) -> Optional[str]:
         """
+        调用大模型API（相同请求并发时只调用一次，成功结果短期缓存）
+        
+        参数:
+            system_prompt: 系统提示词
+            user_message: 用户消息
+            temperature: 温度参数，控制随机性
+            top_p: 核采样概率
+            top_k: 考虑的最高概率词汇数量
+            max_tokens: 最大生成令牌数
+            retry_count: 重试次数，None表示使用默认设置
+            
+        返回:
+            AI的回复，如果失败则返回None
+        """
+        def request():
+            return self._request_completion(system_prompt, user_message, temperature, top_p, top_k,
+                                            max_tokens, retry_count)
+
+        if not LLM_COALESCING_CONFIG['enabled']:
+            return request()
+        key = make_key(self.model_name, self.api_url, system_prompt, user_message,
+                       temperature, top_p, top_k, max_tokens)
+        return get_single_flight('llm_call_api', cacheable=is_valid_response).do(key, request)
+    
+    def _request_completion(self, system_prompt: str, user_message: str, 
+                            temperature=0.7, top_p=0.8, top_k=50, 
+                            max_tokens=None, retry_count=None) -> Optional[str]:
+        """
         调用大模型API并处理重试逻辑
         
         参数:
@@ -119,18 +190,24 @@ class BaseLLMService:
             # 使用用户指定的重试次数或默认值
             retries = retry_count if retry_count is not None else self.max_retries
             
+            # 超时后逐次延长本次调用的超时时间（不修改实例的超时设置），不超过上限
+            timeout = self.timeout
+            breaker = self.circuit_breaker
+            
             # 实现重试逻辑
             for attempt in range(retries + 1):
+                # 熔断器打开时不再请求上游，直接返回降级提示，避免占用请求线程
+                if not breaker.allow_request():
+                    print(f"熔断器打开，跳过API调用 (尝试 {attempt+1}/{retries+1})")
+                    return LLM_CIRCUIT_BREAKER_CONFIG['open_message']
+                
+                attempt_start = time.time()
+                recorded = False
                 try:
                     print(f"API尝试 {attempt+1}/{retries+1}")
                     
                     try:
-                        response = requests.post(
-                            self.api_url,
-                            headers=headers,
-                            json=payload,
-                            timeout=self.timeout
-                        )
+                        response = self._post(headers, payload, timeout)
                         
                         # 记录API响应时间
                         response_time = time.time() - start_time
@@ -142,9 +219,14 @@ class BaseLLMService:
                             if "choices" in response_data and len(response_data["choices"]) > 0:
                                 # 记录成功
                                 print(f"API调用成功 - 状态码: 200, 耗时: {response_time:.2f}秒")
-                                return response_data["choices"][0]["message"]["content"]
+                                content = response_data["choices"][0]["message"]["content"]
+                                breaker.record_success(time.time() - attempt_start)
+                                recorded = True
+                                return content
                             else:
                                 print(f"警告: {config.LLM_ERROR_MESSAGES['invalid_response']}")
+                                breaker.record_failure(time.time() - attempt_start)
+                                recorded = True
                                 # 如果不是最后一次尝试，则继续重试
                                 if attempt < retries:
                                     print(f"等待 {self.retry_delay} 秒后重试...")
@@ -155,6 +237,13 @@ class BaseLLMService:
                             print(f"警告: API返回状态码 {response.status_code}")
                             print(f"响应详情: {response.text[:500]}...")
                             
+                            # 服务端错误与限流计入失败率，其他客户端错误不代表上游故障
+                            if response.status_code >= 500 or response.status_code == 429:
+                                breaker.record_failure(time.time() - attempt_start)
+                            else:
+                                breaker.record_success(time.time() - attempt_start)
+                            recorded = True
+                            
                             # 如果是4xx错误(客户端错误)，可以输出更详细的请求信息以便调试
                             if 400 <= response.status_code < 500:
                                 print(f"API请求详情:")
@@ -173,11 +262,13 @@ class BaseLLMService:
                                 return None
                     
                     except requests.exceptions.Timeout:
-                        print(f"API请求超时 (尝试 {attempt+1}/{retries+1}): 超过了 {self.timeout} 秒")
+                        print(f"API请求超时 (尝试 {attempt+1}/{retries+1}): 超过了 {timeout} 秒")
+                        breaker.record_failure(time.time() - attempt_start)
+                        recorded = True
                         # 增加超时时间进行重试
                         if attempt < retries:
-                            self.timeout += 30  # 每次重试增加30秒超时时间
-                            print(f"增加超时时间到 {self.timeout} 秒并重试...")
+                            timeout = min(timeout + 30, LLM_CIRCUIT_BREAKER_CONFIG['max_timeout'])
+                            print(f"增加超时时间到 {timeout} 秒并重试...")
                             time.sleep(self.retry_delay)
                             continue
                         else:
@@ -185,6 +276,8 @@ class BaseLLMService:
                     
                     except requests.exceptions.RequestException as e:
                         print(f"API请求异常 (尝试 {attempt+1}/{retries+1}): {str(e)}")
+                        breaker.record_failure(time.time() - attempt_start)
+                        recorded = True
                         
                         # 如果不是最后一次尝试，则等待后重试
                         if attempt < retries:
@@ -197,6 +290,8 @@ class BaseLLMService:
                 except Exception as inner_e:
                     print(f"API请求处理异常: {str(inner_e)}")
                     print(traceback.format_exc())
+                    if not recorded:
+                        breaker.record_failure(time.time() - attempt_start)
                     
                     if attempt < retries:
                         print(f"等待 {self.retry_delay} 秒后重试...")
@@ -212,4 +307,79 @@ class BaseLLMService:
             print(f"调用LLM API时发生错误: {str(e)}")
             print(f"错误堆栈: {traceback.format_exc()}")
             # 返回错误消息而不是None，这样用户会看到具体原因而不是无限等待
-            return config.LLM_ERROR_MESSAGES['api_error'].format(str(e)) 
\ No newline at end of file
+            return config.LLM_ERROR_MESSAGES['api_error'].format(str(e)) 
+    
+    def call_with_tools(self, messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None,
+                        tool_choice: Optional[str] = None, temperature=0.3, top_p=0.8,
+                        max_tokens=None, retry_count=None) -> Optional[Dict[str, Any]]:
+        """
+        以OpenAI兼容的工具调用（function calling）格式调用大模型
+        
+        参数:
+            messages: 对话消息列表（可包含 assistant 的 tool_calls 与 tool 角色的工具结果）
+            tools: 工具定义列表 [{'type': 'function', 'function': {...}}]
+            tool_choice: auto、none 或 None（不传）
+            temperature: 温度参数
+            top_p: 核采样概率
+            max_tokens: 最大生成令牌数
+            retry_count: 重试次数，None表示使用默认设置
+            
+        返回:
+            模型返回的消息 {'role': 'assistant', 'content': ..., 'tool_calls': [...]}，失败时返回None
+        """
+        payload = {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": temperature,
+            "top_p": top_p
+        }
+        if tools:
+            payload["tools"] = tools
+            if tool_choice:
+                payload["tool_choice"] = tool_choice
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        
+        def request():
+            return self._post_chat_completion(payload, retry_count)
+        
+        if not LLM_COALESCING_CONFIG['enabled']:
+            return request()
+        key = make_key(self.model_name, self.api_url, payload)
+        return get_single_flight('llm_call_with_tools').do(key, request)
+    
+    def _post_chat_completion(self, payload: Dict[str, Any], retry_count=None) -> Optional[Dict[str, Any]]:
+        """发送请求并返回首个候选消息，按配置重试，全部失败时返回None"""
+        headers = config.LLM_HEADERS.copy()
+        headers["Authorization"] = f"Bearer {self.api_key}"
+        retries = retry_count if retry_count is not None else self.max_retries
+        breaker = self.circuit_breaker
+        
+        for attempt in range(retries + 1):
+            if not breaker.allow_request():
+                print(f"熔断器打开，跳过API调用 (尝试 {attempt+1}/{retries+1})")
+                return None
+            attempt_start = time.time()
+            failed = True
+            try:
+                response = self._post(headers, payload, self.timeout)
+                if response.status_code == 200:
+                    choices = response.json().get("choices") or []
+                    if choices:
+                        failed = False
+                        return choices[0]["message"]
+                    print(f"警告: {config.LLM_ERROR_MESSAGES['invalid_response']}")
+                else:
+                    failed = response.status_code >= 500 or response.status_code == 429
+                    print(f"警告: API返回状态码 {response.status_code}: {response.text[:200]}")
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                print(f"API请求异常 (尝试 {attempt+1}/{retries+1}): {str(e)}")
+            finally:
+                if failed:
+                    breaker.record_failure(time.time() - attempt_start)
+                else:
+                    breaker.record_success(time.time() - attempt_start)
+            
+            if attempt < retries:
+                time.sleep(self.retry_delay)
+        return None
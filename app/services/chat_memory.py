@@ -0,0 +1,431 @@
+"""
+对话记忆模块 - 聊天历史的分页读取、滚动摘要与最近对话窗口
+
+- 历史消息按 (time, message_id) 键集分页读取，列表与提示词构建不读取结构化数据
+- 结构化数据（图表、表格等）以zstd压缩后的JSON存储，只在渲染或导出时解码；
+  旧的JSON文本数据仍可直接读取
+- 提示词只包含持久化的滚动摘要 + token预算内的最近若干轮对话；
+  窗口之外未摘要的消息积累到一定条数后，在后台线程中由大模型合并进摘要
+"""
+import logging
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from app.config import config
+from app.config.base import CHAT_MEMORY_CONFIG, CHAT_STRUCTURED_DATA_FIELDS
+from app.prompts import CHAT_SUMMARY_SYSTEM_PROMPT, CHAT_SUMMARY_USER_PROMPT
+from app.services.base_llm_service import is_valid_response
+from app.services.model_router import get_model_router
+from app.utils.database import (get_db_connection, get_records, get_records_page, get_record,
+                                count_records, insert_record, upsert_record, update_record)
+from app.utils.serialization import dumps, loads
+from app.utils.token_counter import count_tokens
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# zstd帧的魔数，用于区分压缩数据与旧的JSON文本
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# 历史消息的排序（最新的在前），message_id 保证排序唯一
+_HISTORY_ORDER = 'time DESC, message_id DESC'
+
+_MESSAGE_FIELDS = 'message_id, role, content, content_type, time'
+
+_ROLE_NAMES = {'user': '用户', 'ai': '助手'}
+
+
+def encode_structured(data: Any) -> Union[bytes, str, None]:
+    """
+    编码结构化数据用于存储（zstd压缩的JSON，zstandard不可用时为JSON文本）
+
+    参数:
+        data: 图表、表格等结构化数据
+
+    返回:
+        存储值，无数据时返回None
+    """
+    if not data:
+        return None
+    payload = dumps(data)
+    if ZSTD_AVAILABLE:
+        return zstandard.ZstdCompressor(level=CHAT_MEMORY_CONFIG['zstd_level']).compress(payload)
+    return payload.decode('utf-8')
+
+
+def decode_structured(value: Union[bytes, str, None]) -> Any:
+    """
+    解码存储的结构化数据
+
+    参数:
+        value: encode_structured 的结果或旧的JSON文本
+
+    返回:
+        结构化数据，无数据或无法解析时返回None
+    """
+    if not value:
+        return None
+    try:
+        if isinstance(value, (bytes, memoryview)):
+            value = bytes(value)
+            if value[:4] == _ZSTD_MAGIC:
+                value = zstandard.ZstdDecompressor().decompress(value)
+        return loads(value)
+    except Exception as e:
+        logger.warning(f"结构化数据解析失败: {str(e)}")
+        return None
+
+
+def _now() -> str:
+    # 精确到微秒，同一秒内的问答也能按时间排序
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class ChatMemory:
+    """对话记忆"""
+
+    def __init__(self, memory_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化对话记忆
+
+        参数:
+            memory_config: 记忆配置，默认使用 CHAT_MEMORY_CONFIG
+        """
+        self.config = {**CHAT_MEMORY_CONFIG, **(memory_config or {})}
+        self._schema_ready = set()
+        self._summarizing = set()
+        self._lock = threading.Lock()
+
+    def _ensure_schema(self) -> None:
+        """创建分页索引与摘要表（每个数据库只执行一次）"""
+        if config.DATABASE_PATH in self._schema_ready:
+            return
+        with get_db_connection() as conn:
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_chat_time "
+                         "ON chat_messages(chat_id, time, message_id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_summaries (
+                    chat_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    summarized_until TEXT NOT NULL,
+                    message_count INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+        self._schema_ready.add(config.DATABASE_PATH)
+
+    # ---------- 写入 ----------
+
+    def ensure_chat(self, chat_id: str, user_id: str, title: Optional[str] = None) -> str:
+        """
+        确保聊天会话存在（不存在时创建）
+
+        参数:
+            chat_id: 聊天ID
+            user_id: 用户ID（仅在创建时使用）
+            title: 标题（仅在创建时使用）
+
+        返回:
+            会话所属的用户ID（会话已存在时为原所属用户，调用方须据此校验归属）
+        """
+        with get_db_connection() as conn:
+            conn.execute("INSERT OR IGNORE INTO chats (chat_id, user_id, title) VALUES (?, ?, ?)",
+                         (chat_id, str(user_id), title))
+            row = conn.execute("SELECT user_id FROM chats WHERE chat_id = ?", (chat_id,)).fetchone()
+        return str(row[0])
+
+    def get_owner(self, chat_id: str) -> Optional[str]:
+        """
+        获取聊天会话所属的用户ID
+
+        参数:
+            chat_id: 聊天ID
+
+        返回:
+            用户ID，会话不存在时返回None
+        """
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT user_id FROM chats WHERE chat_id = ?", (chat_id,)).fetchone()
+        return str(row[0]) if row else None
+
+    def append_message(self, chat_id: str, role: str, content: str, content_type: str = 'text',
+                       structured: Optional[Dict[str, Any]] = None) -> str:
+        """
+        追加一条消息
+
+        参数:
+            chat_id: 聊天ID
+            role: user 或 ai
+            content: 消息内容
+            content_type: text、markdown 或 html
+            structured: 结构化数据（字段见 CHAT_STRUCTURED_DATA_FIELDS）
+
+        返回:
+            消息ID
+        """
+        self._ensure_schema()
+        message_id = str(uuid.uuid4())
+        time = _now()
+        insert_record('chat_messages', {
+            'message_id': message_id,
+            'chat_id': chat_id,
+            'role': role,
+            'content': content or '',
+            'content_type': content_type,
+            'time': time,
+            'structured_data': encode_structured(structured)
+        })
+        update_record('chats', {'updated_at': time}, 'chat_id = ?', (chat_id,))
+        return message_id
+
+    # ---------- 读取 ----------
+
+    def _format_message(self, row: Dict[str, Any], include_structured: bool) -> Dict[str, Any]:
+        message = {
+            'message_id': row['message_id'],
+            'role': row['role'],
+            'content': row['content'],
+            'content_type': row['content_type'],
+            'time': row['time']
+        }
+        if include_structured:
+            structured = decode_structured(row.get('structured_data')) or {}
+            if isinstance(structured, dict):
+                for field in CHAT_STRUCTURED_DATA_FIELDS:
+                    if field in structured:
+                        message[field] = structured[field]
+        return message
+
+    def get_page(self, chat_id: str, cursor: Optional[str] = None, limit: int = 0,
+                 include_structured: bool = False) -> Dict[str, Any]:
+        """
+        分页读取聊天历史（从最新往前翻页，页内按时间正序）
+
+        参数:
+            chat_id: 聊天ID
+            cursor: 上一页返回的 next_cursor，None表示最新一页
+            limit: 每页条数，默认使用配置
+            include_structured: 是否解码结构化数据
+
+        返回:
+            {'items': 消息列表, 'next_cursor': 更早一页的游标或None, 'has_more': bool}
+        """
+        self._ensure_schema()
+        fields = _MESSAGE_FIELDS + (', structured_data' if include_structured else '')
+        page = get_records_page('chat_messages', fields, 'chat_id = ?', (chat_id,), order_by=_HISTORY_ORDER,
+                                limit=limit or self.config['page_size'], cursor=cursor)
+        page['items'] = [self._format_message(row, include_structured) for row in reversed(page['items'])]
+        return page
+
+    def iter_messages(self, chat_id: str, include_structured: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        按时间正序逐条读取全部消息（导出用，每次只读取一页）
+
+        参数:
+            chat_id: 聊天ID
+            include_structured: 是否解码结构化数据
+
+        返回:
+            消息迭代器
+        """
+        self._ensure_schema()
+        fields = _MESSAGE_FIELDS + (', structured_data' if include_structured else '')
+        after = None
+        while True:
+            rows = get_records('chat_messages', fields, 'chat_id = ?', (chat_id,),
+                               order_by='time ASC, message_id ASC', limit=self.config['page_size'], after=after)
+            for row in rows:
+                yield self._format_message(row, include_structured)
+            if len(rows) < self.config['page_size']:
+                return
+            after = [rows[-1]['time'], rows[-1]['message_id']]
+
+    def get_summary(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取聊天的滚动摘要
+
+        参数:
+            chat_id: 聊天ID
+
+        返回:
+            {'summary', 'summarized_until', 'message_count', 'updated_at'}，没有摘要时返回None
+        """
+        self._ensure_schema()
+        return get_record('chat_summaries', 'summary, summarized_until, message_count, updated_at',
+                          'chat_id = ?', (chat_id,))
+
+    # ---------- 提示词上下文 ----------
+
+    def _truncate(self, content: str) -> str:
+        limit = self.config['message_max_chars']
+        return content if len(content) <= limit else content[:limit] + '…'
+
+    def build_context(self, chat_id: str, token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """
+        构建提示词用的对话上下文：滚动摘要 + token预算内的最近若干轮对话
+
+        参数:
+            chat_id: 聊天ID
+            token_budget: 最近对话窗口的token上限，默认使用配置
+
+        返回:
+            {'summary': 摘要或None, 'messages': 窗口内消息（时间正序）, 'tokens': 窗口token数,
+             'window_start': 窗口内最早消息的时间}
+        """
+        budget = token_budget or self.config['window_token_budget']
+        max_messages = self.config['window_turns'] * 2
+        summary = self.get_summary(chat_id)
+
+        window: List[Dict[str, Any]] = []
+        used = 0
+        cursor = None
+        done = False
+        while not done:
+            page = self.get_page(chat_id, cursor, limit=max_messages)
+            for message in reversed(page['items']):
+                # 已合并进摘要的消息不再重复放入窗口
+                if len(window) >= max_messages or (summary and message['time'] <= summary['summarized_until']):
+                    done = True
+                    break
+                content = self._truncate(message['content'])
+                tokens = count_tokens(content)
+                if used + tokens > budget:
+                    done = True
+                    break
+                window.append({'role': message['role'], 'content': content, 'time': message['time']})
+                used += tokens
+            cursor = page['next_cursor']
+            done = done or not page['has_more']
+
+        window.reverse()
+        return {
+            'summary': summary['summary'] if summary else None,
+            'messages': window,
+            'tokens': used,
+            'window_start': window[0]['time'] if window else None
+        }
+
+    def format_prompt(self, context: Dict[str, Any], question: str) -> str:
+        """
+        将对话上下文与当前问题拼接为提示词
+
+        参数:
+            context: build_context 的结果
+            question: 当前问题
+
+        返回:
+            提示词文本（没有历史时即为问题本身）
+        """
+        parts = []
+        if context.get('summary'):
+            parts.append(f"此前对话摘要：\n{context['summary']}")
+        if context.get('messages'):
+            lines = [f"{_ROLE_NAMES.get(message['role'], message['role'])}：{message['content']}"
+                     for message in context['messages']]
+            parts.append("最近对话：\n" + '\n'.join(lines))
+        if not parts:
+            return question
+        parts.append(f"当前问题：{question}")
+        return '\n\n'.join(parts)
+
+    # ---------- 滚动摘要 ----------
+
+    def _pending_condition(self, chat_id: str, window_start: Optional[str]):
+        summary = self.get_summary(chat_id)
+        conditions, params = ['chat_id = ?'], [chat_id]
+        if summary:
+            conditions.append('time > ?')
+            params.append(summary['summarized_until'])
+        if window_start:
+            conditions.append('time < ?')
+            params.append(window_start)
+        return summary, ' AND '.join(conditions), tuple(params)
+
+    def maybe_refresh_summary(self, chat_id: str, background: bool = True) -> bool:
+        """
+        窗口之外未摘要的消息达到 summary_batch 条时更新滚动摘要
+
+        参数:
+            chat_id: 聊天ID
+            background: 是否在后台线程中更新
+
+        返回:
+            是否触发了更新
+        """
+        window_start = self.build_context(chat_id)['window_start']
+        _, condition, params = self._pending_condition(chat_id, window_start)
+        if count_records('chat_messages', condition, params) < self.config['summary_batch']:
+            return False
+
+        with self._lock:
+            if chat_id in self._summarizing:
+                return False
+            self._summarizing.add(chat_id)
+
+        if background:
+            threading.Thread(target=self._refresh_summary, args=(chat_id, window_start),
+                             name=f'chat-summary-{chat_id}', daemon=True).start()
+        else:
+            self._refresh_summary(chat_id, window_start)
+        return True
+
+    def _refresh_summary(self, chat_id: str, window_start: Optional[str]) -> None:
+        try:
+            summary, condition, params = self._pending_condition(chat_id, window_start)
+            rows = get_records('chat_messages', 'role, content, time', condition, params,
+                               order_by='time ASC, message_id ASC', limit=self.config['summary_batch'] * 4)
+            if not rows:
+                return
+            messages = '\n'.join(f"{_ROLE_NAMES.get(row['role'], row['role'])}：{self._truncate(row['content'])}"
+                                 for row in rows)
+            text = get_model_router().call(
+                'chat_summary',
+                system_prompt=CHAT_SUMMARY_SYSTEM_PROMPT,
+                user_message=CHAT_SUMMARY_USER_PROMPT.format(
+                    previous_summary=summary['summary'] if summary else '（无）',
+                    messages=messages,
+                    max_chars=self.config['summary_max_chars']
+                ),
+                temperature=0.2
+            )
+            if not is_valid_response(text):
+                logger.warning(f"聊天 {chat_id} 的摘要生成失败，保留原摘要")
+                return
+            upsert_record('chat_summaries', {
+                'chat_id': chat_id,
+                'summary': text.strip()[:self.config['summary_max_chars'] * 2],
+                'summarized_until': rows[-1]['time'],
+                'message_count': (summary['message_count'] if summary else 0) + len(rows),
+                'updated_at': _now()
+            }, key='chat_id')
+            logger.info(f"聊天 {chat_id} 的滚动摘要已合并 {len(rows)} 条消息")
+        except Exception as e:
+            logger.error(f"更新聊天 {chat_id} 的摘要失败: {str(e)}")
+        finally:
+            with self._lock:
+                self._summarizing.discard(chat_id)
+
+
+_chat_memory = None
+
+
+def get_chat_memory() -> ChatMemory:
+    """
+    获取对话记忆单例
+
+    返回:
+        ChatMemory实例
+    """
+    global _chat_memory
+
+    if _chat_memory is None:
+        _chat_memory = ChatMemory()
+    return _chat_memory
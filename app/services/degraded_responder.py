@@ -0,0 +1,154 @@
+"""
+降级回答模块 - 大模型服务熔断期间快速给出不依赖大模型的回答
+
+按以下顺序选择：
+- 缓存回答：同一用户相同输入（问题与对话上下文）最近一次成功的回答
+- 规则SQL：DatabaseMetaAnalyzer.generate_smart_sql 按关键词生成查询，在只读沙箱中执行，以统计摘要作答
+- 模板提示：说明服务暂不可用
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.config.base import LLM_CIRCUIT_BREAKER_CONFIG
+from app.services.result_summarizer import summarize_results
+from app.services.schema_prompt_builder import get_schema_prompt_builder
+from app.utils.single_flight import make_key
+from app.utils.sql_sandbox import get_sql_sandbox, SQLSandboxError
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+DEGRADED_NOTICE = '> 大模型服务暂时不可用，以下为简化模式下的回答。'
+
+
+class DegradedResponder:
+    """熔断期间的降级回答"""
+
+    def __init__(self, cache_size: Optional[int] = None):
+        """
+        初始化降级回答
+
+        参数:
+            cache_size: 保留的历史回答数，默认使用配置
+        """
+        self.cache_size = cache_size or LLM_CIRCUIT_BREAKER_CONFIG['answer_cache_size']
+        self._answers: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ---------- 缓存回答 ----------
+
+    @staticmethod
+    def _cache_key(question: str, user: Optional[str], agent_input: Optional[str]) -> str:
+        # 回答可能基于该用户的对话记忆生成，按用户与完整输入区分，不同用户之间不复用
+        return make_key(user, agent_input or question)
+
+    def remember(self, question: str, answer: str, user: Optional[str] = None,
+                 agent_input: Optional[str] = None) -> None:
+        """
+        保存一次成功的回答，供熔断期间复用
+
+        参数:
+            question: 用户问题
+            answer: 回答
+            user: 用户标识
+            agent_input: 发送给Agent的完整输入（含对话上下文），默认与 question 相同
+        """
+        if not question or not answer:
+            return
+        key = self._cache_key(question, user, agent_input)
+        with self._lock:
+            self._answers[key] = answer
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.cache_size:
+                self._answers.popitem(last=False)
+
+    def cached_answer(self, question: str, user: Optional[str] = None,
+                      agent_input: Optional[str] = None) -> Optional[str]:
+        """同一用户相同输入最近一次成功的回答"""
+        with self._lock:
+            return self._answers.get(self._cache_key(question, user, agent_input))
+
+    # ---------- 规则SQL ----------
+
+    def rule_based_sql(self, question: str) -> Optional[str]:
+        """
+        按关键词规则生成SQL（不调用大模型）
+
+        参数:
+            question: 用户问题
+
+        返回:
+            SQL语句，无法生成时返回None
+        """
+        try:
+            return get_schema_prompt_builder().analyzer.generate_smart_sql(question)
+        except Exception as e:
+            logger.error(f"规则生成SQL失败: {str(e)}")
+            return None
+
+    def summarize(self, results: List[Dict[str, Any]]) -> str:
+        """
+        查询结果的模板化摘要（不调用大模型）
+
+        参数:
+            results: 查询结果行
+
+        返回:
+            摘要文本
+        """
+        if not results:
+            return '查询无结果。'
+        return f"查询返回 {len(results)} 条记录，统计摘要如下：\n\n{summarize_results(results)['text']}"
+
+    # ---------- 降级回答 ----------
+
+    def answer(self, question: str, user: Optional[str] = None,
+               agent_input: Optional[str] = None) -> Dict[str, Any]:
+        """
+        生成降级回答
+
+        参数:
+            question: 用户问题
+            user: 用户标识（缓存回答只在同一用户内复用，规则SQL按该用户执行）
+            agent_input: 发送给Agent的完整输入，默认与 question 相同
+
+        返回:
+            {'answer': 回答, 'source': 'cache' | 'rule_sql' | 'template', 'sql': 规则SQL（仅 rule_sql）}
+        """
+        cached = self.cached_answer(question, user, agent_input)
+        if cached:
+            return {'answer': f"{DEGRADED_NOTICE}（复用最近的回答）\n\n{cached}", 'source': 'cache'}
+
+        sql = self.rule_based_sql(question)
+        if sql:
+            try:
+                execution = get_sql_sandbox().execute(sql, user=user)
+                return {
+                    'answer': f"{DEGRADED_NOTICE}\n\n查询语句：\n```sql\n{sql.strip()}\n```\n\n"
+                              f"{self.summarize(execution['rows'])}",
+                    'source': 'rule_sql',
+                    'sql': sql
+                }
+            except SQLSandboxError as e:
+                logger.warning(f"降级查询执行失败: {e.message}")
+
+        return {'answer': LLM_CIRCUIT_BREAKER_CONFIG['open_message'], 'source': 'template'}
+
+
+_degraded_responder = None
+
+
+def get_degraded_responder() -> DegradedResponder:
+    """
+    获取降级回答单例
+
+    返回:
+        DegradedResponder实例
+    """
+    global _degraded_responder
+
+    if _degraded_responder is None:
+        _degraded_responder = DegradedResponder()
+    return _degraded_responder
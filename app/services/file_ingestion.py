@@ -0,0 +1,222 @@
+"""
+文件解析流水线模块
+负责处理器选择、按内容哈希缓存解析结果，以及为页/工作表级并行处理提供进程池
+
+解析结果中含上传的患者数据，只缓存在内存中，按数量与过期时间淘汰，不落盘
+"""
+import os
+import copy
+import hashlib
+import logging
+import mimetypes
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+from app.config.base import INGESTION_CONFIG
+from app.services.file_service import BaseFileProcessor, ParsedDocument, discover_file_processors
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+
+def compute_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    流式计算文件内容的SHA-256哈希
+
+    参数:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    返回:
+        十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestionPipeline:
+    """文件解析流水线"""
+
+    def __init__(self, ingestion_config: Optional[Dict[str, Any]] = None):
+        self.config = dict(INGESTION_CONFIG)
+        if ingestion_config:
+            self.config.update(ingestion_config)
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 进程池
+    # ------------------------------------------------------------------
+    @property
+    def executor(self) -> Optional[ProcessPoolExecutor]:
+        """
+        惰性创建的共享进程池，max_workers<=1时返回None（串行处理）
+
+        进程池在请求线程中创建，此时服务已有多个线程，使用 spawn 启动工作进程，
+        避免 fork 复制其他线程持有的锁
+        """
+        max_workers = self.config.get('max_workers') or 0
+        if max_workers <= 1:
+            return None
+
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=max_workers,
+                                                         mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    # ------------------------------------------------------------------
+    # 处理器选择
+    # ------------------------------------------------------------------
+    @staticmethod
+    def select_processor(file_path: str, mime_type: str = None) -> Optional[type]:
+        """
+        选择优先级最高的可用处理器
+
+        参数:
+            file_path: 文件路径
+            mime_type: MIME类型
+
+        返回:
+            处理器类，找不到时返回None
+        """
+        if mime_type is None:
+            mime_type, _ = mimetypes.guess_type(file_path)
+
+        selected = None
+        for processor_class in discover_file_processors().values():
+            if processor_class.can_process(file_path, mime_type):
+                if selected is None or processor_class.priority > selected.priority:
+                    selected = processor_class
+        return selected
+
+    # ------------------------------------------------------------------
+    # 缓存
+    # ------------------------------------------------------------------
+    def _cache_key(self, content_hash: str, processor: type) -> str:
+        return f"{processor.name}:{content_hash}"
+
+    def _cache_get(self, key: str) -> Optional[ParsedDocument]:
+        ttl = self.config.get('cache_ttl')
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            stored_at, document = entry
+            if ttl and time.monotonic() - stored_at > ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+        # 返回副本，调用方修改文本或DataFrame不会影响之后的命中
+        return copy.deepcopy(document)
+
+    def _cache_put(self, key: str, document: ParsedDocument) -> None:
+        max_entries = self.config.get('cache_size', 64)
+        entry = (time.monotonic(), copy.deepcopy(document))
+        with self._cache_lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > max_entries:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self) -> None:
+        """清空缓存"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # 解析
+    # ------------------------------------------------------------------
+    def ingest(self, file_path: str, processor: Optional[type] = None,
+               use_cache: bool = True) -> ParsedDocument:
+        """
+        解析文件，内容相同的文件直接返回缓存结果
+
+        参数:
+            file_path: 文件路径
+            processor: 指定的处理器类，None时自动选择
+            use_cache: 是否使用缓存
+
+        返回:
+            ParsedDocument对象
+        """
+        if processor is None:
+            processor = self.select_processor(file_path)
+        if processor is None:
+            raise ValueError(f"无法找到处理此类文件的处理器: {os.path.basename(file_path)}")
+
+        content_hash = compute_file_hash(file_path) if use_cache else None
+        if content_hash:
+            cached = self._cache_get(self._cache_key(content_hash, processor))
+            if cached is not None:
+                logger.info(f"命中文件解析缓存: {os.path.basename(file_path)}")
+                return self._rebind(cached, file_path)
+
+        document = processor.parse(file_path, executor=self.executor)
+        document.processor_name = processor.name
+        document.content_hash = content_hash
+
+        if content_hash:
+            self._cache_put(self._cache_key(content_hash, processor), document)
+        return document
+
+    @staticmethod
+    def _rebind(document: ParsedDocument, file_path: str) -> ParsedDocument:
+        """缓存命中时，更新与文件路径相关的元数据"""
+        if document.file_path == file_path:
+            return document
+
+        rebound = ParsedDocument(
+            file_path,
+            processor_name=document.processor_name,
+            metadata=dict(document.metadata),
+            pages=document.pages,
+            tables=document.tables,
+            structured_data=document._structured_data,
+            separator=document.separator
+        )
+        rebound.content_hash = document.content_hash
+        base_metadata = BaseFileProcessor.extract_metadata(file_path)
+        rebound.metadata.update(base_metadata)
+        return rebound
+
+
+# 全局解析流水线实例
+_ingestion_pipeline = None
+_ingestion_pipeline_lock = threading.Lock()
+
+
+def get_ingestion_pipeline() -> IngestionPipeline:
+    """
+    获取共享的文件解析流水线
+
+    返回:
+        IngestionPipeline实例
+    """
+    global _ingestion_pipeline
+
+    if _ingestion_pipeline is not None:
+        return _ingestion_pipeline
+
+    with _ingestion_pipeline_lock:
+        if _ingestion_pipeline is None:
+            _ingestion_pipeline = IngestionPipeline()
+    return _ingestion_pipeline
@@ -12,7 +12,19 @@ import json
 logger = logging.getLogger(__name__)
 
 # 导入基类
-from app.services.file_service import BaseFileProcessor
+from app.services.file_service import BaseFileProcessor, ParsedDocument
+from app.config.base import INGESTION_CONFIG
+
+
+def _read_sheet(file_path: str, sheet_name: str):
+    """
+    读取单个工作表并生成文本（进程池任务，需定义在模块级别）
+    
+    返回:
+        (工作表名, DataFrame, 文本)
+    """
+    df = pd.read_excel(file_path, sheet_name=sheet_name)
+    return sheet_name, df, df.to_string(index=False)
 
 class ExcelProcessor(BaseFileProcessor):
     """Excel文件处理器"""
@@ -136,4 +148,83 @@ class ExcelProcessor(BaseFileProcessor):
             return excel_file.sheet_names
         except Exception as e:
             logger.error(f"获取工作表名称失败: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
+    
+    @classmethod
+    def parse(cls, file_path: str, executor=None) -> ParsedDocument:
+        """
+        一次性解析电子表格
+        
+        每个工作表只读取一次；工作表较多且文件较大时，各工作表在进程池中并行解析
+        """
+        metadata = super().extract_metadata(file_path)
+        
+        if file_path.lower().endswith('.csv'):
+            df = pd.read_csv(file_path)
+            metadata.update({
+                "rows": len(df),
+                "columns": len(df.columns),
+                "column_names": df.columns.tolist(),
+                "sheet_count": 1,
+                "sheet_names": ["Sheet1"]
+            })
+            return ParsedDocument(
+                file_path,
+                processor_name=cls.name,
+                metadata=metadata,
+                pages=[df.to_string(index=False)],
+                structured_data=df
+            )
+        
+        excel_file = pd.ExcelFile(file_path)
+        sheet_names = excel_file.sheet_names
+        
+        use_pool = (
+            executor is not None
+            and len(sheet_names) >= INGESTION_CONFIG.get('parallel_min_sheets', 2)
+            and metadata.get('size', 0) >= INGESTION_CONFIG.get('parallel_min_bytes', 0)
+        )
+        
+        if use_pool:
+            excel_file.close()
+            futures = [executor.submit(_read_sheet, file_path, name) for name in sheet_names]
+            sheets = [future.result() for future in futures]
+        else:
+            sheets = []
+            with excel_file:
+                for name in sheet_names:
+                    df = excel_file.parse(sheet_name=name)
+                    sheets.append((name, df, df.to_string(index=False)))
+        
+        tables = {}
+        pages = []
+        sheet_info = []
+        total_rows = 0
+        for name, df, text in sheets:
+            tables[name] = df
+            pages.append(f"=== 工作表: {name} ===\n\n{text}\n")
+            total_rows += len(df)
+            sheet_info.append({
+                "name": name,
+                "rows": len(df),
+                "columns": len(df.columns),
+                "column_names": df.columns.tolist()
+            })
+        
+        metadata.update({
+            "rows": total_rows,
+            "sheet_count": len(sheet_names),
+            "sheet_names": sheet_names,
+            "sheet_details": sheet_info
+        })
+        
+        # 与extract_structured_data保持一致：Excel始终返回 {工作表名: DataFrame}
+        return ParsedDocument(
+            file_path,
+            processor_name=cls.name,
+            metadata=metadata,
+            pages=pages,
+            tables=tables,
+            structured_data=dict(tables),
+            separator="\n"
+        )
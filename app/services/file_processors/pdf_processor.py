@@ -11,7 +11,41 @@ import io
 logger = logging.getLogger(__name__)
 
 # 导入基类
-from app.services.file_service import BaseFileProcessor
+from app.services.file_service import BaseFileProcessor, ParsedDocument
+from app.config.base import INGESTION_CONFIG
+
+
+def _extract_page(page):
+    """
+    提取一页的文本与表格，处理完后立即释放页缓存，避免大文件一次性占用大量内存
+    
+    返回:
+        (页文本, [表格行列表, ...])
+    """
+    page_text = page.extract_text() or ""
+    page_tables = [table for table in page.extract_tables() if table]
+    page.close()
+    return page_text, page_tables
+
+
+def _parse_pdf_pages(file_path: str, start: int, end: int):
+    """
+    使用pdfplumber解析指定页范围（进程池任务，需定义在模块级别）
+    
+    返回:
+        [(页文本, [表格行列表, ...]), ...]
+    """
+    import pdfplumber
+    
+    with pdfplumber.open(file_path, pages=list(range(start + 1, end + 1))) as pdf:
+        return [_extract_page(page) for page in pdf.pages]
+
+
+def _read_pdf_version(file_path: str) -> str:
+    """从文件头读取PDF版本，如 %PDF-1.7"""
+    with open(file_path, 'rb') as f:
+        header = f.read(16)
+    return header.split(b'\n')[0].split(b'\r')[0].decode('latin-1', errors='ignore').strip()
 
 class PDFProcessor(BaseFileProcessor):
     """PDF文件处理器"""
@@ -157,4 +191,88 @@ class PDFProcessor(BaseFileProcessor):
         except Exception as e:
             logger.error(f"提取PDF结构化数据失败: {str(e)}", exc_info=True)
         
-        return None 
\ No newline at end of file
+        return None
+    
+    @classmethod
+    def parse(cls, file_path: str, executor=None) -> ParsedDocument:
+        """
+        一次性解析PDF
+        
+        使用pdfplumber打开一次同时获取元数据、文本和表格；页数较多时按页块分发到进程池，
+        页级流式处理以控制内存；未安装pdfplumber时退回PyPDF2仅提取文本
+        """
+        metadata = super().extract_metadata(file_path)
+        try:
+            metadata["pdf_version"] = _read_pdf_version(file_path)
+        except Exception as e:
+            logger.error(f"读取PDF版本失败: {str(e)}")
+        
+        try:
+            import pdfplumber
+        except ImportError:
+            pdfplumber = None
+        
+        if pdfplumber is None:
+            return cls._parse_with_pypdf2(file_path, metadata)
+        
+        with pdfplumber.open(file_path) as pdf:
+            page_count = len(pdf.pages)
+            doc_info = {key: str(value) for key, value in (pdf.metadata or {}).items() if value is not None}
+            parallel = executor is not None and page_count >= INGESTION_CONFIG.get('parallel_min_pages', 32)
+            if not parallel:
+                # 串行时在同一次打开中逐页处理
+                page_results = [_extract_page(page) for page in pdf.pages]
+        
+        metadata["page_count"] = page_count
+        if doc_info:
+            metadata["document_info"] = doc_info
+        
+        if parallel:
+            chunk_size = INGESTION_CONFIG.get('page_chunk_size', 16)
+            futures = [executor.submit(_parse_pdf_pages, file_path, start, min(start + chunk_size, page_count))
+                       for start in range(0, page_count, chunk_size)]
+            page_results = [page for future in futures for page in future.result()]
+        
+        pages = []
+        tables = {}
+        for page_text, page_tables in page_results:
+            pages.append(page_text)
+            for table in page_tables:
+                # 使用第一行作为列名
+                tables[f"table_{len(tables) + 1}"] = pd.DataFrame(table[1:], columns=table[0])
+        
+        return ParsedDocument(
+            file_path,
+            processor_name=cls.name,
+            metadata=metadata,
+            pages=pages,
+            tables=tables,
+            separator="\n\n"
+        )
+    
+    @classmethod
+    def _parse_with_pypdf2(cls, file_path: str, metadata: Dict[str, Any]) -> ParsedDocument:
+        """使用PyPDF2解析（仅文本与元数据）"""
+        pages = []
+        try:
+            import PyPDF2
+            with open(file_path, 'rb') as file:
+                reader = PyPDF2.PdfReader(file)
+                metadata["page_count"] = len(reader.pages)
+                if reader.metadata:
+                    metadata["document_info"] = {
+                        key: str(value) for key, value in reader.metadata.items() if value is not None
+                    }
+                for page in reader.pages:
+                    pages.append(page.extract_text() or "")
+        except ImportError:
+            logger.error("PyPDF2未安装，无法提取PDF文本")
+            pages = ["无法提取PDF内容：需要安装PyPDF2库"]
+        
+        return ParsedDocument(
+            file_path,
+            processor_name=cls.name,
+            metadata=metadata,
+            pages=pages,
+            separator="\n\n"
+        )
@@ -11,7 +11,7 @@ import io
 logger = logging.getLogger(__name__)
 
 # 导入基类
-from app.services.file_service import BaseFileProcessor
+from app.services.file_service import BaseFileProcessor, ParsedDocument
 
 class WordProcessor(BaseFileProcessor):
     """Word文档处理器"""
@@ -160,4 +160,53 @@ class WordProcessor(BaseFileProcessor):
         except Exception as e:
             logger.error(f"提取Word结构化数据失败: {str(e)}", exc_info=True)
         
-        return None 
\ No newline at end of file
+        return None
+    
+    @classmethod
+    def parse(cls, file_path: str, executor=None) -> ParsedDocument:
+        """一次性解析Word文档，只打开一次即获取元数据、文本和表格"""
+        try:
+            import docx
+        except ImportError:
+            # 未安装python-docx时沿用逐项提取（可能使用win32com）
+            return super().parse(file_path, executor=executor)
+        
+        metadata = super().extract_metadata(file_path)
+        doc = docx.Document(file_path)
+        
+        # 提取核心属性
+        core_properties = doc.core_properties
+        doc_info = {}
+        properties = [
+            'author', 'category', 'comments', 'content_status', 
+            'created', 'identifier', 'keywords', 'language', 
+            'last_modified_by', 'last_printed', 'modified', 
+            'revision', 'subject', 'title', 'version'
+        ]
+        for prop in properties:
+            value = getattr(core_properties, prop, None)
+            if value is not None:
+                doc_info[prop] = str(value)
+        
+        metadata["document_info"] = doc_info
+        metadata.update({
+            "paragraph_count": len(doc.paragraphs),
+            "table_count": len(doc.tables)
+        })
+        
+        # 段落文本与表格文本
+        lines = [para.text for para in doc.paragraphs]
+        tables = {}
+        for table in doc.tables:
+            data = [[cell.text for cell in row.cells] for row in table.rows]
+            lines.extend(" | ".join(row) for row in data)
+            if data:
+                tables[f"table_{len(tables) + 1}"] = pd.DataFrame(data[1:], columns=data[0])
+        
+        return ParsedDocument(
+            file_path,
+            processor_name=cls.name,
+            metadata=metadata,
+            pages=["\n".join(lines)],
+            tables=tables
+        )
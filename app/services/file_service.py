@@ -3,6 +3,7 @@
 提供动态文件格式识别和内容提取能力
 """
 import os
+import io
 import importlib
 import inspect
 from pathlib import Path
@@ -22,6 +23,57 @@ logger = logging.getLogger(__name__)
 FILE_PROCESSORS_CACHE = None
 FILE_PROCESSORS_CACHE_TIME = 0
 
+class ParsedDocument:
+    """
+    文件解析后的共享中间表示
+    
+    文件只解析一次，元数据、文本和结构化数据三个提取步骤都从这里读取
+    """
+    
+    def __init__(self, file_path: str, processor_name: str = None,
+                 metadata: Optional[Dict[str, Any]] = None,
+                 pages: Optional[List[str]] = None,
+                 tables: Optional[Dict[str, Any]] = None,
+                 structured_data: Union[pd.DataFrame, Dict, List, None] = None,
+                 separator: str = "\n"):
+        """
+        初始化解析结果
+        
+        参数:
+            file_path: 文件路径
+            processor_name: 处理器名称
+            metadata: 文件元数据
+            pages: 按页/工作表切分的文本片段
+            tables: 按名称组织的表格数据
+            structured_data: 结构化数据；为None时由tables推导
+            separator: 拼接页文本时使用的分隔符
+        """
+        self.file_path = file_path
+        self.processor_name = processor_name
+        self.metadata = metadata or {}
+        self.pages = pages or []
+        self.tables = tables or {}
+        self._structured_data = structured_data
+        self.separator = separator
+        self.content_hash = None
+    
+    @property
+    def text(self) -> str:
+        """完整文本内容"""
+        return self.separator.join(self.pages)
+    
+    @property
+    def structured_data(self) -> Union[pd.DataFrame, Dict, List, None]:
+        """结构化数据：单个表格返回DataFrame，多个表格返回字典"""
+        if self._structured_data is not None:
+            return self._structured_data
+        if not self.tables:
+            return None
+        if len(self.tables) == 1:
+            return next(iter(self.tables.values()))
+        return dict(self.tables)
+
+
 class BaseFileProcessor:
     """
     文件处理器基类
@@ -110,6 +162,29 @@ class BaseFileProcessor:
         """
         return None
     
+    @classmethod
+    def parse(cls, file_path: str, executor=None) -> ParsedDocument:
+        """
+        一次性解析文件为共享中间表示
+        
+        子类应重写此方法以避免重复打开文件；默认实现依次调用三个提取方法，
+        以兼容只实现了extract_*方法的处理器
+        
+        参数:
+            file_path: 文件路径
+            executor: 可选的进程池，用于并行处理页/工作表
+            
+        返回:
+            ParsedDocument对象
+        """
+        return ParsedDocument(
+            file_path,
+            processor_name=cls.name,
+            metadata=cls.extract_metadata(file_path),
+            pages=[cls.extract_text(file_path)],
+            structured_data=cls.extract_structured_data(file_path)
+        )
+    
     @classmethod
     def get_capabilities(cls) -> Dict[str, Any]:
         """
@@ -182,6 +257,32 @@ class TextFileProcessor(BaseFileProcessor):
                 return None
         
         return None
+    
+    @classmethod
+    def parse(cls, file_path: str, executor=None) -> ParsedDocument:
+        """读取一次文本，结构化数据直接从已读取的内容解析"""
+        text = cls.extract_text(file_path)
+        file_ext = os.path.splitext(file_path)[1].lower().lstrip('.')
+        
+        structured_data = None
+        if file_ext == 'csv':
+            try:
+                structured_data = pd.read_csv(io.StringIO(text))
+            except Exception as e:
+                logger.error(f"CSV解析错误: {str(e)}")
+        elif file_ext == 'json':
+            try:
+                structured_data = json.loads(text)
+            except Exception as e:
+                logger.error(f"JSON解析错误: {str(e)}")
+        
+        return ParsedDocument(
+            file_path,
+            processor_name=cls.name,
+            metadata=cls.extract_metadata(file_path),
+            pages=[text],
+            structured_data=structured_data
+        )
 
 # 注册所有的文件处理器
 def discover_file_processors() -> Dict[str, BaseFileProcessor]:
@@ -277,34 +378,22 @@ class FileService:
         # 猜测MIME类型
         mime_type, _ = mimetypes.guess_type(file_path)
         
-        # 发现处理器
-        processors = discover_file_processors()
-        
-        # 选择合适的处理器
-        selected_processor = None
-        for processor_name, processor_class in processors.items():
-            if processor_class.can_process(file_path, mime_type):
-                if (selected_processor is None or 
-                    processor_class.priority > processors[selected_processor].priority):
-                    selected_processor = processor_name
+        # 解析文件：按内容哈希缓存，文件只解析一次，三个提取步骤共享同一中间表示
+        from app.services.file_ingestion import get_ingestion_pipeline
         
-        if not selected_processor:
+        processor = get_ingestion_pipeline().select_processor(file_path, mime_type)
+        if processor is None:
             return {
                 "success": False,
                 "error": f"无法找到处理此类文件的处理器: {filename} (类型: {mime_type})"
             }
         
-        processor = processors[selected_processor]
-        
         try:
-            # 提取文件元数据
-            metadata = processor.extract_metadata(file_path)
-            
-            # 提取文本内容
-            text_content = processor.extract_text(file_path)
+            document = get_ingestion_pipeline().ingest(file_path, processor=processor)
             
-            # 尝试提取结构化数据
-            structured_data = processor.extract_structured_data(file_path)
+            metadata = document.metadata
+            text_content = document.text
+            structured_data = document.structured_data
             
             # 构建结果
             result = {
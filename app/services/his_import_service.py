@@ -0,0 +1,739 @@
+"""
+HIS批量导入服务
+将门诊、住院、手术、收入等HIS导出文件（CSV/Excel）批量导入业务表
+
+导入流程：
+1. 流式解析文件，按块写入无索引的原始暂存表（写暂存表时使用 synchronous=OFF 与大缓存）
+2. 用集合化SQL完成规范化、校验与去重（批内去重、与现有数据去重）
+3. 追加或整表替换到正式表（替换模式通过重命名完成切换）
+4. 最后统一重建索引、日汇总表并更新统计信息
+"""
+import os
+import re
+import csv
+import time
+import sqlite3
+import logging
+import threading
+from datetime import date, datetime
+from operator import itemgetter
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Tuple
+
+from app.config import config
+from app.config.base import HIS_IMPORT_CONFIG
+from app.services.schema_prompt_builder import get_schema_prompt_builder
+from app.utils.database import create_mock_tables
+from app.utils.partitioning import archived_years, partition_tables
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 各类HIS数据的导入定义
+# columns: 目标列定义，type 为 text/date/int/real，aliases 为HIS导出文件中常见的列名
+# key: 去重键；indexes: 导入完成后需要存在的索引；rollup: 日汇总使用的日期列与金额列
+HIS_FEEDS = {
+    'visits': {
+        'table': 'visits',
+        'columns': [
+            {'name': 'visit_date', 'type': 'date', 'required': True, 'aliases': ['就诊日期', '挂号日期', '就诊时间']},
+            {'name': 'date', 'type': 'date', 'fallback': 'visit_date', 'aliases': ['日期']},
+            {'name': 'visit_type', 'type': 'text', 'required': True, 'aliases': ['就诊类型', '门诊类型', '挂号类型']},
+            {'name': 'department', 'type': 'text', 'required': True, 'aliases': ['科室', '就诊科室', '科室名称']},
+            {'name': 'patient_id', 'type': 'text', 'aliases': ['患者ID', '患者编号', '病人ID', '门诊号']},
+            {'name': 'doctor_id', 'type': 'text', 'aliases': ['医生ID', '医生编号', '医生工号']},
+            {'name': 'visit_reason', 'type': 'text', 'aliases': ['就诊原因', '主诉']},
+            {'name': 'diagnosis', 'type': 'text', 'aliases': ['诊断', '门诊诊断']}
+        ],
+        'key': ['visit_date', 'department', 'patient_id', 'doctor_id', 'visit_type'],
+        'indexes': {
+            'idx_visits_visit_date': ['visit_date'],
+            'idx_visits_department_date': ['department', 'visit_date']
+        },
+        'rollup': {'date': 'visit_date', 'amount': None}
+    },
+    'admissions': {
+        'table': 'admissions',
+        'columns': [
+            {'name': 'patient_id', 'type': 'text', 'required': True, 'aliases': ['患者ID', '患者编号', '病人ID', '住院号']},
+            {'name': 'admission_date', 'type': 'date', 'required': True, 'aliases': ['入院日期', '入院时间']},
+            {'name': 'discharge_date', 'type': 'date', 'aliases': ['出院日期', '出院时间']},
+            {'name': 'length_of_stay', 'type': 'int', 'aliases': ['住院天数']},
+            {'name': 'department', 'type': 'text', 'required': True, 'aliases': ['科室', '入院科室', '科室名称']},
+            {'name': 'diagnosis_group', 'type': 'text', 'aliases': ['诊断分组', '疾病分组']},
+            {'name': 'doctor_id', 'type': 'text', 'aliases': ['医生ID', '主治医生', '医生工号']},
+            {'name': 'status', 'type': 'text', 'default': 'active', 'aliases': ['状态', '住院状态']},
+            {'name': 'notes', 'type': 'text', 'aliases': ['备注']}
+        ],
+        'key': ['patient_id', 'admission_date', 'department'],
+        'indexes': {
+            'idx_admissions_admission_date': ['admission_date'],
+            'idx_admissions_department_date': ['department', 'admission_date']
+        },
+        'rollup': {'date': 'admission_date', 'amount': None}
+    },
+    'surgeries': {
+        'table': 'surgeries',
+        'columns': [
+            {'name': 'surgery_date', 'type': 'date', 'required': True, 'aliases': ['手术日期', '手术时间']},
+            {'name': 'patient_id', 'type': 'text', 'required': True, 'aliases': ['患者ID', '患者编号', '病人ID', '住院号']},
+            {'name': 'doctor_id', 'type': 'text', 'required': True, 'aliases': ['医生ID', '主刀医生', '术者工号']},
+            {'name': 'department', 'type': 'text', 'required': True, 'aliases': ['科室', '手术科室', '科室名称']},
+            {'name': 'surgery_type', 'type': 'text', 'required': True, 'aliases': ['手术类型', '手术名称']},
+            {'name': 'duration', 'type': 'int', 'aliases': ['手术时长', '时长']},
+            {'name': 'status', 'type': 'text', 'default': 'completed', 'aliases': ['状态', '手术状态']},
+            {'name': 'complications', 'type': 'text', 'aliases': ['并发症']},
+            {'name': 'notes', 'type': 'text', 'aliases': ['备注']}
+        ],
+        'key': ['surgery_date', 'patient_id', 'doctor_id', 'surgery_type'],
+        'indexes': {
+            'idx_surgeries_surgery_date': ['surgery_date'],
+            'idx_surgeries_department_date': ['department', 'surgery_date']
+        },
+        'rollup': {'date': 'surgery_date', 'amount': None}
+    },
+    'revenue': {
+        'table': 'revenue',
+        'columns': [
+            {'name': 'date', 'type': 'date', 'required': True, 'aliases': ['日期', '收费日期', '结算日期']},
+            {'name': 'revenue_type', 'type': 'text', 'required': True, 'aliases': ['收入类型', '费用类别']},
+            {'name': 'amount', 'type': 'real', 'required': True, 'aliases': ['金额', '收入金额', '费用']},
+            {'name': 'department', 'type': 'text', 'aliases': ['科室', '开单科室', '科室名称']},
+            {'name': 'description', 'type': 'text', 'aliases': ['说明', '描述', '备注']}
+        ],
+        'key': ['date', 'revenue_type', 'amount', 'department', 'description'],
+        'indexes': {
+            'idx_revenue_date': ['date'],
+            'idx_revenue_department_date': ['department', 'date']
+        },
+        'rollup': {'date': 'date', 'amount': 'amount'}
+    }
+}
+
+# 各业务表的日汇总表
+ROLLUP_TABLE = 'his_daily_rollup'
+
+# 日期允许使用 / 或 . 作为分隔符，统一转换为ISO格式后由SQLite的date()校验；
+# date()只接受补零的月、日，未补零的（如 2024/1/7、2024.3.5）再交给 his_date() 解析
+_DATE_EXPR = "COALESCE(date(REPLACE(REPLACE(TRIM({col}), '/', '-'), '.', '-')), his_date({col}))"
+_LOOSE_DATE = re.compile(r'^\s*(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*日?(?:[\sT]|$)')
+_NUMBER_TEXT = "REPLACE(TRIM({col}), ',', '')"
+
+# 同一进程内的导入串行执行（暂存表按业务表命名）
+_import_lock = threading.Lock()
+
+
+def _quote(identifier: str) -> str:
+    """为标识符加双引号"""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _parse_his_date(value: Any) -> Optional[str]:
+    """解析月、日未补零的日期（SQLite函数 his_date），无效日期返回None"""
+    if value is None:
+        return None
+    match = _LOOSE_DATE.match(str(value))
+    if not match:
+        return None
+    try:
+        return date(*map(int, match.groups())).isoformat()
+    except ValueError:
+        return None
+
+
+def _normalize_header(name: Any) -> str:
+    return str(name).strip().lower() if name is not None else ''
+
+
+class HISImportService:
+    """HIS数据批量导入服务"""
+
+    def __init__(self, database_path: Optional[str] = None,
+                 import_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化导入服务
+
+        参数:
+            database_path: 数据库路径，默认使用配置中的DATABASE_PATH
+            import_config: 覆盖 HIS_IMPORT_CONFIG 的配置项
+        """
+        self.config = dict(HIS_IMPORT_CONFIG)
+        if import_config:
+            self.config.update(import_config)
+        self.database_path = database_path or config.DATABASE_PATH
+
+    # ------------------------------------------------------------------
+    # 连接
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        """创建导入专用连接，应用批量加载PRAGMA"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.database_path)), exist_ok=True)
+        conn = sqlite3.connect(self.database_path, isolation_level=None,
+                               timeout=self.config.get('busy_timeout', 60))
+        for pragma, value in self.config.get('load_pragmas', {}).items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        conn.create_function('his_date', 1, _parse_his_date, deterministic=True)
+        return conn
+
+    @staticmethod
+    def get_feed(feed: str) -> Dict[str, Any]:
+        """
+        获取导入定义
+
+        参数:
+            feed: 数据类型（visits/admissions/surgeries/revenue）
+
+        返回:
+            导入定义字典
+        """
+        if feed not in HIS_FEEDS:
+            raise ValueError(f"不支持的导入类型: {feed}，可选: {', '.join(HIS_FEEDS)}")
+        return HIS_FEEDS[feed]
+
+    # ------------------------------------------------------------------
+    # 流式解析
+    # ------------------------------------------------------------------
+    def _detect_encoding(self, file_path: str) -> str:
+        """根据文件开头的字节探测CSV编码"""
+        with open(file_path, 'rb') as f:
+            sample = f.read(64 * 1024)
+        encodings = self.config.get('csv_encodings') or ['utf-8-sig']
+        for encoding in encodings:
+            try:
+                sample.decode(encoding)
+                return encoding
+            except UnicodeDecodeError as e:
+                # 样本末尾可能截断了多字节字符
+                if e.start >= len(sample) - 4:
+                    return encoding
+        return encodings[-1]
+
+    def _iter_file_rows(self, file_path: str, sheet_name: Optional[str] = None) -> Iterator[tuple]:
+        """逐行读取文件，第一行为表头"""
+        ext = os.path.splitext(file_path)[1].lower()
+
+        if ext in ('.csv', '.txt', '.tsv'):
+            encoding = self._detect_encoding(file_path)
+            delimiter = '\t' if ext == '.tsv' else ','
+            with open(file_path, 'r', encoding=encoding, newline='') as f:
+                yield from csv.reader(f, delimiter=delimiter)
+
+        elif ext in ('.xlsx', '.xlsm'):
+            from openpyxl import load_workbook
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+                for row in sheet.iter_rows(values_only=True):
+                    yield tuple(
+                        value.isoformat(sep=' ') if isinstance(value, datetime)
+                        else value.isoformat() if isinstance(value, date)
+                        else value
+                        for value in row
+                    )
+            finally:
+                workbook.close()
+
+        elif ext == '.xls':
+            # 旧版Excel无法流式读取，整表读入后逐行输出
+            import pandas as pd
+            df = pd.read_excel(file_path, sheet_name=sheet_name or 0, dtype=str, header=None)
+            for row in df.itertuples(index=False, name=None):
+                yield tuple(None if isinstance(value, float) else value for value in row)
+
+        else:
+            raise ValueError(f"不支持的导入文件格式: {ext}")
+
+    def _map_header(self, header: tuple, spec: Dict[str, Any]) -> List[Tuple[str, int]]:
+        """
+        将文件表头映射到目标列
+
+        返回:
+            [(目标列名, 文件列序号), ...]，仅包含文件中存在的列
+        """
+        positions = {}
+        for i, name in enumerate(header):
+            positions.setdefault(_normalize_header(name), i)
+
+        mapping = []
+        missing = []
+        for column in spec['columns']:
+            candidates = [column['name']] + column.get('aliases', [])
+            index = next((positions[_normalize_header(c)] for c in candidates
+                          if _normalize_header(c) in positions), None)
+            if index is not None:
+                mapping.append((column['name'], index))
+            elif column.get('required') and not column.get('fallback'):
+                missing.append(column['name'])
+
+        if missing:
+            raise ValueError(f"导入文件缺少必需列: {', '.join(missing)}")
+        return mapping
+
+    def iter_chunks(self, file_path: str, spec: Dict[str, Any],
+                    sheet_name: Optional[str] = None) -> Tuple[List[str], Iterator[List[tuple]]]:
+        """
+        流式解析文件
+
+        参数:
+            file_path: 文件路径
+            spec: 导入定义
+            sheet_name: Excel工作表名，默认第一个
+
+        返回:
+            (文件中存在的目标列, 行块迭代器)
+        """
+        rows = self._iter_file_rows(file_path, sheet_name)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("导入文件为空")
+
+        mapping = self._map_header(header, spec)
+        columns = [name for name, _ in mapping]
+        indexes = [index for _, index in mapping]
+        width = max(indexes) + 1
+        getter = itemgetter(*indexes)
+        single = len(indexes) == 1
+        chunk_size = self.config.get('chunk_size', 50000)
+
+        def project(row):
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            values = getter(row)
+            return (values,) if single else values
+
+        def chunks():
+            chunk = []
+            for row in rows:
+                if not row:
+                    continue
+                chunk.append(project(row))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+        return columns, chunks()
+
+    # ------------------------------------------------------------------
+    # 暂存与校验
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _staging_names(spec: Dict[str, Any]) -> Tuple[str, str]:
+        return f"_his_stage_raw_{spec['table']}", f"_his_stage_{spec['table']}"
+
+    def _load_raw(self, conn: sqlite3.Connection, raw_table: str,
+                  columns: List[str], chunks: Iterator[List[tuple]]) -> int:
+        """创建原始暂存表并按块写入，返回读取行数"""
+        conn.execute(f"DROP TABLE IF EXISTS {raw_table}")
+        conn.execute(f"CREATE TABLE {raw_table} ({', '.join(_quote(c) + ' TEXT' for c in columns)})")
+
+        insert_sql = (f"INSERT INTO {raw_table} ({', '.join(_quote(c) for c in columns)}) "
+                      f"VALUES ({', '.join('?' * len(columns))})")
+        rows_read = 0
+        conn.execute("BEGIN")
+        try:
+            for chunk in chunks:
+                conn.executemany(insert_sql, chunk)
+                rows_read += len(chunk)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return rows_read
+
+    @staticmethod
+    def _column_expressions(spec: Dict[str, Any], present: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        """
+        生成各目标列的规范化表达式与校验条件
+
+        返回:
+            ({列名: 规范化表达式}, [非法数据条件, ...])
+        """
+        expressions = {}
+        invalid = []
+        for column in spec['columns']:
+            name = column['name']
+            if name not in present:
+                expressions[name] = 'NULL'
+                continue
+            col = _quote(name)
+            column_type = column.get('type', 'text')
+            has_value = f"NULLIF(TRIM({col}), '') IS NOT NULL"
+            if column_type == 'date':
+                expressions[name] = _DATE_EXPR.format(col=col)
+                invalid.append(f"({has_value} AND {expressions[name]} IS NULL)")
+            elif column_type in ('int', 'real'):
+                number = _NUMBER_TEXT.format(col=col)
+                sql_type = 'INTEGER' if column_type == 'int' else 'REAL'
+                expressions[name] = f"CAST(NULLIF({number}, '') AS {sql_type})"
+                invalid.append(f"({has_value} AND ({number} GLOB '*[^0-9.+-]*' OR {number} NOT GLOB '*[0-9]*'))")
+            else:
+                expressions[name] = f"NULLIF(TRIM({col}), '')"
+
+        for column in spec['columns']:
+            name = column['name']
+            if column.get('fallback'):
+                expressions[name] = f"COALESCE({expressions[name]}, {expressions[column['fallback']]})"
+            if 'default' in column:
+                expressions[name] = f"COALESCE({expressions[name]}, '{column['default']}')"
+        return expressions, invalid
+
+    def _validate(self, conn: sqlite3.Connection, spec: Dict[str, Any], raw_table: str,
+                  stage_table: str, present: List[str], mode: str) -> Dict[str, int]:
+        """规范化、校验并去重，结果写入暂存表"""
+        expressions, invalid = self._column_expressions(spec, present)
+        column_names = [column['name'] for column in spec['columns']]
+        required = [column['name'] for column in spec['columns'] if column.get('required')]
+
+        select_list = ', '.join(f"{expressions[name]} AS {_quote(name)}" for name in column_names)
+        invalid_expr = ' OR '.join(invalid) if invalid else '0'
+        conditions = ['_invalid = 0'] + [f"{_quote(name)} IS NOT NULL" for name in required]
+
+        conn.execute(f"DROP TABLE IF EXISTS {stage_table}")
+        conn.execute(
+            f"CREATE TABLE {stage_table} AS "
+            f"SELECT {', '.join(_quote(name) for name in column_names)} FROM ("
+            f"SELECT {select_list}, ({invalid_expr}) AS _invalid FROM {raw_table}"
+            f") WHERE {' AND '.join(conditions)}"
+        )
+        valid = conn.execute(f"SELECT COUNT(*) FROM {stage_table}").fetchone()[0]
+
+        # 批内去重：同一去重键只保留第一行
+        key = ', '.join(_quote(name) for name in spec['key'])
+        conn.execute(
+            f"DELETE FROM {stage_table} WHERE rowid NOT IN "
+            f"(SELECT MIN(rowid) FROM {stage_table} GROUP BY {key})"
+        )
+        duplicates = conn.execute("SELECT changes()").fetchone()[0]
+
+        # 追加模式下剔除正式表中已存在的记录（依赖去重键索引）
+        existing = 0
+        if mode == 'append':
+            table = _quote(spec['table'])
+            self._ensure_key_index(conn, spec)
+            match = ' AND '.join(f"l.{_quote(name)} IS {stage_table}.{_quote(name)}" for name in spec['key'])
+            conn.execute(f"DELETE FROM {stage_table} WHERE EXISTS (SELECT 1 FROM {table} l WHERE {match})")
+            existing = conn.execute("SELECT changes()").fetchone()[0]
+
+        return {'rows_valid': valid, 'rows_duplicate': duplicates, 'rows_existing': existing}
+
+    # ------------------------------------------------------------------
+    # 索引
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _key_index_name(spec: Dict[str, Any]) -> str:
+        return f"idx_{spec['table']}_import_key"
+
+    def _ensure_key_index(self, conn: sqlite3.Connection, spec: Dict[str, Any]) -> None:
+        columns = ', '.join(_quote(name) for name in spec['key'])
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {self._key_index_name(spec)} "
+                     f"ON {_quote(spec['table'])} ({columns})")
+
+    @staticmethod
+    def _table_indexes(conn: sqlite3.Connection, table: str) -> Dict[str, str]:
+        """获取表上显式创建的索引 {索引名: 建索引SQL}"""
+        rows = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,)
+        ).fetchall()
+        return {name: sql for name, sql in rows}
+
+    def _rebuild_indexes(self, conn: sqlite3.Connection, spec: Dict[str, Any],
+                         saved: Dict[str, str]) -> None:
+        """重建导入前删除的索引，并补齐导入定义中的索引"""
+        for sql in saved.values():
+            conn.execute(re.sub(r'^CREATE\s+(UNIQUE\s+)?INDEX\s+', r'CREATE \1INDEX IF NOT EXISTS ',
+                                sql, count=1, flags=re.IGNORECASE))
+        table = _quote(spec['table'])
+        for name, columns in spec.get('indexes', {}).items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} "
+                         f"({', '.join(_quote(c) for c in columns)})")
+        self._ensure_key_index(conn, spec)
+
+    @staticmethod
+    def _check_archived_years(conn: sqlite3.Connection, spec: Dict[str, Any], stage_table: str) -> None:
+        """
+        拒绝导入已归档年份的数据
+
+        已归档年份的行保存在分区文件中，再写入主库会被分区路由与分区中的行重复统计
+        """
+        date_column = partition_tables().get(spec['table'])
+        archived = archived_years(conn, spec['table']) if date_column else []
+        if not archived:
+            return
+        column = _quote(date_column)
+        imported = {row[0] for row in conn.execute(f"SELECT DISTINCT substr({column}, 1, 4) FROM {stage_table}")}
+        conflicts = [year for year in archived if f"{year:04d}" in imported]
+        if conflicts:
+            years = ', '.join(str(year) for year in conflicts)
+            raise ValueError(f"导入数据包含已归档年份 {years} 的记录，请先执行 "
+                             f"python -m app.utils.partitioning restore <年份> 将该年份移回主库后再导入")
+
+    # ------------------------------------------------------------------
+    # 切换到正式表
+    # ------------------------------------------------------------------
+    def _append(self, conn: sqlite3.Connection, spec: Dict[str, Any],
+                stage_table: str, rows: int) -> None:
+        """
+        追加到正式表
+
+        导入量相对现有数据较大时先删除二级索引、写入后重建。删除、写入与重建在同一个事务中，
+        写入失败回滚时索引随之恢复
+        """
+        table = _quote(spec['table'])
+        columns = ', '.join(_quote(column['name']) for column in spec['columns'])
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            dropped = {}
+            if rows > existing * self.config.get('drop_index_ratio', 0.2):
+                key_index = self._key_index_name(spec)
+                for name, sql in self._table_indexes(conn, spec['table']).items():
+                    if name != key_index:
+                        dropped[name] = sql
+                        conn.execute(f"DROP INDEX IF EXISTS {_quote(name)}")
+
+            conn.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage_table}")
+            self._rebuild_indexes(conn, spec, dropped)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _replace(self, conn: sqlite3.Connection, spec: Dict[str, Any], stage_table: str) -> Dict[str, str]:
+        """
+        用暂存数据构建新表，再在一个短事务内替换正式表
+
+        返回:
+            原表上的索引（替换后需要重建）
+        """
+        table = spec['table']
+        new_table = f"{table}__import_new"
+        create_sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()[0]
+        create_sql = re.sub(
+            r'^CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?(?:"[^"]+"|\[[^\]]+\]|`[^`]+`|\S+?)(\s*\()',
+            lambda m: f'CREATE TABLE {_quote(new_table)}{m.group(2)}',
+            create_sql, count=1, flags=re.IGNORECASE
+        )
+        saved = self._table_indexes(conn, table)
+
+        columns = ', '.join(_quote(column['name']) for column in spec['columns'])
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(new_table)}")
+        conn.execute(create_sql)
+        conn.execute("BEGIN")
+        try:
+            conn.execute(f"INSERT INTO {_quote(new_table)} ({columns}) SELECT {columns} FROM {stage_table}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(new_table)}")
+            raise
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"DROP TABLE {_quote(table)}")
+            conn.execute(f"ALTER TABLE {_quote(new_table)} RENAME TO {_quote(table)}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(new_table)}")
+            raise
+        return saved
+
+    # ------------------------------------------------------------------
+    # 汇总
+    # ------------------------------------------------------------------
+    @staticmethod
+    def rebuild_rollup(conn: sqlite3.Connection, feed: str) -> int:
+        """
+        重建指定数据类型的日汇总（按日期、科室统计记录数与金额）
+
+        参数:
+            conn: 数据库连接
+            feed: 数据类型
+
+        返回:
+            汇总行数
+        """
+        spec = HISImportService.get_feed(feed)
+        rollup = spec['rollup']
+        date_col = _quote(rollup['date'])
+        amount = f"SUM({_quote(rollup['amount'])})" if rollup.get('amount') else 'NULL'
+
+        conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+            feed TEXT NOT NULL,
+            date TEXT NOT NULL,
+            department TEXT NOT NULL,
+            record_count INTEGER NOT NULL,
+            amount REAL,
+            PRIMARY KEY (feed, date, department)
+        )
+        """)
+        conn.execute("BEGIN")
+        try:
+            conn.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE feed = ?", (feed,))
+            conn.execute(
+                f"INSERT INTO {ROLLUP_TABLE} (feed, date, department, record_count, amount) "
+                f"SELECT ?, {date_col}, COALESCE(department, '未知'), COUNT(*), {amount} "
+                f"FROM {_quote(spec['table'])} WHERE {date_col} IS NOT NULL "
+                f"GROUP BY {date_col}, COALESCE(department, '未知')",
+                (feed,)
+            )
+            count = conn.execute("SELECT changes()").fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    # ------------------------------------------------------------------
+    # 入口
+    # ------------------------------------------------------------------
+    def import_file(self, file_path: str, feed: str, mode: Optional[str] = None,
+                    sheet_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        导入HIS导出文件
+
+        参数:
+            file_path: CSV/Excel文件路径，第一行为表头
+            feed: 数据类型（visits/admissions/surgeries/revenue）
+            mode: append（去重后追加）或 replace（整表替换），默认使用配置
+            sheet_name: Excel工作表名
+
+        返回:
+            导入统计，包含读取、无效、重复、已存在、导入行数与耗时
+        """
+        spec = self.get_feed(feed)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"导入文件不存在: {file_path}")
+
+        columns, chunks = self.iter_chunks(file_path, spec, sheet_name)
+        return self.import_chunks(feed, columns, chunks, mode=mode)
+
+    def import_chunks(self, feed: str, columns: List[str], chunks: Iterable[List[tuple]],
+                      mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        导入已解析的行块（文件导入与批量数据生成共用的入口）
+
+        参数:
+            feed: 数据类型
+            columns: 行中各值对应的目标列名
+            chunks: 行块迭代器，每块为元组列表
+            mode: append 或 replace，默认使用配置
+
+        返回:
+            导入统计
+        """
+        spec = self.get_feed(feed)
+        mode = mode or self.config.get('default_mode', 'append')
+        if mode not in ('append', 'replace'):
+            raise ValueError(f"不支持的导入模式: {mode}")
+        unknown = set(columns) - {column['name'] for column in spec['columns']}
+        if unknown:
+            raise ValueError(f"导入数据包含未知列: {', '.join(sorted(unknown))}")
+
+        raw_table, stage_table = self._staging_names(spec)
+        timings = {}
+        start = time.perf_counter()
+
+        with _import_lock:
+            conn = self._connect()
+            try:
+                create_mock_tables(conn)
+
+                step = time.perf_counter()
+                rows_read = self._load_raw(conn, raw_table, columns, chunks)
+                timings['load'] = time.perf_counter() - step
+
+                step = time.perf_counter()
+                counts = self._validate(conn, spec, raw_table, stage_table, columns, mode)
+                conn.execute(f"DROP TABLE IF EXISTS {raw_table}")
+                rows_loaded = counts['rows_valid'] - counts['rows_duplicate'] - counts['rows_existing']
+                self._check_archived_years(conn, spec, stage_table)
+                timings['validate'] = time.perf_counter() - step
+
+                # 暂存表可以丢失，写正式表时恢复应用的同步级别
+                conn.execute(f"PRAGMA synchronous = {getattr(config, 'DB_PRAGMA_SETTINGS', {}).get('synchronous', 'NORMAL')}")
+                step = time.perf_counter()
+                if mode == 'replace':
+                    saved_indexes = self._replace(conn, spec, stage_table)
+                else:
+                    self._append(conn, spec, stage_table, rows_loaded)
+                    saved_indexes = {}
+                timings['swap'] = time.perf_counter() - step
+
+                step = time.perf_counter()
+                self._rebuild_indexes(conn, spec, saved_indexes)
+                rollup_rows = self.rebuild_rollup(conn, feed)
+                conn.execute(f"ANALYZE {_quote(spec['table'])}")
+                timings['rebuild'] = time.perf_counter() - step
+            finally:
+                try:
+                    conn.execute(f"DROP TABLE IF EXISTS {raw_table}")
+                    conn.execute(f"DROP TABLE IF EXISTS {stage_table}")
+                finally:
+                    conn.close()
+
+        # 替换模式重建了正式表，追加会改变样例值，表结构提示词需要重新分析
+        get_schema_prompt_builder().refresh()
+
+        elapsed = time.perf_counter() - start
+        result = {
+            'feed': feed,
+            'table': spec['table'],
+            'mode': mode,
+            'rows_read': rows_read,
+            'rows_rejected': rows_read - counts['rows_valid'],
+            'rows_duplicate': counts['rows_duplicate'],
+            'rows_existing': counts['rows_existing'],
+            'rows_loaded': rows_loaded,
+            'rollup_rows': rollup_rows,
+            'seconds': round(elapsed, 3),
+            'rows_per_minute': int(rows_read / elapsed * 60) if elapsed else 0,
+            'timings': {name: round(value, 3) for name, value in timings.items()}
+        }
+        logger.info(f"HIS数据导入完成: {result}")
+        return result
+
+
+# 全局导入服务实例
+_his_import_service = None
+
+
+def get_his_import_service() -> HISImportService:
+    """
+    获取共享的HIS导入服务
+
+    返回:
+        HISImportService实例
+    """
+    global _his_import_service
+
+    if _his_import_service is None:
+        _his_import_service = HISImportService()
+    return _his_import_service
+
+
+def main(argv=None):
+    """命令行入口: python -m app.services.his_import_service <类型> <文件> [--mode replace]"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='HIS数据批量导入')
+    parser.add_argument('feed', choices=sorted(HIS_FEEDS), help='数据类型')
+    parser.add_argument('file', help='CSV/Excel文件路径')
+    parser.add_argument('--mode', choices=['append', 'replace'], default=None, help='导入模式')
+    parser.add_argument('--sheet', default=None, help='Excel工作表名')
+    parser.add_argument('--database', default=None, help='数据库路径，默认使用配置')
+    args = parser.parse_args(argv)
+
+    service = HISImportService(database_path=args.database)
+    result = service.import_file(args.file, args.feed, mode=args.mode, sheet_name=args.sheet)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ from flask import current_app
 import os
 
 from app.services.base_llm_service import BaseLLMService
+from app.services.model_router import get_model_router
 from app.prompts import KB_ANALYSIS_SYSTEM_PROMPT, KB_RESPONSE_SYSTEM_PROMPT, KB_RESPONSE_USER_PROMPT
 
 # 导入LangChain相关库
@@ -20,6 +21,14 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.chains import RetrievalQA
 from langchain.chains.retrieval_qa.base import BaseRetrievalQA
 
+def _is_keyword_list(response: str) -> bool:
+    """关键词抽取回复是否为非空的JSON数组"""
+    try:
+        keywords = json.loads(response.strip())
+    except ValueError:
+        return False
+    return isinstance(keywords, list) and bool(keywords)
+
 class KnowledgeBaseService(BaseLLMService):
     """
     知识库服务类，处理知识库内容检索和分析
@@ -291,9 +300,12 @@ class KnowledgeBaseService(BaseLLMService):
             4. 以JSON数组格式返回关键词，例如: ["关键词1", "关键词2", "关键词3"]
             """
             
-            keywords_json = self.call_api(
+            # 关键词抽取使用小模型，返回的不是JSON数组时升级到大模型
+            keywords_json = get_model_router().call(
+                'keywords',
                 system_prompt="你是一位精确的医疗搜索关键词提取专家。你的任务是从用户查询中提取出最适合在医疗知识库中搜索的关键词。",
                 user_message=search_prompt,
+                validate=_is_keyword_list,
                 temperature=0.3
             )
             
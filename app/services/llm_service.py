@@ -9,6 +9,7 @@ from app.services.sql_service import SQLService
 from app.services.chart_service import ChartService
 from app.services.text_analysis_service import TextAnalysisService
 from app.services.knowledge_base_service import KnowledgeBaseService
+from app.services.model_router import get_model_router
 
 # 导入环境变量中定义的模型配置
 VOLCENGINE_MODEL = os.getenv("VOLCENGINE_MODEL", "deepseek-v3-241226")
@@ -103,6 +104,46 @@ class LLMServiceFactory:
         if key not in cls._instances:
             cls._instances[key] = BaseLLMService(model_name)
         return cls._instances[key]
+    
+    @classmethod
+    def get_task_service(cls, task):
+        """
+        获取任务对应档位的基础LLM服务实例（见 MODEL_ROUTING_CONFIG）
+        
+        参数:
+            task: 任务名称，如 intent、keywords、sql_generation、answer
+            
+        返回:
+            BaseLLMService实例
+        """
+        return get_model_router().get_service(task)
+    
+    @classmethod
+    def call_task(cls, task, system_prompt, user_message, validate=None, **kwargs):
+        """
+        按任务调用大模型，提供校验函数时校验失败会升级到更大的模型
+        
+        参数:
+            task: 任务名称
+            system_prompt: 系统提示词
+            user_message: 用户消息
+            validate: 回复校验函数
+            kwargs: 传给 call_api 的其他参数
+            
+        返回:
+            LLM响应
+        """
+        return get_model_router().call(task, system_prompt, user_message, validate=validate, **kwargs)
+    
+    @classmethod
+    def get_task_stats(cls):
+        """
+        获取按任务的模型调用统计（耗时、估算token与成本、升级次数）
+        
+        返回:
+            {任务: 统计}
+        """
+        return get_model_router().get_stats()
 
 
 # 为了向后兼容，保留一个LLMService类，但将功能分发到专门的服务类
@@ -0,0 +1,194 @@
+"""
+模型路由模块 - 按任务选择模型档位，校验失败时升级到更大的模型
+
+- 任务（意图分类、关键词抽取、SQL生成等）按 MODEL_ROUTING_CONFIG['tasks'] 映射到档位，档位再映射到模型
+- 调用方提供校验函数时按 cascade 中的档位顺序调用，回复通过校验即返回，否则升级到下一档位；
+  不同档位配置为同一模型时只调用一次
+- 按任务与档位统计调用数、耗时、估算token数与成本，以及升级次数
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config.base import MODEL_ROUTING_CONFIG
+from app.services.base_llm_service import BaseLLMService, VOLCENGINE_MODEL, is_valid_response
+from app.utils.token_counter import measure_tokens
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+
+class ModelRouter:
+    """按任务路由模型并支持级联升级"""
+
+    def __init__(self, routing_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化模型路由
+
+        参数:
+            routing_config: 路由配置，默认使用 MODEL_ROUTING_CONFIG
+        """
+        self.config = {**MODEL_ROUTING_CONFIG, **(routing_config or {})}
+        self._services: Dict[str, BaseLLMService] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    # ---------- 路由 ----------
+
+    def tier_for(self, task: str) -> str:
+        """任务使用的档位（关闭路由时一律使用默认档位）"""
+        if not self.config['enabled']:
+            return self.config['default_tier']
+        return self.config['tasks'].get(task, self.config['default_tier'])
+
+    def model_for(self, tier: str) -> str:
+        """档位对应的模型（未配置时使用默认模型）"""
+        return self.config['tiers'].get(tier) or VOLCENGINE_MODEL
+
+    def _tiers(self, task: str, cascade: bool) -> List[str]:
+        tiers = self.config['cascade'].get(task) if cascade and self.config['enabled'] else None
+        tiers = tiers or [self.tier_for(task)]
+        # 不同档位配置为同一模型时只保留第一个
+        unique, models = [], set()
+        for tier in tiers:
+            model = self.model_for(tier)
+            if model not in models:
+                models.add(model)
+                unique.append(tier)
+        return unique
+
+    def service_for_model(self, model: str) -> BaseLLMService:
+        """获取指定模型的服务实例（按模型共享）"""
+        service = self._services.get(model)
+        if service is None:
+            with self._lock:
+                service = self._services.get(model)
+                if service is None:
+                    service = self._services[model] = BaseLLMService(model)
+        return service
+
+    def get_service(self, task: str) -> BaseLLMService:
+        """
+        获取任务对应档位的服务实例
+
+        参数:
+            task: 任务名称
+
+        返回:
+            BaseLLMService实例
+        """
+        return self.service_for_model(self.model_for(self.tier_for(task)))
+
+    # ---------- 调用 ----------
+
+    def call(self, task: str, system_prompt: str, user_message: str,
+             validate: Optional[Callable[[str], bool]] = None, **kwargs: Any) -> str:
+        """
+        按任务调用大模型
+
+        参数:
+            task: 任务名称
+            system_prompt: 系统提示词
+            user_message: 用户消息
+            validate: 回复校验函数，提供时校验失败会升级到 cascade 中的下一档位
+            kwargs: 传给 call_api 的其他参数（temperature、max_tokens等）
+
+        返回:
+            通过校验的回复；所有档位都未通过时返回最后一个档位的回复
+        """
+        tiers = self._tiers(task, validate is not None)
+        prompt_tokens = measure_tokens(system_prompt) + measure_tokens(user_message)
+        response = None
+        for index, tier in enumerate(tiers):
+            model = self.model_for(tier)
+            start = time.perf_counter()
+            response = self.service_for_model(model).call_api(system_prompt, user_message, **kwargs)
+            seconds = time.perf_counter() - start
+
+            valid = is_valid_response(response)
+            # 未通过校验的回复同样产生了输出token
+            completion_tokens = measure_tokens(response) if valid else 0
+            if valid and validate is not None:
+                try:
+                    valid = bool(validate(response))
+                except Exception as e:
+                    logger.warning(f"[{task}] 回复校验出错: {str(e)}")
+                    valid = False
+            self._record(task, tier, model, seconds, prompt_tokens, completion_tokens, escalated=index > 0)
+            if valid:
+                return response
+            if index + 1 < len(tiers):
+                logger.info(f"[{task}] {tier} 档位（{model}）的回复未通过校验，升级到 {tiers[index + 1]}")
+
+        self._record_failure(task)
+        return response
+
+    # ---------- 统计 ----------
+
+    def _task_stats(self, task: str) -> Dict[str, Any]:
+        stats = self._stats.get(task)
+        if stats is None:
+            stats = self._stats[task] = {'requests': 0, 'escalations': 0, 'failures': 0, 'tiers': {}}
+        return stats
+
+    def _record(self, task: str, tier: str, model: str, seconds: float, prompt_tokens: int,
+                completion_tokens: int, escalated: bool) -> None:
+        input_price, output_price = self.config['pricing'].get(model, (0, 0))
+        cost = (prompt_tokens * input_price + completion_tokens * output_price) / 1000
+        with self._lock:
+            stats = self._task_stats(task)
+            if escalated:
+                stats['escalations'] += 1
+            else:
+                stats['requests'] += 1
+            tier_stats = stats['tiers'].setdefault(tier, {
+                'model': model, 'calls': 0, 'seconds': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cost': 0.0
+            })
+            tier_stats['model'] = model
+            tier_stats['calls'] += 1
+            tier_stats['seconds'] += seconds
+            tier_stats['prompt_tokens'] += prompt_tokens
+            tier_stats['completion_tokens'] += completion_tokens
+            tier_stats['cost'] += cost
+
+    def _record_failure(self, task: str) -> None:
+        with self._lock:
+            self._task_stats(task)['failures'] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取按任务的调用统计
+
+        返回:
+            {任务: {'requests', 'escalations', 'escalation_rate', 'failures', 'seconds', 'cost',
+                    'tiers': {档位: {'model', 'calls', 'seconds', 'avg_seconds', 'prompt_tokens',
+                                     'completion_tokens', 'cost'}}}}
+        """
+        with self._lock:
+            snapshot = {task: {**stats, 'tiers': {tier: dict(tier_stats) for tier, tier_stats in stats['tiers'].items()}}
+                        for task, stats in self._stats.items()}
+        for stats in snapshot.values():
+            for tier_stats in stats['tiers'].values():
+                tier_stats['avg_seconds'] = tier_stats['seconds'] / tier_stats['calls'] if tier_stats['calls'] else 0
+            stats['seconds'] = sum(tier_stats['seconds'] for tier_stats in stats['tiers'].values())
+            stats['cost'] = sum(tier_stats['cost'] for tier_stats in stats['tiers'].values())
+            stats['escalation_rate'] = stats['escalations'] / stats['requests'] if stats['requests'] else 0
+        return snapshot
+
+
+_model_router = None
+
+
+def get_model_router() -> ModelRouter:
+    """
+    获取模型路由单例
+
+    返回:
+        ModelRouter实例
+    """
+    global _model_router
+
+    if _model_router is None:
+        _model_router = ModelRouter()
+    return _model_router
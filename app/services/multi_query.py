@@ -0,0 +1,104 @@
+"""
+多查询执行模块 - 一次并发执行多个子问题或SQL并合并结果
+
+- 子项以 SELECT/WITH 开头时直接作为SQL执行，否则由数据库元数据分析器生成SQL
+- 子查询在只读沙箱的连接池上并发执行（计入发起用户的并发名额），相同的SQL只执行一次
+- 每个子查询的结果压缩为统计摘要，合并为一条紧凑的观察结果，token预算按子查询平均分配
+"""
+import re
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.config.base import MULTI_QUERY_CONFIG, SQL_SANDBOX_CONFIG
+from app.services.result_summarizer import summarize_results
+from app.services.schema_prompt_builder import get_schema_prompt_builder
+from app.utils.sql_sandbox import get_sql_sandbox, SQLSandboxError, current_user_key
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 直接作为SQL执行的子项
+_SQL_PATTERN = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+
+def _to_sql(query: str) -> Optional[str]:
+    if _SQL_PATTERN.match(query):
+        return query.strip()
+    return get_schema_prompt_builder().analyzer.generate_smart_sql(query)
+
+
+def _execute(sql: str, user: str, token_budget: int) -> Dict[str, Any]:
+    try:
+        execution = get_sql_sandbox().execute(sql, user=user)
+    except SQLSandboxError as e:
+        return {'ok': False, 'error': e.message}
+    rows = execution['rows']
+    return {
+        'ok': True,
+        'row_count': execution['row_count'],
+        'truncated': execution['truncated'],
+        'elapsed': round(execution['elapsed'], 4),
+        'summary': summarize_results(rows, token_budget)['text'] if rows else '查询无结果'
+    }
+
+
+def run_multi_query(queries: Sequence[str], token_budget: Optional[int] = None,
+                    max_workers: Optional[int] = None, user: Optional[str] = None) -> Dict[str, Any]:
+    """
+    并发执行多个子问题或SQL，合并为一个结果
+
+    参数:
+        queries: 子问题（自然语言）或只读SQL列表
+        token_budget: 合并结果的token上限，默认使用配置
+        max_workers: 并发数，默认使用配置（不超过只读连接池大小与每用户并发上限）
+        user: 发起请求的用户标识，默认取当前用户；子查询计入该用户的并发名额
+
+    返回:
+        {'ok', 'results': [{'query', 'sql', 'ok', 'row_count', 'truncated', 'elapsed', 'summary' 或 'error'}],
+         'executed', 'seconds'}
+    """
+    start = time.perf_counter()
+    queries = [query.strip() for query in queries or [] if query and query.strip()]
+    if not queries:
+        return {'ok': False, 'error': '未提供查询'}
+    limit = MULTI_QUERY_CONFIG['max_queries']
+    if len(queries) > limit:
+        return {'ok': False, 'error': f"一次最多执行 {limit} 个查询，收到 {len(queries)} 个"}
+
+    budget = token_budget or MULTI_QUERY_CONFIG['token_budget']
+    item_budget = max(MULTI_QUERY_CONFIG['min_item_budget'], budget // len(queries))
+    workers = min(max_workers or MULTI_QUERY_CONFIG['max_workers'], SQL_SANDBOX_CONFIG['pool_size'],
+                  SQL_SANDBOX_CONFIG['per_user_concurrency'], len(queries))
+    # 子查询计入发起用户的并发名额，一个用户不会占满整个只读连接池
+    user = user or current_user_key()
+
+    results: List[Dict[str, Any]] = []
+    for query in queries:
+        try:
+            sql = _to_sql(query)
+        except Exception as e:
+            logger.error(f"为子查询生成SQL失败: {str(e)}")
+            sql = None
+        results.append({'query': query, 'sql': sql} if sql else
+                       {'query': query, 'sql': None, 'ok': False, 'error': f"无法为'{query}'生成SQL查询"})
+
+    # 相同的SQL只执行一次
+    pending = list(dict.fromkeys(item['sql'] for item in results if item['sql']))
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(workers, len(pending)), thread_name_prefix='multi-query') as executor:
+            outputs = executor.map(lambda sql: _execute(sql, user, item_budget), pending)
+            executed = dict(zip(pending, outputs))
+        for item in results:
+            if item['sql']:
+                item.update(executed[item['sql']])
+
+    seconds = time.perf_counter() - start
+    logger.info(f"多查询完成: {len(queries)} 个子查询, 执行 {len(pending)} 条SQL, 耗时 {seconds:.2f} 秒")
+    return {
+        'ok': any(item['ok'] for item in results),
+        'results': results,
+        'executed': len(pending),
+        'seconds': round(seconds, 4)
+    }
@@ -108,6 +108,20 @@ def execute_sql_query(sql: str) -> pd.DataFrame:
         traceback.print_exc()
         raise e  # 向上抛出异常以便更好地处理
 
+# 意图分析的有效类型
+_INTENT_TYPES = ('DATABASE_QUERY', 'KNOWLEDGE_QUERY', 'FILE_ANALYSIS', 'GENERAL_QUERY')
+
+def _is_intent_response(response: str) -> bool:
+    """意图分析回复中是否包含带有效 intent 字段的JSON"""
+    json_match = re.search(r'\{.*\}', response, re.DOTALL)
+    if not json_match:
+        return False
+    try:
+        result = json.loads(json_match.group(0))
+    except ValueError:
+        return False
+    return isinstance(result, dict) and result.get('intent') in _INTENT_TYPES
+
 def analyze_query_intent(user_message: str) -> Dict[str, Any]:
     """
     使用LLM分析用户查询意图
@@ -121,9 +135,6 @@ def analyze_query_intent(user_message: str) -> Dict[str, Any]:
     try:
         print(f"开始分析查询意图: {user_message}")
         
-        # 获取LLM服务
-        base_service = LLMServiceFactory.get_base_service()
-        
         # 构建系统提示词
         system_prompt = """你是一位医疗信息系统查询意图分析专家。你的任务是分析用户查询的意图，并将其分类为以下类型之一:
 
@@ -150,8 +161,9 @@ def analyze_query_intent(user_message: str) -> Dict[str, Any]:
 - 如果查询要求统计分析、趋势、数量等，应该归类为DATABASE_QUERY
 - 任何提及系统存储数据的查询都应归类为DATABASE_QUERY"""
         
-        # 调用LLM
-        response = base_service.call_api(system_prompt, user_prompt)
+        # 意图分类使用小模型，返回无法解析的意图时升级到大模型
+        response = LLMServiceFactory.call_task('intent', system_prompt, user_prompt,
+                                               validate=_is_intent_response)
         
         # 解析JSON响应
         try:
@@ -449,8 +461,8 @@ def process_general_query(user_message: str) -> Dict[str, Any]:
     try:
         print(f"开始处理通用查询: {user_message}")
         
-        # 使用基本服务获取回复
-        service = LLMServiceFactory.get_base_service()
+        # 使用回答撰写档位的模型获取回复
+        service = LLMServiceFactory.get_task_service('answer')
         
         # 构建提示
         system_prompt = KB_RESPONSE_SYSTEM_PROMPT
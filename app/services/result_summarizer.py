@@ -0,0 +1,294 @@
+"""
+查询结果摘要模块 - 结果集发送给大模型前压缩到token预算内
+
+原始结果（JSON）不超过预算时原样发送；超过时改为发送：
+- 概况：行数、字段数
+- 字段统计（pandas向量化计算）：数值字段的最小/最大/均值/中位数/合计与按四分位距判定的异常值，
+  类别字段的不同值个数与高频值，日期字段的起止范围
+- 趋势：按首个日期字段分段的各数值字段日均值与首尾变化
+- 分层样本：按低基数类别字段分层按比例抽样，并补充数值极值所在行
+各部分按上述顺序加入，超出预算的部分舍弃，样本行数逐步减半直到放得下
+"""
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config.base import RESULT_SUMMARY_CONFIG
+from app.utils.token_counter import count_tokens, estimate_tokens, measure_tokens
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 字段统计与趋势最多占用的预算比例，其余留给样本
+_STATS_BUDGET_RATIO = 0.7
+
+# 原始结果字符数不超过 预算×该倍数 时精确计数token
+_EXACT_COUNT_RATIO = 16
+
+# 形如 2024-01-31 / 2024-01 / 2024-01-31 08:00:00 的日期文本
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}(-\d{2})?([ T]\d{2}:\d{2}(:\d{2})?)?$')
+
+
+def _to_frame(results: Any) -> Optional[pd.DataFrame]:
+    """将查询结果（字典列表、行元组列表、DataFrame或JSON文本）转换为DataFrame，无法识别时返回None"""
+    if isinstance(results, pd.DataFrame):
+        return results
+    if isinstance(results, str):
+        try:
+            results = json.loads(results)
+        except ValueError:
+            return None
+    if isinstance(results, dict):
+        results = [results]
+    if not isinstance(results, list):
+        return None
+    if not results:
+        return pd.DataFrame()
+    if all(hasattr(row, 'keys') for row in results):
+        return pd.DataFrame.from_records([dict(row) for row in results])
+    if all(isinstance(row, (list, tuple)) for row in results):
+        return pd.DataFrame.from_records(results)
+    return None
+
+
+def _format_number(value: Any) -> str:
+    if pd.isna(value):
+        return '-'
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return f"{value:.4g}" if abs(value) < 1 else f"{value:,.2f}"
+
+
+class ResultSummarizer:
+    """查询结果摘要器"""
+
+    def __init__(self, summary_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化摘要器
+
+        参数:
+            summary_config: 摘要配置，默认使用 RESULT_SUMMARY_CONFIG
+        """
+        self.config = {**RESULT_SUMMARY_CONFIG, **(summary_config or {})}
+
+    # ---------- 字段分类 ----------
+
+    def _classify(self, df: pd.DataFrame) -> Dict[str, List[str]]:
+        """将字段分为数值、日期与类别字段，可转换的文本字段一并转换"""
+        kinds = {'numeric': [], 'date': [], 'category': []}
+        for column in df.columns[:self.config['max_columns']]:
+            series = df[column]
+            non_null = series.dropna()
+            if pd.api.types.is_bool_dtype(series) or non_null.empty:
+                kinds['category'].append(column)
+            elif pd.api.types.is_numeric_dtype(series):
+                kinds['numeric'].append(column)
+            elif pd.api.types.is_datetime64_any_dtype(series):
+                kinds['date'].append(column)
+            elif _DATE_PATTERN.match(str(non_null.iloc[0])):
+                df[column] = pd.to_datetime(series, errors='coerce', format='ISO8601')
+                kinds['date'].append(column)
+            else:
+                # 先用前若干个值判断，明显不是数值的字段不做整列转换
+                head = pd.to_numeric(non_null.iloc[:100], errors='coerce')
+                numeric = pd.to_numeric(series, errors='coerce') if head.notna().mean() >= 0.9 else head
+                if numeric.notna().sum() >= 0.9 * len(non_null):
+                    df[column] = numeric
+                    kinds['numeric'].append(column)
+                else:
+                    kinds['category'].append(column)
+        return kinds
+
+    # ---------- 各部分 ----------
+
+    def _column_lines(self, df: pd.DataFrame, kinds: Dict[str, List[str]]) -> List[str]:
+        lines = []
+        numeric = kinds['numeric']
+        if numeric:
+            frame = df[numeric]
+            stats = frame.agg(['min', 'max', 'mean', 'median', 'sum'])
+            quartiles = frame.quantile([0.25, 0.75])
+            iqr = quartiles.loc[0.75] - quartiles.loc[0.25]
+            factor = self.config['outlier_iqr']
+            outliers = ((frame < quartiles.loc[0.25] - factor * iqr) | (frame > quartiles.loc[0.75] + factor * iqr)).sum()
+            for column in numeric:
+                line = (f"- {column}（数值）: 最小 {_format_number(stats.at['min', column])}, "
+                        f"最大 {_format_number(stats.at['max', column])}, "
+                        f"均值 {_format_number(stats.at['mean', column])}, "
+                        f"中位数 {_format_number(stats.at['median', column])}, "
+                        f"合计 {_format_number(stats.at['sum', column])}")
+                if outliers[column]:
+                    line += f", 异常值 {int(outliers[column])} 个"
+                lines.append(line)
+
+        for column in kinds['date']:
+            dates = df[column].dropna()
+            if not dates.empty:
+                lines.append(f"- {column}（日期）: {dates.min():%Y-%m-%d} 至 {dates.max():%Y-%m-%d}, "
+                             f"{dates.dt.normalize().nunique()} 个不同日期")
+
+        top_k = self.config['top_k']
+        for column in kinds['category']:
+            counts = df[column].astype(str).where(df[column].notna()).value_counts()
+            top = ', '.join(f"{value}({count})" for value, count in counts.head(top_k).items())
+            lines.append(f"- {column}（类别）: {len(counts)} 个不同值" + (f", 最多: {top}" if top else ''))
+        return lines
+
+    def _trend_lines(self, df: pd.DataFrame, kinds: Dict[str, List[str]]) -> List[str]:
+        if not kinds['date'] or not kinds['numeric']:
+            return []
+        date_column = kinds['date'][0]
+        daily = df.groupby(df[date_column].dt.normalize())[kinds['numeric']].sum().sort_index()
+        if len(daily) < 3:
+            return []
+
+        points = min(self.config['trend_points'], len(daily))
+        buckets = np.arange(len(daily)) * points // len(daily)
+        segments = daily.groupby(buckets).mean()
+        starts = daily.index.to_series().groupby(buckets).min()
+        ends = daily.index.to_series().groupby(buckets).max()
+
+        lines = [f"趋势（按 {date_column} 分 {points} 段，各段日均值）:"]
+        for bucket in segments.index:
+            label = f"{starts[bucket]:%Y-%m-%d}" if starts[bucket] == ends[bucket] \
+                else f"{starts[bucket]:%Y-%m-%d}~{ends[bucket]:%Y-%m-%d}"
+            values = ', '.join(f"{column} {_format_number(segments.at[bucket, column])}" for column in kinds['numeric'])
+            lines.append(f"  {label}: {values}")
+        first, last = segments.iloc[0], segments.iloc[-1]
+        changes = [f"{column} {(last[column] - first[column]) / abs(first[column]):+.1%}"
+                   for column in kinds['numeric'] if first[column]]
+        if changes:
+            lines.append(f"  首段到末段变化: {', '.join(changes)}")
+        return lines
+
+    def _sample(self, df: pd.DataFrame, kinds: Dict[str, List[str]], size: int) -> pd.DataFrame:
+        """分层样本：按低基数类别字段按比例分配（每层至少1行），并包含首个数值字段的极值行"""
+        if len(df) <= size:
+            return df
+        shuffled = df.sample(frac=1, random_state=self.config['seed'])
+        strata = next((column for column in kinds['category'] if 1 < df[column].nunique() <= size), None)
+        if strata is not None:
+            groups = shuffled[strata].astype(str)
+            quota = (groups.map(groups.value_counts()) * size / len(df)).round().clip(lower=1)
+            sample = shuffled[groups.groupby(groups).cumcount() < quota]
+        else:
+            positions = np.unique(np.linspace(0, len(df) - 1, size).astype(int))
+            sample = df.iloc[positions]
+
+        if kinds['numeric']:
+            values = df[kinds['numeric'][0]]
+            if values.notna().any():
+                extremes = [values.idxmin(), values.idxmax()]
+                sample = pd.concat([sample, df.loc[[index for index in extremes if index not in sample.index]]])
+        return sample.sort_index()
+
+    def _sample_text(self, df: pd.DataFrame, kinds: Dict[str, List[str]], size: int) -> str:
+        sample = self._sample(df, kinds, size)
+        formatted = sample.copy()
+        for column in kinds['date']:
+            formatted[column] = formatted[column].dt.strftime('%Y-%m-%d')
+        title = f"样本数据（{len(sample)} 行" + ('，抽样' if len(sample) < len(df) else '') + '）:'
+        return title + '\n' + formatted.to_csv(index=False).strip()
+
+    # ---------- 摘要 ----------
+
+    def summarize(self, results: Any, token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """
+        生成查询结果的提示词文本
+
+        参数:
+            results: 查询结果（字典列表、行元组列表、DataFrame或JSON文本）
+            token_budget: 结果部分的token上限，默认使用配置
+
+        返回:
+            {'text': 提示词文本, 'row_count': 行数, 'compacted': 是否为摘要,
+             'tokens': token数, 'raw_tokens': 原始结果token数}
+        """
+        budget = token_budget or self.config['token_budget']
+        df = _to_frame(results)
+        if isinstance(results, str):
+            raw = results
+        elif df is not None and df.size > budget:
+            # 每个单元格至少占1个token，必然超出预算：按前若干行估算原始token数，不序列化整个结果
+            head = df.head(100).to_json(orient='records', force_ascii=False, date_format='iso')
+            raw = None
+            raw_tokens = max(estimate_tokens(head) * len(df) // min(len(df), 100), df.size)
+        elif isinstance(results, pd.DataFrame):
+            raw = results.to_json(orient='records', force_ascii=False, date_format='iso')
+        else:
+            raw = json.dumps(results, ensure_ascii=False, default=str)
+        if raw is not None:
+            # 远超预算的结果无需精确计数，按字符数估算，避免对整段结果编码
+            raw_tokens = measure_tokens(raw) if len(raw) <= budget * _EXACT_COUNT_RATIO else estimate_tokens(raw)
+        row_count = len(df) if df is not None else None
+
+        if raw_tokens <= budget or df is None or df.empty:
+            if raw_tokens > budget:
+                raw = raw[:budget * 2] + '...（内容过长已截断）'
+            return {'text': raw, 'row_count': row_count, 'compacted': raw_tokens > budget,
+                    'tokens': measure_tokens(raw), 'raw_tokens': raw_tokens}
+
+        df = df.reset_index(drop=True).copy()
+        df.columns = [str(column) for column in df.columns]
+        kinds = self._classify(df)
+
+        lines = [f"共 {len(df)} 行、{len(df.columns)} 个字段（数据量较大，以下为统计摘要与分层样本）",
+                 "字段统计:"]
+        used = sum(count_tokens(line) for line in lines)
+        stats_budget = int(budget * _STATS_BUDGET_RATIO)
+        for line in self._column_lines(df, kinds) + self._trend_lines(df, kinds):
+            tokens = count_tokens(line)
+            if used + tokens > stats_budget:
+                break
+            lines.append(line)
+            used += tokens
+
+        size = self.config['sample_rows']
+        while size >= 1:
+            sample_text = self._sample_text(df, kinds, size)
+            tokens = measure_tokens(sample_text)
+            if used + tokens <= budget:
+                lines.append(sample_text)
+                used += tokens
+                break
+            size //= 2
+
+        text = '\n'.join(lines)
+        logger.info(f"查询结果摘要: {len(df)} 行，原 {raw_tokens} tokens，摘要 {used} tokens（预算 {budget}）")
+        return {'text': text, 'row_count': len(df), 'compacted': True, 'tokens': used, 'raw_tokens': raw_tokens}
+
+
+_result_summarizer = None
+
+
+def get_result_summarizer() -> ResultSummarizer:
+    """
+    获取查询结果摘要器单例
+
+    返回:
+        ResultSummarizer实例
+    """
+    global _result_summarizer
+
+    if _result_summarizer is None:
+        _result_summarizer = ResultSummarizer()
+    return _result_summarizer
+
+
+def summarize_results(results: Any, token_budget: Optional[int] = None) -> Dict[str, Any]:
+    """
+    生成查询结果的提示词文本（见 ResultSummarizer.summarize）
+
+    参数:
+        results: 查询结果
+        token_budget: 结果部分的token上限，默认使用配置
+
+    返回:
+        摘要结果字典
+    """
+    return get_result_summarizer().summarize(results, token_budget)
@@ -0,0 +1,257 @@
+"""
+表结构提示词构建模块 - 为自然语言转SQL按问题裁剪表结构并控制token数
+
+每次生成SQL时不再发送全部表结构：
+- 通过 DatabaseMetaAnalyzer.find_relevant_tables / find_relevant_columns 选出最相关的 top-k 个表，
+  每个表只列出相关字段、日期字段与关联键，相关字段附带少量样例值
+- 按相关性依次加入各表片段，超出token预算时先退化为精简片段（只保留相关字段与日期字段），仍放不下则舍弃
+- token数按片段文本缓存计数（见 app.utils.token_counter）
+- 没有相关表时只给出表名目录
+每次构建都会与原有的表结构提示词对比，记录节省的token数
+表结构变化（HIS导入、建表、迁移）后调用 refresh()；其他进程执行的迁移通过 PRAGMA schema_version 发现
+"""
+import logging
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.config import config
+from app.config.base import SCHEMA_PROMPT_CONFIG
+from app.services.database_meta_analyzer import DatabaseMetaAnalyzer, TableInfo
+from app.utils.token_counter import count_tokens
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 管理字段，只在预算充足时列出
+_HOUSEKEEPING_COLUMNS = {'created_at', 'updated_at'}
+
+# 样例值的最大字符数
+_SAMPLE_MAX_CHARS = 20
+
+
+def _is_date_column(name: str) -> bool:
+    lower = name.lower()
+    return lower not in _HOUSEKEEPING_COLUMNS and ('date' in lower or 'time' in lower or '日期' in name
+                                                  or lower in ('年', '月', 'year', 'month'))
+
+
+def _is_key_column(name: str) -> bool:
+    lower = name.lower()
+    return lower == 'id' or lower.endswith('_id')
+
+
+class SchemaPromptBuilder:
+    """按问题裁剪的表结构提示词构建器"""
+
+    def __init__(self, db_path: Optional[str] = None, prompt_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化构建器
+
+        参数:
+            db_path: 数据库路径，默认使用配置
+            prompt_config: 构建配置，默认使用 SCHEMA_PROMPT_CONFIG
+        """
+        self.db_path = db_path or config.DATABASE_PATH
+        self.config = {**SCHEMA_PROMPT_CONFIG, **(prompt_config or {})}
+        self._excluded = {table.lower() for table in self.config.get('exclude_tables', [])}
+        self._analyzer: Optional[DatabaseMetaAnalyzer] = None
+        self._full_schema: Optional[str] = None
+        self._full_schema_tokens: Optional[int] = None
+        self._schema_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def analyzer(self) -> DatabaseMetaAnalyzer:
+        """数据库元数据分析器（首次使用时分析数据库）"""
+        if self._analyzer is None:
+            with self._lock:
+                if self._analyzer is None:
+                    self._schema_version = self._read_schema_version()
+                    self._analyzer = DatabaseMetaAnalyzer(self.db_path)
+        return self._analyzer
+
+    def _read_schema_version(self) -> Optional[int]:
+        """数据库的表结构版本号（建表、删表、改表时递增）"""
+        try:
+            with closing(sqlite3.connect(self.db_path)) as conn:
+                return conn.execute("PRAGMA schema_version").fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    def refresh(self) -> None:
+        """表结构或数据变化后重新分析数据库"""
+        with self._lock:
+            self._analyzer = None
+            self._full_schema = None
+            self._full_schema_tokens = None
+            self._schema_version = None
+
+    def refresh_if_changed(self) -> bool:
+        """
+        表结构版本号变化时（如其他进程执行了迁移）重新分析数据库
+
+        返回:
+            是否重新分析
+        """
+        if self._analyzer is None:
+            return False
+        version = self._read_schema_version()
+        if version is None or version == self._schema_version:
+            return False
+        logger.info(f"表结构已变化（schema_version {self._schema_version} -> {version}），重新分析数据库")
+        self.refresh()
+        return True
+
+    def _tables(self) -> Dict[str, TableInfo]:
+        return {name: info for name, info in self.analyzer.tables_info.items() if name.lower() not in self._excluded}
+
+    # ---------- 片段渲染 ----------
+
+    def _render_table(self, info: TableInfo, columns: Sequence[str], sampled: Sequence[str] = ()) -> str:
+        """渲染单个表的结构片段"""
+        description = '' if '包含字段' in info.description else f"（{info.description}）"
+        lines = [f"表 {info.name}{description}:"]
+        sample_count = self.config['sample_values']
+        for column in columns:
+            line = f"  - {column} {info.column_types.get(column) or 'TEXT'}"
+            values = (info.sample_data.get(column) or []) if column in sampled and sample_count else []
+            if values:
+                samples = ', '.join(str(value)[:_SAMPLE_MAX_CHARS] for value in values[:sample_count])
+                line += f"  例: {samples}"
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def _select_columns(self, info: TableInfo, scores: Dict[str, float], limit: int) -> List[str]:
+        """按相关字段、日期字段、关联键、其他字段的顺序选出最多 limit 个字段（保持表中原顺序）"""
+        def priority(item):
+            index, column = item
+            if scores.get(column):
+                rank = 0
+            elif _is_date_column(column):
+                rank = 1
+            elif _is_key_column(column):
+                rank = 2
+            elif column.lower() in _HOUSEKEEPING_COLUMNS:
+                rank = 4
+            else:
+                rank = 3
+            return rank, -scores.get(column, 0), index
+
+        chosen = sorted(enumerate(info.columns), key=priority)[:limit]
+        return [column for _, column in sorted(chosen)]
+
+    def full_schema(self) -> str:
+        """
+        完整表结构（全部表、全部字段与样例值，即裁剪前的提示词规模）
+
+        返回:
+            表结构文本
+        """
+        if self._full_schema is None:
+            fragments = [self._render_table(info, info.columns, info.columns) for info in self._tables().values()]
+            self._full_schema = '\n\n'.join(fragments)
+        return self._full_schema
+
+    def full_schema_tokens(self) -> int:
+        """完整表结构的token数（缓存，用于统计裁剪节省的token）"""
+        if self._full_schema_tokens is None:
+            self._full_schema_tokens = count_tokens(self.full_schema())
+        return self._full_schema_tokens
+
+    def _catalog(self, budget: int) -> List[str]:
+        """没有相关表时的表名目录（一行一个表）"""
+        lines, used = [], 0
+        for name, info in self._tables().items():
+            line = f"- {name}" + ('' if '包含字段' in info.description else f": {info.description}")
+            tokens = count_tokens(line)
+            if used + tokens > budget:
+                break
+            lines.append(line)
+            used += tokens
+        return lines
+
+    # ---------- 构建 ----------
+
+    def build(self, question: str, token_budget: Optional[int] = None,
+              baseline: Optional[str] = None) -> Dict[str, Any]:
+        """
+        构建与问题相关的表结构提示词
+
+        参数:
+            question: 用户问题
+            token_budget: 表结构部分的token上限，默认使用配置
+            baseline: 裁剪前会发送的表结构文本（用于统计节省的token），默认为完整表结构（含样例值）
+
+        返回:
+            {'schema': 表结构文本, 'tables': 包含的表, 'tokens': token数, 'baseline_tokens': 原token数,
+             'tokens_saved': 节省的token数, 'token_budget': 预算}
+        """
+        self.refresh_if_changed()
+        budget = token_budget or self.config['token_budget']
+        tables = self._tables()
+        ranked = [table for table, _ in self.analyzer.find_relevant_tables(question) if table in tables]
+        ranked = ranked[:self.config['top_k_tables']]
+
+        column_scores: Dict[str, Dict[str, float]] = {}
+        if ranked:
+            for table, column, score in self.analyzer.find_relevant_columns(question):
+                if table in ranked:
+                    column_scores.setdefault(table, {})[column] = score
+
+        fragments: List[str] = []
+        included: List[str] = []
+        used = 0
+        for table in ranked:
+            info = tables[table]
+            scores = column_scores.get(table, {})
+            relevant = [column for column in info.columns if scores.get(column)]
+            full_columns = self._select_columns(info, scores, self.config['max_columns_per_table'])
+            minimal_columns = [column for column in full_columns if column in scores or _is_date_column(column)]
+            candidates = [self._render_table(info, full_columns, relevant)]
+            if minimal_columns and minimal_columns != full_columns:
+                candidates.append(self._render_table(info, minimal_columns, ()))
+            for fragment in candidates:
+                tokens = count_tokens(fragment)
+                if used + tokens <= budget:
+                    fragments.append(fragment)
+                    included.append(table)
+                    used += tokens
+                    break
+
+        if fragments:
+            schema = '\n\n'.join(fragments)
+        else:
+            schema = '数据库包含以下表：\n' + '\n'.join(self._catalog(budget))
+            used = count_tokens(schema)
+
+        baseline_tokens = count_tokens(baseline) if baseline is not None else self.full_schema_tokens()
+        saved = max(baseline_tokens - used, 0)
+        logger.info(f"表结构提示词: 包含表 {included or '目录'}，{used} tokens（预算 {budget}），"
+                    f"原 {baseline_tokens} tokens，节省 {saved}")
+        return {
+            'schema': schema,
+            'tables': included,
+            'tokens': used,
+            'baseline_tokens': baseline_tokens,
+            'tokens_saved': saved,
+            'token_budget': budget
+        }
+
+
+_schema_prompt_builder = None
+
+
+def get_schema_prompt_builder() -> SchemaPromptBuilder:
+    """
+    获取表结构提示词构建器单例（数据库路径变化时重新创建）
+
+    返回:
+        SchemaPromptBuilder实例
+    """
+    global _schema_prompt_builder
+
+    if _schema_prompt_builder is None or _schema_prompt_builder.db_path != config.DATABASE_PATH:
+        _schema_prompt_builder = SchemaPromptBuilder()
+    return _schema_prompt_builder
@@ -13,7 +13,12 @@ import hashlib
 from datetime import datetime
 
 from app.services.base_llm_service import BaseLLMService
-from app.utils.database import get_database_schema, execute_query, validate_sql_query
+from app.services.model_router import get_model_router
+from app.services.degraded_responder import get_degraded_responder
+from app.utils.database import get_database_schema, validate_sql_query
+from app.utils.sql_sandbox import get_sql_sandbox, SQLSandboxError
+from app.services.schema_prompt_builder import get_schema_prompt_builder
+from app.services.result_summarizer import summarize_results
 from app.utils.utils import safe_json_dumps
 from app.prompts import DATABASE_SYSTEM_PROMPT
 from app.prompts.querying import (
@@ -126,6 +131,10 @@ class SQLQueryOptimizer:
             logger.error(f"SQL查询优化失败: {str(e)}")
             return {"error": str(e), "sql": sql_query}
 
+def _clean_sql(response: str) -> str:
+    """清理模型回复，提取SQL（去除代码块标记）"""
+    return re.sub(r'```sql|```', '', (response or '').strip()).strip()
+
 class SQLService(BaseLLMService):
     """
     SQL服务类，处理SQL查询生成和分析
@@ -217,9 +226,6 @@ class SQLService(BaseLLMService):
     def generate_sql(self, user_message: str) -> Optional[Dict[str, Any]]:
         """生成SQL查询"""
         try:
-            # 获取数据库结构信息
-            schema_info = get_database_schema(self.db_path)
-            
             print(f"处理SQL查询: {user_message}")
             print(f"表名映射: {self.table_name_mapping}")
             
@@ -276,6 +282,15 @@ class SQLService(BaseLLMService):
                     'recommendations': []
                 }
             
+            # 大模型服务熔断期间使用规则生成SQL
+            if not self.llm_available():
+                return self._generate_degraded_sql(user_message)
+            
+            # 只包含与问题相关的表和字段，并控制表结构部分的token数
+            schema_prompt = get_schema_prompt_builder().build(user_message,
+                                                              baseline=get_database_schema(self.db_path))
+            schema_info = schema_prompt['schema']
+            
             # 使用SQL查询提示词
             prompt = f"""
 请根据用户的请求和数据库结构生成一个SQL查询。
@@ -289,19 +304,18 @@ class SQLService(BaseLLMService):
 注意：不要使用UNION或UNION ALL来合并不同结构的表。
 """
             
-            # 调用LLM
-            response = self.call_api(
+            # SQL生成使用小模型，生成的SQL无法通过EXPLAIN时升级到大模型
+            response = get_model_router().call(
+                'sql_generation',
                 system_prompt="你是一个SQL专家，擅长将自然语言查询转换为精确的SQL语句。请只返回SQL查询语句，不要包含解释或其他内容。不要使用UNION或UNION ALL来合并不同结构的表。",
-                user_message=prompt
+                user_message=prompt,
+                validate=self._sql_compiles
             )
             
             print(f"LLM返回的SQL查询: {response}")
             
             # 清理响应，提取SQL
-            sql = response.strip()
-            
-            # 移除可能的代码块标记
-            sql = re.sub(r'```sql|```', '', sql).strip()
+            sql = _clean_sql(response)
             
             # 验证SQL安全性
             if not sql or not sql.upper().startswith('SELECT'):
@@ -328,7 +342,8 @@ SQL查询: {sql}
 
 请提供简洁的解释，说明这个SQL查询的作用和它如何满足用户的请求。
 """
-            explanation = self.call_api(
+            explanation = get_model_router().call(
+                'sql_explanation',
                 system_prompt="你是一个SQL专家，擅长解释SQL查询的含义。",
                 user_message=explanation_prompt
             )
@@ -338,7 +353,9 @@ SQL查询: {sql}
                 'sql': sql,
                 'explanation': explanation,
                 'purpose': f"满足用户请求: {user_message}",
-                'recommendations': []
+                'recommendations': [],
+                'schema_tokens': schema_prompt['tokens'],
+                'tokens_saved': schema_prompt['tokens_saved']
             }
             
         except Exception as e:
@@ -350,36 +367,35 @@ SQL查询: {sql}
             }
     
     def execute_query(self, sql: str) -> Optional[Dict[str, Any]]:
-        """执行SQL查询"""
+        """执行SQL查询（经由只读沙箱，受时间预算、行数上限与执行计划检查约束）"""
         try:
-            # 验证SQL安全性
-            if not validate_sql_query(sql):
-                return {
-                    'status': SQL_STATUS_CODES['error'],
-                    'message': SQL_ERROR_MESSAGES['unsafe_query']
-                }
-            
             # 执行查询
             try:
-                results = execute_query(sql)
-                print(f"SQL查询执行结果: {results}")
-            except Exception as query_error:
-                print(f"执行SQL查询失败: {str(query_error)}")
-                traceback.print_exc()
+                execution = get_sql_sandbox().execute(sql)
+            except SQLSandboxError as query_error:
+                logger.warning(f"SQL查询被沙箱拒绝({query_error.reason}): {query_error.message}")
+                message_key = 'unsafe_query' if query_error.reason == 'unsafe' else None
                 return {
                     'status': SQL_STATUS_CODES['error'],
-                    'message': SQL_ERROR_MESSAGES['execution_failed'].format(str(query_error))
+                    'message': SQL_ERROR_MESSAGES[message_key] if message_key
+                    else SQL_ERROR_MESSAGES['execution_failed'].format(query_error.message),
+                    'reason': query_error.reason
                 }
+            results = execution['rows']
             
             # 分析结果
+            analysis = f"查询返回了 {len(results)} 条记录"
+            if execution['truncated']:
+                analysis += f"（结果已截断，仅返回前 {len(results)} 条）"
             analysis_result = {
-                'analysis': f"查询返回了 {len(results) if results else 0} 条记录",
+                'analysis': analysis,
                 'summary': self._generate_result_summary(sql, results)
             }
             
             return {
                 'status': SQL_STATUS_CODES['success'],
                 'results': results,
+                'truncated': execution['truncated'],
                 'analysis': analysis_result
             }
             
@@ -496,6 +512,34 @@ SQL查询: {sql}
                 error=str(e)
             )
     
+    def _generate_degraded_sql(self, user_message: str) -> Dict[str, Any]:
+        """大模型服务熔断期间按关键词规则生成SQL"""
+        sql = get_degraded_responder().rule_based_sql(user_message)
+        if not sql:
+            return {
+                'status': SQL_STATUS_CODES['error'],
+                'message': SQL_ERROR_MESSAGES['invalid_query'],
+                'degraded': True
+            }
+        return {
+            'status': SQL_STATUS_CODES['success'],
+            'sql': sql.strip(),
+            'explanation': "大模型服务暂时不可用，此查询由关键词规则生成",
+            'purpose': f"满足用户请求: {user_message}",
+            'recommendations': [],
+            'degraded': True
+        }
+    
+    def _sql_compiles(self, response: str) -> bool:
+        """模型生成的SQL是否为可在当前数据库上编译的只读查询（用于级联升级的校验）"""
+        sql = _clean_sql(response)
+        if not sql.upper().startswith('SELECT'):
+            return False
+        error = get_sql_sandbox().explain(sql)
+        if error:
+            logger.debug(f"生成的SQL无法通过EXPLAIN: {error}")
+        return error is None
+    
     def validate_sql(self, sql_query: str) -> Dict[str, Any]:
         """
         验证SQL查询
@@ -533,13 +577,20 @@ SQL查询: {sql}
     
     def analyze_query_results(self, sql_query: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """分析SQL查询结果"""
+        # 大模型服务熔断期间返回模板化的统计摘要
+        if not self.llm_available():
+            return {
+                "analysis": f"查询返回了 {len(results)} 条记录",
+                "summary": get_degraded_responder().summarize(results),
+                "degraded": True
+            }
         try:
             # 使用SQL结果分析提示词
             response = self.call_api(
                 system_prompt=SQL_RESULT_ANALYSIS_SYSTEM_PROMPT,
                 user_message=SQL_RESULT_ANALYSIS_USER_PROMPT.format(
                     sql_query=sql_query,
-                    query_results=json.dumps(results, ensure_ascii=False)
+                    query_results=summarize_results(results)['text']
                 )
             )
             
@@ -599,9 +650,10 @@ SQL查询: {sql}
                 StrOutputParser() 
             )
             
-            # 执行链
+            # 执行链（表结构只包含与问题相关的表和字段，不再逐表附带样例行）
+            schema_prompt = get_schema_prompt_builder().build(user_message)
             sql_query = chain.invoke({
-                "schema": self.langchain_db.get_table_info(),
+                "schema": schema_prompt['schema'],
                 "question": user_message
             })
             
@@ -636,7 +688,9 @@ SQL查询: {sql}
                 "sql": sql_query,
                 "explanation": explanation,
                 "purpose": f"解答用户的问题：{user_message}",
-                "recommendations": ["可以进一步按需求细化查询"]
+                "recommendations": ["可以进一步按需求细化查询"],
+                "schema_tokens": schema_prompt['tokens'],
+                "tokens_saved": schema_prompt['tokens_saved']
             }
         
         except Exception as e:
@@ -679,7 +733,8 @@ SQL查询: {sql}
         """生成SQL查询的解释"""
         try:
             # 使用LLM生成解释
-            explanation = self.call_api(
+            explanation = get_model_router().call(
+                'sql_explanation',
                 system_prompt=SQL_META_PROMPT,
                 user_message=SQL_EXPLANATION_PROMPT.format(
                     user_message=user_message,
@@ -1,94 +1,90 @@
 """
-标准LangChain Agent实现
-使用官方推荐的最佳实践
+标准Agent实现
+基于大模型原生工具调用（function calling）的轻量执行器，不再依赖LangChain的ReAct Agent：
+模型一轮返回的多个工具调用并行执行，工具返回结构化结果
 """
 
-import sqlite3
-import json
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional
 from datetime import datetime
 
-from langchain.agents import initialize_agent, AgentType
-from langchain.tools import Tool
-from langchain.llms.base import LLM
-from langchain.callbacks.manager import CallbackManagerForLLMRun
-
 from app.services.base_llm_service import BaseLLMService
-from app.services.database_meta_analyzer import DatabaseMetaAnalyzer
-from app.config import config
+from app.services.degraded_responder import get_degraded_responder
+from app.services.multi_query import run_multi_query
+from app.services.result_summarizer import summarize_results
+from app.services.schema_prompt_builder import get_schema_prompt_builder
+from app.services.tool_agent import AgentTool, ToolCallingAgent
+from app.config.base import LLM_COALESCING_CONFIG, MULTI_QUERY_CONFIG
+from app.utils.sql_sandbox import get_sql_sandbox, SQLSandboxError, current_user_key
+from app.utils.single_flight import get_single_flight, make_key
 
-class MedicalLLM(LLM):
-    """标准LangChain LLM适配器"""
-    
-    base_service: Any = None
-    
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.base_service = BaseLLMService()
-    
-    def _call(
-        self,
-        prompt: str,
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> str:
-        """调用LLM"""
-        try:
-            # 简单的提示词处理
-            return self.base_service.call_api(
-                system_prompt="你是专业的医疗数据分析助手，请简洁准确地回答问题。",
-                user_message=prompt
-            )
-        except Exception as e:
-            return f"LLM调用失败: {str(e)}"
-    
-    @property
-    def _llm_type(self) -> str:
-        return "medical_llm"
+AGENT_SYSTEM_PROMPT = """你是专业的医疗数据分析助手，请简洁准确地回答问题。
+需要数据时调用 medical_database_query；需要多组相互独立的数据（如按科室对比门诊、住院、手术量）时，
+调用一次 multi_query 并在 queries 中列出全部子问题，不要逐个查询。需要医学概念时调用 medical_knowledge_search，需要分析建议时调用 data_analysis。
+多个互不依赖的工具调用请在同一轮中一并发出。工具返回JSON结果，ok为false表示调用失败。"""
 
 def create_medical_sql_tool():
     """创建医疗数据库查询工具"""
-    def run_sql_query(query: str) -> str:
-        """执行医疗数据库查询"""
+    def run_sql_query(query: str, user: Optional[str] = None) -> Dict[str, Any]:
+        """执行医疗数据库查询（user 为发起请求的用户标识，用于按用户限制并发）"""
         try:
-            meta_analyzer = DatabaseMetaAnalyzer(config.DATABASE_PATH)
+            # 复用已分析的数据库元数据，避免每次调用重新分析数据库
+            meta_analyzer = get_schema_prompt_builder().analyzer
             
             # 生成SQL
             sql = meta_analyzer.generate_smart_sql(query)
             if not sql:
-                return f"无法为'{query}'生成SQL查询"
-            
-            # 执行查询
-            with sqlite3.connect(config.DATABASE_PATH) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                cursor.execute(sql)
-                results = [dict(row) for row in cursor.fetchall()]
+                return {"ok": False, "error": f"无法为'{query}'生成SQL查询"}
             
-            # 返回格式化结果
-            if not results:
-                return "查询无结果"
+            # 在只读沙箱中执行查询
+            execution = get_sql_sandbox().execute(sql, user=user)
+            results = execution['rows']
             
-            return json.dumps({
+            # 返回结构化结果，结果集以统计摘要代替原始行
+            return {
+                "ok": True,
                 "sql": sql,
                 "count": len(results),
-                "sample_data": results[:3],  # 只显示前3条
-                "message": f"查询成功，共{len(results)}条记录"
-            }, ensure_ascii=False, indent=2)
+                "truncated": execution['truncated'],
+                "summary": summarize_results(results)['text'] if results else "查询无结果"
+            }
             
+        except SQLSandboxError as e:
+            return {"ok": False, "error": f"数据库查询被拒绝: {e.message}"}
         except Exception as e:
-            return f"数据库查询失败: {str(e)}"
+            return {"ok": False, "error": f"数据库查询失败: {str(e)}"}
     
-    return Tool(
+    return AgentTool(
         name="medical_database_query",
         description="查询医疗数据库，获取门诊、住院、手术、收入等数据。支持中文查询如'门诊量'、'科室收入'等。",
-        func=run_sql_query
+        func=run_sql_query,
+        pass_user=True
+    )
+
+def create_multi_query_tool():
+    """创建多查询工具（一次并发执行多个子问题/SQL）"""
+    return AgentTool(
+        name="multi_query",
+        description="一次并发查询医疗数据库中的多组数据并合并返回，每项可以是中文子问题或只读SELECT语句。"
+                    "适合对比多个指标，如同时查询各科室门诊量、住院量和手术量。",
+        func=run_multi_query,
+        pass_user=True,
+        parameters={
+            'type': 'object',
+            'properties': {
+                'queries': {
+                    'type': 'array',
+                    'items': {'type': 'string'},
+                    'maxItems': MULTI_QUERY_CONFIG['max_queries'],
+                    'description': '子问题或SELECT语句列表'
+                }
+            },
+            'required': ['queries']
+        }
     )
 
 def create_medical_knowledge_tool():
     """创建医疗知识查询工具"""
-    def get_medical_knowledge(query: str) -> str:
+    def get_medical_knowledge(query: str) -> Dict[str, Any]:
         """获取医疗知识"""
         knowledge_base = {
             "高血压": "高血压是指血压持续升高的疾病，正常血压应低于120/80mmHg。治疗包括生活方式改变和药物治疗。",
@@ -99,11 +95,11 @@ def create_medical_knowledge_tool():
         
         for keyword, info in knowledge_base.items():
             if keyword in query:
-                return f"关于{keyword}的医疗知识：{info}"
+                return {"ok": True, "topic": keyword, "knowledge": info}
         
-        return f"关于'{query}'的医疗知识暂不可用，建议咨询专业医疗机构。"
+        return {"ok": False, "error": f"关于'{query}'的医疗知识暂不可用，建议咨询专业医疗机构。"}
     
-    return Tool(
+    return AgentTool(
         name="medical_knowledge_search",
         description="搜索医疗专业知识，包括疾病信息、治疗方案、医学概念等。适合回答'什么是'类型的问题。",
         func=get_medical_knowledge
@@ -111,68 +107,120 @@ def create_medical_knowledge_tool():
 
 def create_analysis_tool():
     """创建数据分析工具"""
-    def analyze_data(analysis_request: str) -> str:
+    def analyze_data(query: str) -> Dict[str, Any]:
         """数据分析"""
+        analysis_request = query
         if "绩效" in analysis_request or "表现" in analysis_request:
-            return "绩效分析建议：1) 关注关键指标趋势 2) 对比同期历史数据 3) 识别改进机会 4) 制定行动计划"
+            advice = "绩效分析建议：1) 关注关键指标趋势 2) 对比同期历史数据 3) 识别改进机会 4) 制定行动计划"
         elif "趋势" in analysis_request:
-            return "趋势分析建议：1) 观察数据变化模式 2) 识别季节性因素 3) 预测未来走向 4) 及时调整策略"
+            advice = "趋势分析建议：1) 观察数据变化模式 2) 识别季节性因素 3) 预测未来走向 4) 及时调整策略"
         elif "收入" in analysis_request or "财务" in analysis_request:
-            return "财务分析建议：1) 监控收入结构变化 2) 控制成本支出 3) 提高盈利能力 4) 优化资源配置"
+            advice = "财务分析建议：1) 监控收入结构变化 2) 控制成本支出 3) 提高盈利能力 4) 优化资源配置"
         else:
-            return f"针对'{analysis_request}'的分析建议：建议从数据质量、趋势识别、对比分析、改进建议四个维度进行综合评估。"
+            advice = f"针对'{analysis_request}'的分析建议：建议从数据质量、趋势识别、对比分析、改进建议四个维度进行综合评估。"
+        return {"ok": True, "advice": advice}
     
-    return Tool(
+    return AgentTool(
         name="data_analysis",
         description="对医疗数据进行分析，提供专业建议和见解。适合回答分析、评估、建议类问题。",
         func=analyze_data
     )
 
 class StandardLangChainAgent:
-    """标准LangChain Agent服务"""
+    """标准Agent服务（保留原类名以兼容调用方）"""
     
     def __init__(self):
         # 初始化LLM
-        self.llm = MedicalLLM()
+        self.llm = BaseLLMService()
         
         # 初始化工具
         self.tools = [
             create_medical_sql_tool(),
+            create_multi_query_tool(),
             create_medical_knowledge_tool(),
             create_analysis_tool()
         ]
         
         # 创建Agent
-        self.agent = initialize_agent(
-            tools=self.tools,
-            llm=self.llm,
-            agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-            verbose=True,
-            max_iterations=3,
-            handle_parsing_errors=True
-        )
+        self.agent = ToolCallingAgent(self.llm, self.tools, AGENT_SYSTEM_PROMPT)
         
-        print("标准LangChain Agent初始化完成 ✅")
+        print("标准Agent初始化完成 ✅")
     
-    def process_query(self, user_query: str) -> Dict[str, Any]:
-        """处理用户查询"""
+    def process_query(self, user_query: str, question: Optional[str] = None,
+                      user: Optional[str] = None) -> Dict[str, Any]:
+        """
+        处理用户查询（相同问题并发时只运行一次Agent，成功结果短期缓存）
+        
+        大模型服务熔断期间不运行Agent，直接返回降级回答（缓存回答、规则SQL或模板提示）
+        
+        参数:
+            user_query: 发送给Agent的完整输入（可包含对话上下文）
+            question: 用户原始问题，用于降级回答与回答缓存，默认与 user_query 相同
+            user: 用户标识（数据库工具按用户限制并发），默认在请求线程中取当前用户
+        """
+        question = question or user_query
+        # 工具在线程池中执行，没有请求上下文，需在请求线程中确定用户
+        user = user or current_user_key()
+        if not self.llm.llm_available():
+            return self._degraded_result(user_query, question, user)
+        
+        if not LLM_COALESCING_CONFIG['enabled']:
+            result = self._run_query(user_query, user)
+        else:
+            single_flight = get_single_flight('agent_process_query', cache_ttl=LLM_COALESCING_CONFIG['agent_cache_ttl'],
+                                              cacheable=lambda result: result.get('success'))
+            # 每个调用方拿到独立的副本，避免修改结果时相互影响
+            result = dict(single_flight.do(make_key(user_query), lambda: self._run_query(user_query, user)))
+        
+        if result.get('success'):
+            get_degraded_responder().remember(question, result.get('answer'), user, user_query)
+        elif not self.llm.llm_available():
+            # 运行过程中熔断器打开
+            return self._degraded_result(user_query, question, user)
+        return result
+    
+    def _degraded_result(self, user_query: str, question: str, user: Optional[str] = None) -> Dict[str, Any]:
+        """熔断期间的降级回答"""
+        start_time = datetime.now()
+        degraded = get_degraded_responder().answer(question, user, user_query)
+        process_time = (datetime.now() - start_time).total_seconds()
+        return {
+            "success": True,
+            "query": user_query,
+            "answer": degraded['answer'],
+            "process_time": f"{process_time:.2f}秒",
+            "agent_type": "Degraded",
+            "degraded": True,
+            "degraded_source": degraded['source'],
+            "llm_calls": 0,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+    
+    def _run_query(self, user_query: str, user: Optional[str] = None) -> Dict[str, Any]:
+        """运行Agent处理用户查询"""
         start_time = datetime.now()
         
         try:
             # 使用标准Agent执行查询
-            result = self.agent.run(user_query)
+            run = self.agent.run(user_query, user=user)
             
             end_time = datetime.now()
             process_time = (end_time - start_time).total_seconds()
             
-            return {
-                "success": True,
+            result = {
+                "success": run['success'],
                 "query": user_query,
-                "answer": result,
+                "answer": run['answer'],
                 "process_time": f"{process_time:.2f}秒",
-                "agent_type": "StandardLangChain",
+                "agent_type": "ToolCalling",
+                "llm_calls": run['llm_calls'],
+                "tool_calls": run['tool_calls'],
+                "steps": run['steps'],
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
+            if not run['success']:
+                result["error"] = run['error']
+            return result
             
         except Exception as e:
             end_time = datetime.now()
@@ -183,7 +231,7 @@ class StandardLangChainAgent:
                 "query": user_query,
                 "error": str(e),
                 "process_time": f"{process_time:.2f}秒",
-                "agent_type": "StandardLangChain"
+                "agent_type": "ToolCalling"
             }
 
 # 创建全局实例
@@ -7,6 +7,7 @@ import re
 import json
 
 from app.services.base_llm_service import BaseLLMService
+from app.services.result_summarizer import summarize_results
 
 class TextAnalysisService(BaseLLMService):
     """
@@ -72,10 +73,9 @@ class TextAnalysisService(BaseLLMService):
             分析结果文本
         """
         try:
-            # 转换结果为可读格式
+            # 转换结果为可读格式（结果较大时压缩为统计摘要与分层样本）
             if results and len(results) > 0:
-                sample_size = min(10, len(results))  # 最多取10条数据作为样本
-                results_str = str(results[:sample_size])
+                results_str = summarize_results(results)['text']
                 total_count = len(results)
             else:
                 results_str = "[]"
@@ -105,7 +105,7 @@ class TextAnalysisService(BaseLLMService):
 执行的SQL查询：
 {sql_query}
 
-查询结果 (共{total_count}条记录，显示前{min(10, total_count)}条)：
+查询结果 (共{total_count}条记录)：
 {results_str}{date_range_info}
 
 {'图表已生成用于可视化这些数据。' if has_chart else '未生成图表。'}
@@ -495,7 +495,7 @@ class TextAnalysisService(BaseLLMService):
                 components.append(f"执行的SQL查询:\n{sql_query}")
             
             if sql_results:
-                components.append(f"查询结果:\n{sql_results}")
+                components.append(f"查询结果:\n{summarize_results(sql_results)['text']}")
             
             if chart_configs:
                 components.append(f"生成的图表配置:\n{chart_configs}")
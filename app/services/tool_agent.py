@@ -0,0 +1,205 @@
+"""
+工具调用Agent模块 - 基于OpenAI兼容function calling的轻量Agent执行器
+
+与ReAct文本解析相比：
+- 模型直接返回结构化的 tool_calls，无需解析 Thought/Action 文本，也没有解析失败后的重试轮次
+- 同一轮返回的多个工具调用并行执行，一轮模型调用即可拿到全部工具结果
+- 工具返回结构化字典，序列化后作为 tool 消息回传给模型
+- 记录每一轮模型调用与每个工具调用的耗时
+"""
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config.base import AGENT_CONFIG
+from app.utils.serialization import dumps
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AgentTool:
+    """Agent可调用的工具"""
+    name: str
+    description: str
+    func: Callable[..., Any]
+    # 为True时执行器以 user 关键字参数传入发起请求的用户标识（不由模型提供）
+    pass_user: bool = False
+    # 参数的JSON Schema，默认为单个字符串参数 query
+    parameters: Dict[str, Any] = field(default_factory=lambda: {
+        'type': 'object',
+        'properties': {'query': {'type': 'string', 'description': '查询内容'}},
+        'required': ['query']
+    })
+
+    def to_openai(self) -> Dict[str, Any]:
+        """转换为OpenAI兼容的工具定义"""
+        return {
+            'type': 'function',
+            'function': {'name': self.name, 'description': self.description, 'parameters': self.parameters}
+        }
+
+
+def _parse_arguments(raw: Any) -> Dict[str, Any]:
+    if isinstance(raw, dict):
+        return raw
+    if not raw:
+        return {}
+    try:
+        arguments = json.loads(raw)
+    except ValueError:
+        # 部分模型会直接返回字符串参数
+        return {'query': raw}
+    return arguments if isinstance(arguments, dict) else {'query': arguments}
+
+
+class ToolCallingAgent:
+    """基于工具调用的Agent执行器"""
+
+    def __init__(self, llm: Any, tools: List[AgentTool], system_prompt: str,
+                 agent_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化执行器
+
+        参数:
+            llm: 提供 call_with_tools(messages, tools, tool_choice, temperature) 的服务（如 BaseLLMService）
+            tools: 工具列表
+            system_prompt: 系统提示词
+            agent_config: 执行配置，默认使用 AGENT_CONFIG
+        """
+        self.llm = llm
+        self.tools = {tool.name: tool for tool in tools}
+        self.tool_definitions = [tool.to_openai() for tool in tools]
+        self.system_prompt = system_prompt
+        self.config = {**AGENT_CONFIG, **(agent_config or {})}
+
+    # ---------- 工具执行 ----------
+
+    def _invoke(self, name: str, arguments: Dict[str, Any], user: Optional[str]) -> Dict[str, Any]:
+        tool = self.tools.get(name)
+        if tool is None:
+            return {'ok': False, 'error': f"未知工具: {name}"}
+        if tool.pass_user:
+            arguments = {**arguments, 'user': user}
+        try:
+            output = tool.func(**arguments)
+        except TypeError as e:
+            return {'ok': False, 'error': f"工具参数错误: {str(e)}"}
+        except Exception as e:
+            logger.error(f"工具 {name} 执行失败: {str(e)}")
+            return {'ok': False, 'error': str(e)}
+        return output if isinstance(output, dict) and 'ok' in output else {'ok': True, 'data': output}
+
+    def _timed_invoke(self, name: str, arguments: Dict[str, Any], user: Optional[str]) -> Tuple[Dict[str, Any], float]:
+        start = time.perf_counter()
+        output = self._invoke(name, arguments, user)
+        return output, time.perf_counter() - start
+
+    def _run_tools(self, tool_calls: List[Dict[str, Any]], user: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        并行执行同一轮的全部工具调用，按调用顺序返回结果（工具线程没有请求上下文，用户标识由调用方传入）
+
+        每轮使用独立的线程池，整轮共用一个 tool_timeout 截止时间；超时未完成的工具不再等待，
+        尚未开始的调用直接取消，仍在运行的工具只占用本轮的线程
+        """
+        calls = []
+        for call in tool_calls:
+            function = call.get('function') or {}
+            calls.append((call, function.get('name'), _parse_arguments(function.get('arguments'))))
+
+        timeout = self.config['tool_timeout']
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=min(len(calls), self.config['max_parallel_tools']) or 1,
+                                      thread_name_prefix='agent-tool')
+        try:
+            futures = [executor.submit(self._timed_invoke, name, arguments, user) for _, name, arguments in calls]
+            wait(futures, timeout=timeout)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        records = []
+        for (call, name, arguments), future in zip(calls, futures):
+            if future.done() and not future.cancelled():
+                output, seconds = future.result()
+            else:
+                output = {'ok': False, 'error': f"本轮工具执行超过 {timeout} 秒"}
+                seconds = time.perf_counter() - start
+            records.append({
+                'id': call.get('id') or name,
+                'name': name,
+                'arguments': arguments,
+                'output': output,
+                'seconds': round(seconds, 4)
+            })
+        return records
+
+    def _tool_message(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        content = dumps(record['output']).decode('utf-8')
+        limit = self.config['tool_output_max_chars']
+        if len(content) > limit:
+            content = content[:limit] + '...（结果过长已截断）'
+        return {'role': 'tool', 'tool_call_id': record['id'], 'content': content}
+
+    # ---------- 执行循环 ----------
+
+    def run(self, query: str, user: Optional[str] = None) -> Dict[str, Any]:
+        """
+        运行Agent直到模型给出最终回答或达到最大轮数
+
+        参数:
+            query: 用户问题（可已包含对话上下文）
+            user: 发起请求的用户标识，传给 pass_user 的工具（用于按用户限制数据库并发）
+
+        返回:
+            {'success', 'answer', 'steps': [{'step', 'llm_seconds', 'tool_calls': [...]}],
+             'llm_calls', 'tool_calls', 'seconds'}，失败时包含 'error'
+        """
+        start = time.perf_counter()
+        messages: List[Dict[str, Any]] = [
+            {'role': 'system', 'content': self.system_prompt},
+            {'role': 'user', 'content': query}
+        ]
+        steps: List[Dict[str, Any]] = []
+        tool_count = 0
+
+        for step in range(self.config['max_steps']):
+            # 最后一轮不再提供工具，要求模型基于已有结果作答
+            last_step = step == self.config['max_steps'] - 1
+            llm_start = time.perf_counter()
+            message = self.llm.call_with_tools(messages, self.tool_definitions,
+                                               tool_choice='none' if last_step else 'auto',
+                                               temperature=self.config['temperature'])
+            record = {'step': step + 1, 'llm_seconds': round(time.perf_counter() - llm_start, 4), 'tool_calls': []}
+            steps.append(record)
+            if message is None:
+                return self._result(False, None, steps, tool_count, start, error='大模型调用失败')
+
+            tool_calls = message.get('tool_calls') or []
+            if not tool_calls or last_step:
+                return self._result(True, message.get('content') or '', steps, tool_count, start)
+
+            messages.append({'role': 'assistant', 'content': message.get('content') or '', 'tool_calls': tool_calls})
+            record['tool_calls'] = self._run_tools(tool_calls, user)
+            tool_count += len(record['tool_calls'])
+            messages.extend(self._tool_message(tool_record) for tool_record in record['tool_calls'])
+
+        return self._result(False, None, steps, tool_count, start, error='超过最大轮数')
+
+    def _result(self, success: bool, answer: Optional[str], steps: List[Dict[str, Any]], tool_count: int,
+                start: float, error: Optional[str] = None) -> Dict[str, Any]:
+        result = {
+            'success': success,
+            'answer': answer,
+            'steps': steps,
+            'llm_calls': len(steps),
+            'tool_calls': tool_count,
+            'seconds': round(time.perf_counter() - start, 4)
+        }
+        if error:
+            result['error'] = error
+        logger.info(f"Agent完成: {len(steps)} 次模型调用, {tool_count} 次工具调用, 耗时 {result['seconds']:.2f} 秒")
+        return result
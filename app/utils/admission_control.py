@@ -0,0 +1,393 @@
+"""
+准入控制模块 - 限制AI接口的请求速率、估算token用量与并发数
+
+- 令牌桶：每用户与全局各有请求数、LLM token两类令牌桶，任一不足时立即返回429并给出 Retry-After
+- 令牌桶后端可插拔：memory（进程内，默认）或 sqlite（多个工作进程共享同一数据库文件）
+- 并发闸门：每个进程同时处理的AI请求数与每用户并发数有上限，超出时进入有界等待队列，
+  交互请求优先于批量请求（脚本客户端或带 X-Request-Priority: batch 的请求），队列已满或等待超时返回429
+- 以 init_admission_control(app) 注册为请求钩子，只作用于 ADMISSION_CONTROL_CONFIG['paths'] 中的接口
+"""
+import heapq
+import itertools
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from flask import g, jsonify, request, session
+
+from app.config.base import ADMISSION_CONTROL_CONFIG
+from app.utils.error_handler import ErrorCode
+from app.utils.token_counter import estimate_tokens
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+_PRIORITIES = {INTERACTIVE: 0, BATCH: 1}
+
+
+class AdmissionRejected(Exception):
+    """请求未获准入"""
+
+    def __init__(self, message: str, reason: str, retry_after: float):
+        self.message = message
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+# ---------- 令牌桶后端 ----------
+
+class MemoryBucketBackend:
+    """进程内令牌桶"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def consume(self, key: str, amount: float, rate: float, capacity: float) -> float:
+        """
+        尝试从令牌桶中取出令牌
+
+        参数:
+            key: 桶名
+            amount: 需要的令牌数
+            rate: 每秒补充的令牌数
+            capacity: 桶容量
+
+        返回:
+            0表示已取出；否则为令牌补足所需的秒数（未取出）
+        """
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, wait = _take(tokens, updated, now, amount, rate, capacity)
+            self._buckets[key] = (tokens, now)
+        return wait
+
+    def refund(self, key: str, amount: float, capacity: float) -> None:
+        """退回已取出的令牌"""
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(capacity, tokens + amount), updated)
+
+
+class SQLiteBucketBackend:
+    """多个工作进程共享的SQLite令牌桶"""
+
+    def __init__(self, database_path: str):
+        """
+        初始化SQLite后端
+
+        参数:
+            database_path: 令牌桶数据库路径（与业务库分开，避免写锁相互影响）
+        """
+        self.database_path = database_path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(database_path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_buckets "
+                         "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.database_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key: str, amount: float, rate: float, capacity: float) -> float:
+        """尝试从令牌桶中取出令牌（见 MemoryBucketBackend.consume）"""
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, wait = _take(tokens, updated, now, amount, rate, capacity)
+            conn.execute("INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def refund(self, key: str, amount: float, capacity: float) -> None:
+        """退回已取出的令牌"""
+        self._connection().execute("UPDATE rate_buckets SET tokens = MIN(?, tokens + ?) WHERE key = ?",
+                                   (capacity, amount, key))
+
+
+def _take(tokens: float, updated: float, now: float, amount: float, rate: float,
+          capacity: float) -> Tuple[float, float]:
+    """按经过的时间补充令牌后尝试取出，返回 (剩余令牌, 需等待秒数)"""
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    # 超过桶容量的请求按容量计，避免永远无法通过
+    amount = min(amount, capacity)
+    if tokens >= amount:
+        return tokens - amount, 0.0
+    return tokens, (amount - tokens) / rate if rate > 0 else float('inf')
+
+
+# ---------- 并发闸门 ----------
+
+class _Waiter:
+    __slots__ = ('user', 'granted')
+
+    def __init__(self, user: str):
+        self.user = user
+        self.granted = False
+
+
+class ConcurrencyGate:
+    """带优先级有界等待队列的并发闸门（进程内）"""
+
+    def __init__(self, max_concurrent: int, per_user: int, max_queue: int):
+        self.max_concurrent = max_concurrent
+        self.per_user = per_user
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._active = 0
+        self._user_active: Dict[str, int] = {}
+        self._queue: list = []
+        self._sequence = itertools.count()
+
+    def _can_run(self, user: str) -> bool:
+        return self._active < self.max_concurrent and self._user_active.get(user, 0) < self.per_user
+
+    def _grant(self, user: str) -> None:
+        self._active += 1
+        self._user_active[user] = self._user_active.get(user, 0) + 1
+
+    def _dispatch(self) -> None:
+        """按优先级与到达顺序把空闲名额分给可以运行的等待者"""
+        for entry in sorted(self._queue):
+            if self._active >= self.max_concurrent:
+                break
+            waiter = entry[2]
+            if not waiter.granted and self._can_run(waiter.user):
+                self._grant(waiter.user)
+                waiter.granted = True
+        self._queue = [entry for entry in self._queue if not entry[2].granted]
+        heapq.heapify(self._queue)
+        self._cond.notify_all()
+
+    def acquire(self, user: str, priority: str, max_wait: float) -> float:
+        """
+        获取运行名额
+
+        参数:
+            user: 用户标识
+            priority: interactive 或 batch
+            max_wait: 最长等待秒数
+
+        返回:
+            实际等待的秒数；队列已满或等待超时抛出 AdmissionRejected
+        """
+        start = time.monotonic()
+        with self._cond:
+            if not self._queue and self._can_run(user):
+                self._grant(user)
+                return 0.0
+            if len(self._queue) >= self.max_queue:
+                raise AdmissionRejected("服务繁忙，等待队列已满，请稍后重试", 'queue_full', max_wait or 1)
+            waiter = _Waiter(user)
+            heapq.heappush(self._queue, (_PRIORITIES.get(priority, 0), next(self._sequence), waiter))
+            self._dispatch()
+            deadline = start + max_wait
+            while not waiter.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                    heapq.heapify(self._queue)
+                    raise AdmissionRejected("服务繁忙，排队等待超时，请稍后重试", 'queue_timeout', max_wait or 1)
+                self._cond.wait(remaining)
+        return time.monotonic() - start
+
+    def release(self, user: str) -> None:
+        """释放运行名额"""
+        with self._cond:
+            self._active -= 1
+            remaining = self._user_active.get(user, 1) - 1
+            if remaining > 0:
+                self._user_active[user] = remaining
+            else:
+                self._user_active.pop(user, None)
+            self._dispatch()
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._cond:
+            return {'active': self._active, 'queued': len(self._queue)}
+
+
+# ---------- 准入控制 ----------
+
+class AdmissionController:
+    """AI接口的准入控制"""
+
+    def __init__(self, admission_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化准入控制
+
+        参数:
+            admission_config: 准入配置，默认使用 ADMISSION_CONTROL_CONFIG
+        """
+        self.config = {**ADMISSION_CONTROL_CONFIG, **(admission_config or {})}
+        if self.config['backend'] == 'sqlite':
+            self.backend = SQLiteBucketBackend(self.config['sqlite_path'])
+        else:
+            self.backend = MemoryBucketBackend()
+        self.gate = ConcurrencyGate(self.config['max_concurrent'], self.config['per_user_concurrent'],
+                                    self.config['max_queue'])
+        self._lock = threading.Lock()
+        self.stats = {'admitted': 0, 'queued': 0, 'wait_seconds': 0.0, 'rejected': {}}
+
+    def _buckets(self, user: str, llm_tokens: int):
+        """(桶名, 需要的令牌数, 桶配置, 拒绝原因, 提示)，依次检查"""
+        return [
+            (f"requests:{user}", 1, self.config['user_requests'], 'user_requests', "请求过于频繁，请稍后重试"),
+            ('requests:*', 1, self.config['global_requests'], 'global_requests', "服务繁忙，请稍后重试"),
+            (f"llm_tokens:{user}", llm_tokens, self.config['user_llm_tokens'], 'user_llm_tokens',
+             "大模型用量超过限制，请稍后重试"),
+            ('llm_tokens:*', llm_tokens, self.config['global_llm_tokens'], 'global_llm_tokens',
+             "大模型服务繁忙，请稍后重试")
+        ]
+
+    def admit(self, user: str, priority: str, llm_tokens: int) -> Dict[str, Any]:
+        """
+        为一次请求申请准入（成功后必须调用 release）
+
+        参数:
+            user: 用户标识
+            priority: interactive 或 batch
+            llm_tokens: 估算的LLM token数
+
+        返回:
+            准入凭据 {'user', 'priority', 'llm_tokens', 'waited'}；未获准入时抛出 AdmissionRejected
+        """
+        taken = []
+        try:
+            for key, amount, bucket, reason, message in self._buckets(user, llm_tokens):
+                wait = self.backend.consume(key, amount, bucket['rate'], bucket['capacity'])
+                if wait:
+                    raise AdmissionRejected(message, reason, wait)
+                taken.append((key, amount, bucket))
+            waited = self.gate.acquire(user, priority, self.config['max_wait'][priority])
+        except AdmissionRejected as e:
+            # 未获准入的请求不消耗令牌
+            for key, amount, bucket in taken:
+                self.backend.refund(key, amount, bucket['capacity'])
+            with self._lock:
+                self.stats['rejected'][e.reason] = self.stats['rejected'].get(e.reason, 0) + 1
+            logger.warning(f"拒绝AI请求（{e.reason}）: 用户 {user}, 优先级 {priority}, {e.retry_after:.1f} 秒后重试")
+            raise
+
+        with self._lock:
+            self.stats['admitted'] += 1
+            if waited:
+                self.stats['queued'] += 1
+                self.stats['wait_seconds'] += waited
+        return {'user': user, 'priority': priority, 'llm_tokens': llm_tokens, 'waited': waited}
+
+    def release(self, ticket: Dict[str, Any]) -> None:
+        """释放准入凭据占用的并发名额"""
+        self.gate.release(ticket['user'])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取准入统计（准入、排队、各原因拒绝数、当前并发与队列长度）"""
+        with self._lock:
+            stats = {**self.stats, 'rejected': dict(self.stats['rejected'])}
+        stats.update(self.gate.snapshot())
+        stats['backend'] = self.config['backend']
+        stats['avg_wait_seconds'] = stats['wait_seconds'] / stats['queued'] if stats['queued'] else 0
+        return stats
+
+
+# ---------- 请求钩子 ----------
+
+def _request_user() -> str:
+    user_id = session.get('user_id')
+    return f"user:{user_id}" if user_id else f"addr:{request.remote_addr}"
+
+
+def _request_priority(admission_config: Dict[str, Any]) -> str:
+    if request.headers.get(admission_config['priority_header'], '').lower() == BATCH:
+        return BATCH
+    user_agent = (request.user_agent.string or '').lower()
+    if any(agent.lower() in user_agent for agent in admission_config['batch_user_agents']):
+        return BATCH
+    return INTERACTIVE
+
+
+def _estimate_request_tokens(admission_config: Dict[str, Any]) -> int:
+    body = request.get_data(cache=True, as_text=True) or ''
+    return admission_config['request_token_overhead'] + estimate_tokens(body)
+
+
+def _rejected_response(error: AdmissionRejected):
+    retry_after = max(1, math.ceil(error.retry_after))
+    response = jsonify({
+        'success': False,
+        'error': error.message,
+        'error_code': ErrorCode.API_RATE_LIMIT,
+        'details': {'reason': error.reason, 'retry_after': retry_after}
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+_admission_controller = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    获取准入控制单例
+
+    返回:
+        AdmissionController实例
+    """
+    global _admission_controller
+
+    if _admission_controller is None:
+        _admission_controller = AdmissionController()
+    return _admission_controller
+
+
+def init_admission_control(app) -> None:
+    """
+    为 ADMISSION_CONTROL_CONFIG['paths'] 中的AI接口注册准入控制钩子
+
+    参数:
+        app: Flask应用
+    """
+    admission_config = ADMISSION_CONTROL_CONFIG
+    if not admission_config['enabled']:
+        return
+    paths = set(admission_config['paths'])
+
+    @app.before_request
+    def _admit_ai_request():
+        if request.method == 'OPTIONS' or request.path.rstrip('/') not in paths:
+            return None
+        try:
+            g.admission_ticket = get_admission_controller().admit(
+                _request_user(), _request_priority(admission_config), _estimate_request_tokens(admission_config))
+        except AdmissionRejected as e:
+            return _rejected_response(e)
+        return None
+
+    @app.teardown_request
+    def _release_ai_request(exc=None):
+        ticket = g.pop('admission_ticket', None)
+        if ticket is not None:
+            get_admission_controller().release(ticket)
@@ -0,0 +1,204 @@
+"""
+熔断器模块 - 上游服务持续失败或变慢时快速失败，避免占满请求线程
+
+- 关闭（closed）：正常放行，按最近 window_size 次调用统计失败率与慢调用率
+- 打开（open）：失败率或慢调用率超过阈值后打开，open_seconds 内的调用直接拒绝
+- 半开（half_open）：打开期满后只放行 half_open_probes 个探测调用，全部成功则关闭，任一失败则重新打开
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from app.config.base import LLM_CIRCUIT_BREAKER_CONFIG
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """按失败率与慢调用率熔断的断路器"""
+
+    def __init__(self, name: str, breaker_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化熔断器
+
+        参数:
+            name: 名称（用于日志与统计）
+            breaker_config: 熔断配置，默认使用 LLM_CIRCUIT_BREAKER_CONFIG
+        """
+        self.name = name
+        self.config = {**LLM_CIRCUIT_BREAKER_CONFIG, **(breaker_config or {})}
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        # 最近调用的 (是否失败, 是否慢调用)
+        self._window: deque = deque(maxlen=self.config['window_size'])
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self.stats = {
+            'calls': 0,
+            'failures': 0,
+            'slow_calls': 0,
+            'rejected': 0,
+            'opened': 0
+        }
+
+    # ---------- 状态 ----------
+
+    def _update_state(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.config['open_seconds']:
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+            logger.info(f"[{self.name}] 熔断期满，进入半开状态")
+
+    def _open(self, now: float, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._window.clear()
+        self.stats['opened'] += 1
+        logger.warning(f"[{self.name}] 熔断器打开（{reason}），{self.config['open_seconds']} 秒内快速失败")
+
+    @property
+    def state(self) -> str:
+        """当前状态（closed/open/half_open）"""
+        with self._lock:
+            self._update_state(time.monotonic())
+            return self._state
+
+    def is_open(self) -> bool:
+        """是否处于打开状态（调用会被直接拒绝）"""
+        if not self.config['enabled']:
+            return False
+        return self.state == OPEN
+
+    # ---------- 调用 ----------
+
+    def allow_request(self) -> bool:
+        """
+        判断是否放行一次调用（放行后必须调用 record_success 或 record_failure）
+
+        返回:
+            是否放行
+        """
+        if not self.config['enabled']:
+            return True
+        with self._lock:
+            self._update_state(time.monotonic())
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.config['half_open_probes']:
+                self._probes += 1
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self, seconds: float) -> None:
+        """
+        记录一次成功调用（耗时超过 slow_call_seconds 视为慢调用）
+
+        参数:
+            seconds: 调用耗时
+        """
+        self._record(False, seconds)
+
+    def record_failure(self, seconds: float) -> None:
+        """
+        记录一次失败调用
+
+        参数:
+            seconds: 调用耗时
+        """
+        self._record(True, seconds)
+
+    def _record(self, failed: bool, seconds: float) -> None:
+        if not self.config['enabled']:
+            return
+        slow = seconds >= self.config['slow_call_seconds']
+        now = time.monotonic()
+        with self._lock:
+            self.stats['calls'] += 1
+            self.stats['failures'] += failed
+            self.stats['slow_calls'] += slow
+            self._update_state(now)
+
+            if self._state == HALF_OPEN:
+                if failed or slow:
+                    self._open(now, '探测调用失败' if failed else f"探测调用耗时 {seconds:.1f} 秒")
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.config['half_open_probes']:
+                    self._state = CLOSED
+                    self._window.clear()
+                    logger.info(f"[{self.name}] 探测调用成功，熔断器关闭")
+                return
+            if self._state == OPEN:
+                return
+
+            self._window.append((failed, slow))
+            if len(self._window) < self.config['min_calls']:
+                return
+            failure_rate = sum(item[0] for item in self._window) / len(self._window)
+            slow_rate = sum(item[1] for item in self._window) / len(self._window)
+            if failure_rate >= self.config['failure_rate_threshold']:
+                self._open(now, f"失败率 {failure_rate:.0%}")
+            elif slow_rate >= self.config['slow_rate_threshold']:
+                self._open(now, f"慢调用率 {slow_rate:.0%}")
+
+    # ---------- 统计 ----------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器状态与统计"""
+        with self._lock:
+            now = time.monotonic()
+            self._update_state(now)
+            stats = dict(self.stats)
+            window = list(self._window)
+            stats['state'] = self._state if self.config['enabled'] else 'disabled'
+            stats['open_remaining'] = (max(0.0, self.config['open_seconds'] - (now - self._opened_at))
+                                       if self._state == OPEN else 0.0)
+        stats['window_calls'] = len(window)
+        stats['failure_rate'] = sum(item[0] for item in window) / len(window) if window else 0
+        stats['slow_rate'] = sum(item[1] for item in window) / len(window) if window else 0
+        return stats
+
+
+# 按名称共享的熔断器
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """
+    获取指定名称的共享熔断器（首次获取时按 LLM_CIRCUIT_BREAKER_CONFIG 创建）
+
+    参数:
+        name: 名称
+
+    返回:
+        CircuitBreaker实例
+    """
+    breaker = _circuit_breakers.get(name)
+    if breaker is not None:
+        return breaker
+
+    with _circuit_breakers_lock:
+        if name not in _circuit_breakers:
+            _circuit_breakers[name] = CircuitBreaker(name)
+        return _circuit_breakers[name]
+
+
+def get_circuit_breaker_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    获取全部熔断器的状态与统计
+
+    返回:
+        {名称: 统计}
+    """
+    return {name: breaker.get_stats() for name, breaker in list(_circuit_breakers.items())}
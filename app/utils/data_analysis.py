@@ -721,7 +721,7 @@ class DataVisualizer:
 
 
 def generate_plotly_chart_for_sql(query, params=None, chart_type='line', 
-                                 x=None, y=None, title=None, **kwargs):
+                                 x=None, y=None, title=None, df=None, **kwargs):
     """
     根据SQL查询生成Plotly图表
     
@@ -732,6 +732,7 @@ def generate_plotly_chart_for_sql(query, params=None, chart_type='line',
         x: x轴字段
         y: y轴字段
         title: 图表标题
+        df: 已查询好的数据（如沙箱执行的结果），提供时不再执行query
         **kwargs: 其他参数
         
     返回:
@@ -739,7 +740,8 @@ def generate_plotly_chart_for_sql(query, params=None, chart_type='line',
     """
     try:
         # 执行查询
-        df = execute_query_to_dataframe(query, params)
+        if df is None:
+            df = execute_query_to_dataframe(query, params)
         
         if df.empty:
             return None
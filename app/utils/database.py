@@ -4,8 +4,9 @@
 import sqlite3
 import os
 import json
-from typing import Dict, List, Any, Optional, Tuple, Union, Callable
+from typing import Dict, List, Any, Optional, Sequence, Tuple, Union, Callable
 from contextlib import contextmanager
+from contextvars import ContextVar
 import time
 import logging
 from flask import current_app
@@ -15,6 +16,38 @@ import traceback
 from app.config import config
 from app.utils.error_handler import ErrorType, ErrorCode, error_response
 from app.utils.logger import log_query, log_error
+from app.utils.db_writer import get_db_writer, write_queue_enabled, WRITE_ERRORS
+from app.utils.pagination import parse_order_by, keyset_condition, decode_cursor, build_page
+from app.config.base import PAGINATION_CONFIG
+
+# SQL语句监听器（count_queries 使用）：按上下文保存，并发请求与其他线程的语句互不计入，
+# 嵌套使用时外层同样记录内层代码块的语句
+_query_listeners: ContextVar[Tuple[Callable[[str], None], ...]] = ContextVar('query_listeners', default=())
+
+def _notify_query_listeners(statement: str) -> None:
+    for listener in _query_listeners.get():
+        listener(statement)
+
+@contextmanager
+def count_queries():
+    """
+    记录代码块内经由 get_db_connection / transaction 执行的SQL语句（调试与校验查询次数用）
+    只记录当前线程（上下文）中执行的语句，可以嵌套使用
+    
+    用法:
+        with count_queries() as statements:
+            MedicalRecord.query().include('patient').get_models()
+        print(len(statements))
+    
+    返回:
+        执行过的SQL语句列表（连接初始化的PRAGMA不计入）
+    """
+    statements: List[str] = []
+    token = _query_listeners.set(_query_listeners.get() + (statements.append,))
+    try:
+        yield statements
+    finally:
+        _query_listeners.reset(token)
 
 # 连接数据库
 @contextmanager
@@ -39,6 +72,8 @@ def get_db_connection():
         # 设置数据库参数
         for pragma, value in config.DB_PRAGMA_SETTINGS.items():
             conn.execute(f"PRAGMA {pragma} = {value}")
+        if _query_listeners.get():
+            conn.set_trace_callback(_notify_query_listeners)
         
         yield conn
         conn.commit()
@@ -113,6 +148,8 @@ def transaction():
         # 设置数据库参数
         for pragma, value in config.DB_PRAGMA_SETTINGS.items():
             conn.execute(f"PRAGMA {pragma} = {value}")
+        if _query_listeners.get():
+            conn.set_trace_callback(_notify_query_listeners)
             
         yield conn
         conn.commit()
@@ -145,16 +182,93 @@ def insert_record(table: str, data: Dict[str, Any]) -> Optional[int]:
         columns = ', '.join(data.keys())
         query = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
         
+        # 经由单写线程分组提交，避免并发写入时的锁竞争
+        if write_queue_enabled():
+            return get_db_writer().execute(query, tuple(data.values()))["last_insert_id"]
+        
         with get_db_connection() as conn:
             cur = conn.execute(query, tuple(data.values()))
             return cur.lastrowid
-    except sqlite3.Error as e:
+    except WRITE_ERRORS as e:
         log_error(config.DB_ERROR_MESSAGES['data_error'].format(str(e)), 
                   error_code=config.DB_ERROR_CODES['data'], 
                   error_type=ErrorType.DATABASE,
                   details={"table": table})
         return None
 
+def quote_identifier(name: str) -> str:
+    """为列名/表名加双引号（列名可能是 order 等SQL关键字）"""
+    return '"' + name.replace('"', '""') + '"'
+
+def _bulk_write_sql(table: str, columns: Sequence[str], key: str, mode: str) -> str:
+    """生成批量写入语句（upsert/insert/update）"""
+    quoted_key = quote_identifier(key)
+    if mode == 'update':
+        set_clause = ', '.join(f"{quote_identifier(c)} = ?" for c in columns if c != key)
+        return f"UPDATE {table} SET {set_clause} WHERE {quoted_key} = ?"
+
+    placeholders = ', '.join(['?'] * len(columns))
+    query = f"INSERT INTO {table} ({', '.join(map(quote_identifier, columns))}) VALUES ({placeholders})"
+    if mode == 'upsert':
+        updates = ', '.join(f"{quote_identifier(c)} = excluded.{quote_identifier(c)}" for c in columns if c != key)
+        query += (f" ON CONFLICT ({quoted_key}) DO UPDATE SET {updates}" if updates
+                  else f" ON CONFLICT ({quoted_key}) DO NOTHING")
+    elif mode != 'insert':
+        raise ValueError(f"不支持的批量写入模式: {mode}")
+    return query
+
+def upsert_record(table: str, data: Dict[str, Any], key: str = 'id') -> bool:
+    """
+    插入或更新一条记录（INSERT ... ON CONFLICT DO UPDATE），一次往返完成
+
+    参数:
+        table: 表名
+        data: 记录数据（须包含 key 列）
+        key: 冲突判断列，须为主键或唯一索引
+
+    返回:
+        是否成功
+    """
+    return bulk_write_records(table, list(data.keys()), [tuple(data.values())], key=key) is not None
+
+def bulk_write_records(table: str, columns: Sequence[str], rows: Sequence[Sequence[Any]],
+                       key: str = 'id', mode: str = 'upsert') -> Optional[int]:
+    """
+    在一个事务内用 executemany 批量写入记录
+
+    参数:
+        table: 表名
+        columns: 列名（每行的值与之顺序一致）
+        rows: 行数据
+        key: 主键列（upsert 的冲突判断列、update 的定位列）
+        mode: upsert - 插入或更新; insert - 仅插入; update - 仅更新已存在的记录
+
+    返回:
+        受影响的行数，失败返回None
+    """
+    if not rows:
+        return 0
+
+    query = _bulk_write_sql(table, columns, key, mode)
+    if mode == 'update':
+        # UPDATE 语句中主键参数在最后
+        key_index = list(columns).index(key)
+        rows = [tuple(v for i, v in enumerate(row) if i != key_index) + (row[key_index],) for row in rows]
+
+    try:
+        # 经由单写线程时整批作为一个写意图提交
+        if write_queue_enabled():
+            return get_db_writer().execute_many(query, rows)["affected_rows"]
+
+        with get_db_connection() as conn:
+            return conn.executemany(query, rows).rowcount
+    except WRITE_ERRORS as e:
+        log_error(config.DB_ERROR_MESSAGES['data_error'].format(str(e)),
+                  error_code=config.DB_ERROR_CODES['data'],
+                  error_type=ErrorType.DATABASE,
+                  details={"table": table, "mode": mode, "rows": len(rows)})
+        return None
+
 def update_record(table: str, data: Dict[str, Any], condition: str, params: Tuple) -> bool:
     """
     更新记录
@@ -176,10 +290,14 @@ def update_record(table: str, data: Dict[str, Any], condition: str, params: Tupl
         # 组合参数（先是SET子句的参数，再是WHERE子句的参数）
         all_params = tuple(data.values()) + params
         
+        if write_queue_enabled():
+            get_db_writer().execute(query, all_params)
+            return True
+        
         with get_db_connection() as conn:
             conn.execute(query, all_params)
             return True
-    except sqlite3.Error as e:
+    except WRITE_ERRORS as e:
         log_error(config.DB_ERROR_MESSAGES['data_error'].format(str(e)), 
                   error_code=config.DB_ERROR_CODES['data'], 
                   error_type=ErrorType.DATABASE,
@@ -201,10 +319,14 @@ def delete_record(table: str, condition: str, params: Tuple) -> bool:
     try:
         query = f"DELETE FROM {table} WHERE {condition}"
         
+        if write_queue_enabled():
+            get_db_writer().execute(query, params)
+            return True
+        
         with get_db_connection() as conn:
             conn.execute(query, params)
             return True
-    except sqlite3.Error as e:
+    except WRITE_ERRORS as e:
         log_error(config.DB_ERROR_MESSAGES['data_error'].format(str(e)), 
                   error_code=config.DB_ERROR_CODES['data'], 
                   error_type=ErrorType.DATABASE,
@@ -240,8 +362,39 @@ def get_record(table: str, fields: str = '*', condition: str = '', params: Tuple
                   details={"table": table})
         return None
 
+def _select_query(table: str, fields: str, condition: str, params: Tuple, order_by: str,
+                  limit: int, offset: int, after: Optional[Sequence]) -> Tuple[str, Tuple]:
+    """构建 get_records / get_record_tuples 共用的查询语句"""
+    conditions = [f"({condition})"] if condition else []
+    params = tuple(params)
+    if after is not None:
+        seek_condition, seek_params = keyset_condition(parse_order_by(order_by), after)
+        conditions.append(seek_condition)
+        params += tuple(seek_params)
+    
+    query = f"SELECT {fields} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    if limit:
+        query += f" LIMIT {limit}"
+    if offset:
+        query += f" OFFSET {offset}"
+    return query, params
+
+def _route_partitions(conn, query: str, date_range: Optional[Tuple[Any, Any]]) -> str:
+    """按日期范围把事实表改写为主库与已归档年份分区的并集（date_range 为None时原样返回）"""
+    if date_range is None:
+        return query
+    # 延迟导入，partitioning 依赖本模块
+    from app.utils.partitioning import route_query
+    return route_query(conn, query, *date_range)
+
 def get_records(table: str, fields: str = '*', condition: str = '', params: Tuple = (), 
-               order_by: str = '', limit: int = 0, offset: int = 0) -> List[Dict]:
+               order_by: str = '', limit: int = 0, offset: int = 0,
+               after: Optional[Sequence] = None,
+               date_range: Optional[Tuple[Any, Any]] = None) -> List[Dict]:
     """
     获取多条记录
     
@@ -253,23 +406,17 @@ def get_records(table: str, fields: str = '*', condition: str = '', params: Tupl
         order_by: 排序
         limit: 限制
         offset: 偏移
+        after: 键集分页的起点，即上一页最后一行的排序键值（与order_by的列一一对应）
+        date_range: (起始日期, 结束日期)，提供时同时读取范围内已归档年份的分区（None表示不限）
         
     返回:
         记录列表
     """
     try:
-        query = f"SELECT {fields} FROM {table}"
-        if condition:
-            query += f" WHERE {condition}"
-        if order_by:
-            query += f" ORDER BY {order_by}"
-        if limit:
-            query += f" LIMIT {limit}"
-        if offset:
-            query += f" OFFSET {offset}"
+        query, params = _select_query(table, fields, condition, params, order_by, limit, offset, after)
         
         with get_db_connection() as conn:
-            cur = conn.execute(query, params)
+            cur = conn.execute(_route_partitions(conn, query, date_range), params)
             rows = cur.fetchall()
             return [dict(row) for row in rows]
     except sqlite3.Error as e:
@@ -279,7 +426,117 @@ def get_records(table: str, fields: str = '*', condition: str = '', params: Tupl
                   details={"table": table})
         return []
 
-def count_records(table: str, condition: str = '', params: Tuple = ()) -> int:
+def get_record_tuples(table: str, fields: str = '*', condition: str = '', params: Tuple = (),
+                      order_by: str = '', limit: int = 0, offset: int = 0,
+                      after: Optional[Sequence] = None) -> List[Tuple]:
+    """
+    获取多条记录的原始元组（不构造字典，列顺序与 fields 一致），参数同 get_records
+    
+    返回:
+        记录元组列表
+    """
+    try:
+        query, params = _select_query(table, fields, condition, params, order_by, limit, offset, after)
+        
+        with get_db_connection() as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            return cur.execute(query, params).fetchall()
+    except sqlite3.Error as e:
+        log_error(config.DB_ERROR_MESSAGES['data_error'].format(str(e)), 
+                  error_code=config.DB_ERROR_CODES['data'], 
+                  error_type=ErrorType.DATABASE,
+                  details={"table": table})
+        return []
+
+def get_records_page(table: str, fields: str = '*', condition: str = '', params: Tuple = (),
+                     order_by: str = 'id', limit: int = 0, cursor: Optional[str] = None,
+                     count: Optional[str] = None,
+                     date_range: Optional[Tuple[Any, Any]] = None) -> Dict[str, Any]:
+    """
+    键集分页获取记录
+    
+    参数:
+        table: 表名
+        fields: 字段（需包含排序列）
+        condition: 条件
+        params: 条件参数
+        order_by: 排序，最后一列应唯一（如 "visit_date DESC, id DESC"）
+        limit: 每页行数，默认使用分页配置
+        cursor: 上一页返回的 next_cursor
+        count: None不计数；'approx' 近似计数；'exact' 精确计数
+        date_range: (起始日期, 结束日期)，提供时同时读取范围内已归档年份的分区
+        
+    返回:
+        {'items': [...], 'next_cursor': 游标或None, 'has_more': bool, 'count': 计数信息（按需）}
+    """
+    keys = parse_order_by(order_by)
+    size = min(limit or PAGINATION_CONFIG['default_page_size'], PAGINATION_CONFIG['max_page_size'])
+    after = decode_cursor(cursor, keys) if cursor else None
+    
+    rows = get_records(table, fields, condition, params, order_by, size + 1, after=after, date_range=date_range)
+    page = build_page(rows, size, keys)
+    if count == 'exact':
+        page['count'] = {'value': count_records(table, condition, params, date_range=date_range), 'exact': True}
+    elif count == 'approx':
+        page['count'] = approximate_count(table, condition, params, date_range=date_range)
+    return page
+
+def approximate_count(table: str, condition: str = '', params: Tuple = (),
+                      cap: Optional[int] = None,
+                      date_range: Optional[Tuple[Any, Any]] = None) -> Dict[str, Any]:
+    """
+    近似统计记录数，避免大表上的全表COUNT(*)
+    
+    无条件时使用ANALYZE收集的统计信息（sqlite_stat1），没有统计信息时用最大rowid估算；
+    有条件时最多计数cap行，超过时返回下限
+    
+    参数:
+        table: 表名
+        condition: 条件
+        params: 条件参数
+        cap: 最多计数的行数，默认使用分页配置
+        date_range: (起始日期, 结束日期)，提供时计入范围内已归档年份的分区（不使用主库的统计信息）
+        
+    返回:
+        {'value': 计数, 'exact': 是否精确}
+    """
+    cap = cap or PAGINATION_CONFIG['approx_count_cap']
+    try:
+        with get_db_connection() as conn:
+            if not condition and date_range is None:
+                try:
+                    row = conn.execute(
+                        "SELECT stat FROM sqlite_stat1 WHERE tbl = ? ORDER BY idx IS NULL DESC LIMIT 1",
+                        (table,)
+                    ).fetchone()
+                except sqlite3.OperationalError:
+                    row = None
+                if row and row['stat']:
+                    return {'value': int(row['stat'].split()[0]), 'exact': False}
+                try:
+                    row = conn.execute(f"SELECT MAX(rowid) AS value FROM {table}").fetchone()
+                    return {'value': row['value'] or 0, 'exact': False}
+                except sqlite3.OperationalError:
+                    pass
+            
+            query = f"SELECT COUNT(*) AS value FROM (SELECT 1 FROM {table}"
+            if condition:
+                query += f" WHERE {condition}"
+            query += f" LIMIT {int(cap) + 1})"
+            value = conn.execute(_route_partitions(conn, query, date_range), params).fetchone()['value']
+            if value > cap:
+                return {'value': cap, 'exact': False}
+            return {'value': value, 'exact': True}
+    except sqlite3.Error as e:
+        log_error(config.DB_ERROR_MESSAGES['data_error'].format(str(e)), 
+                  error_code=config.DB_ERROR_CODES['data'], 
+                  error_type=ErrorType.DATABASE,
+                  details={"table": table})
+        return {'value': 0, 'exact': False}
+
+def count_records(table: str, condition: str = '', params: Tuple = (),
+                  date_range: Optional[Tuple[Any, Any]] = None) -> int:
     """
     统计记录数
     
@@ -287,6 +544,7 @@ def count_records(table: str, condition: str = '', params: Tuple = ()) -> int:
         table: 表名
         condition: 条件
         params: 条件参数
+        date_range: (起始日期, 结束日期)，提供时计入范围内已归档年份的分区
         
     返回:
         记录数
@@ -297,7 +555,7 @@ def count_records(table: str, condition: str = '', params: Tuple = ()) -> int:
             query += f" WHERE {condition}"
         
         with get_db_connection() as conn:
-            cur = conn.execute(query, params)
+            cur = conn.execute(_route_partitions(conn, query, date_range), params)
             row = cur.fetchone()
             return row['count'] if row else 0
     except sqlite3.Error as e:
@@ -346,6 +604,10 @@ def init_database(schema_file: str = None) -> bool:
         conn.commit()
         conn.close()
         
+        # 表结构已变化，表结构提示词重新分析（延迟导入，避免循环依赖）
+        from app.services.schema_prompt_builder import get_schema_prompt_builder
+        get_schema_prompt_builder().refresh()
+        
         return True
     except (sqlite3.Error, IOError) as e:
         log_error(config.DB_ERROR_MESSAGES['init_error'].format(str(e)), 
@@ -868,8 +1130,10 @@ class QueryBuilder:
     """
     SQL查询构建器
     """
-    def __init__(self, table: str):
+    def __init__(self, table: str, model: Optional[type] = None):
         self.table = table
+        self.model = model
+        self.includes = []
         self.fields = '*'
         self.conditions = []
         self.params = []
@@ -880,6 +1144,8 @@ class QueryBuilder:
         self.group_by_clause = ''
         self.having_clause = ''
         self.having_params = []
+        self.after_values = None
+        self.after_cursor = None
         
     def select(self, fields: str) -> 'QueryBuilder':
         """设置选择字段"""
@@ -907,6 +1173,44 @@ class QueryBuilder:
         self.offset_value = value
         return self
         
+    def after(self, *values, cursor: Optional[str] = None) -> 'QueryBuilder':
+        """
+        键集分页：只返回排序位于给定键值之后的记录
+        
+        用法:
+            QueryBuilder('visits').order_by('visit_date DESC, id DESC').after('2024-01-01', 1024)
+            QueryBuilder('visits').order_by('visit_date DESC, id DESC').after(cursor=next_cursor)
+        
+        参数:
+            values: 上一页最后一行的排序键值，与order_by的列一一对应（支持复合键）
+            cursor: page()返回的next_cursor，与values二选一
+        """
+        self.after_values = list(values) if values else None
+        self.after_cursor = cursor
+        return self
+        
+    def sort_keys(self) -> List[Tuple[str, bool]]:
+        """获取排序键 [(列名, 是否降序), ...]"""
+        return parse_order_by(self.order_by_clause)
+        
+    def include(self, *names: str) -> 'QueryBuilder':
+        """
+        预加载关联（模型的 __relations__ 中声明），每个关联只发出一条 WHERE key IN (...) 查询
+        
+        用法:
+            MedicalRecord.query().where("department = ?", '内科').include('patient', 'doctor').get_models()
+        
+        参数:
+            names: 关联名，支持点号路径（如 'category.parent'）
+        """
+        if self.model is None:
+            raise ValueError("include 需要通过模型创建的查询构建器（Model.query()）")
+        from app.models.relations import get_relation
+        for name in names:
+            get_relation(self.model, name.partition('.')[0])
+        self.includes.extend(names)
+        return self
+        
     def join(self, table: str, condition: str, join_type: str = 'INNER') -> 'QueryBuilder':
         """添加JOIN"""
         self.joins.append((join_type, table, condition))
@@ -939,9 +1243,17 @@ class QueryBuilder:
         for join_type, table, condition in self.joins:
             query += f" {join_type} JOIN {table} ON {condition}"
             
-        # 添加WHERE
-        if self.conditions:
-            query += " WHERE " + " AND ".join(self.conditions)
+        # 添加WHERE（包括键集分页条件）
+        conditions = list(self.conditions)
+        where_params = list(self.params)
+        if self.after_values is not None or self.after_cursor:
+            keys = self.sort_keys()
+            values = self.after_values if self.after_values is not None else decode_cursor(self.after_cursor, keys)
+            seek_condition, seek_params = keyset_condition(keys, values)
+            conditions.append(seek_condition)
+            where_params.extend(seek_params)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
             
         # 添加GROUP BY
         if self.group_by_clause:
@@ -962,20 +1274,90 @@ class QueryBuilder:
             query += f" OFFSET {self.offset_value}"
             
         # 合并参数
-        all_params = tuple(self.params + self.having_params)
+        all_params = tuple(where_params + self.having_params)
         
         return query, all_params
         
     def get_one(self) -> Optional[Dict]:
-        """执行查询并获取一条记录"""
+        """执行查询并获取一条记录（有预加载关联时附带关联记录）"""
+        if self.includes:
+            original_limit = self.limit_value
+            self.limit_value = 1
+            try:
+                rows = self.get_all()
+            finally:
+                self.limit_value = original_limit
+            return rows[0] if rows else None
         query, params = self.build()
         return execute_query(query, params, fetch_one=True)
         
     def get_all(self) -> List[Dict]:
-        """执行查询并获取所有记录"""
+        """执行查询并获取所有记录（有预加载关联时以关联名为键附带关联记录）"""
+        if self.includes:
+            from app.models.relations import relation_dict
+            return [relation_dict(instance, self.includes) for instance in self.get_models()]
         query, params = self.build()
         return execute_query(query, params, fetch_one=False) or []
         
+    def get_models(self) -> List[Any]:
+        """
+        执行查询并返回模型实例，预加载的关联作为同名属性写入实例
+        
+        返回:
+            模型实例列表
+        """
+        if self.model is None:
+            raise ValueError("get_models 需要通过模型创建的查询构建器（Model.query()）")
+        query, params = self.build()
+        instances = [self.model.from_dict(row) for row in execute_query(query, params, fetch_one=False) or []]
+        if self.includes:
+            from app.models.relations import load_relations
+            load_relations(self.model, instances, self.includes)
+        return instances
+        
+    def page(self, size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        执行键集分页查询
+        
+        参数:
+            size: 每页行数，默认使用分页配置
+            
+        返回:
+            {'items': [...], 'next_cursor': 游标或None, 'has_more': bool}
+        """
+        size = min(size or self.limit_value or PAGINATION_CONFIG['default_page_size'],
+                   PAGINATION_CONFIG['max_page_size'])
+        original_limit = self.limit_value
+        self.limit_value = size + 1
+        try:
+            rows = self.get_all()
+        finally:
+            self.limit_value = original_limit
+        return build_page(rows, size, self.sort_keys())
+        
+    def approximate_count(self, cap: Optional[int] = None) -> Dict[str, Any]:
+        """
+        近似记录数：最多计数cap行，超过时返回下限
+        
+        返回:
+            {'value': 计数, 'exact': 是否精确}
+        """
+        cap = cap or PAGINATION_CONFIG['approx_count_cap']
+        original = (self.fields, self.order_by_clause, self.limit_value, self.offset_value,
+                    self.after_values, self.after_cursor)
+        self.fields, self.order_by_clause, self.limit_value, self.offset_value = '1', '', cap + 1, 0
+        self.after_values = self.after_cursor = None
+        try:
+            query, params = self.build()
+        finally:
+            (self.fields, self.order_by_clause, self.limit_value, self.offset_value,
+             self.after_values, self.after_cursor) = original
+        result = execute_query(f"SELECT COUNT(*) AS count FROM ({query})", params, fetch_one=True)
+        value = result['count'] if result else 0
+        if value > cap:
+            return {'value': cap, 'exact': False}
+        return {'value': value, 'exact': True}
+        
     def count(self) -> int:
         """获取记录数"""
         # 保存原始字段
@@ -1305,14 +1687,20 @@ def execute_many(query: str, params_list: list):
         query: SQL查询语句
         params_list: 参数列表
     """
+    conn = None
     try:
+        # 经由单写线程分组提交
+        if write_queue_enabled():
+            get_db_writer().execute_many(query, params_list)
+            return True
+        
         database_path = config.DATABASE_PATH
         conn = sqlite3.connect(database_path)
         cursor = conn.cursor()
         cursor.executemany(query, params_list)
         conn.commit()
         return True
-    except sqlite3.Error as e:
+    except WRITE_ERRORS as e:
         if conn:
             conn.rollback()
         log_error(config.DB_ERROR_MESSAGES['transaction_error'].format(str(e)), 
@@ -1330,7 +1718,16 @@ def execute_transaction(queries: list):
     参数:
         queries: 查询列表，每个元素是(query, params)元组
     """
+    conn = None
     try:
+        # 经由单写线程执行，全部语句在同一个保存点内，要么全部生效要么全部回滚
+        if write_queue_enabled():
+            def apply(write_conn):
+                for query, params in queries:
+                    write_conn.execute(query, params)
+            get_db_writer().run(apply)
+            return True
+        
         database_path = config.DATABASE_PATH
         conn = sqlite3.connect(database_path)
         cursor = conn.cursor()
@@ -1340,7 +1737,7 @@ def execute_transaction(queries: list):
             
         conn.commit()
         return True
-    except sqlite3.Error as e:
+    except WRITE_ERRORS as e:
         if conn:
             conn.rollback()
         log_error(config.DB_ERROR_MESSAGES['transaction_error'].format(str(e)), 
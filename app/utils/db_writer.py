@@ -0,0 +1,361 @@
+"""
+数据库写入队列模块 - 单写线程 + 分组提交
+
+SQLite同一时刻只允许一个写事务，多个请求各自打开连接写入时会互相等待，
+并在高并发下出现 database is locked。本模块由一个后台线程独占唯一的写连接：
+调用方把写入意图放入队列并得到Future，写线程按数量或延迟上限把多个意图
+合并到同一个事务中提交（group commit），每个意图使用独立的SAVEPOINT，
+单个意图失败不会影响同批次的其他写入。
+"""
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+
+from app.config import config
+from app.config.base import WRITE_QUEUE_CONFIG
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 队列中用于通知写线程退出的哨兵
+_STOP = object()
+
+# 经由写入器写入时调用方可能收到的异常：SQLite错误、等待超时、写入器已关闭
+WRITE_ERRORS = (sqlite3.Error, FutureTimeoutError, RuntimeError)
+
+
+class WriteIntent:
+    """一次写入意图"""
+    __slots__ = ('sql', 'params', 'many', 'func', 'future')
+
+    def __init__(self, sql: Optional[str] = None, params: Any = (), many: bool = False,
+                 func: Optional[Callable[[sqlite3.Connection], Any]] = None):
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.func = func
+        self.future = Future()
+
+    def apply(self, conn: sqlite3.Connection) -> Any:
+        """在写连接上执行意图，返回结果"""
+        if self.func is not None:
+            return self.func(conn)
+        if self.many:
+            cur = conn.executemany(self.sql, self.params)
+            return {"affected_rows": cur.rowcount, "last_insert_id": None}
+        cur = conn.execute(self.sql, self.params or ())
+        return {"affected_rows": cur.rowcount, "last_insert_id": cur.lastrowid}
+
+
+class DatabaseWriter:
+    """单写线程的数据库写入器"""
+
+    def __init__(self, database_path: Optional[str] = None,
+                 writer_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化写入器
+
+        参数:
+            database_path: 数据库路径，默认使用配置中的DATABASE_PATH
+            writer_config: 覆盖 WRITE_QUEUE_CONFIG 的配置项
+        """
+        self.config = dict(WRITE_QUEUE_CONFIG)
+        if writer_config:
+            self.config.update(writer_config)
+
+        self.database_path = database_path or config.DATABASE_PATH
+        self.max_batch_size = self.config.get('max_batch_size', 256)
+        self.max_latency = self.config.get('max_latency_ms', 0) / 1000.0
+
+        self._queue = queue.Queue(maxsize=self.config.get('queue_maxsize', 0))
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
+
+        # 统计信息
+        self.stats = {
+            'intents': 0,
+            'batches': 0,
+            'failed_intents': 0,
+            'failed_batches': 0
+        }
+
+    # ------------------------------------------------------------------
+    # 生命周期
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """启动写线程（首次提交时自动调用）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+            self._thread.start()
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """
+        停止写线程，已入队的意图会先全部写完
+
+        参数:
+            timeout: 等待写线程结束的秒数
+        """
+        if self._thread is None:
+            return
+        self._stopped = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """创建写线程独占的连接"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.database_path)), exist_ok=True)
+        # isolation_level=None: 事务由写线程显式控制
+        conn = sqlite3.connect(self.database_path, isolation_level=None,
+                               timeout=self.config.get('busy_timeout', 30))
+        for pragma, value in getattr(config, 'DB_PRAGMA_SETTINGS', {}).items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    # ------------------------------------------------------------------
+    # 提交接口
+    # ------------------------------------------------------------------
+    def _submit(self, intent: WriteIntent) -> Future:
+        if self._stopped:
+            raise RuntimeError("数据库写入器已关闭")
+        self.start()
+        self._queue.put(intent)
+        return intent.future
+
+    def submit(self, sql: str, params: Union[Sequence, Dict] = ()) -> Future:
+        """
+        提交一条写语句
+
+        参数:
+            sql: INSERT/UPDATE/DELETE语句
+            params: 语句参数
+
+        返回:
+            Future，结果为 {"affected_rows": ..., "last_insert_id": ...}
+        """
+        return self._submit(WriteIntent(sql, params))
+
+    def submit_many(self, sql: str, params_list: Sequence) -> Future:
+        """
+        提交一条批量写语句（executemany）
+
+        参数:
+            sql: 写语句
+            params_list: 参数列表
+
+        返回:
+            Future，结果为 {"affected_rows": ..., "last_insert_id": None}
+        """
+        return self._submit(WriteIntent(sql, list(params_list), many=True))
+
+    def submit_callable(self, func: Callable[[sqlite3.Connection], Any]) -> Future:
+        """
+        提交一个在写连接上执行的函数，函数内的多条语句与同批次其他意图一起提交
+
+        参数:
+            func: 接收连接参数的函数，不应自行提交或回滚
+
+        返回:
+            Future，结果为函数返回值
+        """
+        return self._submit(WriteIntent(func=func))
+
+    def execute(self, sql: str, params: Union[Sequence, Dict] = (),
+                timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        同步执行一条写语句，等待所在批次提交后返回
+
+        参数:
+            sql: 写语句
+            params: 语句参数
+            timeout: 等待秒数，默认使用配置中的 submit_timeout
+
+        返回:
+            {"affected_rows": ..., "last_insert_id": ...}
+        """
+        future = self.submit(sql, params)
+        return future.result(timeout if timeout is not None else self.config.get('submit_timeout'))
+
+    def execute_many(self, sql: str, params_list: Sequence,
+                     timeout: Optional[float] = None) -> Dict[str, Any]:
+        """同步执行批量写语句"""
+        future = self.submit_many(sql, params_list)
+        return future.result(timeout if timeout is not None else self.config.get('submit_timeout'))
+
+    def run(self, func: Callable[[sqlite3.Connection], Any],
+            timeout: Optional[float] = None) -> Any:
+        """同步执行写函数并返回其结果"""
+        future = self.submit_callable(func)
+        return future.result(timeout if timeout is not None else self.config.get('submit_timeout'))
+
+    # ------------------------------------------------------------------
+    # 写线程
+    # ------------------------------------------------------------------
+    def _collect_batch(self, first: Any) -> Tuple[list, bool]:
+        """从队列中收集一批意图，返回 (意图列表, 是否收到停止信号)"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        """写线程主循环"""
+        conn = None
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            logger.error(f"数据库写入器无法建立连接: {str(e)}")
+
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                # 处理停止信号前已入队的意图
+                pending = []
+                while True:
+                    try:
+                        pending.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                pending = [p for p in pending if p is not _STOP]
+                if not pending:
+                    break
+                batch, stop = pending, True
+            else:
+                batch, stop = self._collect_batch(item)
+
+            if conn is None:
+                error = sqlite3.OperationalError("数据库写入器连接不可用")
+                for intent in batch:
+                    intent.future.set_exception(error)
+                try:
+                    conn = self._connect()
+                except sqlite3.Error:
+                    conn = None
+                continue
+
+            try:
+                self._commit_batch(conn, batch)
+            except Exception as e:
+                # 兜底：写线程不能因单个批次异常退出，否则之后的调用方都会一直等待
+                logger.error(f"数据库写入器提交批次异常: {str(e)}")
+                self._fail_batch(conn, batch, sqlite3.OperationalError(f"数据库写入器提交批次异常: {str(e)}"))
+
+        if conn is not None:
+            conn.close()
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: list) -> None:
+        """在一个事务中执行一批意图并提交"""
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            self._fail_batch(conn, batch, e)
+            return
+
+        for intent in batch:
+            try:
+                conn.execute("SAVEPOINT write_intent")
+            except sqlite3.Error as e:
+                self._fail_batch(conn, batch, e)
+                return
+            try:
+                result = intent.apply(conn)
+            except Exception as e:
+                result, error = None, e
+            else:
+                error = None
+            try:
+                if error is not None:
+                    conn.execute("ROLLBACK TO write_intent")
+                conn.execute("RELEASE write_intent")
+            except sqlite3.Error as e:
+                # 意图自行结束了事务，或SQLite因磁盘满、IO错误等自动回滚，保存点已不存在；
+                # 同批次的写入无法确认是否生效，尚未通知的调用方都以失败返回，写线程继续处理后续批次
+                self._fail_batch(conn, batch, error or e)
+                return
+            results.append((intent, result, error))
+
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            self._fail_batch(conn, batch, e)
+            return
+
+        self.stats['batches'] += 1
+        self.stats['intents'] += len(batch)
+        # 事务提交后再通知调用方，保证调用方读到的是已持久化的数据
+        for intent, result, error in results:
+            if error is not None:
+                self.stats['failed_intents'] += 1
+                intent.future.set_exception(error)
+            else:
+                intent.future.set_result(result)
+
+    def _fail_batch(self, conn: sqlite3.Connection, batch: list, error: BaseException) -> None:
+        """回滚仍未结束的事务，并让批次中尚未完成的意图以失败返回"""
+        if conn.in_transaction:
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+        self.stats['failed_batches'] += 1
+        for intent in batch:
+            if not intent.future.done():
+                intent.future.set_exception(error)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入统计"""
+        stats = dict(self.stats)
+        stats['queue_size'] = self._queue.qsize()
+        stats['avg_batch_size'] = stats['intents'] / stats['batches'] if stats['batches'] else 0
+        return stats
+
+
+# 全局写入器实例
+_db_writer = None
+_db_writer_lock = threading.Lock()
+
+
+def get_db_writer() -> DatabaseWriter:
+    """
+    获取共享的数据库写入器
+
+    返回:
+        DatabaseWriter实例
+    """
+    global _db_writer
+
+    if _db_writer is not None:
+        return _db_writer
+
+    with _db_writer_lock:
+        if _db_writer is None:
+            _db_writer = DatabaseWriter()
+            atexit.register(_db_writer.shutdown, 10)
+    return _db_writer
+
+
+def write_queue_enabled() -> bool:
+    """是否通过写入队列执行写操作"""
+    return bool(WRITE_QUEUE_CONFIG.get('enabled', True))
@@ -0,0 +1,278 @@
+"""
+大模型调用录制/回放模块 - 不访问真实API即可复现对话流程与基准测试
+
+- record: 请求照常发送到API，成功的回复连同请求与耗时追加写入JSONL录制文件
+- replay: 只从录制文件回放，不访问网络；按录制耗时（可缩放）或固定延迟模拟API延迟
+- off: 不介入，BaseLLMService 直接发送请求
+
+查找回复时先按完整请求匹配；工具结果中含耗时等每次不同的字段时完整请求无法匹配，
+再按"模型 + 系统/用户消息 + 第几轮 + tool_choice"匹配。同一请求有多条录制时按顺序轮流回放
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from app.config.base import LLM_REPLAY_CONFIG
+from app.utils.single_flight import make_key
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+OFF = 'off'
+RECORD = 'record'
+REPLAY = 'replay'
+
+
+def request_keys(payload: Dict[str, Any]) -> Dict[str, str]:
+    """
+    计算请求的匹配键
+
+    参数:
+        payload: chat/completions 请求体
+
+    返回:
+        {'key': 完整请求的键, 'loose_key': 忽略工具结果与模型中间回复的键}
+    """
+    messages = payload.get('messages') or []
+    prompts = [(message.get('role'), message.get('content')) for message in messages
+               if message.get('role') in ('system', 'user')]
+    turn = sum(1 for message in messages if message.get('role') == 'assistant')
+    tools = sorted((tool.get('function') or {}).get('name', '') for tool in payload.get('tools') or [])
+    return {
+        'key': make_key(payload),
+        'loose_key': make_key(payload.get('model'), prompts, turn, tools, payload.get('tool_choice'))
+    }
+
+
+class ReplayResponse:
+    """回放的HTTP响应（提供 BaseLLMService 用到的 status_code、json()、text）"""
+
+    def __init__(self, status_code: int, data: Dict[str, Any]):
+        self.status_code = status_code
+        self._data = data
+        self.text = json.dumps(data, ensure_ascii=False)
+
+    def json(self) -> Dict[str, Any]:
+        return self._data
+
+
+class LLMRecorder:
+    """大模型调用的录制与回放"""
+
+    def __init__(self, mode: Optional[str] = None, store_path: Optional[str] = None,
+                 replay_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化录制/回放
+
+        参数:
+            mode: off、record 或 replay，默认使用配置
+            store_path: 录制文件路径（JSONL），默认使用配置
+            replay_config: 其他回放配置（latency、latency_scale、jitter、seed、on_miss）
+        """
+        self.config = {**LLM_REPLAY_CONFIG, **(replay_config or {})}
+        self.mode = (mode or self.config['mode'] or OFF).lower()
+        if self.mode not in (OFF, RECORD, REPLAY):
+            raise ValueError(f"不支持的录制/回放模式: {self.mode}")
+        self.store_path = store_path or self.config['store_path']
+        self._lock = threading.Lock()
+        self._random = random.Random(self.config['seed'])
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._loose_entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursors: Dict[str, int] = {}
+        self.stats = {'recorded': 0, 'replayed': 0, 'loose_matches': 0, 'misses': 0}
+        if self.mode != OFF:
+            self.load()
+
+    @property
+    def enabled(self) -> bool:
+        """是否介入请求"""
+        return self.mode != OFF
+
+    # ---------- 录制文件 ----------
+
+    def load(self) -> int:
+        """
+        加载录制文件
+
+        返回:
+            加载的录制条数
+        """
+        entries = []
+        if os.path.exists(self.store_path):
+            with open(self.store_path, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        logger.warning(f"录制文件第 {line_number} 行无法解析，已跳过: {self.store_path}")
+        with self._lock:
+            self._entries.clear()
+            self._loose_entries.clear()
+            self._cursors.clear()
+            for entry in entries:
+                self._index(entry)
+        logger.info(f"加载大模型录制 {len(entries)} 条: {self.store_path}")
+        return len(entries)
+
+    def _index(self, entry: Dict[str, Any]) -> None:
+        self._entries.setdefault(entry['key'], []).append(entry)
+        self._loose_entries.setdefault(entry['loose_key'], []).append(entry)
+
+    def record(self, payload: Dict[str, Any], response: Dict[str, Any], seconds: float) -> None:
+        """
+        追加一条录制
+
+        参数:
+            payload: 请求体
+            response: API返回的JSON
+            seconds: 请求耗时
+        """
+        entry = {
+            **request_keys(payload),
+            'model': payload.get('model'),
+            'request': payload,
+            'response': response,
+            'seconds': round(seconds, 4),
+            'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            directory = os.path.dirname(self.store_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.store_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+            self._index(entry)
+            self.stats['recorded'] += 1
+
+    def lookup(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        查找请求对应的录制（同一请求有多条录制时按顺序轮流返回）
+
+        参数:
+            payload: 请求体
+
+        返回:
+            录制条目，未命中时返回None
+        """
+        keys = request_keys(payload)
+        with self._lock:
+            for name, index in (('key', self._entries), ('loose_key', self._loose_entries)):
+                candidates = index.get(keys[name])
+                if not candidates:
+                    continue
+                cursor_key = f"{name}:{keys[name]}"
+                cursor = self._cursors.get(cursor_key, 0)
+                self._cursors[cursor_key] = cursor + 1
+                self.stats['replayed'] += 1
+                if name == 'loose_key':
+                    self.stats['loose_matches'] += 1
+                return candidates[cursor % len(candidates)]
+            self.stats['misses'] += 1
+        return None
+
+    # ---------- 请求 ----------
+
+    def replay_delay(self, entry: Dict[str, Any]) -> float:
+        """回放时模拟的API延迟（秒）"""
+        latency = self.config['latency']
+        delay = latency if latency is not None else entry.get('seconds', 0) * self.config['latency_scale']
+        jitter = self.config['jitter']
+        if jitter:
+            with self._lock:
+                delay += self._random.uniform(-jitter, jitter)
+        return max(0.0, delay)
+
+    def post(self, url: str, headers: Dict[str, str], payload: Dict[str, Any], timeout: float):
+        """
+        代替 requests.post 发送 chat/completions 请求
+
+        参数:
+            url: API端点
+            headers: 请求头
+            payload: 请求体
+            timeout: 超时秒数
+
+        返回:
+            requests.Response 或 ReplayResponse
+        """
+        if self.mode == REPLAY:
+            entry = self.lookup(payload)
+            if entry is not None:
+                delay = self.replay_delay(entry)
+                if delay > timeout:
+                    time.sleep(timeout)
+                    raise requests.exceptions.Timeout(f"回放延迟 {delay:.1f} 秒超过超时时间 {timeout} 秒")
+                time.sleep(delay)
+                return ReplayResponse(200, entry['response'])
+            if self.config['on_miss'] != 'passthrough':
+                logger.warning(f"回放未命中录制（模型 {payload.get('model')}）")
+                return ReplayResponse(404, {'error': {'message': '回放未命中录制', 'type': 'replay_miss'}})
+
+        start = time.perf_counter()
+        response = requests.post(url, headers=headers, json=payload, timeout=timeout)
+        seconds = time.perf_counter() - start
+        if response.status_code == 200:
+            try:
+                self.record(payload, response.json(), seconds)
+            except ValueError:
+                logger.warning("API返回内容不是JSON，未录制")
+        return response
+
+    # ---------- 统计 ----------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取录制/回放统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = sum(len(entries) for entries in self._entries.values())
+        stats['mode'] = self.mode
+        stats['store_path'] = self.store_path
+        return stats
+
+
+_llm_recorder = None
+_llm_recorder_lock = threading.Lock()
+
+
+def get_llm_recorder() -> LLMRecorder:
+    """
+    获取录制/回放单例（按 LLM_REPLAY_CONFIG 创建）
+
+    返回:
+        LLMRecorder实例
+    """
+    global _llm_recorder
+
+    if _llm_recorder is None:
+        with _llm_recorder_lock:
+            if _llm_recorder is None:
+                _llm_recorder = LLMRecorder()
+    return _llm_recorder
+
+
+def configure_llm_recorder(mode: str, store_path: Optional[str] = None, **replay_config: Any) -> LLMRecorder:
+    """
+    替换录制/回放单例（基准测试、调试脚本在运行时切换模式）
+
+    参数:
+        mode: off、record 或 replay
+        store_path: 录制文件路径，默认使用配置
+        replay_config: 其他回放配置（latency、latency_scale、jitter、seed、on_miss）
+
+    返回:
+        新的LLMRecorder实例
+    """
+    global _llm_recorder
+
+    with _llm_recorder_lock:
+        _llm_recorder = LLMRecorder(mode, store_path, replay_config)
+    return _llm_recorder
@@ -0,0 +1,221 @@
+"""
+本地OpenAI兼容桩服务 - 在没有真实大模型API的环境中运行对话流程
+
+POST .../chat/completions 按以下顺序作答：
+- 提供录制文件时，命中录制则返回录制的回复
+- 否则按规则生成回复：带工具的请求在第一轮按问题关键词发出工具调用，
+  拿到工具结果后（或不带工具时）返回引用问题与工具结果的文本回答
+每次请求按固定延迟（可叠加抖动）返回，GET /health 用于探活
+
+用法:
+    python -m app.utils.llm_stub_server --port 8808 --latency 0.5
+    VOLCENGINE_API_URL=http://127.0.0.1:8808/v1/chat/completions flask run
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.llm_recorder import LLMRecorder, REPLAY
+from app.utils.token_counter import estimate_tokens
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 问题关键词 -> 工具（按顺序匹配，一轮可发出多个工具调用）
+TOOL_RULES = [
+    ('medical_knowledge_search', ('什么是', '高血压', '糖尿病', '门诊管理', '要点')),
+    ('medical_database_query', ('门诊', '住院', '手术', '收入', '科室', '医生', '数量', '多少')),
+    ('data_analysis', ('分析', '建议', '趋势', '绩效', '评估'))
+]
+
+
+def _last_user_message(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get('role') == 'user':
+            return str(message.get('content') or '')
+    return ''
+
+
+def _tool_calls(question: str, tool_names: List[str]) -> List[Dict[str, Any]]:
+    calls = []
+    for name, keywords in TOOL_RULES:
+        if name in tool_names and any(keyword in question for keyword in keywords):
+            calls.append({
+                'id': f"call_{len(calls)}",
+                'type': 'function',
+                'function': {'name': name, 'arguments': json.dumps({'query': question}, ensure_ascii=False)}
+            })
+    return calls
+
+
+def synthetic_completion(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    按规则生成 chat/completions 回复（结果只取决于请求内容）
+
+    参数:
+        payload: 请求体
+
+    返回:
+        OpenAI格式的回复JSON
+    """
+    messages = payload.get('messages') or []
+    question = _last_user_message(messages)
+    tool_names = [(tool.get('function') or {}).get('name') for tool in payload.get('tools') or []]
+    tool_results = [str(message.get('content') or '') for message in messages if message.get('role') == 'tool']
+
+    message: Dict[str, Any] = {'role': 'assistant', 'content': ''}
+    finish_reason = 'stop'
+    calls = (_tool_calls(question, tool_names)
+             if tool_names and not tool_results and payload.get('tool_choice') != 'none' else [])
+    if calls:
+        message['tool_calls'] = calls
+        finish_reason = 'tool_calls'
+    elif tool_results:
+        message['content'] = f"关于「{question[:50]}」，根据 {len(tool_results)} 项工具结果：\n\n" + \
+                             '\n\n'.join(result[:300] for result in tool_results)
+    else:
+        message['content'] = f"关于「{question[:50]}」的回答（本地桩模型）。"
+
+    prompt_tokens = sum(estimate_tokens(str(item.get('content') or '')) for item in messages)
+    completion_tokens = estimate_tokens(message['content'] or json.dumps(calls, ensure_ascii=False))
+    return {
+        'id': f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': payload.get('model', 'stub'),
+        'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason}],
+        'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                  'total_tokens': prompt_tokens + completion_tokens}
+    }
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """OpenAI兼容的本地桩服务"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency: float = 0.0, jitter: float = 0.0,
+                 recorder: Optional[LLMRecorder] = None, seed: int = 42):
+        """
+        初始化桩服务
+
+        参数:
+            address: (主机, 端口)，端口为0时自动分配
+            latency: 每次请求的固定延迟（秒）
+            jitter: 叠加在延迟上的随机抖动（±秒）
+            recorder: 回放模式的录制，命中时返回录制的回复
+            seed: 抖动的随机种子
+        """
+        super().__init__(address, StubLLMHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.recorder = recorder
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'replayed': 0, 'synthetic': 0}
+
+    @property
+    def url(self) -> str:
+        """chat/completions 端点地址"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0))
+
+    def complete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """生成回复（优先使用录制）"""
+        entry = self.recorder.lookup(payload) if self.recorder is not None else None
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats['replayed' if entry is not None else 'synthetic'] += 1
+        return entry['response'] if entry is not None else synthetic_completion(payload)
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """桩服务的请求处理"""
+
+    server: StubLLMServer
+
+    def _send_json(self, status: int, data: Dict[str, Any]) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self._send_json(200, {'status': 'ok', **self.server.stats})
+        else:
+            self._send_json(404, {'error': {'message': f"未知路径: {self.path}"}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('chat/completions'):
+            self._send_json(404, {'error': {'message': f"未知路径: {self.path}"}})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError as e:
+            self._send_json(400, {'error': {'message': f"请求体不是有效的JSON: {str(e)}"}})
+            return
+        time.sleep(self.server.delay())
+        self._send_json(200, self.server.complete(payload))
+
+    def log_message(self, format, *args):
+        logger.debug(f"桩服务请求: {format % args}")
+
+
+def start_stub_server(host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                      recordings: Optional[str] = None) -> StubLLMServer:
+    """
+    在后台线程启动桩服务
+
+    参数:
+        host: 监听地址
+        port: 端口，0 表示自动分配
+        latency: 每次请求的固定延迟（秒）
+        jitter: 随机抖动（±秒）
+        recordings: 录制文件路径，提供时优先回放录制的回复
+
+    返回:
+        StubLLMServer实例（url 属性为端点地址，用完调用 shutdown()）
+    """
+    recorder = LLMRecorder(REPLAY, recordings) if recordings else None
+    server = StubLLMServer((host, port), latency, jitter, recorder)
+    threading.Thread(target=server.serve_forever, name='llm-stub-server', daemon=True).start()
+    logger.info(f"大模型桩服务已启动: {server.url}")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地OpenAI兼容大模型桩服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8808, help='端口')
+    parser.add_argument('--latency', type=float, default=0.5, help='每次请求的固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='随机抖动（±秒）')
+    parser.add_argument('--recordings', help='录制文件路径（JSONL），命中时返回录制的回复')
+    args = parser.parse_args()
+
+    recorder = LLMRecorder(REPLAY, args.recordings) if args.recordings else None
+    server = StubLLMServer((args.host, args.port), args.latency, args.jitter, recorder)
+    print(f"大模型桩服务: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""
+医疗实体抽取引擎
+在一次扫描中同时抽取词典实体（疾病/症状/药物/检查等）、诊断、用药和化验值，并返回字符位置
+
+- 所有正则在导入时预编译
+- 词典术语合并为一个前缀树正则（共享前缀，等价于一个自动机），避免逐词 in 检查
+- 主扫描正则只遍历文本一次；命中线索词后在该位置做锚定匹配提取结构化字段
+"""
+import os
+import re
+import threading
+import time
+import logging
+from typing import List, Dict, Optional, Any, Iterable
+
+from app.config.base import BASE_DIR, NLP_CONFIG
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 内置医疗词典（实体类型 -> 术语）
+MEDICAL_TERMS = {
+    "疾病": ["糖尿病", "高血压", "肺炎", "感冒", "肝炎", "心脏病", "脑梗", "癌症"],
+    "症状": ["头痛", "发热", "咳嗽", "乏力", "恶心", "呕吐", "腹痛", "胸闷"],
+    "药物": ["阿司匹林", "布洛芬", "青霉素", "头孢", "胰岛素", "降压药"],
+    "检查": ["血常规", "尿常规", "CT", "核磁", "超声", "心电图", "X光"],
+    "手术": [],
+    "身体部位": []
+}
+
+# jieba词典词性标签到实体类型的映射，无标签的词典词条按疾病处理
+DICT_TAG_MAP = {
+    "disease": "疾病",
+    "symptom": "症状",
+    "drug": "药物",
+    "exam": "检查",
+    "surgery": "手术",
+    "body": "身体部位"
+}
+DICT_DEFAULT_TYPE = "疾病"
+
+# 结构化实体类型
+DIAGNOSIS = "诊断"
+MEDICATION = "用药"
+LAB_VALUE = "化验"
+
+_DELIMITERS = "，。；,;!?？！\n"
+_LAB_ITEM_MAX_LENGTH = 30
+
+# 诊断线索词，之后到分隔符为止的内容为诊断
+_DIAGNOSIS_CUE = r'(?:(?:初步|最终|临床|明确)?诊断(?:为)?[:：]?|确诊为|患有)'
+# 用药线索词
+_MEDICATION_CUE = r'(?:给予|服用|使用|处方|开具)'
+# 化验值：冒号后紧跟数值
+_LAB_CUE = r'[:：]\s*[0-9]'
+
+# 线索之后的锚定匹配
+DIAGNOSIS_VALUE_RE = re.compile(r'\s*([^%s]+)' % re.escape(_DELIMITERS))
+MEDICATION_VALUE_RE = re.compile(
+    r'\s*(?P<name>[^\s0-9%s]+)'
+    r'\s*(?:剂量|用量)?\s*(?P<dose>[0-9.]+\s*(?:mg|g|ml|片|支|瓶|丸|毫克|克|毫升|单位)?)?'
+    r'\s*(?P<freq>(?:每日|每天|每周|每月|隔日)\s*[0-9一二三四]*\s*次|bid|tid|qd|qid|prn)?'
+    % re.escape(_DELIMITERS)
+)
+LAB_VALUE_RE = re.compile(r'[:：]\s*([0-9.]+\s*(?:[a-zA-Z%/μ]*))')
+
+
+def _build_trie_pattern(terms: Iterable[str]) -> str:
+    """
+    将术语列表构建为前缀树形式的正则表达式
+
+    共享前缀只比较一次，且可选分支为贪婪匹配，保证取最长术语
+    """
+    trie = {}
+    for term in terms:
+        if not term:
+            continue
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node) -> str:
+        terminal = '' in node
+        branches = [re.escape(char) + build(child)
+                    for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+def _load_dictionary_terms() -> Dict[str, str]:
+    """读取医学词典文件，返回 {术语: 实体类型}"""
+    terms = {}
+    for path in NLP_CONFIG.get('dict_paths', []):
+        if not os.path.isabs(path):
+            path = os.path.join(BASE_DIR, path)
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.split()
+                    if not parts:
+                        continue
+                    tag = parts[2] if len(parts) > 2 else None
+                    terms[parts[0]] = DICT_TAG_MAP.get(tag, DICT_DEFAULT_TYPE)
+        except Exception as e:
+            logger.warning(f"读取医学词典 {path} 失败: {str(e)}")
+        break
+    return terms
+
+
+class MedicalExtractionEngine:
+    """单次扫描的医疗实体抽取引擎"""
+
+    def __init__(self, terms: Optional[Dict[str, List[str]]] = None,
+                 include_dictionary: bool = True):
+        """
+        初始化抽取引擎
+
+        参数:
+            terms: 实体类型到术语列表的映射，默认使用内置词典
+            include_dictionary: 是否合并医学词典文件中的术语
+        """
+        self.entity_types = list((terms or MEDICAL_TERMS).keys())
+        self.term_types = {}
+        for entity_type, words in (terms or MEDICAL_TERMS).items():
+            for word in words:
+                self.term_types[word] = entity_type
+        if include_dictionary:
+            for word, entity_type in _load_dictionary_terms().items():
+                self.term_types.setdefault(word, entity_type)
+                if entity_type not in self.entity_types:
+                    self.entity_types.append(entity_type)
+
+        alternatives = [
+            r'(?P<diag>%s)' % _DIAGNOSIS_CUE,
+            r'(?P<med>%s)' % _MEDICATION_CUE,
+        ]
+        term_pattern = _build_trie_pattern(self.term_types)
+        if term_pattern:
+            alternatives.append(r'(?P<term>%s)' % term_pattern)
+        alternatives.append(r'(?P<lab>%s)' % _LAB_CUE)
+        self.scanner = re.compile('|'.join(alternatives))
+
+    def extract(self, text: str) -> List[Dict[str, Any]]:
+        """
+        单次扫描抽取文本中的所有实体
+
+        参数:
+            text: 医疗文本
+
+        返回:
+            实体列表，按出现位置排序，每项包含 type/text/start/end，结构化实体附带 attrs
+        """
+        if not text:
+            return []
+
+        entities = []
+        for match in self.scanner.finditer(text):
+            kind = match.lastgroup
+            if kind == 'term':
+                word = match.group()
+                entities.append({
+                    'type': self.term_types.get(word, DICT_DEFAULT_TYPE),
+                    'text': word,
+                    'start': match.start(),
+                    'end': match.end()
+                })
+            elif kind == 'diag':
+                value = DIAGNOSIS_VALUE_RE.match(text, match.end())
+                if value:
+                    entities.append({
+                        'type': DIAGNOSIS,
+                        'text': value.group(1).strip(),
+                        'start': value.start(1),
+                        'end': value.end(1)
+                    })
+            elif kind == 'med':
+                value = MEDICATION_VALUE_RE.match(text, match.end())
+                if value and value.group('name'):
+                    entities.append({
+                        'type': MEDICATION,
+                        'text': value.group('name'),
+                        'start': value.start('name'),
+                        'end': value.end(),
+                        'attrs': {
+                            '药名': value.group('name').strip(),
+                            '剂量': (value.group('dose') or '').strip(),
+                            '频次': (value.group('freq') or '').strip()
+                        }
+                    })
+            elif kind == 'lab':
+                entity = self._lab_entity(text, match.start())
+                if entity:
+                    entities.append(entity)
+        return entities
+
+    @staticmethod
+    def _lab_entity(text: str, colon_pos: int) -> Optional[Dict[str, Any]]:
+        """根据冒号位置向前定位化验项目、向后提取数值"""
+        value = LAB_VALUE_RE.match(text, colon_pos)
+        if not value:
+            return None
+
+        item_start = colon_pos
+        lower_bound = max(0, colon_pos - _LAB_ITEM_MAX_LENGTH)
+        while item_start > lower_bound and text[item_start - 1] not in _DELIMITERS + ':：':
+            item_start -= 1
+        item = text[item_start:colon_pos].strip()
+        if not item:
+            return None
+
+        return {
+            'type': LAB_VALUE,
+            'text': item,
+            'start': item_start,
+            'end': value.end(1),
+            'attrs': {
+                '项目': item,
+                '数值': value.group(1).strip()
+            }
+        }
+
+    def extract_batch(self, texts: Iterable[str]) -> List[List[Dict[str, Any]]]:
+        """
+        批量抽取
+
+        参数:
+            texts: 文本列表
+
+        返回:
+            与输入一一对应的实体列表
+        """
+        return [self.extract(text) for text in texts]
+
+    def group(self, entities: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        将实体列表整理为按类型分组的结果
+
+        参数:
+            entities: extract返回的实体列表
+
+        返回:
+            {
+                'entities': {实体类型: [术语, ...]},
+                'diagnoses': [诊断, ...],
+                'medications': [{'药名', '剂量', '频次'}, ...],
+                'lab_values': [{'项目', '数值'}, ...]
+            }
+        """
+        grouped = {entity_type: [] for entity_type in self.entity_types}
+        diagnoses, medications, lab_values = [], [], []
+
+        for entity in entities:
+            entity_type = entity['type']
+            if entity_type == DIAGNOSIS:
+                if entity['text'] not in diagnoses:
+                    diagnoses.append(entity['text'])
+            elif entity_type == MEDICATION:
+                medications.append(entity['attrs'])
+            elif entity_type == LAB_VALUE:
+                lab_values.append(entity['attrs'])
+            else:
+                bucket = grouped.setdefault(entity_type, [])
+                if entity['text'] not in bucket:
+                    bucket.append(entity['text'])
+
+        return {
+            'entities': grouped,
+            'diagnoses': diagnoses,
+            'medications': medications,
+            'lab_values': lab_values
+        }
+
+    def benchmark(self, texts: List[str], repeat: int = 3) -> Dict[str, Any]:
+        """
+        测量抽取吞吐量
+
+        参数:
+            texts: 测试文本
+            repeat: 重复次数，取最快一次
+
+        返回:
+            {'notes': 文本数, 'seconds': 最快耗时, 'notes_per_second': 吞吐量}
+        """
+        best = None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            self.extract_batch(texts)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        return {
+            'notes': len(texts),
+            'seconds': best,
+            'notes_per_second': len(texts) / best if best else float('inf')
+        }
+
+
+# 全局抽取引擎实例
+_extraction_engine = None
+_extraction_engine_lock = threading.Lock()
+
+
+def get_extraction_engine() -> MedicalExtractionEngine:
+    """
+    获取共享的抽取引擎实例
+
+    返回:
+        MedicalExtractionEngine实例
+    """
+    global _extraction_engine
+
+    if _extraction_engine is not None:
+        return _extraction_engine
+
+    # 构建词典正则开销较大，并发的首次请求只构建一次
+    with _extraction_engine_lock:
+        if _extraction_engine is None:
+            _extraction_engine = MedicalExtractionEngine()
+    return _extraction_engine
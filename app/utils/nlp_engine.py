@@ -0,0 +1,283 @@
+"""
+NLP引擎模块
+统一管理jieba分词器、医学词典与SpaCy模型的加载，提供共享的单例与批处理接口
+
+- 词典与模型仅在首次使用时加载一次，之后所有请求共享
+- 批量实体识别基于 nlp.pipe
+- 大规模语料可启用jieba多进程并行分词
+"""
+import os
+import logging
+import threading
+from typing import List, Dict, Tuple, Optional, Any, Iterable, Iterator
+
+from app.config.base import BASE_DIR, NLP_CONFIG
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 优先使用jieba_fast，未安装时回退到jieba
+try:
+    import jieba_fast as jieba
+    from jieba_fast import analyse as jieba_analyse
+except ImportError:
+    import jieba
+    from jieba import analyse as jieba_analyse
+
+
+class NLPEngine:
+    """共享的NLP引擎，负责资源的惰性加载与批处理"""
+
+    def __init__(self, nlp_config: Optional[Dict[str, Any]] = None):
+        self.config = dict(NLP_CONFIG)
+        if nlp_config:
+            self.config.update(nlp_config)
+
+        self._lock = threading.RLock()
+        # jieba的并行模式替换的是进程内全局的 jieba.cut，同一时刻只允许一个并行分词任务开启/关闭它；
+        # segment 与 extract_keywords 使用默认分词器的绑定方法，不受并行模式影响，无需等待
+        self._parallel_lock = threading.Lock()
+        self._tokenizer_ready = False
+        self._dict_path = None
+        self._spacy_model = None
+        self._spacy_loaded = False
+
+    # ------------------------------------------------------------------
+    # 资源加载
+    # ------------------------------------------------------------------
+    def _resolve_dict_paths(self) -> List[str]:
+        """解析医学词典路径，相对路径以项目根目录为基准"""
+        paths = []
+        for path in self.config.get('dict_paths', []):
+            if not os.path.isabs(path):
+                path = os.path.join(BASE_DIR, path)
+            paths.append(path)
+        return paths
+
+    @property
+    def tokenizer(self):
+        """获取已加载医学词典的jieba模块（仅初始化一次）"""
+        if self._tokenizer_ready:
+            return jieba
+
+        with self._lock:
+            if self._tokenizer_ready:
+                return jieba
+
+            for dict_path in self._resolve_dict_paths():
+                if not os.path.exists(dict_path):
+                    continue
+                try:
+                    jieba.load_userdict(dict_path)
+                    self._dict_path = dict_path
+                    logger.info(f"成功加载医学词典: {dict_path}")
+                    break
+                except Exception as e:
+                    logger.warning(f"尝试加载医学词典 {dict_path} 失败: {str(e)}")
+
+            if self._dict_path is None:
+                logger.warning("医学词典加载失败，使用默认词典")
+
+            # 预先构建前缀词典，避免首个请求承担初始化开销
+            try:
+                jieba.initialize()
+            except Exception as e:
+                logger.warning(f"jieba初始化失败: {str(e)}")
+
+            self._tokenizer_ready = True
+        return jieba
+
+    @property
+    def spacy_model(self):
+        """获取SpaCy模型，首次访问时加载，不可用时返回None"""
+        if self._spacy_loaded:
+            return self._spacy_model
+
+        with self._lock:
+            if self._spacy_loaded:
+                return self._spacy_model
+
+            model_name = self.config.get('spacy_model', 'zh_core_web_sm')
+            try:
+                import spacy
+                self._spacy_model = spacy.load(model_name)
+                logger.info("成功加载SpaCy中文模型")
+            except ImportError:
+                logger.warning("SpaCy库未安装，某些NLP功能将不可用")
+            except Exception as e:
+                logger.warning(f"中文SpaCy模型加载失败: {str(e)}，某些NLP功能将不可用")
+            self._spacy_loaded = True
+        return self._spacy_model
+
+    def warmup(self, load_spacy: bool = False) -> None:
+        """
+        预热引擎
+
+        参数:
+            load_spacy: 是否同时加载SpaCy模型
+        """
+        _ = self.tokenizer
+        if load_spacy:
+            _ = self.spacy_model
+
+    # ------------------------------------------------------------------
+    # 分词
+    # ------------------------------------------------------------------
+    def segment(self, text: str, cut_all: bool = False) -> List[str]:
+        """
+        中文分词
+
+        参数:
+            text: 待分词文本
+            cut_all: 是否全模式分词
+
+        返回:
+            分词结果列表（已去除空白词）
+        """
+        if not text:
+            return []
+        words = self.tokenizer.lcut(text, cut_all=cut_all)
+        return [w for w in words if w.strip()]
+
+    def segment_batch(self, texts: Iterable[str], cut_all: bool = False,
+                      parallel: Optional[bool] = None) -> List[List[str]]:
+        """
+        批量分词
+
+        参数:
+            texts: 文本列表
+            cut_all: 是否全模式分词
+            parallel: 是否启用jieba多进程模式；None时按语料规模自动判断
+
+        返回:
+            与输入一一对应的分词结果列表
+        """
+        texts = [text or '' for text in texts]
+        if not texts:
+            return []
+
+        if parallel is None:
+            total_chars = sum(len(text) for text in texts)
+            parallel = total_chars >= self.config.get('parallel_min_chars', 200000)
+
+        if parallel and os.name != 'nt':
+            try:
+                return self._segment_parallel(texts, cut_all)
+            except Exception as e:
+                logger.warning(f"并行分词失败，回退到串行模式: {str(e)}")
+
+        return [self.segment(text, cut_all=cut_all) for text in texts]
+
+    def _segment_parallel(self, texts: List[str], cut_all: bool) -> List[List[str]]:
+        """
+        使用jieba的多进程模式分词
+
+        jieba按行切分语料并分发给进程池，这里以换行符拼接文档，
+        再按结果中的换行符把词序列还原为各文档
+        """
+        tokenizer = self.tokenizer
+        # 文档内部的换行会打乱文档边界，替换为空格（空白词最终会被过滤）
+        corpus = '\n'.join(text.replace('\r', ' ').replace('\n', ' ') for text in texts)
+        workers = self.config.get('parallel_workers') or os.cpu_count() or 1
+
+        with self._parallel_lock:
+            tokenizer.enable_parallel(workers)
+            try:
+                # enable_parallel 只替换模块级的 jieba.cut；lcut 绑定在默认分词器上，仍是串行分词
+                tokens = list(tokenizer.cut(corpus, cut_all=cut_all))
+            finally:
+                tokenizer.disable_parallel()
+
+        results = [[]]
+        for token in tokens:
+            if '\n' in token:
+                for _ in range(token.count('\n')):
+                    results.append([])
+                continue
+            if token.strip():
+                results[-1].append(token)
+
+        if len(results) != len(texts):
+            raise ValueError(f"并行分词结果数量不匹配: {len(results)} != {len(texts)}")
+        return results
+
+    # ------------------------------------------------------------------
+    # 关键词
+    # ------------------------------------------------------------------
+    def extract_keywords(self, text: str, topk: int = 10) -> List[Tuple[str, float]]:
+        """
+        基于TF-IDF提取关键词
+
+        参数:
+            text: 输入文本
+            topk: 提取前k个关键词
+
+        返回:
+            关键词及权重列表 [(word, weight), ...]
+        """
+        if not text:
+            return []
+        # 确保关键词提取使用的默认分词器已加载医学词典
+        _ = self.tokenizer
+        return jieba_analyse.extract_tags(text, topK=topk, withWeight=True)
+
+    def extract_keywords_batch(self, texts: Iterable[str], topk: int = 10) -> List[List[Tuple[str, float]]]:
+        """
+        批量提取关键词
+
+        参数:
+            texts: 文本列表
+            topk: 每个文本提取前k个关键词
+
+        返回:
+            与输入一一对应的关键词列表
+        """
+        return [self.extract_keywords(text, topk=topk) for text in texts]
+
+    # ------------------------------------------------------------------
+    # SpaCy批处理
+    # ------------------------------------------------------------------
+    def pipe(self, texts: Iterable[str], batch_size: Optional[int] = None,
+             n_process: Optional[int] = None) -> Optional[Iterator[Any]]:
+        """
+        使用 nlp.pipe 批量处理文本
+
+        参数:
+            texts: 文本列表
+            batch_size: 每批文本数量
+            n_process: 进程数
+
+        返回:
+            Doc迭代器；SpaCy不可用时返回None
+        """
+        model = self.spacy_model
+        if model is None:
+            return None
+        return model.pipe(
+            texts,
+            batch_size=batch_size or self.config.get('spacy_batch_size', 64),
+            n_process=n_process or self.config.get('spacy_n_process', 1)
+        )
+
+
+# 全局NLP引擎实例
+_nlp_engine = None
+_nlp_engine_lock = threading.Lock()
+
+
+def get_nlp_engine() -> NLPEngine:
+    """
+    获取共享的NLP引擎实例
+
+    返回:
+        NLPEngine实例
+    """
+    global _nlp_engine
+
+    if _nlp_engine is not None:
+        return _nlp_engine
+
+    with _nlp_engine_lock:
+        if _nlp_engine is None:
+            _nlp_engine = NLPEngine()
+    return _nlp_engine
@@ -2,47 +2,24 @@
 自然语言处理工具模块
 提供中文分词、医疗实体识别、文本分类等功能
 """
-import re
-import jieba_fast as jieba
-import os
 import logging
 from collections import Counter
 import numpy as np
 from typing import List, Dict, Tuple, Optional, Any
 
+from app.utils.nlp_engine import get_nlp_engine
+from app.utils.medical_extractor import get_extraction_engine
+
 # 设置日志记录器
 logger = logging.getLogger(__name__)
 
-# 加载医学词典
-DICT_PATHS = [
-    "data/dict/medical_dict.txt",  # 项目根目录
-    "app/data/medical_dict.txt",   # app目录
-]
-
-dict_loaded = False
-for dict_path in DICT_PATHS:
-    if os.path.exists(dict_path):
-        try:
-            jieba.load_userdict(dict_path)
-            logger.info(f"成功加载医学词典: {dict_path}")
-            dict_loaded = True
-            break
-        except Exception as e:
-            logger.warning(f"尝试加载医学词典 {dict_path} 失败: {str(e)}")
-
-if not dict_loaded:
-    logger.warning("医学词典加载失败，使用默认词典")
-
-# 尝试加载SpaCy中文模型
-nlp = None
-try:
-    import spacy
-    nlp = spacy.load("zh_core_web_sm")
-    logger.info("成功加载SpaCy中文模型")
-except ImportError:
-    logger.warning("SpaCy库未安装，某些NLP功能将不可用")
-except Exception as e:
-    logger.warning(f"中文SpaCy模型加载失败: {str(e)}，某些NLP功能将不可用")
+# SpaCy实体标签到医疗实体类型的映射
+SPACY_LABEL_MAP = {
+    "DISEASE": "疾病",
+    "SYMPTOM": "症状",
+    "DRUG": "药物",
+    "BODY_PART": "身体部位"
+}
 
 
 class TextProcessor:
@@ -63,14 +40,24 @@ class TextProcessor:
         if not text:
             return []
             
-        # 加载医学词典
-        try:
-            jieba.load_userdict("app/data/medical_dict.txt")
-        except:
-            pass  # 词典不存在则忽略
+        # 词典由共享NLP引擎一次性加载
+        return get_nlp_engine().segment(text, cut_all=cut_all)
+    
+    @staticmethod
+    def segment_texts(texts: List[str], cut_all: bool = False,
+                      parallel: Optional[bool] = None) -> List[List[str]]:
+        """
+        批量中文分词
+        
+        参数:
+            texts: 待分词文本列表
+            cut_all: 是否全模式分词
+            parallel: 是否使用jieba多进程模式，None时按语料规模自动判断
             
-        words = jieba.lcut(text, cut_all=cut_all)
-        return [w for w in words if w.strip()]
+        返回:
+            与输入一一对应的分词结果列表
+        """
+        return get_nlp_engine().segment_batch(texts, cut_all=cut_all, parallel=parallel)
     
     @staticmethod
     def extract_keywords(text: str, topk: int = 10) -> List[Tuple[str, float]]:
@@ -88,25 +75,26 @@ class TextProcessor:
             return []
             
         # 使用TF-IDF提取关键词
-        from jieba import analyse
-        keywords = analyse.extract_tags(text, topK=topk, withWeight=True)
-        return keywords
+        return get_nlp_engine().extract_keywords(text, topk=topk)
     
     @staticmethod
-    def extract_medical_entities(text: str) -> Dict[str, List[str]]:
+    def extract_keywords_batch(texts: List[str], topk: int = 10) -> List[List[Tuple[str, float]]]:
         """
-        提取医疗实体
+        批量提取关键词
         
         参数:
-            text: 输入文本
+            texts: 文本列表
+            topk: 每个文本提取前k个关键词
             
         返回:
-            实体字典 {entity_type: [entities]}
+            与输入一一对应的关键词列表
         """
-        if not text:
-            return {}
-            
-        entities = {
+        return get_nlp_engine().extract_keywords_batch(texts, topk=topk)
+    
+    @staticmethod
+    def _empty_entities() -> Dict[str, List[str]]:
+        """创建空的实体字典"""
+        return {
             "疾病": [],
             "症状": [],
             "药物": [],
@@ -114,56 +102,83 @@ class TextProcessor:
             "手术": [],
             "身体部位": []
         }
+    
+    @staticmethod
+    def _entities_from_doc(doc) -> Dict[str, List[str]]:
+        """从SpaCy Doc中提取实体，没有识别出实体时返回None"""
+        entities = TextProcessor._empty_entities()
+        for ent in doc.ents:
+            # 根据实体类型分类
+            entity_type = SPACY_LABEL_MAP.get(ent.label_)
+            if entity_type:
+                entities[entity_type].append(ent.text)
+        
+        if any(len(v) > 0 for v in entities.values()):
+            return entities
+        return None
+    
+    @staticmethod
+    def _rule_based_entities(text: str) -> Dict[str, List[str]]:
+        """规则匹配方法（作为后备方案），使用单次扫描的词典自动机"""
+        engine = get_extraction_engine()
+        return engine.group(engine.extract(text))['entities']
+    
+    @staticmethod
+    def extract_medical_entities(text: str) -> Dict[str, List[str]]:
+        """
+        提取医疗实体
+        
+        参数:
+            text: 输入文本
+            
+        返回:
+            实体字典 {entity_type: [entities]}
+        """
+        if not text:
+            return {}
         
         # 如果SpaCy可用，使用SpaCy进行实体识别
+        nlp = get_nlp_engine().spacy_model
         if nlp is not None:
             try:
-                doc = nlp(text)
-                # 根据SpaCy的结果提取实体
-                for ent in doc.ents:
-                    # 根据实体类型分类
-                    if ent.label_ == "DISEASE":
-                        entities["疾病"].append(ent.text)
-                    elif ent.label_ == "SYMPTOM":
-                        entities["症状"].append(ent.text)
-                    elif ent.label_ == "DRUG":
-                        entities["药物"].append(ent.text)
-                    elif ent.label_ == "BODY_PART":
-                        entities["身体部位"].append(ent.text)
-                    # 可以添加更多的实体类型判断
-                
+                entities = TextProcessor._entities_from_doc(nlp(text))
                 # 如果通过SpaCy解析出了实体，则返回结果
-                if any(len(v) > 0 for v in entities.values()):
+                if entities is not None:
                     return entities
             except Exception as e:
                 logger.warning(f"使用SpaCy提取实体失败: {str(e)}")
                 # 如果SpaCy出错，继续使用规则方法
         
-        # 规则匹配方法（作为后备方案）
-        # 使用简单的关键词匹配
-        disease_keywords = ["糖尿病", "高血压", "肺炎", "感冒", "肝炎", "心脏病", "脑梗", "癌症"]
-        symptom_keywords = ["头痛", "发热", "咳嗽", "乏力", "恶心", "呕吐", "腹痛", "胸闷"]
-        drug_keywords = ["阿司匹林", "布洛芬", "青霉素", "头孢", "胰岛素", "降压药"]
-        exam_keywords = ["血常规", "尿常规", "CT", "核磁", "超声", "心电图", "X光"]
+        return TextProcessor._rule_based_entities(text)
+    
+    @staticmethod
+    def extract_medical_entities_batch(texts: List[str]) -> List[Dict[str, List[str]]]:
+        """
+        批量提取医疗实体，SpaCy可用时通过 nlp.pipe 批处理
         
-        # 提取实体
-        for keyword in disease_keywords:
-            if keyword in text:
-                entities["疾病"].append(keyword)
-                
-        for keyword in symptom_keywords:
-            if keyword in text:
-                entities["症状"].append(keyword)
-                
-        for keyword in drug_keywords:
-            if keyword in text:
-                entities["药物"].append(keyword)
-                
-        for keyword in exam_keywords:
-            if keyword in text:
-                entities["检查"].append(keyword)
+        参数:
+            texts: 文本列表
+            
+        返回:
+            与输入一一对应的实体字典列表
+        """
+        texts = [text or '' for text in texts]
+        results = [None] * len(texts)
+        
+        docs = None
+        try:
+            docs = get_nlp_engine().pipe(texts)
+            if docs is not None:
+                for i, doc in enumerate(docs):
+                    if texts[i]:
+                        results[i] = TextProcessor._entities_from_doc(doc)
+        except Exception as e:
+            logger.warning(f"使用SpaCy批量提取实体失败: {str(e)}")
         
-        return entities
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                results[i] = TextProcessor._rule_based_entities(text) if text else {}
+        return results
     
     @staticmethod
     def get_word_frequency(text: str, stop_words: Optional[List[str]] = None) -> Dict[str, int]:
@@ -210,22 +225,11 @@ class TextProcessor:
         words1 = set(TextProcessor.segment_text(text1))
         words2 = set(TextProcessor.segment_text(text2))
         
-        # 构建词袋
-        all_words = list(words1.union(words2))
-        
-        # 计算词向量
-        vector1 = np.array([1 if word in words1 else 0 for word in all_words])
-        vector2 = np.array([1 if word in words2 else 0 for word in all_words])
-        
-        # 计算余弦相似度
-        dot_product = np.dot(vector1, vector2)
-        norm1 = np.linalg.norm(vector1)
-        norm2 = np.linalg.norm(vector2)
-        
-        if norm1 == 0 or norm2 == 0:
+        if not words1 or not words2:
             return 0.0
-            
-        return dot_product / (norm1 * norm2)
+        
+        # 0/1词袋向量的余弦相似度等价于 |A∩B| / sqrt(|A|·|B|)，无需构建稠密向量
+        return float(len(words1 & words2) / np.sqrt(len(words1) * len(words2)))
     
     @staticmethod
     def classify_medical_text(text: str) -> str:
@@ -269,7 +273,37 @@ class TextProcessor:
 
 
 class MedicalTermExtractor:
-    """医学术语提取工具类"""
+    """医学术语提取工具类，基于单次扫描的抽取引擎"""
+    
+    @staticmethod
+    def extract_all(text: str) -> Dict[str, Any]:
+        """
+        单次扫描提取全部医学信息
+        
+        参数:
+            text: 医疗文本
+            
+        返回:
+            {'entities', 'diagnoses', 'medications', 'lab_values', 'spans'}
+        """
+        engine = get_extraction_engine()
+        spans = engine.extract(text)
+        result = engine.group(spans)
+        result['spans'] = spans
+        return result
+    
+    @staticmethod
+    def extract_all_batch(texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        批量提取全部医学信息
+        
+        参数:
+            texts: 医疗文本列表
+            
+        返回:
+            与输入一一对应的提取结果列表
+        """
+        return [MedicalTermExtractor.extract_all(text) for text in texts]
     
     @staticmethod
     def extract_diagnoses(text: str) -> List[str]:
@@ -284,21 +318,8 @@ class MedicalTermExtractor:
         """
         if not text:
             return []
-            
-        # 诊断提取规则
-        patterns = [
-            r'诊断(?:为|:)?\s*([^，。；,;!?？！\n]+)',
-            r'(?:初步|最终|临床|明确)诊断(?:为|:)?\s*([^，。；,;!?？！\n]+)',
-            r'(?:患有|患|确诊为|诊断为)\s*([^，。；,;!?？！\n]+?)(?:病|症)?'
-        ]
         
-        diagnoses = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            diagnoses.extend(matches)
-        
-        # 去重
-        return list(set(diagnoses))
+        return MedicalTermExtractor.extract_all(text)['diagnoses']
     
     @staticmethod
     def extract_medications(text: str) -> List[Dict[str, str]]:
@@ -313,23 +334,8 @@ class MedicalTermExtractor:
         """
         if not text:
             return []
-            
-        # 提取药物名、剂量、频次
-        medication_pattern = r'(?:给予|用|服用|使用|处方|开具)?\s*([^，。；,;!?？！\n]+?)\s*(?:剂量|用量)?\s*([0-9.]+\s*(?:mg|g|ml|片|支|瓶|丸|毫克|克|毫升|单位)?)?\s*(?:每日|每天|每周|每月|隔日|bid|tid|qd|qid|prn)?\s*([0-9]*\s*次)?'
         
-        medications = []
-        matches = re.finditer(medication_pattern, text)
-        
-        for match in matches:
-            if match.group(1):  # 至少要有药名
-                medication = {
-                    "药名": match.group(1).strip(),
-                    "剂量": match.group(2).strip() if match.group(2) else "",
-                    "频次": match.group(3).strip() if match.group(3) else ""
-                }
-                medications.append(medication)
-        
-        return medications
+        return MedicalTermExtractor.extract_all(text)['medications']
     
     @staticmethod
     def extract_lab_values(text: str) -> List[Dict[str, Any]]:
@@ -344,19 +350,5 @@ class MedicalTermExtractor:
         """
         if not text:
             return []
-            
-        # 提取化验项目及数值
-        lab_pattern = r'([^，。；,;!?？！\n]+?)(?::|：)\s*([0-9.]+\s*(?:[a-zA-Z%/]*))'
-        
-        lab_values = []
-        matches = re.finditer(lab_pattern, text)
-        
-        for match in matches:
-            if match.group(1) and match.group(2):
-                lab = {
-                    "项目": match.group(1).strip(),
-                    "数值": match.group(2).strip()
-                }
-                lab_values.append(lab)
         
-        return lab_values 
\ No newline at end of file
+        return MedicalTermExtractor.extract_all(text)['lab_values']
@@ -0,0 +1,163 @@
+"""
+键集（seek）分页工具模块
+
+LIMIT/OFFSET 分页需要扫描并丢弃前面所有行，页码越深越慢。
+键集分页记住上一页最后一行的排序键，下一页直接用
+WHERE (排序键) > (上次的值) 定位，配合索引每一页的代价都相同。
+
+游标是对排序键值的不透明编码，附带排序定义的签名，防止把一个列表的游标用于另一种排序。
+"""
+import re
+import json
+import zlib
+import base64
+from typing import Any, Dict, List, Sequence, Tuple
+
+# 排序键: [(列名, 是否降序), ...]
+SortKey = List[Tuple[str, bool]]
+
+_ORDER_ITEM_RE = re.compile(r'^\s*(?P<column>[^\s]+)(?:\s+(?P<direction>ASC|DESC))?\s*$', re.IGNORECASE)
+
+
+def parse_order_by(clause: str) -> SortKey:
+    """
+    解析ORDER BY子句
+
+    参数:
+        clause: 如 "timestamp DESC, id DESC"
+
+    返回:
+        [(列名, 是否降序), ...]
+    """
+    keys = []
+    for item in (clause or '').split(','):
+        if not item.strip():
+            continue
+        match = _ORDER_ITEM_RE.match(item)
+        if not match:
+            raise ValueError(f"键集分页不支持的排序表达式: {item.strip()}")
+        direction = (match.group('direction') or 'ASC').upper()
+        keys.append((match.group('column'), direction == 'DESC'))
+    return keys
+
+
+def keyset_condition(keys: SortKey, values: Sequence[Any]) -> Tuple[str, List[Any]]:
+    """
+    生成“位于游标之后”的WHERE条件
+
+    排序方向一致时使用行值比较 (a, b) > (?, ?)，可直接利用复合索引；
+    方向混合时展开为 a > ? OR (a = ? AND b < ?) ... 的形式
+
+    参数:
+        keys: 排序键
+        values: 上一页最后一行的排序键值
+
+    返回:
+        (条件SQL, 参数列表)
+    """
+    if len(keys) != len(values):
+        raise ValueError(f"游标值数量({len(values)})与排序键数量({len(keys)})不一致")
+    if not keys:
+        raise ValueError("键集分页需要至少一个排序键")
+
+    directions = {descending for _, descending in keys}
+    if len(directions) == 1:
+        op = '<' if directions.pop() else '>'
+        if len(keys) == 1:
+            return f"{keys[0][0]} {op} ?", [values[0]]
+        columns = ', '.join(column for column, _ in keys)
+        placeholders = ', '.join('?' * len(keys))
+        return f"({columns}) {op} ({placeholders})", list(values)
+
+    clauses = []
+    params = []
+    for i, (column, descending) in enumerate(keys):
+        parts = [f"{prev} = ?" for prev, _ in keys[:i]]
+        parts.append(f"{column} {'<' if descending else '>'} ?")
+        clauses.append('(' + ' AND '.join(parts) + ')')
+        params.extend(values[:i])
+        params.append(values[i])
+    return '(' + ' OR '.join(clauses) + ')', params
+
+
+def _signature(keys: SortKey) -> str:
+    spec = ','.join(f"{column} {'DESC' if descending else 'ASC'}" for column, descending in keys)
+    return format(zlib.crc32(spec.encode('utf-8')), '08x')
+
+
+def encode_cursor(values: Sequence[Any], keys: SortKey) -> str:
+    """
+    将排序键值编码为不透明游标
+
+    参数:
+        values: 排序键值
+        keys: 排序键
+
+    返回:
+        URL安全的游标字符串
+    """
+    payload = json.dumps({'k': _signature(keys), 'v': list(values)},
+                         ensure_ascii=False, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, keys: SortKey) -> List[Any]:
+    """
+    解码游标
+
+    参数:
+        cursor: encode_cursor生成的游标
+        keys: 当前查询的排序键
+
+    返回:
+        排序键值列表
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        values = payload['v']
+        signature = payload['k']
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+    if signature != _signature(keys) or len(values) != len(keys):
+        raise ValueError("分页游标与当前排序方式不匹配")
+    return values
+
+
+def row_key_values(row: Dict[str, Any], keys: SortKey) -> List[Any]:
+    """
+    从结果行中取出排序键值（列名中的表前缀与引号会被忽略）
+
+    参数:
+        row: 结果行字典
+        keys: 排序键
+
+    返回:
+        排序键值列表
+    """
+    values = []
+    for column, _ in keys:
+        name = column.split('.')[-1].strip('"`[]')
+        if name not in row:
+            raise ValueError(f"结果中缺少排序列 {name}，无法生成分页游标")
+        values.append(row[name])
+    return values
+
+
+def build_page(rows: List[Dict[str, Any]], size: int, keys: SortKey) -> Dict[str, Any]:
+    """
+    根据多取一行的查询结果构建分页结果
+
+    参数:
+        rows: 查询结果（最多 size + 1 行）
+        size: 每页行数
+        keys: 排序键
+
+    返回:
+        {'items': [...], 'next_cursor': 游标或None, 'has_more': bool}
+    """
+    has_more = len(rows) > size
+    items = rows[:size]
+    next_cursor = encode_cursor(row_key_values(items[-1], keys), keys) if has_more and items else None
+    return {'items': items, 'next_cursor': next_cursor, 'has_more': has_more}
@@ -0,0 +1,498 @@
+"""
+按年分区存储模块 - 将事实表的冷数据年份归档到独立的SQLite文件，查询时按日期范围ATTACH
+
+存储布局：
+- 主库（config.DATABASE_PATH）保存近期数据以及尚未归档的全部数据
+- 每个已归档年份一个分区文件 <分区目录>/<主库文件名>_<年份>.db，内含该年各事实表的行
+- 主库的 partition_catalog 表登记已归档的 (表, 年份)，路由只使用登记过的分区
+
+查询路由：
+route_query 根据查询的日期范围找出需要的已归档年份，将这些分区ATTACH到当前连接，
+并把 FROM/JOIN 中的事实表改写为 (主库表 UNION ALL 各分区表) 子查询（只投影查询用到的列）；
+日期范围只落在主库年份时不做任何改写。主库始终参与查询，归档后补录的旧日期数据不会丢失。
+读取事实表的入口（仪表盘与分析接口、/api/records 分页浏览、SQL沙箱）都经过路由；
+HIS批量导入拒绝已归档年份的数据（须先 restore），避免同一年份同时存在于主库与分区而重复统计。
+
+归档流程（每个年份）：
+1. 将主库中该年份的行复制到分区文件（INSERT OR REPLACE，重复执行幂等）并提交
+2. 在主库的同一事务中删除这些行并登记 partition_catalog
+第1步完成后中断时分区尚未登记，查询不会重复计数，重新执行归档即可。
+
+用法:
+    python -m app.utils.partitioning list
+    python -m app.utils.partitioning archive [--before-year 2023] [--vacuum]
+    python -m app.utils.partitioning restore 2021
+"""
+import os
+import re
+import time
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from app.config import config
+from app.config.base import PARTITION_CONFIG, WRITE_QUEUE_CONFIG
+from app.utils.database import get_db_connection, quote_identifier
+from app.utils.logger import log_query
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 主库中登记已归档分区的表
+CATALOG_TABLE = 'partition_catalog'
+
+# 表名之后出现这些关键字时表示没有别名
+_CLAUSE_KEYWORDS = {
+    'WHERE', 'GROUP', 'ORDER', 'LIMIT', 'HAVING', 'WINDOW', 'ON', 'USING', 'JOIN', 'INNER', 'LEFT',
+    'RIGHT', 'FULL', 'CROSS', 'NATURAL', 'OUTER', 'UNION', 'EXCEPT', 'INTERSECT', 'INDEXED', 'NOT'
+}
+
+# 建表/建索引语句中的对象名（用于在分区库中复制主库的表结构）
+_CREATE_TABLE = re.compile(r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?', re.IGNORECASE)
+_CREATE_INDEX = re.compile(r'^\s*CREATE\s+(UNIQUE\s+)?INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?("[^"]+"|\S+)\s+ON\s+',
+                           re.IGNORECASE)
+
+
+def partition_tables() -> Dict[str, str]:
+    """
+    获取参与分区的事实表
+
+    返回:
+        {表名: 日期列}
+    """
+    return dict(PARTITION_CONFIG.get('tables', {}))
+
+
+def partition_directory(database_path: Optional[str] = None) -> str:
+    """分区文件目录（未配置时为主库所在目录下的 partitions/）"""
+    database_path = database_path or config.DATABASE_PATH
+    return PARTITION_CONFIG.get('directory') or os.path.join(os.path.dirname(database_path), 'partitions')
+
+
+def partition_path(year: int, database_path: Optional[str] = None) -> str:
+    """
+    获取年份对应的分区文件路径
+
+    参数:
+        year: 年份
+        database_path: 主库路径，默认使用配置
+
+    返回:
+        分区文件路径
+    """
+    database_path = database_path or config.DATABASE_PATH
+    stem = os.path.splitext(os.path.basename(database_path))[0]
+    return os.path.join(partition_directory(database_path), f"{stem}_{int(year)}.db")
+
+
+def _schema_name(year: int) -> str:
+    return f"p{int(year)}"
+
+
+def _year_of(value: Any) -> Optional[int]:
+    """取日期值的年份（无法识别时返回None，视为不限）"""
+    text = str(value or '')[:4]
+    return int(text) if len(text) == 4 and text.isdigit() else None
+
+
+def _year_bounds(year: int) -> Tuple[str, str]:
+    """年份对应的日期文本范围 [start, end)"""
+    return f"{year:04d}", f"{year + 1:04d}"
+
+
+def _catalog(conn: sqlite3.Connection) -> Dict[str, List[int]]:
+    """读取主库登记的已归档分区 {表名: [年份]}（未归档过时为空）"""
+    try:
+        rows = conn.execute(f"SELECT table_name, year FROM main.{CATALOG_TABLE} ORDER BY year").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    catalog: Dict[str, List[int]] = {}
+    for table, year in rows:
+        catalog.setdefault(table, []).append(year)
+    return catalog
+
+
+def archived_years(conn: sqlite3.Connection, table: str) -> List[int]:
+    """
+    获取事实表已归档的年份
+
+    参数:
+        conn: 主库连接
+        table: 表名
+
+    返回:
+        已归档年份列表（升序）
+    """
+    return _catalog(conn).get(table, [])
+
+
+def _table_pattern(tables: Sequence[str]) -> re.Pattern:
+    """匹配 FROM/JOIN 后的事实表引用（可带 main. 前缀、引号与别名）"""
+    names = '|'.join(re.escape(table) for table in sorted(tables, key=len, reverse=True))
+    return re.compile(
+        rf'\b(FROM|JOIN)\s+(?:main\.)?(["`\[]?)({names})["`\]]?(?![\w.])(\s+(?:AS\s+)?([A-Za-z_]\w*))?',
+        re.IGNORECASE)
+
+
+def _projection(conn: sqlite3.Connection, query: str, table: str) -> str:
+    """
+    分区子查询的投影列：只选出查询中出现的列，使各分区的查询仍能使用覆盖索引
+
+    查询中出现 SELECT * 或 表.* 时返回 *
+    """
+    if re.search(r'(SELECT\s+(DISTINCT\s+)?|\.)\*', query, re.IGNORECASE):
+        return '*'
+    words = {word.lower() for word in re.findall(r'[A-Za-z_]\w*', query)}
+    columns = [row[1] for row in conn.execute(f"PRAGMA main.table_info({quote_identifier(table)})")]
+    used = [column for column in columns if column.lower() in words]
+    if not used:
+        used = [partition_tables()[table]]
+    return ', '.join(quote_identifier(column) for column in used)
+
+
+def attach_partitions(conn: sqlite3.Connection, years: Sequence[int],
+                      database_path: Optional[str] = None) -> List[str]:
+    """
+    将年份分区ATTACH到连接（已ATTACH的跳过）
+
+    参数:
+        conn: 数据库连接
+        years: 年份列表
+        database_path: 主库路径，默认使用配置
+
+    返回:
+        各年份的schema名
+    """
+    attached = {row[1] for row in conn.execute("PRAGMA database_list").fetchall()}
+    pending = [year for year in years if _schema_name(year) not in attached]
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(conn, 'getlimit') else 10
+    if len(attached - {'main', 'temp'}) + len(pending) > limit:
+        raise ValueError(f"查询跨越 {len(years)} 个已归档年份，超过SQLite可同时ATTACH的数据库上限 {limit}，请缩小日期范围")
+
+    for year in pending:
+        path = partition_path(year, database_path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"分区文件不存在: {path}")
+        conn.execute("ATTACH DATABASE ? AS " + _schema_name(year), (path,))
+    return [_schema_name(year) for year in years]
+
+
+def detach_partitions(conn: sqlite3.Connection) -> None:
+    """DETACH 连接上已ATTACH的年份分区（连接归还连接池前调用）"""
+    for row in conn.execute("PRAGMA database_list").fetchall():
+        if re.fullmatch(r'p\d{4}', row[1]):
+            conn.execute(f"DETACH DATABASE {row[1]}")
+
+
+def route_query(conn: sqlite3.Connection, query: str, start_date: Any = None, end_date: Any = None) -> str:
+    """
+    按日期范围改写查询，使其只读取主库与范围内的已归档年份分区
+
+    参数:
+        conn: 执行查询的连接（需要的分区会ATTACH到该连接上）
+        query: 原始SQL，事实表须出现在 FROM/JOIN 之后
+        start_date: 日期范围起点（含），None表示不限
+        end_date: 日期范围终点（含），None表示不限
+
+    返回:
+        改写后的SQL（不涉及已归档年份时原样返回）
+    """
+    tables = partition_tables()
+    if not PARTITION_CONFIG.get('enabled', True) or not tables:
+        return query
+    pattern = _table_pattern(tables)
+    referenced = {match.group(3).lower() for match in pattern.finditer(query)}
+    if not referenced:
+        return query
+
+    catalog = _catalog(conn)
+    if not catalog:
+        return query
+    first, last = _year_of(start_date), _year_of(end_date)
+    years_by_table = {
+        table: [year for year in catalog.get(table, [])
+                if (first is None or year >= first) and (last is None or year <= last)]
+        for table in tables if table.lower() in referenced
+    }
+    years = sorted({year for table_years in years_by_table.values() for year in table_years})
+    if not years:
+        return query
+    attach_partitions(conn, years)
+
+    def rewrite(match: re.Match) -> str:
+        keyword, table, tail, alias = match.group(1), match.group(3), match.group(4) or '', match.group(5)
+        canonical = next(name for name in tables if name.lower() == table.lower())
+        table_years = years_by_table.get(canonical)
+        if not table_years:
+            return match.group(0)
+        name = quote_identifier(canonical)
+        columns = _projection(conn, query, canonical)
+        union = ' UNION ALL '.join([f"SELECT {columns} FROM main.{name}"] +
+                                   [f"SELECT {columns} FROM {_schema_name(year)}.{name}" for year in table_years])
+        if alias and alias.upper() not in _CLAUSE_KEYWORDS:
+            return f"{keyword} ({union}) AS {alias}"
+        return f"{keyword} ({union}) AS {name}{tail}"
+
+    routed = pattern.sub(rewrite, query)
+    logger.debug(f"分区路由: {sorted(referenced)} 读取已归档年份 {years}")
+    return routed
+
+
+def execute_partitioned_query(query: str, params: Optional[Tuple] = None, start_date: Any = None,
+                              end_date: Any = None, fetch_one: bool = False) -> Union[List[Dict], Dict, None]:
+    """
+    执行按日期范围路由到分区的只读查询（与 execute_query 的返回格式一致）
+
+    参数:
+        query: SQL查询
+        params: 查询参数
+        start_date: 日期范围起点（含）
+        end_date: 日期范围终点（含）
+        fetch_one: 是否只获取一条记录
+
+    返回:
+        查询结果
+    """
+    start_time = time.time()
+    with get_db_connection() as conn:
+        cur = conn.execute(route_query(conn, query, start_date, end_date), params or ())
+        if fetch_one:
+            row = cur.fetchone()
+            result = dict(row) if row else None
+        else:
+            result = [dict(row) for row in cur.fetchall()]
+    log_query(query, time.time() - start_time)
+    return result
+
+
+def _connect(database_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(database_path, timeout=WRITE_QUEUE_CONFIG.get('busy_timeout', 30),
+                           isolation_level=None)
+    conn.execute("PRAGMA foreign_keys = OFF")
+    return conn
+
+
+def _ensure_catalog(conn: sqlite3.Connection) -> None:
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS main.{CATALOG_TABLE} (
+            table_name TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            archived_at TEXT NOT NULL,
+            PRIMARY KEY (table_name, year)
+        )
+    """)
+
+
+def _existing_tables(conn: sqlite3.Connection, schema: str = 'main') -> set:
+    return {row[0] for row in conn.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")}
+
+
+def _copy_schema(conn: sqlite3.Connection, table: str, date_column: str, schema: str) -> None:
+    """在分区库中创建与主库结构一致的表及索引，并保证日期列有索引"""
+    table_sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?",
+                             (table,)).fetchone()[0]
+    conn.execute(_CREATE_TABLE.sub(f"CREATE TABLE IF NOT EXISTS {schema}.", table_sql, count=1))
+
+    index_sqls = conn.execute("SELECT sql FROM main.sqlite_master WHERE type = 'index' AND tbl_name = ? "
+                              "AND sql IS NOT NULL", (table,)).fetchall()
+    for (index_sql,) in index_sqls:
+        conn.execute(_CREATE_INDEX.sub(lambda m: f"CREATE {m.group(1) or ''}INDEX IF NOT EXISTS "
+                                                 f"{schema}.{m.group(2)} ON ", index_sql, count=1))
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.{quote_identifier(f'idx_{table}_{date_column}')} "
+                 f"ON {quote_identifier(table)} ({quote_identifier(date_column)})")
+
+
+def _archivable_years(conn: sqlite3.Connection, table: str, date_column: str, before_year: int) -> List[int]:
+    column = quote_identifier(date_column)
+    rows = conn.execute(f"SELECT DISTINCT substr({column}, 1, 4) FROM main.{quote_identifier(table)} "
+                        f"WHERE {column} < ?", (f"{before_year:04d}",)).fetchall()
+    return sorted(year for year in (_year_of(row[0]) for row in rows) if year is not None)
+
+
+def archive_partitions(before_year: Optional[int] = None, vacuum: Optional[bool] = None,
+                       database_path: Optional[str] = None) -> Dict[int, Dict[str, int]]:
+    """
+    将早于 before_year 的年份从主库归档到各年份的分区文件
+
+    参数:
+        before_year: 归档早于该年份的数据，默认按 hot_years 保留最近几年
+        vacuum: 归档后是否VACUUM主库，默认使用 vacuum_after_archive 配置
+        database_path: 主库路径，默认使用配置
+
+    返回:
+        {年份: {表名: 归档行数}}
+    """
+    database_path = database_path or config.DATABASE_PATH
+    if before_year is None:
+        before_year = datetime.now().year - max(int(PARTITION_CONFIG.get('hot_years', 2)), 1) + 1
+    if vacuum is None:
+        vacuum = PARTITION_CONFIG.get('vacuum_after_archive', False)
+    os.makedirs(partition_directory(database_path), exist_ok=True)
+
+    conn = _connect(database_path)
+    archived: Dict[int, Dict[str, int]] = {}
+    try:
+        _ensure_catalog(conn)
+        existing = _existing_tables(conn)
+        tables = {table: column for table, column in partition_tables().items() if table in existing}
+        years: Dict[int, List[str]] = {}
+        for table, column in tables.items():
+            for year in _archivable_years(conn, table, column, before_year):
+                years.setdefault(year, []).append(table)
+
+        for year in sorted(years):
+            schema = _schema_name(year)
+            start, end = _year_bounds(year)
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (partition_path(year, database_path),))
+            try:
+                # 第1步：复制到分区文件（只修改分区库，主库只读不阻塞写入）
+                conn.execute("BEGIN")
+                try:
+                    for table in years[year]:
+                        _copy_schema(conn, table, tables[table], schema)
+                        name, column = quote_identifier(table), quote_identifier(tables[table])
+                        conn.execute(f"INSERT OR REPLACE INTO {schema}.{name} SELECT * FROM main.{name} "
+                                     f"WHERE {column} >= ? AND {column} < ?", (start, end))
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+
+                # 第2步：从主库删除并登记（只修改主库）
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    counts = {}
+                    for table in years[year]:
+                        name, column = quote_identifier(table), quote_identifier(tables[table])
+                        counts[table] = conn.execute(f"DELETE FROM main.{name} WHERE {column} >= ? AND {column} < ?",
+                                                     (start, end)).rowcount
+                        total = conn.execute(f"SELECT COUNT(*) FROM {schema}.{name}").fetchone()[0]
+                        conn.execute(f"INSERT OR REPLACE INTO main.{CATALOG_TABLE} "
+                                     f"(table_name, year, row_count, archived_at) VALUES (?, ?, ?, ?)",
+                                     (table, year, total, datetime.now().isoformat()))
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute(f"DETACH DATABASE {schema}")
+            archived[year] = counts
+            logger.info(f"已归档 {year} 年数据到 {partition_path(year, database_path)}: {counts}")
+
+        if vacuum and archived:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return archived
+
+
+def restore_partition(year: int, database_path: Optional[str] = None) -> Dict[str, int]:
+    """
+    将已归档年份的数据移回主库并删除分区文件
+
+    参数:
+        year: 年份
+        database_path: 主库路径，默认使用配置
+
+    返回:
+        {表名: 恢复行数}
+    """
+    database_path = database_path or config.DATABASE_PATH
+    path = partition_path(year, database_path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"分区文件不存在: {path}")
+
+    schema = _schema_name(year)
+    conn = _connect(database_path)
+    restored = {}
+    try:
+        _ensure_catalog(conn)
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        existing = _existing_tables(conn)
+        partitioned = _existing_tables(conn, schema)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in partition_tables():
+                if table not in partitioned or table not in existing:
+                    continue
+                name = quote_identifier(table)
+                restored[table] = conn.execute(f"INSERT OR REPLACE INTO main.{name} SELECT * FROM {schema}.{name}"
+                                               ).rowcount
+            conn.execute(f"DELETE FROM main.{CATALOG_TABLE} WHERE year = ?", (year,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute(f"DETACH DATABASE {schema}")
+    finally:
+        conn.close()
+
+    os.remove(path)
+    logger.info(f"已将 {year} 年数据恢复到主库: {restored}")
+    return restored
+
+
+def list_partitions(database_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    列出已归档的分区
+
+    参数:
+        database_path: 主库路径，默认使用配置
+
+    返回:
+        [{'table_name', 'year', 'row_count', 'archived_at', 'path', 'size'}]
+    """
+    database_path = database_path or config.DATABASE_PATH
+    conn = _connect(database_path)
+    try:
+        try:
+            rows = conn.execute(f"SELECT table_name, year, row_count, archived_at FROM {CATALOG_TABLE} "
+                                f"ORDER BY year, table_name").fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+    finally:
+        conn.close()
+
+    partitions = []
+    for table, year, row_count, archived_at in rows:
+        path = partition_path(year, database_path)
+        partitions.append({
+            'table_name': table,
+            'year': year,
+            'row_count': row_count,
+            'archived_at': archived_at,
+            'path': path,
+            'size': os.path.getsize(path) if os.path.exists(path) else None
+        })
+    return partitions
+
+
+def main(argv=None):
+    """命令行入口: python -m app.utils.partitioning <list|archive|restore>"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='按年分区存储管理')
+    parser.add_argument('--database', default=None, help='主库路径，默认使用配置')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='列出已归档的分区')
+    archive = commands.add_parser('archive', help='将冷数据年份归档到分区文件')
+    archive.add_argument('--before-year', type=int, default=None, help='归档早于该年份的数据')
+    archive.add_argument('--vacuum', action='store_true', default=None, help='归档后VACUUM主库')
+    restore = commands.add_parser('restore', help='将已归档年份移回主库')
+    restore.add_argument('year', type=int, help='年份')
+    args = parser.parse_args(argv)
+
+    if args.command == 'archive':
+        result = archive_partitions(args.before_year, args.vacuum, args.database)
+    elif args.command == 'restore':
+        result = restore_partition(args.year, args.database)
+    else:
+        result = list_partitions(args.database)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+"""
+规模测试数据生成工具 - 基于NumPy向量化采样生成百万至亿级的HIS业务数据
+
+- 使用固定种子的 numpy.random.Generator，相同参数生成完全相同的数据
+- 日期按季节性（冬季呼吸道高峰、夏季小高峰）、星期效应与逐年增长加权采样
+- 科室、就诊类型、收入类型等按真实比例加权采样
+- 按块生成并经由HIS批量导入流程（HISImportService.import_chunks）写入
+
+用法:
+    python -m app.utils.scale_data_generator --database instance/scale_test.db --rows 1000000 --seed 42
+    （默认追加写入；--mode replace 会替换目标表中的现有数据，须同时指定 --yes）
+"""
+import time
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+import numpy as np
+
+from app.utils.demo_data_generator import DemoDataGenerator
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 科室门诊量占比（相对权重）
+DEPARTMENT_WEIGHTS = {
+    '内科': 18, '外科': 10, '妇产科': 9, '儿科': 12, '骨科': 7, '眼科': 5, '耳鼻喉科': 5,
+    '神经科': 5, '心胸外科': 2, '皮肤科': 5, '泌尿外科': 3, '康复科': 2, '口腔科': 6,
+    '中医科': 4, '急诊科': 7
+}
+
+# 季节性中受呼吸道疾病影响较大的科室（冬季高峰更明显）
+RESPIRATORY_DEPARTMENTS = {'内科', '儿科', '急诊科', '耳鼻喉科'}
+
+VISIT_TYPE_WEIGHTS = {'普通门诊': 55, '专家门诊': 20, '复诊': 20, '转诊': 5}
+
+# 各收入类型的对数正态参数（均值对应约 e^mu 元）
+REVENUE_TYPE_PARAMS = {
+    '门诊收入': (5.0, 0.8),
+    '住院收入': (8.5, 0.9),
+    '药品收入': (5.5, 1.0),
+    '检查收入': (5.8, 0.7),
+    '手术收入': (9.0, 0.8),
+    '其他收入': (4.5, 1.0)
+}
+REVENUE_TYPE_WEIGHTS = {'门诊收入': 35, '住院收入': 10, '药品收入': 30, '检查收入': 15, '手术收入': 3, '其他收入': 7}
+
+# 相对门诊行数的各业务表比例
+FEED_RATIOS = {
+    'visits': 1.0,
+    'admissions': 0.08,
+    'surgeries': 0.02,
+    'revenue': 0.5
+}
+
+# 各业务表生成的列（与块数据中值的顺序一致）
+FEED_COLUMNS = {
+    'visits': ['visit_date', 'visit_type', 'department', 'patient_id', 'doctor_id', 'diagnosis'],
+    'admissions': ['patient_id', 'admission_date', 'discharge_date', 'length_of_stay',
+                   'department', 'diagnosis_group', 'doctor_id', 'status'],
+    'surgeries': ['surgery_date', 'patient_id', 'doctor_id', 'department', 'surgery_type', 'duration', 'status'],
+    'revenue': ['date', 'revenue_type', 'amount', 'department', 'description']
+}
+
+# 每个科室的医生数
+DOCTORS_PER_DEPARTMENT = 40
+
+
+def _normalized(weights) -> np.ndarray:
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.sum()
+
+
+class ScaleDataGenerator:
+    """向量化的规模测试数据生成器"""
+
+    def __init__(self, seed: int = 42, start_date: date = date(2020, 1, 1), years: int = 3,
+                 chunk_size: int = 200000):
+        """
+        初始化生成器
+
+        参数:
+            seed: 随机种子
+            start_date: 数据起始日期
+            years: 覆盖的年数
+            chunk_size: 每块生成的行数
+        """
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+        days = int(round(years * 365.25))
+        # 多保留一段日期用于出院日期等向后偏移
+        self.day_strings = np.array(
+            [(start_date + timedelta(days=i)).isoformat() for i in range(days + 120)], dtype=object
+        )
+        self.days = days
+        # 每个日期在当年中的序号（0起，按实际日期计算，闰年与非1月1日起始都准确）
+        first = np.datetime64(start_date.isoformat(), 'D')
+        dates = first + np.arange(len(self.day_strings))
+        self.day_of_year = (dates - dates.astype('datetime64[Y]')).astype(np.int64)
+
+        self.departments = np.array(list(DEPARTMENT_WEIGHTS), dtype=object)
+        self.department_p = _normalized(list(DEPARTMENT_WEIGHTS.values()))
+        self.respiratory = np.array([d in RESPIRATORY_DEPARTMENTS for d in self.departments])
+        self.day_p = self._day_weights(start_date, days)
+
+    @staticmethod
+    def _day_weights(start_date: date, days: int) -> np.ndarray:
+        """按季节性、星期效应、节假日与逐年增长计算每天的相对就诊量"""
+        offsets = np.arange(days)
+        first = np.datetime64(start_date.isoformat(), 'D')
+        dates = first + offsets
+        day_of_year = (dates - dates.astype('datetime64[Y]')).astype(np.int64)
+        weekday = (dates.astype(np.int64) + 3) % 7  # 1970-01-01 为周四，0表示周一
+
+        # 冬季（1月中旬）主峰、夏季（7月底）次峰
+        seasonal = (1.0
+                    + 0.18 * np.cos(2 * np.pi * (day_of_year - 15) / 365.25)
+                    + 0.06 * np.cos(4 * np.pi * (day_of_year - 205) / 365.25))
+        weekly = np.select([weekday == 5, weekday == 6], [0.65, 0.55], default=1.0)
+        # 春节前后（约1月下旬至2月中旬）门诊量明显下降
+        holiday = np.where((day_of_year >= 25) & (day_of_year <= 45), 0.7, 1.0)
+        growth = 1.0 + 0.06 * offsets / 365.25
+
+        return _normalized(seasonal * weekly * holiday * growth)
+
+    def _rng(self, feed: str, chunk_index: int) -> np.random.Generator:
+        """每个数据类型、每一块使用独立且可复现的随机流"""
+        feed_id = list(FEED_RATIOS).index(feed)
+        return np.random.default_rng([self.seed, feed_id, chunk_index])
+
+    def _sample_days(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        return rng.choice(self.days, size=n, p=self.day_p)
+
+    def _sample_departments(self, rng: np.random.Generator, n: int, day_index: np.ndarray) -> np.ndarray:
+        """采样科室编号；冬季时呼吸道相关科室占比更高"""
+        dept = rng.choice(len(self.departments), size=n, p=self.department_p)
+        day_of_year = self.day_of_year[day_index]
+        winter = (day_of_year < 60) | (day_of_year > 330)
+        # 冬季把部分非呼吸道科室的就诊重新分配给呼吸道科室
+        shift = winter & ~self.respiratory[dept] & (rng.random(n) < 0.15)
+        if shift.any():
+            respiratory_ids = np.flatnonzero(self.respiratory)
+            dept[shift] = rng.choice(respiratory_ids, size=int(shift.sum()))
+        return dept
+
+    @staticmethod
+    def _ids(prefix: str, values: np.ndarray, width: int) -> List[str]:
+        return np.char.mod(f'{prefix}%0{width}d', values).tolist()
+
+    def _doctor_ids(self, rng: np.random.Generator, dept: np.ndarray) -> List[str]:
+        doctors = dept * DOCTORS_PER_DEPARTMENT + rng.integers(0, DOCTORS_PER_DEPARTMENT, size=len(dept))
+        return self._ids('D', doctors, 5)
+
+    # ------------------------------------------------------------------
+    # 各业务表的块生成
+    # ------------------------------------------------------------------
+    def _visits_chunk(self, rng: np.random.Generator, n: int, patient_pool: int) -> List[list]:
+        day_index = self._sample_days(rng, n)
+        dept = self._sample_departments(rng, n, day_index)
+
+        visit_types = np.array(list(VISIT_TYPE_WEIGHTS), dtype=object)[
+            rng.choice(len(VISIT_TYPE_WEIGHTS), size=n, p=_normalized(list(VISIT_TYPE_WEIGHTS.values())))
+        ]
+        visit_types[self.departments[dept] == '急诊科'] = '急诊'
+
+        diagnosis_groups = np.array(DemoDataGenerator.DIAGNOSIS_GROUPS, dtype=object)
+        diagnosis = diagnosis_groups[rng.integers(0, len(diagnosis_groups), size=n)]
+
+        return [
+            self.day_strings[day_index].tolist(),
+            visit_types.tolist(),
+            self.departments[dept].tolist(),
+            self._ids('P', rng.integers(0, patient_pool, size=n), 9),
+            self._doctor_ids(rng, dept),
+            diagnosis.tolist()
+        ]
+
+    def _admissions_chunk(self, rng: np.random.Generator, n: int, patient_pool: int) -> List[list]:
+        day_index = self._sample_days(rng, n)
+        dept = self._sample_departments(rng, n, day_index)
+        length_of_stay = np.clip(np.rint(rng.lognormal(1.9, 0.55, size=n)), 1, 90).astype(np.int64)
+        discharge_index = day_index + length_of_stay
+        active = discharge_index >= self.days
+
+        discharge = self.day_strings[np.minimum(discharge_index, len(self.day_strings) - 1)]
+        discharge[active] = None
+        diagnosis_groups = np.array(DemoDataGenerator.DIAGNOSIS_GROUPS, dtype=object)
+
+        values = [
+            self._ids('P', rng.integers(0, patient_pool, size=n), 9),
+            self.day_strings[day_index].tolist(),
+            discharge.tolist(),
+            np.where(active, -1, length_of_stay).tolist(),
+            self.departments[dept].tolist(),
+            diagnosis_groups[rng.integers(0, len(diagnosis_groups), size=n)].tolist(),
+            self._doctor_ids(rng, dept),
+            np.where(active, 'active', 'discharged').tolist()
+        ]
+        # 在院患者住院天数未知
+        values[3] = [None if v < 0 else v for v in values[3]]
+        return values
+
+    def _surgeries_chunk(self, rng: np.random.Generator, n: int, patient_pool: int) -> List[list]:
+        day_index = self._sample_days(rng, n)
+        dept = self._sample_departments(rng, n, day_index)
+        surgery_types = np.array(DemoDataGenerator.SURGERY_TYPES, dtype=object)
+        duration = np.clip(np.rint(rng.gamma(4.0, 30.0, size=n)), 15, 720).astype(np.int64)
+        status = np.where(rng.random(n) < 0.97, 'completed', 'cancelled')
+
+        return [
+            self.day_strings[day_index].tolist(),
+            self._ids('P', rng.integers(0, patient_pool, size=n), 9),
+            self._doctor_ids(rng, dept),
+            self.departments[dept].tolist(),
+            surgery_types[rng.integers(0, len(surgery_types), size=n)].tolist(),
+            duration.tolist(),
+            status.tolist()
+        ]
+
+    def _revenue_chunk(self, rng: np.random.Generator, n: int, patient_pool: int) -> List[list]:
+        day_index = self._sample_days(rng, n)
+        dept = self._sample_departments(rng, n, day_index)
+        type_names = list(REVENUE_TYPE_WEIGHTS)
+        type_index = rng.choice(len(type_names), size=n, p=_normalized(list(REVENUE_TYPE_WEIGHTS.values())))
+        mu = np.array([REVENUE_TYPE_PARAMS[t][0] for t in type_names])[type_index]
+        sigma = np.array([REVENUE_TYPE_PARAMS[t][1] for t in type_names])[type_index]
+        amount = np.round(rng.lognormal(mu, sigma), 2)
+
+        return [
+            self.day_strings[day_index].tolist(),
+            np.array(type_names, dtype=object)[type_index].tolist(),
+            amount.tolist(),
+            self.departments[dept].tolist(),
+            self._ids('INV', rng.integers(0, 10 ** 10, size=n), 10)
+        ]
+
+    def iter_chunks(self, feed: str, rows: int) -> Tuple[List[str], Iterator[List[tuple]]]:
+        """
+        按块生成指定业务表的数据
+
+        参数:
+            feed: 数据类型（visits/admissions/surgeries/revenue）
+            rows: 总行数
+
+        返回:
+            (列名, 行块迭代器)，可直接传给 HISImportService.import_chunks
+        """
+        builders = {
+            'visits': self._visits_chunk,
+            'admissions': self._admissions_chunk,
+            'surgeries': self._surgeries_chunk,
+            'revenue': self._revenue_chunk
+        }
+        if feed not in builders:
+            raise ValueError(f"不支持的数据类型: {feed}")
+        builder = builders[feed]
+        # 约每位患者3次就诊
+        patient_pool = max(1000, int(rows * FEED_RATIOS['visits'] / FEED_RATIOS[feed] / 3))
+
+        def chunks():
+            for chunk_index, offset in enumerate(range(0, rows, self.chunk_size)):
+                n = min(self.chunk_size, rows - offset)
+                values = builder(self._rng(feed, chunk_index), n, patient_pool)
+                yield list(zip(*values))
+
+        return list(FEED_COLUMNS[feed]), chunks()
+
+    def populate(self, rows: int, feeds: Optional[List[str]] = None, mode: str = 'append',
+                 database_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        生成数据并通过HIS批量导入流程写入数据库
+
+        参数:
+            rows: 门诊记录行数，其余业务表按 FEED_RATIOS 比例生成
+            feeds: 要生成的数据类型，默认全部
+            mode: 导入模式，默认追加；replace 会替换目标表中的现有数据，须显式指定 database_path
+            database_path: 数据库路径，默认使用配置
+
+        返回:
+            {数据类型: 导入统计}
+        """
+        from app.services.his_import_service import HISImportService
+
+        if mode == 'replace' and not database_path:
+            # 避免在未指定数据库时误替换配置中的生产库数据
+            raise ValueError("replace 模式须显式指定 database_path")
+
+        service = HISImportService(database_path=database_path)
+        results = {}
+        for feed in feeds or list(FEED_RATIOS):
+            feed_rows = max(1, int(rows * FEED_RATIOS[feed]))
+            start = time.perf_counter()
+            columns, chunks = self.iter_chunks(feed, feed_rows)
+            result = service.import_chunks(feed, columns, chunks, mode=mode)
+            result['generate_and_import_seconds'] = round(time.perf_counter() - start, 3)
+            results[feed] = result
+            logger.info(f"已生成 {feed}: {feed_rows} 行")
+        return results
+
+
+def build_scale_database(database_path: str, rows: int, seed: int = 42,
+                         feeds: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    构建可复现的规模测试数据库（供各基准测试使用）
+
+    参数:
+        database_path: 数据库路径
+        rows: 门诊记录行数
+        seed: 随机种子
+        feeds: 要生成的数据类型，默认全部
+
+    返回:
+        {数据类型: 导入统计}
+    """
+    return ScaleDataGenerator(seed=seed).populate(rows, feeds=feeds, mode='replace',
+                                                  database_path=database_path)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='规模测试数据生成')
+    parser.add_argument('--rows', type=int, default=1000000, help='门诊记录行数（其余表按比例生成）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--years', type=int, default=3, help='覆盖年数')
+    parser.add_argument('--feeds', nargs='+', choices=list(FEED_RATIOS), default=None, help='要生成的数据类型')
+    parser.add_argument('--mode', choices=['append', 'replace'], default='append',
+                        help='导入模式，replace 会替换目标表中的现有数据')
+    parser.add_argument('--yes', action='store_true', help='确认以 replace 模式替换现有数据')
+    parser.add_argument('--database', required=True, help='数据库路径（请使用测试库，不要指向生产库）')
+    parser.add_argument('--chunk-size', type=int, default=200000, help='每块生成的行数')
+    args = parser.parse_args(argv)
+    if args.mode == 'replace' and not args.yes:
+        parser.error('--mode replace 会替换目标表中的现有数据，请同时指定 --yes 确认')
+
+    generator = ScaleDataGenerator(seed=args.seed, years=args.years, chunk_size=args.chunk_size)
+    results = generator.populate(args.rows, feeds=args.feeds, mode=args.mode, database_path=args.database)
+    for feed, result in results.items():
+        print(f"[{feed}] 生成 {result['rows_read']} 行, 导入 {result['rows_loaded']} 行, "
+              f"耗时 {result['generate_and_import_seconds']:.2f} 秒")
+
+
+if __name__ == '__main__':
+    main()
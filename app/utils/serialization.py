@@ -0,0 +1,348 @@
+"""
+响应序列化模块 - 提供高性能的JSON序列化、列式表格编码和响应压缩
+
+主要功能:
+- 基于orjson的序列化（未安装时回退到标准库json）
+- Plotly图表JSON直通，避免 fig.to_json() -> json.loads -> jsonify 的二次序列化
+- 列式表格编码 {columns: [...], data: [[...]]}，避免每行重复字段名
+- 按Accept-Encoding协商的gzip/brotli压缩
+"""
+import gzip
+import json
+import math
+import datetime
+import decimal
+from typing import Any, Dict, List, Optional, Union
+
+from flask import Response, request
+
+from app.config import config
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+SERIALIZATION_CONFIG = getattr(config, 'SERIALIZATION_CONFIG', {})
+
+# 超过该字节数的响应才会尝试压缩
+COMPRESS_MIN_SIZE = SERIALIZATION_CONFIG.get('compress_min_size', 4096)
+GZIP_LEVEL = SERIALIZATION_CONFIG.get('gzip_level', 5)
+BROTLI_QUALITY = SERIALIZATION_CONFIG.get('brotli_quality', 4)
+# 表格编码: records(行字典列表) 或 columnar(列式)
+DEFAULT_TABLE_FORMAT = SERIALIZATION_CONFIG.get('default_table_format', 'records')
+
+_ORJSON_OPTIONS = 0
+if ORJSON_AVAILABLE:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class RawJSON:
+    """
+    已序列化的JSON片段
+
+    在标准库回退路径下使用；orjson可用时直接使用 orjson.Fragment
+    """
+    __slots__ = ('contents',)
+
+    def __init__(self, contents: Union[str, bytes]):
+        self.contents = contents
+
+
+def raw_json(contents: Union[str, bytes]) -> Any:
+    """
+    包装一段已经是合法JSON的字符串，序列化时原样输出而不重新解析
+
+    参数:
+        contents: JSON字符串或字节串
+
+    返回:
+        可嵌入任意响应结构的JSON片段对象
+    """
+    if ORJSON_AVAILABLE and hasattr(orjson, 'Fragment'):
+        return orjson.Fragment(contents)
+    return RawJSON(contents)
+
+
+def plotly_json(fig) -> Any:
+    """
+    将Plotly图表对象转换为可直通的JSON片段
+
+    参数:
+        fig: Plotly Figure对象或其JSON字符串
+
+    返回:
+        JSON片段，fig为None时返回None
+    """
+    if fig is None:
+        return None
+    if isinstance(fig, (str, bytes)):
+        return raw_json(fig)
+    return raw_json(fig.to_json())
+
+
+def _default(obj: Any) -> Any:
+    """处理orjson/json无法直接序列化的对象"""
+    if isinstance(obj, RawJSON):
+        contents = obj.contents
+        if isinstance(contents, bytes):
+            contents = contents.decode('utf-8')
+        return json.loads(contents)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode('utf-8', errors='replace')
+    if np is not None:
+        if isinstance(obj, np.integer):
+            return int(obj)
+        if isinstance(obj, np.floating):
+            value = float(obj)
+            return None if math.isnan(value) or math.isinf(value) else value
+        if isinstance(obj, np.bool_):
+            return bool(obj)
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    if pd is not None:
+        if isinstance(obj, pd.DataFrame):
+            return encode_table(obj)
+        if isinstance(obj, pd.Series):
+            return obj.tolist()
+        if obj is pd.NaT:
+            return None
+        if isinstance(obj, pd.Timestamp):
+            return obj.isoformat()
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    if hasattr(obj, '__dict__'):
+        return obj.__dict__
+    return str(obj)
+
+
+def _clean_floats(obj: Any) -> Any:
+    """标准库回退路径下将NaN/Infinity替换为null，保证输出为合法JSON"""
+    if isinstance(obj, float):
+        return None if math.isnan(obj) or math.isinf(obj) else obj
+    if isinstance(obj, dict):
+        return {k: _clean_floats(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_clean_floats(v) for v in obj]
+    return obj
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    将Python对象序列化为UTF-8编码的JSON字节串
+
+    参数:
+        obj: 要序列化的对象
+
+    返回:
+        JSON字节串
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(_clean_floats(obj), default=_default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    解析JSON字符串或字节串
+
+    参数:
+        data: JSON数据
+
+    返回:
+        解析后的Python对象
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_table(data: Any, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    将表格数据编码为列式结构 {columns: [...], data: [[...]]}
+
+    参数:
+        data: DataFrame、行字典列表或行列表
+        columns: 列名（data为行列表时必须提供）
+
+    返回:
+        列式表格字典
+    """
+    if pd is not None and isinstance(data, pd.DataFrame):
+        frame = data
+        if columns is not None:
+            frame = frame[columns]
+        frame = frame.astype(object).where(frame.notna(), None)
+        return {
+            'columns': [str(c) for c in frame.columns],
+            'data': frame.values.tolist()
+        }
+
+    rows = list(data or [])
+    if not rows:
+        return {'columns': list(columns or []), 'data': []}
+
+    if isinstance(rows[0], dict):
+        if columns is None:
+            # 保持首次出现顺序合并所有行的字段
+            seen = {}
+            for row in rows:
+                for key in row:
+                    if key not in seen:
+                        seen[key] = None
+            columns = list(seen)
+        return {
+            'columns': list(columns),
+            'data': [[row.get(col) for col in columns] for row in rows]
+        }
+
+    return {
+        'columns': list(columns or []),
+        'data': [list(row) for row in rows]
+    }
+
+
+def decode_table(table: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    将列式表格还原为行字典列表
+
+    参数:
+        table: 列式表格字典
+
+    返回:
+        行字典列表
+    """
+    columns = table.get('columns', [])
+    return [dict(zip(columns, row)) for row in table.get('data', [])]
+
+
+def requested_table_format() -> str:
+    """
+    获取客户端请求的表格编码格式
+
+    支持查询参数 table_format 或请求头 X-Table-Format，取值 records / columnar
+    """
+    fmt = None
+    try:
+        fmt = request.args.get('table_format') or request.headers.get('X-Table-Format')
+    except RuntimeError:
+        # 不在请求上下文中
+        fmt = None
+    fmt = (fmt or DEFAULT_TABLE_FORMAT).lower()
+    return 'columnar' if fmt == 'columnar' else 'records'
+
+
+def table_payload(data: Any, columns: Optional[List[str]] = None) -> Any:
+    """
+    按客户端协商的格式输出表格数据
+
+    参数:
+        data: DataFrame或行字典列表
+        columns: 可选的列顺序
+
+    返回:
+        列式表格字典或行字典列表
+    """
+    if requested_table_format() == 'columnar':
+        return encode_table(data, columns)
+    if pd is not None and isinstance(data, pd.DataFrame):
+        frame = data if columns is None else data[columns]
+        return frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+    return data
+
+
+def _negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """根据Accept-Encoding选择压缩算法，优先brotli"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    if BROTLI_AVAILABLE and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """
+    使用指定算法压缩响应体
+
+    参数:
+        body: 原始字节
+        encoding: 'br' 或 'gzip'
+
+    返回:
+        压缩后的字节
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def json_response(payload: Any, status: int = 200,
+                  headers: Optional[Dict[str, str]] = None,
+                  compress: bool = True) -> Response:
+    """
+    生成JSON响应，替代 jsonify，对大响应按需压缩
+
+    参数:
+        payload: 响应数据，可包含 raw_json/plotly_json 片段与DataFrame
+        status: HTTP状态码
+        headers: 额外的响应头
+        compress: 是否允许压缩
+
+    返回:
+        Flask Response对象
+    """
+    body = dumps(payload)
+    response_headers = {'Vary': 'Accept-Encoding'}
+    if headers:
+        response_headers.update(headers)
+
+    if compress and len(body) >= COMPRESS_MIN_SIZE:
+        try:
+            encoding = _negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        except RuntimeError:
+            encoding = None
+        if encoding:
+            body = compress_body(body, encoding)
+            response_headers['Content-Encoding'] = encoding
+
+    return Response(body, status=status, headers=response_headers,
+                    mimetype='application/json')
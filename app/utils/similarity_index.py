@@ -0,0 +1,372 @@
+"""
+文本相似度索引模块
+提供基于稀疏TF-IDF矩阵的批量相似度检索，以及基于MinHash/LSH的近重复文本检测
+
+- 语料只分词一次，构建scipy稀疏TF-IDF矩阵（行向量已L2归一化，点积即余弦相似度）
+- 一对多、全对全Top-K检索均通过稀疏矩阵乘法完成
+- MinHash签名 + LSH分桶用于病历去重，避免两两比较
+"""
+import re
+import zlib
+import logging
+from collections import defaultdict
+from typing import List, Dict, Tuple, Optional, Any, Iterable
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.utils.nlp_engine import get_nlp_engine
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# MinHash使用的梅森素数与哈希取值上限
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _identity(tokens):
+    """TfidfVectorizer的分析器，输入已是分词结果"""
+    return tokens
+
+
+class SimilarityIndex:
+    """基于稀疏TF-IDF矩阵的文本相似度索引"""
+
+    def __init__(self, documents: Optional[Iterable[str]] = None,
+                 ids: Optional[List[Any]] = None,
+                 sublinear_tf: bool = True,
+                 min_df: int = 1):
+        """
+        初始化相似度索引
+
+        参数:
+            documents: 初始文档列表，提供时立即构建索引
+            ids: 与文档对应的标识，默认为文档下标
+            sublinear_tf: 是否使用对数词频
+            min_df: 词语最小文档频率
+        """
+        self.vectorizer = TfidfVectorizer(
+            analyzer=_identity,
+            sublinear_tf=sublinear_tf,
+            min_df=min_df,
+            norm='l2',
+            dtype=np.float32
+        )
+        self.matrix = None
+        self.ids = []
+
+        if documents is not None:
+            self.fit(documents, ids=ids)
+
+    def __len__(self) -> int:
+        return 0 if self.matrix is None else self.matrix.shape[0]
+
+    def fit(self, documents: Iterable[str], ids: Optional[List[Any]] = None) -> 'SimilarityIndex':
+        """
+        对语料分词并构建TF-IDF矩阵
+
+        参数:
+            documents: 文档列表
+            ids: 与文档对应的标识
+
+        返回:
+            当前索引对象
+        """
+        documents = [doc or '' for doc in documents]
+        if ids is not None and len(ids) != len(documents):
+            raise ValueError("ids数量必须与文档数量一致")
+
+        tokens = get_nlp_engine().segment_batch(documents)
+        if not any(tokens):
+            # 空语料无法构建词表，保留空矩阵
+            self.matrix = sparse.csr_matrix((len(documents), 0), dtype=np.float32)
+        else:
+            self.matrix = self.vectorizer.fit_transform(tokens).tocsr()
+        self.ids = list(ids) if ids is not None else list(range(len(documents)))
+        return self
+
+    def transform(self, texts: Iterable[str]) -> sparse.csr_matrix:
+        """
+        将新文本映射到索引的TF-IDF空间
+
+        参数:
+            texts: 文本列表
+
+        返回:
+            稀疏TF-IDF矩阵
+        """
+        if self.matrix is None:
+            raise ValueError("索引尚未构建")
+        texts = [text or '' for text in texts]
+        if self.matrix.shape[1] == 0:
+            return sparse.csr_matrix((len(texts), 0), dtype=np.float32)
+        tokens = get_nlp_engine().segment_batch(texts)
+        return self.vectorizer.transform(tokens).tocsr()
+
+    @staticmethod
+    def _top_k_row(scores: np.ndarray, indices: np.ndarray, top_k: int,
+                   threshold: float) -> List[Tuple[int, float]]:
+        """从一行稀疏得分中选出Top-K"""
+        if threshold > 0:
+            mask = scores >= threshold
+            scores, indices = scores[mask], indices[mask]
+        if scores.size == 0:
+            return []
+        if scores.size > top_k:
+            part = np.argpartition(-scores, top_k - 1)[:top_k]
+            scores, indices = scores[part], indices[part]
+        order = np.argsort(-scores, kind='stable')
+        return [(int(indices[i]), float(scores[i])) for i in order]
+
+    def query(self, text: str, top_k: int = 10, threshold: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        一对多检索：计算文本与索引中所有文档的相似度
+
+        参数:
+            text: 查询文本
+            top_k: 返回前k个结果
+            threshold: 最低相似度
+
+        返回:
+            结果列表 [{'id': ..., 'index': ..., 'score': ...}, ...]
+        """
+        return self.query_batch([text], top_k=top_k, threshold=threshold)[0]
+
+    def query_batch(self, texts: List[str], top_k: int = 10,
+                    threshold: float = 0.0) -> List[List[Dict[str, Any]]]:
+        """
+        多对多检索：每个查询文本返回其在索引中的Top-K相似文档
+
+        参数:
+            texts: 查询文本列表
+            top_k: 每个查询返回前k个结果
+            threshold: 最低相似度
+
+        返回:
+            与查询一一对应的结果列表
+        """
+        queries = self.transform(texts)
+        scores = (queries @ self.matrix.T).tocsr()
+
+        results = []
+        for row in range(scores.shape[0]):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            top = self._top_k_row(scores.data[start:end], scores.indices[start:end], top_k, threshold)
+            results.append([
+                {'id': self.ids[idx], 'index': idx, 'score': score}
+                for idx, score in top
+            ])
+        return results
+
+    def all_pairs_top_k(self, top_k: int = 5, threshold: float = 0.0,
+                        chunk_size: int = 1000) -> Dict[Any, List[Dict[str, Any]]]:
+        """
+        全对全检索：为索引中的每个文档找出最相似的k个其他文档
+
+        参数:
+            top_k: 每个文档返回前k个结果
+            threshold: 最低相似度
+            chunk_size: 分块计算的行数，用于控制内存占用
+
+        返回:
+            {文档id: [{'id': ..., 'index': ..., 'score': ...}, ...]}
+        """
+        if self.matrix is None:
+            raise ValueError("索引尚未构建")
+
+        results = {}
+        matrix_t = self.matrix.T.tocsc()
+        n_docs = self.matrix.shape[0]
+
+        for chunk_start in range(0, n_docs, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, n_docs)
+            scores = (self.matrix[chunk_start:chunk_end] @ matrix_t).tocsr()
+
+            for offset in range(chunk_end - chunk_start):
+                doc_idx = chunk_start + offset
+                start, end = scores.indptr[offset], scores.indptr[offset + 1]
+                indices = scores.indices[start:end]
+                data = scores.data[start:end]
+                # 排除文档自身
+                mask = indices != doc_idx
+                top = self._top_k_row(data[mask], indices[mask], top_k, threshold)
+                results[self.ids[doc_idx]] = [
+                    {'id': self.ids[idx], 'index': idx, 'score': score}
+                    for idx, score in top
+                ]
+        return results
+
+
+class MinHashLSH:
+    """基于MinHash签名与LSH分桶的近重复文本检测"""
+
+    def __init__(self, num_perm: int = 128, threshold: float = 0.8,
+                 shingle_size: int = 3, bands: Optional[int] = None, seed: int = 1):
+        """
+        初始化近重复检测器
+
+        参数:
+            num_perm: MinHash置换数（签名长度）
+            threshold: Jaccard相似度阈值
+            shingle_size: 字符shingle长度
+            bands: LSH分带数，None时按阈值自动选择
+            seed: 随机种子，保证签名可复现
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold必须在(0, 1]范围内")
+
+        self.num_perm = num_perm
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands or self._optimal_bands(threshold, num_perm)
+        self.rows = num_perm // self.bands
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+        self._b = rng.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE_PRIME
+
+    @staticmethod
+    def _optimal_bands(threshold: float, num_perm: int) -> int:
+        """选择使LSH拐点 (1/b)^(1/r) 最接近且不高于阈值的分带数"""
+        best_bands, best_gap = 1, None
+        for bands in range(1, num_perm + 1):
+            if num_perm % bands:
+                continue
+            rows = num_perm // bands
+            knee = (1.0 / bands) ** (1.0 / rows)
+            if knee > threshold:
+                continue
+            gap = threshold - knee
+            if best_gap is None or gap < best_gap:
+                best_bands, best_gap = bands, gap
+        return best_bands
+
+    def shingles(self, text: str) -> np.ndarray:
+        """
+        生成文本的字符shingle哈希集合
+
+        参数:
+            text: 输入文本
+
+        返回:
+            去重后的32位哈希数组
+        """
+        text = _WHITESPACE_RE.sub('', text or '')
+        k = self.shingle_size
+        if len(text) <= k:
+            grams = {text} if text else set()
+        else:
+            grams = {text[i:i + k] for i in range(len(text) - k + 1)}
+        return np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams),
+                           dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        计算文本的MinHash签名
+
+        参数:
+            text: 输入文本
+
+        返回:
+            长度为num_perm的签名数组
+        """
+        hashes = self.shingles(text)
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        permuted = np.bitwise_and((np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME, _MAX_HASH)
+        return permuted.min(axis=0)
+
+    def signatures(self, texts: Iterable[str]) -> np.ndarray:
+        """
+        批量计算MinHash签名
+
+        参数:
+            texts: 文本列表
+
+        返回:
+            (文本数, num_perm) 的签名矩阵
+        """
+        texts = list(texts)
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint64)
+        for i, text in enumerate(texts):
+            result[i] = self.signature(text)
+        return result
+
+    def candidate_pairs(self, signatures: np.ndarray) -> set:
+        """
+        通过LSH分桶找出候选重复对
+
+        参数:
+            signatures: 签名矩阵
+
+        返回:
+            候选下标对集合 {(i, j), ...}，i < j
+        """
+        candidates = set()
+        for band in range(self.bands):
+            buckets = defaultdict(list)
+            band_slice = signatures[:, band * self.rows:(band + 1) * self.rows]
+            for idx in range(band_slice.shape[0]):
+                buckets[band_slice[idx].tobytes()].append(idx)
+            for members in buckets.values():
+                if len(members) < 2:
+                    continue
+                for i in range(len(members)):
+                    for j in range(i + 1, len(members)):
+                        candidates.add((members[i], members[j]))
+        return candidates
+
+    def find_duplicates(self, texts: List[str], ids: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """
+        检测近重复文本
+
+        参数:
+            texts: 文本列表
+            ids: 与文本对应的标识，默认为文本下标
+
+        返回:
+            {
+                'pairs': [{'id1': ..., 'id2': ..., 'similarity': ...}, ...],
+                'groups': [[id, ...], ...]  # 每组为互相近重复的文本
+            }
+        """
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError("ids数量必须与文本数量一致")
+        ids = list(ids) if ids is not None else list(range(len(texts)))
+
+        signatures = self.signatures(texts)
+        # 空文本的签名全部相同，不参与去重
+        valid = np.array([bool(_WHITESPACE_RE.sub('', text or '')) for text in texts], dtype=bool)
+
+        parent = list(range(len(texts)))
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        pairs = []
+        for i, j in sorted(self.candidate_pairs(signatures)):
+            if not (valid[i] and valid[j]):
+                continue
+            similarity = float(np.mean(signatures[i] == signatures[j]))
+            if similarity < self.threshold:
+                continue
+            pairs.append({'id1': ids[i], 'id2': ids[j], 'similarity': similarity})
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_j] = root_i
+
+        groups = defaultdict(list)
+        for idx in range(len(texts)):
+            groups[find(idx)].append(ids[idx])
+
+        return {
+            'pairs': pairs,
+            'groups': [members for members in groups.values() if len(members) > 1]
+        }
@@ -0,0 +1,222 @@
+"""
+请求合并模块 - 相同请求并发时只执行一次，结果分发给所有调用方
+
+- 以规范化后的请求内容计算键，同一键同一时刻只有一个调用在执行，其余调用等待并共用其结果或异常
+- 执行成功且结果可缓存时放入带过期时间的精确匹配缓存，过期前的相同请求直接返回缓存结果
+- 统计调用数、实际执行数、合并数与缓存命中数，便于评估重复请求的比例
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from app.config.base import LLM_COALESCING_CONFIG
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+
+def _normalize(part: Any) -> Any:
+    """规范化键的组成部分（文本折叠空白，DataFrame等对象转为文本）"""
+    if isinstance(part, str):
+        return ' '.join(part.split())
+    if hasattr(part, 'to_string'):
+        return ' '.join(part.to_string().split())
+    if isinstance(part, (list, tuple)):
+        return [_normalize(item) for item in part]
+    if isinstance(part, dict):
+        return {str(key): _normalize(value) for key, value in part.items()}
+    return part
+
+
+def make_key(*parts: Any) -> str:
+    """
+    由请求内容计算合并键
+
+    参数:
+        parts: 请求的组成部分（提示词、参数等）
+
+    返回:
+        键的十六进制摘要
+    """
+    payload = json.dumps([_normalize(part) for part in parts], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    """进行中的一次调用"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """相同键的并发调用只执行一次，并可缓存成功结果"""
+
+    def __init__(self, name: str, cache_ttl: float = 0, max_entries: int = 512,
+                 wait_timeout: Optional[float] = None,
+                 cacheable: Optional[Callable[[Any], bool]] = None):
+        """
+        初始化请求合并器
+
+        参数:
+            name: 名称（用于日志与统计）
+            cache_ttl: 结果缓存秒数，0表示不缓存
+            max_entries: 最多缓存的结果数
+            wait_timeout: 等待进行中调用的最长秒数，超时后自行执行，None表示一直等待
+            cacheable: 判断结果是否可缓存的函数，默认结果不为None即可缓存
+        """
+        self.name = name
+        self.cache_ttl = cache_ttl
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self.cacheable = cacheable or (lambda result: result is not None)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Call] = {}
+        self._cache: 'OrderedDict[str, tuple]' = OrderedDict()
+        self.stats = {
+            'calls': 0,
+            'executions': 0,
+            'coalesced': 0,
+            'cache_hits': 0,
+            'errors': 0,
+            'wait_timeouts': 0
+        }
+
+    def _cached(self, key: str, now: float):
+        entry = self._cache.get(key)
+        if entry is None:
+            return False, None
+        expires_at, result = entry
+        if expires_at <= now:
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        return True, result
+
+    def _store(self, key: str, result: Any) -> None:
+        self._cache[key] = (time.monotonic() + self.cache_ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        执行调用（相同键的调用正在进行时等待其结果，缓存命中时直接返回）
+
+        参数:
+            key: 合并键，通常由 make_key 计算
+            func: 实际执行的无参函数
+
+        返回:
+            func 的返回值（执行出错时所有等待方都会收到同一异常）
+        """
+        with self._lock:
+            self.stats['calls'] += 1
+            hit, result = self._cached(key, time.monotonic())
+            if hit:
+                self.stats['cache_hits'] += 1
+                return result
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.stats['executions'] += 1
+            else:
+                call.waiters += 1
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            if call.done.wait(self.wait_timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            with self._lock:
+                self.stats['wait_timeouts'] += 1
+                self.stats['executions'] += 1
+            logger.warning(f"[{self.name}] 等待相同请求超过 {self.wait_timeout} 秒，改为自行调用")
+            return func()
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                if call.error is None and self.cache_ttl > 0 and self.cacheable(call.result):
+                    self._store(key, call.result)
+                self._inflight.pop(key, None)
+            call.done.set()
+            if call.waiters:
+                logger.info(f"[{self.name}] 1次调用结果分发给 {call.waiters} 个相同的并发请求")
+        return call.result
+
+    def clear(self) -> None:
+        """清空结果缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['inflight'] = len(self._inflight)
+            stats['cached'] = len(self._cache)
+        saved = stats['coalesced'] + stats['cache_hits']
+        stats['dedupe_ratio'] = saved / stats['calls'] if stats['calls'] else 0
+        return stats
+
+
+# 按名称共享的合并器
+_single_flights: Dict[str, SingleFlight] = {}
+_single_flights_lock = threading.Lock()
+
+
+def get_single_flight(name: str, cache_ttl: Optional[float] = None,
+                      cacheable: Optional[Callable[[Any], bool]] = None) -> SingleFlight:
+    """
+    获取指定名称的共享请求合并器（首次获取时按 LLM_COALESCING_CONFIG 创建）
+
+    参数:
+        name: 名称
+        cache_ttl: 结果缓存秒数，默认使用配置中的 cache_ttl
+        cacheable: 判断结果是否可缓存的函数
+
+    返回:
+        SingleFlight实例
+    """
+    single_flight = _single_flights.get(name)
+    if single_flight is not None:
+        return single_flight
+
+    with _single_flights_lock:
+        if name not in _single_flights:
+            _single_flights[name] = SingleFlight(
+                name,
+                cache_ttl=LLM_COALESCING_CONFIG['cache_ttl'] if cache_ttl is None else cache_ttl,
+                max_entries=LLM_COALESCING_CONFIG['max_entries'],
+                wait_timeout=LLM_COALESCING_CONFIG['wait_timeout'],
+                cacheable=cacheable
+            )
+        return _single_flights[name]
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    获取全部请求合并器的统计
+
+    返回:
+        {名称: 统计}
+    """
+    return {name: single_flight.get_stats() for name, single_flight in list(_single_flights.items())}
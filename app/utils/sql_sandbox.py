@@ -0,0 +1,428 @@
+"""
+SQL执行沙箱模块 - 安全地执行LLM生成或用户提交的即席查询
+
+防护措施：
+- 只读连接池：以 mode=ro 打开数据库并设置 query_only，授权回调只允许读取（禁止写入、PRAGMA、ATTACH等）
+- 时间预算：通过 set_progress_handler 定期检查耗时，超时即中断查询
+- 行数上限：最多返回 max_rows 行，超出时标记 truncated
+- 执行计划检查：执行前分析 EXPLAIN QUERY PLAN，拒绝需要排序/聚合的大表全表扫描和大表之间的嵌套扫描；
+  只流式读取的大表扫描允许执行，由行数上限与时间预算截断
+- 并发限制：连接池大小即全局并发上限，另按用户限制同时执行的查询数
+- 分区路由：查询中的事实表按 app.utils.partitioning 改写为主库与已归档年份分区的并集
+"""
+import os
+import re
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.request import pathname2url
+
+import pandas as pd
+
+from app.config import config
+from app.config.base import SQL_SANDBOX_CONFIG
+from app.utils.error_handler import ApiError, ErrorCode
+from app.utils.logger import log_query
+from app.utils.partitioning import detach_partitions, route_query
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+# 授权回调允许的操作（只读查询）
+_ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+# 查询计划中的全表扫描/索引查找（表名可能是别名）
+_PLAN_ACCESS = re.compile(r'^(SCAN|SEARCH)\s+(?:TABLE\s+)?(\S+)')
+
+# 需要读完全部输入才能产出结果的写法（聚合）
+_AGGREGATE = re.compile(r'\b(COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(|\bGROUP\s+BY\b', re.IGNORECASE)
+
+# FROM/JOIN/逗号后的表名与别名
+_TABLE_ALIAS = re.compile(r'(?:\bFROM|\bJOIN|,)\s*["`\[]?(\w+)["`\]]?(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+
+
+class SQLSandboxError(ApiError):
+    """沙箱拒绝或中断查询"""
+
+    def __init__(self, message, reason, error_code=ErrorCode.API_INVALID_PARAMS, http_status=400, details=None):
+        """
+        参数:
+            message: 错误信息
+            reason: 原因（unsafe/too_costly/timeout/busy/failed）
+            error_code: 错误码
+            http_status: HTTP状态码
+            details: 详细信息
+        """
+        super().__init__(message, error_code=error_code, http_status=http_status, details=details)
+        self.reason = reason
+
+
+class ReadOnlyConnectionPool:
+    """只读连接池"""
+
+    def __init__(self, database_path: str, size: int, acquire_timeout: float):
+        """
+        参数:
+            database_path: 数据库路径
+            size: 连接数上限（同时也是并发查询上限）
+            acquire_timeout: 等待空闲连接的秒数
+        """
+        self.database_path = database_path
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = f"file:{pathname2url(os.path.abspath(self.database_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        借出一个只读连接，用完后归还
+
+        返回:
+            只读连接
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise SQLSandboxError("查询并发数已达上限，请稍后重试", 'busy',
+                                  error_code=ErrorCode.API_RATE_LIMIT, http_status=429)
+        conn = None
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            yield conn
+        finally:
+            if conn is not None:
+                conn.set_authorizer(None)
+                conn.set_progress_handler(None, 0)
+                try:
+                    detach_partitions(conn)
+                    self._idle.put(conn)
+                except sqlite3.Error:
+                    conn.close()
+            self._slots.release()
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class SQLSandbox:
+    """即席SQL执行沙箱"""
+
+    def __init__(self, database_path: Optional[str] = None, sandbox_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化沙箱
+
+        参数:
+            database_path: 数据库路径，默认使用配置
+            sandbox_config: 沙箱配置，默认使用 SQL_SANDBOX_CONFIG
+        """
+        self.database_path = database_path or config.DATABASE_PATH
+        self.config = {**SQL_SANDBOX_CONFIG, **(sandbox_config or {})}
+        self.pool = ReadOnlyConnectionPool(self.database_path, self.config['pool_size'],
+                                           self.config['acquire_timeout'])
+        self._denied_tables = {table.lower() for table in self.config.get('denied_tables', [])}
+        self._user_lock = threading.Condition()
+        self._user_active: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        self._table_stats: Dict[str, Tuple[int, float]] = {}
+        self._query_stats = {'queries': 0, 'seconds': 0.0}
+
+    # ---------- 并发限制 ----------
+
+    @contextmanager
+    def _user_slot(self, user: Optional[str]) -> Iterator[None]:
+        """按用户限制同时执行的查询数（名额已满时最多等待 user_slot_wait 秒）"""
+        key = user or 'anonymous'
+        limit = self.config['per_user_concurrency']
+        with self._user_lock:
+            if not self._user_lock.wait_for(lambda: self._user_active.get(key, 0) < limit,
+                                            timeout=self.config['user_slot_wait']):
+                raise SQLSandboxError(f"每个用户最多同时执行 {limit} 个查询，请等待之前的查询完成", 'busy',
+                                      error_code=ErrorCode.API_RATE_LIMIT, http_status=429)
+            self._user_active[key] = self._user_active.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._user_lock:
+                remaining = self._user_active[key] - 1
+                if remaining:
+                    self._user_active[key] = remaining
+                else:
+                    del self._user_active[key]
+                self._user_lock.notify_all()
+
+    # ---------- 执行计划检查 ----------
+
+    def _authorizer(self, action, arg1, arg2, db_name, trigger):
+        if action not in _ALLOWED_ACTIONS:
+            return sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_READ and arg1 and arg1.lower() in self._denied_tables:
+            return sqlite3.SQLITE_DENY
+        return sqlite3.SQLITE_OK
+
+    def _table_rows(self, conn: sqlite3.Connection, table: str) -> Optional[int]:
+        """估算表行数（sqlite_stat1 优先，其次最大rowid），不是表时返回None"""
+        now = time.monotonic()
+        with self._stats_lock:
+            cached = self._table_stats.get(table)
+        if cached and cached[1] > now:
+            return cached[0]
+
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+            return None
+        rows = None
+        try:
+            stat = conn.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = ? ORDER BY idx IS NULL DESC LIMIT 1",
+                                (table,)).fetchone()
+            if stat and stat[0]:
+                rows = int(stat[0].split()[0])
+        except sqlite3.OperationalError:
+            pass
+        if rows is None:
+            try:
+                rows = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0] or 0
+            except sqlite3.OperationalError:
+                rows = 0
+
+        with self._stats_lock:
+            self._table_stats[table] = (rows, now + self.config['table_stats_ttl'])
+        return rows
+
+    def check_plan(self, conn: sqlite3.Connection, sql: str, params: Sequence[Any] = ()) -> Dict[str, Any]:
+        """
+        分析执行计划并估算扫描行数，代价过高时抛出 SQLSandboxError
+
+        参数:
+            conn: 只读连接
+            sql: 查询语句
+            params: 查询参数
+
+        返回:
+            {'plan': 计划明细, 'estimated_rows': 估算的最大扫描行数}
+        """
+        conn.set_authorizer(self._authorizer)
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        finally:
+            conn.set_authorizer(None)
+
+        aliases = {}
+        for table, alias in _TABLE_ALIAS.findall(sql):
+            aliases.setdefault(table.lower(), table)
+            if alias:
+                aliases.setdefault(alias.lower(), table)
+
+        # 同一父节点下的访问按嵌套循环连接，扫描行数相乘
+        groups: Dict[int, List[Tuple[str, int]]] = {}
+        for _, parent, _, detail in plan:
+            match = _PLAN_ACCESS.match(detail)
+            if not match or match.group(1) != 'SCAN':
+                continue
+            name = match.group(2)
+            rows = self._table_rows(conn, name)
+            if rows is None and name.lower() in aliases:
+                rows = self._table_rows(conn, aliases[name.lower()])
+            if rows is not None:
+                groups.setdefault(parent, []).append((name, rows))
+
+        blocking = bool(_AGGREGATE.search(sql)) or any('TEMP B-TREE' in row[3] for row in plan)
+        limit = self.config['max_scan_rows']
+        estimated = 0
+        for scans in groups.values():
+            product = 1
+            for _, rows in scans:
+                product *= max(rows, 1)
+            estimated = max(estimated, product)
+            tables = ', '.join(name for name, _ in scans)
+            if len(scans) > 1 and product > limit:
+                raise SQLSandboxError(f"查询对 {tables} 做嵌套全表扫描，估算 {product:,} 行，请增加连接条件或筛选条件",
+                                      'too_costly', http_status=422, details={'estimated_rows': product})
+            if blocking and product > limit:
+                raise SQLSandboxError(f"查询需要对大表 {tables} 全表扫描后排序或聚合（约 {product:,} 行），"
+                                      f"请增加可使用索引的筛选条件", 'too_costly', http_status=422,
+                                      details={'estimated_rows': product})
+        return {'plan': [row[3] for row in plan], 'estimated_rows': estimated}
+
+    # ---------- 执行 ----------
+
+    def execute(self, sql: str, params: Sequence[Any] = (), user: Optional[str] = None,
+                max_rows: Optional[int] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        在沙箱中执行只读查询
+
+        参数:
+            sql: 查询语句（只允许单条SELECT/WITH语句）
+            params: 查询参数
+            user: 用户标识（用于按用户限制并发），默认取当前登录用户
+            max_rows: 最大返回行数，默认使用配置
+            timeout: 时间预算（秒），默认使用配置
+
+        返回:
+            {'columns': 列名, 'rows': 行字典列表, 'row_count': 返回行数, 'truncated': 是否截断,
+             'elapsed': 耗时秒数, 'estimated_rows': 估算扫描行数}
+        """
+        sql = (sql or '').strip().rstrip(';').strip()
+        if not sql:
+            raise SQLSandboxError("SQL查询不能为空", 'unsafe')
+        max_rows = max_rows or self.config['max_rows']
+        timeout = timeout or self.config['timeout_seconds']
+        user = user if user is not None else current_user_key()
+
+        with self._user_slot(user), self.pool.connection() as conn:
+            start = time.monotonic()
+            try:
+                # 已归档到分区文件的年份一并读取（ATTACH 在授权回调之外由沙箱自身执行）
+                try:
+                    routed = route_query(conn, sql)
+                except (ValueError, FileNotFoundError) as e:
+                    raise SQLSandboxError(f"执行SQL查询失败: {str(e)}", 'failed', error_code=ErrorCode.DB_QUERY)
+                check = self.check_plan(conn, routed, params)
+
+                deadline = start + timeout
+                conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0,
+                                          self.config['progress_interval'])
+                conn.set_authorizer(self._authorizer)
+                cursor = conn.execute(routed, params)
+                columns = [description[0] for description in cursor.description or ()]
+                fetched = cursor.fetchmany(max_rows + 1)
+                cursor.close()
+            except SQLSandboxError:
+                raise
+            except sqlite3.OperationalError as e:
+                elapsed = time.monotonic() - start
+                if 'interrupted' in str(e):
+                    logger.warning(f"沙箱查询超时（{elapsed:.1f}秒），用户: {user}")
+                    raise SQLSandboxError(f"查询超过 {timeout} 秒的执行时间上限，已中断", 'timeout',
+                                          error_code=ErrorCode.DB_QUERY, http_status=408)
+                raise self._rejected(e)
+            except (sqlite3.DatabaseError, sqlite3.ProgrammingError, sqlite3.Warning) as e:
+                raise self._rejected(e)
+            finally:
+                conn.set_progress_handler(None, 0)
+                conn.set_authorizer(None)
+
+        elapsed = time.monotonic() - start
+        truncated = len(fetched) > max_rows
+        rows = [dict(zip(columns, row)) for row in fetched[:max_rows]]
+        log_query(sql, elapsed)
+        with self._stats_lock:
+            self._query_stats['queries'] += 1
+            self._query_stats['seconds'] += elapsed
+        return {
+            'columns': columns,
+            'rows': rows,
+            'row_count': len(rows),
+            'truncated': truncated,
+            'elapsed': elapsed,
+            'estimated_rows': check['estimated_rows']
+        }
+
+    def explain(self, sql: str) -> Optional[str]:
+        """
+        只编译不执行，检查SQL能否在当前数据库上运行（表、字段是否存在，语法是否正确，是否只读）
+
+        参数:
+            sql: 查询语句
+
+        返回:
+            无法运行时的错误信息，可以运行时返回None
+        """
+        sql = (sql or '').strip().rstrip(';').strip()
+        if not sql:
+            return "SQL查询不能为空"
+        with self.pool.connection() as conn:
+            conn.set_authorizer(self._authorizer)
+            try:
+                conn.execute(f"EXPLAIN {sql}").close()
+            except (sqlite3.DatabaseError, sqlite3.ProgrammingError, sqlite3.Warning) as e:
+                return str(e)
+            finally:
+                conn.set_authorizer(None)
+        return None
+
+    @staticmethod
+    def _rejected(error: Exception) -> SQLSandboxError:
+        message = str(error)
+        if any(marker in message for marker in ('not authorized', 'prohibited', 'readonly', 'one statement')):
+            return SQLSandboxError("不安全的SQL查询，仅支持单条只读SELECT语句", 'unsafe',
+                                   details={'reason': message})
+        return SQLSandboxError(f"执行SQL查询失败: {message}", 'failed', error_code=ErrorCode.DB_QUERY)
+
+    def query_dataframe(self, sql: str, params: Sequence[Any] = (), user: Optional[str] = None,
+                        max_rows: Optional[int] = None) -> pd.DataFrame:
+        """
+        在沙箱中执行查询并返回DataFrame（截断信息保存在 df.attrs['truncated']）
+
+        参数:
+            sql: 查询语句
+            params: 查询参数
+            user: 用户标识
+            max_rows: 最大返回行数
+
+        返回:
+            查询结果DataFrame
+        """
+        result = self.execute(sql, params, user=user, max_rows=max_rows)
+        df = pd.DataFrame(result['rows'], columns=result['columns'])
+        df.attrs['truncated'] = result['truncated']
+        return df
+
+    def get_query_stats(self) -> Dict[str, Any]:
+        """累计执行的查询数与查询耗时（秒）"""
+        with self._stats_lock:
+            return dict(self._query_stats)
+
+    def close(self) -> None:
+        """关闭连接池"""
+        self.pool.close()
+
+
+def current_user_key() -> str:
+    """当前请求的用户标识（已登录用户ID，其次客户端地址，无请求上下文时为 anonymous）"""
+    try:
+        from flask import has_request_context, request
+        from flask_login import current_user
+
+        if not has_request_context():
+            return 'anonymous'
+        if getattr(current_user, 'is_authenticated', False):
+            return f"user:{current_user.get_id()}"
+        return f"addr:{request.remote_addr}"
+    except ImportError:
+        return 'anonymous'
+
+
+_sql_sandbox = None
+_sql_sandbox_lock = threading.Lock()
+
+
+def get_sql_sandbox() -> SQLSandbox:
+    """
+    获取SQL执行沙箱单例（数据库路径变化时重新创建）
+
+    返回:
+        SQLSandbox实例
+    """
+    global _sql_sandbox
+
+    with _sql_sandbox_lock:
+        if _sql_sandbox is None or _sql_sandbox.database_path != config.DATABASE_PATH:
+            if _sql_sandbox is not None:
+                _sql_sandbox.close()
+            _sql_sandbox = SQLSandbox()
+        return _sql_sandbox
@@ -0,0 +1,87 @@
+"""
+token计数模块 - 估算发送给大模型的文本token数
+
+使用 tiktoken 计数（编码名取自 SCHEMA_PROMPT_CONFIG['encoding']）；
+tiktoken 或其编码文件不可用时按字符数估算。短片段用 count_tokens（按文本缓存），
+一次性的大段文本（如完整查询结果）用 measure_tokens，避免占用缓存
+"""
+import logging
+import threading
+from functools import lru_cache
+
+from app.config.base import SCHEMA_PROMPT_CONFIG
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+# 设置日志记录器
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_encoding_unavailable = not TIKTOKEN_AVAILABLE
+
+
+def _get_encoding():
+    """加载tiktoken编码（首次加载可能需要下载编码文件，失败后不再重试）"""
+    global _encoding, _encoding_unavailable
+
+    if _encoding is not None or _encoding_unavailable:
+        return _encoding
+    with _encoding_lock:
+        if _encoding is None and not _encoding_unavailable:
+            try:
+                _encoding = tiktoken.get_encoding(SCHEMA_PROMPT_CONFIG['encoding'])
+            except Exception as e:
+                _encoding_unavailable = True
+                logger.warning(f"tiktoken编码 {SCHEMA_PROMPT_CONFIG['encoding']} 不可用，改为按字符数估算token: {str(e)}")
+    return _encoding
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    按字符数估算token（中文等非ASCII字符约1个token，ASCII约4个字符1个token）
+
+    参数:
+        text: 文本
+
+    返回:
+        估算的token数
+    """
+    ascii_count = len(text.encode('ascii', 'ignore'))
+    return len(text) - ascii_count + (ascii_count + 3) // 4
+
+
+def measure_tokens(text: str) -> int:
+    """
+    计算文本的token数（不缓存）
+
+    参数:
+        text: 文本
+
+    返回:
+        token数
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=SCHEMA_PROMPT_CONFIG['fragment_cache_size'])
+def count_tokens(text: str) -> int:
+    """
+    计算文本的token数（按文本缓存）
+
+    参数:
+        text: 文本
+
+    返回:
+        token数
+    """
+    return measure_tokens(text)